@@ -2,25 +2,60 @@
 
 VERSION = "0.1.3"
 
+import atexit
 import json
 import os
 import sys
 import threading
+import time
 import webbrowser
 from datetime import date, datetime
 from datetime import time as dt_time
 from datetime import timedelta
 from decimal import Decimal
 
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request, stream_with_context
 from flask.json.provider import DefaultJSONProvider
 from lxml import etree
 
-from config import DEFAULT_PORT, ONVIF_PRESETS
+from config import (
+    BATCH_MAX_CONCURRENCY,
+    DEFAULT_PORT,
+    DISCOVERY_PORT,
+    DISCOVERY_TIMEOUT,
+    FLEET_DEVICE_TIMEOUT,
+    FLEET_MAX_WORKERS,
+    HISTORY_ENABLED,
+    LOAD_TEST_REQUEST_TIMEOUT,
+    METRICS_ENABLED,
+    ONVIF_PRESETS,
+    PROFILE_SCAN_MAX_WORKERS,
+    RESPONSE_CACHE_ENABLED,
+)
 from onvif_client.command_executor import CommandExecutor
+from onvif_client.discovery import WSDiscovery
+from onvif_client.fleet import FleetRunner, parse_device_list
+from onvif_client.history import HistoryStore
+from onvif_client.load_test import LoadTestRunner, build_stages, report_to_csv
+from onvif_client.metrics import (
+    CONTENT_TYPE,
+    ONVIFMetrics,
+    device_health_collector,
+    history_collector,
+    pool_collector,
+    response_cache_collector,
+    subscriptions_collector,
+    wsdl_cache_collector,
+)
+from onvif_client.profile_checker import matrix_to_csv
+from onvif_client.raw_sender import RawSender
+from onvif_client.response_cache import ResponseCache
 from onvif_client.serializer import ONVIFSerializer
-from onvif_client.type_introspector import introspect_operation
+from onvif_client.snapshot import SnapshotRunner, SnapshotStore
+from onvif_client.subscriptions import SubscriptionManager
+from onvif_client.warmup import WarmUp
 from onvif_client.wsdl_loader import WSDLLoader
+from onvif_client.xml_store import DIRECTIONS, pretty_xml
 
 
 def _get_base_path():
@@ -63,14 +98,46 @@ app = Flask(
 )
 app.json_provider_class = ONVIFJSONProvider
 app.json = ONVIFJSONProvider(app)
+# The UI's xml_mode; serve.py switches to "inline" with several workers, since
+# deferred envelopes live in the memory of the worker that ran the call
+app.config["ONVIF_XML_MODE"] = "deferred"
 wsdl_loader = WSDLLoader()
-executor = CommandExecutor()
+metrics = ONVIFMetrics() if METRICS_ENABLED else None
+history = HistoryStore() if HISTORY_ENABLED else None
+if history is not None:
+    atexit.register(history.close)  # write results still queued at shutdown
+response_cache = ResponseCache() if RESPONSE_CACHE_ENABLED else None
+executor = CommandExecutor(metrics=metrics, history=history, response_cache=response_cache)
+profile_checker = executor.profile_checker
+raw_sender = RawSender(executor.pool, executor.resolve_xaddr)
+subscriptions = SubscriptionManager(executor)
+snapshots = SnapshotRunner(executor, wsdl_loader, SnapshotStore())
+load_tests = LoadTestRunner()
+warmup = WarmUp(wsdl_loader, executor.pool)
+if metrics is not None:
+    metrics.add_collector(pool_collector(executor.pool))
+    metrics.add_collector(wsdl_cache_collector(wsdl_loader))
+    metrics.add_collector(subscriptions_collector(subscriptions))
+    if history is not None:
+        metrics.add_collector(history_collector(history))
+    if response_cache is not None:
+        metrics.add_collector(response_cache_collector(response_cache))
+    if executor.pool.health is not None:
+        metrics.add_collector(device_health_collector(executor.pool.health))
 
 
 @app.route("/")
 def index():
     """Render main page."""
-    return render_template("index.html", presets=ONVIF_PRESETS, version=VERSION)
+    return render_template("index.html", presets=ONVIF_PRESETS, version=VERSION,
+                           xml_mode=app.config["ONVIF_XML_MODE"])
+
+
+@app.route("/api/ready", methods=["GET"])
+def api_ready():
+    """Readiness probe: 503 while the WSDL warm-up is still running."""
+    status = warmup.status()
+    return jsonify({"success": True, **status}), 200 if status["ready"] else 503
 
 
 @app.route("/api/presets", methods=["GET"])
@@ -89,7 +156,7 @@ def api_load_wsdl():
         return jsonify({"success": False, "error": "WSDL URL is required"}), 400
 
     try:
-        result = wsdl_loader.load_wsdl(wsdl_url)
+        result = wsdl_loader.load_wsdl(wsdl_url, refresh=bool(data.get("refresh")))
         return jsonify({"success": True, **result})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -107,73 +174,797 @@ def api_operation_params():
         return jsonify({"success": False, "error": "Missing required fields"}), 400
 
     try:
-        client = wsdl_loader.get_client(wsdl_url)
-        params = introspect_operation(client, binding_name, operation_name)
-        return jsonify({"success": True, "params": params})
+        params, types = wsdl_loader.get_operation_schema(wsdl_url, binding_name,
+                                                         operation_name)
+        return jsonify({"success": True, "params": params, "types": types})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route("/api/binding-schemas", methods=["GET"])
+def api_binding_schemas():
+    """Return the parameter schemas of every operation in a binding.
+
+    The response carries an ETag; a matching If-None-Match gets 304, so the
+    browser can keep the schemas and revalidate cheaply.
+    """
+    wsdl_url = request.args.get("wsdl_url", "").strip()
+    binding_name = request.args.get("binding_name", "").strip()
+
+    if not all([wsdl_url, binding_name]):
+        return jsonify({"success": False, "error": "Missing required fields"}), 400
+
+    try:
+        schemas, types, etag = wsdl_loader.get_binding_schemas(wsdl_url, binding_name)
+        response = jsonify({"success": True, "schemas": schemas, "types": types})
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+def parse_execute_request(data: dict) -> dict:
+    """Return ``execute()`` keyword arguments for an /api/execute body.
+
+    Raises ValueError when a required field is missing.
+    """
+    kwargs = {
+        "wsdl_url": data.get("wsdl_url", "").strip(),
+        "binding_name": data.get("binding_name", "").strip(),
+        "operation_name": data.get("operation_name", "").strip(),
+        "camera_ip": data.get("camera_ip", "").strip(),
+        "camera_port": int(data.get("camera_port", 80)),
+        "username": data.get("username", "").strip(),
+        "password": data.get("password", ""),
+        "params": data.get("params", {}),
+        "use_https": data.get("use_https", False),
+        "xml_mode": data.get("xml_mode", "inline"),
+        "cache": data.get("cache", True),
+    }
+    if not all(kwargs[k] for k in ("wsdl_url", "binding_name", "operation_name",
+                                   "camera_ip", "username")):
+        raise ValueError("Missing required fields")
+    return kwargs
+
+
+def parse_batch_request(data: dict) -> dict:
+    """Return ``execute_batch()`` keyword arguments for an /api/execute-batch body.
+
+    Raises ValueError when a required field is missing.
+    """
+    default_wsdl = data.get("wsdl_url", "").strip()
+    items = []
+    for item in data.get("items") or []:
+        items.append({
+            "wsdl_url": (item.get("wsdl_url") or default_wsdl).strip(),
+            "binding_name": (item.get("binding_name") or "").strip(),
+            "operation_name": (item.get("operation_name") or "").strip(),
+            "params": item.get("params") or {},
+        })
+    kwargs = {
+        "items": items,
+        "camera_ip": data.get("camera_ip", "").strip(),
+        "camera_port": int(data.get("camera_port", 80)),
+        "username": data.get("username", "").strip(),
+        "password": data.get("password", ""),
+        "use_https": data.get("use_https", False),
+        "max_concurrency": int(data.get("max_concurrency", BATCH_MAX_CONCURRENCY)),
+        "xml_mode": data.get("xml_mode", "inline"),
+        "cache": data.get("cache", True),
+    }
+
+    if not all([kwargs["camera_ip"], kwargs["username"]]) or not items:
+        raise ValueError("Missing required fields")
+    if not all(i["wsdl_url"] and i["binding_name"] and i["operation_name"] for i in items):
+        raise ValueError("Each item needs wsdl_url, binding_name and operation_name")
+    return kwargs
+
+
+def execute_error_result(e: Exception) -> dict:
+    """Return the /api/execute body for an unexpected server-side error."""
+    return {
+        "success": False,
+        "result_json": None,
+        "request_xml": "",
+        "response_xml": "",
+        "result_id": None,
+        "error": f"Server error: {type(e).__name__}: {e}",
+        "execution_time_ms": 0,
+    }
+
+
+def batch_error_result(e: Exception) -> dict:
+    """Return the /api/execute-batch body for an unexpected server-side error."""
+    return {
+        "success": False,
+        "results": [],
+        "error": f"Server error: {type(e).__name__}: {e}",
+        "execution_time_ms": 0,
+    }
+
+
 @app.route("/api/execute", methods=["POST"])
 def api_execute():
     """Execute an ONVIF operation on the camera."""
+    try:
+        kwargs = parse_execute_request(request.get_json())
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        return jsonify(executor.execute(**kwargs))
+    except Exception as e:
+        return jsonify(execute_error_result(e)), 500
+
+
+@app.route("/api/raw-send", methods=["POST"])
+def api_raw_send():
+    """POST a raw SOAP body or envelope to the camera, bypassing zeep."""
+    data = request.get_json(silent=True) or {}
+    xml = data.get("xml") or ""
+    camera_ip = data.get("camera_ip", "").strip()
+    if not xml.strip() or not camera_ip:
+        return jsonify({"success": False, "error": "Missing required fields"}), 400
+    try:
+        camera_port = int(data.get("camera_port", 80))
+        timeout = float(data["timeout"]) if data.get("timeout") else None
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": f"Invalid request: {e}"}), 400
+
+    try:
+        result = raw_sender.send(
+            xml,
+            camera_ip=camera_ip,
+            camera_port=camera_port,
+            username=data.get("username", "").strip(),
+            password=data.get("password", ""),
+            use_https=data.get("use_https", False),
+            xaddr=data.get("xaddr", "").strip() or None,
+            binding_name=data.get("binding_name", "").strip() or None,
+            soap_action=data.get("soap_action", "").strip() or None,
+            wsse=data.get("wsse", True),
+            parse=data.get("parse", False),
+            timeout=timeout,
+        )
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Server error: {type(e).__name__}: {e}"}), 500
+
+
+@app.route("/api/execute-batch", methods=["POST"])
+def api_execute_batch():
+    """Execute several ONVIF operations on one camera concurrently."""
+    try:
+        kwargs = parse_batch_request(request.get_json())
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        return jsonify(executor.execute_batch(**kwargs))
+    except Exception as e:
+        return jsonify(batch_error_result(e)), 500
+
+
+@app.route("/api/fleet-execute", methods=["POST"])
+def api_fleet_execute():
+    """Run one operation across a device list, streaming NDJSON results."""
+    data = request.get_json()
+
+    wsdl_url = data.get("wsdl_url", "").strip()
+    binding_name = data.get("binding_name", "").strip()
+    operation_name = data.get("operation_name", "").strip()
+    params = data.get("params", {})
+    xml_mode = data.get("xml_mode", "inline")
+
+    if not all([wsdl_url, binding_name, operation_name]):
+        return jsonify({"success": False, "error": "Missing required fields"}), 400
+
+    try:
+        devices = parse_device_list(
+            data.get("devices", ""),
+            username=data.get("username", "").strip(),
+            password=data.get("password", ""),
+            use_https=data.get("use_https", False),
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Invalid device list: {e}"}), 400
+    if not devices:
+        return jsonify({"success": False, "error": "Device list is empty"}), 400
+
+    runner = FleetRunner(
+        executor,
+        max_workers=min(int(data.get("max_workers", FLEET_MAX_WORKERS)), FLEET_MAX_WORKERS),
+        device_timeout=float(data.get("device_timeout", FLEET_DEVICE_TIMEOUT)),
+    )
+
+    def generate():
+        try:
+            for event in runner.run(devices, wsdl_url, binding_name, operation_name, params,
+                                    xml_mode=xml_mode):
+                yield app.json.dumps(event) + "\n"
+        except Exception as e:
+            yield app.json.dumps({
+                "type": "error",
+                "error": f"Server error: {type(e).__name__}: {e}",
+            }) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@app.route("/api/discover", methods=["POST"])
+def api_discover():
+    """Find ONVIF devices with WS-Discovery (multicast and/or a unicast CIDR sweep)."""
+    data = request.get_json() or {}
+    cidr = (data.get("cidr") or "").strip()
+    multicast = data.get("multicast", True)
+
+    if not multicast and not cidr:
+        return jsonify({"success": False, "error": "Enable multicast or enter a CIDR range"}), 400
+
+    try:
+        discovery = WSDiscovery(port=int(data.get("port") or DISCOVERY_PORT))
+        result = discovery.scan(
+            multicast=multicast,
+            cidr=cidr or None,
+            timeout=min(float(data.get("timeout") or DISCOVERY_TIMEOUT), 30),
+            interface=(data.get("interface") or "").strip() or None,
+        )
+        return jsonify({"success": True, **result})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Server error: {type(e).__name__}: {e}"}), 500
+
+
+@app.route("/api/load-test", methods=["POST"])
+def api_load_test():
+    """Run a load test of one operation on one camera, streaming NDJSON progress.
+
+    ``rate`` (req/s, 0 = closed loop) + ``duration`` (s), or a ramp profile
+    ``stages: [{"duration", "rate"}, ...]``; ``concurrency`` caps requests
+    in flight. Emits ``started``, one ``progress`` per second and ``summary``.
+    """
     data = request.get_json()
 
     wsdl_url = data.get("wsdl_url", "").strip()
     binding_name = data.get("binding_name", "").strip()
     operation_name = data.get("operation_name", "").strip()
     camera_ip = data.get("camera_ip", "").strip()
-    camera_port = int(data.get("camera_port", 80))
     username = data.get("username", "").strip()
-    password = data.get("password", "")
-    params = data.get("params", {})
-    use_https = data.get("use_https", False)
 
     if not all([wsdl_url, binding_name, operation_name, camera_ip, username]):
         return jsonify({"success": False, "error": "Missing required fields"}), 400
 
+    try:
+        stages = build_stages(rate=data.get("rate"), duration=data.get("duration"),
+                              stages=data.get("stages"))
+        test = load_tests.create(
+            {
+                "wsdl_url": wsdl_url,
+                "binding_name": binding_name,
+                "operation_name": operation_name,
+                "camera_ip": camera_ip,
+                "camera_port": int(data.get("camera_port", 80)),
+                "username": username,
+                "password": data.get("password", ""),
+                "params": data.get("params", {}),
+                "use_https": data.get("use_https", False),
+            },
+            stages,
+            concurrency=int(data.get("concurrency", 8)),
+            timeout=float(data.get("timeout", LOAD_TEST_REQUEST_TIMEOUT)),
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": f"Invalid load profile: {e}"}), 400
+
+    def generate():
+        try:
+            for event in test.run():
+                yield app.json.dumps(event) + "\n"
+        except Exception as e:
+            yield app.json.dumps({
+                "type": "error",
+                "error": f"Server error: {type(e).__name__}: {e}",
+            }) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@app.route("/api/load-test/<run_id>/stop", methods=["POST"])
+def api_load_test_stop(run_id):
+    """Stop a running load test; its summary is still emitted and kept."""
+    if not load_tests.stop(run_id):
+        return jsonify({"success": False, "error": "Load test not found"}), 404
+    return jsonify({"success": True})
+
+
+@app.route("/api/load-test/<run_id>/report", methods=["GET"])
+def api_load_test_report(run_id):
+    """Export a finished load test as JSON (default) or CSV (``?format=csv``)."""
+    test = load_tests.get(run_id)
+    if test is None:
+        return jsonify({"success": False, "error": "Load test not found or expired"}), 404
+    if test.report is None:
+        return jsonify({"success": False, "error": "Load test is still running"}), 409
+
+    if request.args.get("format") == "csv":
+        return Response(report_to_csv(test.report), mimetype="text/csv", headers={
+            "Content-Disposition": f"attachment; filename=load_test_{run_id}.csv",
+        })
+    return Response(app.json.dumps(test.report, indent=2), mimetype="application/json", headers={
+        "Content-Disposition": f"attachment; filename=load_test_{run_id}.json",
+    })
+
+
+@app.route("/api/result-xml/<result_id>/<direction>", methods=["GET"])
+def api_result_xml(result_id, direction):
+    """Return a deferred SOAP envelope: pretty-printed JSON, or the raw bytes.
+
+    ``?format=pretty`` (default) returns ``{"success", "xml"}``;
+    ``?format=raw`` sends the envelope exactly as captured, as a download.
+    """
+    if direction not in DIRECTIONS:
+        return jsonify({"success": False, "error": f"Unknown direction: {direction}"}), 400
+
+    raw = executor.xml_store.get(result_id, direction)
+    if raw is None:
+        return jsonify({"success": False, "error": "Result XML not found or expired"}), 404
+
+    if request.args.get("format", "pretty") == "raw":
+        return Response(raw, mimetype="application/xml", headers={
+            "Content-Disposition": f'attachment; filename="{direction}_{result_id}.xml"',
+        })
+    try:
+        return jsonify({"success": True, "xml": pretty_xml(raw)})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route("/api/history", methods=["GET"])
+def api_history():
+    """Search stored results, newest first (keyset-paginated with ``cursor``)."""
+    if history is None:
+        return jsonify({"success": False, "error": "History is disabled"}), 404
+    args = request.args
+    success = args.get("success")
+    try:
+        page = history.search(
+            device=args.get("device", "").strip() or None,
+            operation=args.get("operation", "").strip() or None,
+            binding=args.get("binding", "").strip() or None,
+            success=None if success in (None, "") else success.lower() in ("1", "true", "yes"),
+            error_type=args.get("error_type", "").strip() or None,
+            since=float(args["since"]) if args.get("since") else None,
+            until=float(args["until"]) if args.get("until") else None,
+            before_id=int(args["cursor"]) if args.get("cursor") else None,
+            limit=int(args.get("limit", 50)),
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Invalid query: {e}"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Server error: {type(e).__name__}: {e}"}), 500
+    return jsonify({"success": True, **page})
+
+
+@app.route("/api/history/<int:entry_id>", methods=["GET"])
+def api_history_entry(entry_id):
+    """Return one stored result with params, result JSON and envelopes."""
+    if history is None:
+        return jsonify({"success": False, "error": "History is disabled"}), 404
+    entry = history.get(entry_id)
+    if entry is None:
+        return jsonify({"success": False, "error": "History entry not found"}), 404
+    return jsonify({"success": True, "entry": entry})
+
+
+@app.route("/api/history/<int:entry_id>/rerun", methods=["POST"])
+def api_history_rerun(entry_id):
+    """Execute a stored call again (the password is not stored, so it is sent here)."""
+    if history is None:
+        return jsonify({"success": False, "error": "History is disabled"}), 404
+    entry = history.get(entry_id)
+    if entry is None:
+        return jsonify({"success": False, "error": "History entry not found"}), 404
+    data = request.get_json(silent=True) or {}
+
     try:
         result = executor.execute(
-            wsdl_url=wsdl_url,
-            binding_name=binding_name,
-            operation_name=operation_name,
-            camera_ip=camera_ip,
-            camera_port=camera_port,
-            username=username,
-            password=password,
-            params=params,
-            use_https=use_https,
+            wsdl_url=entry["wsdl_url"],
+            binding_name=entry["binding_name"],
+            operation_name=entry["operation_name"],
+            camera_ip=entry["camera_ip"],
+            camera_port=entry["camera_port"],
+            username=data.get("username", "").strip() or entry["username"],
+            password=data.get("password", ""),
+            params=entry["params"],
+            use_https=entry["use_https"],
+            xml_mode=data.get("xml_mode", "inline"),
+            cache=False,
         )
         return jsonify(result)
     except Exception as e:
-        return jsonify({
-            "success": False,
-            "result_json": None,
-            "request_xml": "",
-            "response_xml": "",
-            "error": f"Server error: {type(e).__name__}: {e}",
-            "execution_time_ms": 0,
-        }), 500
+        return jsonify(execute_error_result(e)), 500
+
+
+@app.route("/api/history", methods=["DELETE"])
+def api_history_clear():
+    """Delete every stored result."""
+    if history is None:
+        return jsonify({"success": False, "error": "History is disabled"}), 404
+    return jsonify({"success": history.clear()})
+
+
+@app.route("/api/history/stats", methods=["GET"])
+def api_history_stats():
+    """Return history row count, writer counters and database size."""
+    if history is None:
+        return jsonify({"success": False, "error": "History is disabled"}), 404
+    return jsonify({"success": True, **history.stats()})
+
+
+@app.route("/api/subscriptions", methods=["POST"])
+def api_start_subscriptions():
+    """Start PullPoint event subscriptions for a device list (or one camera)."""
+    data = request.get_json()
+    username = data.get("username", "").strip()
+    password = data.get("password", "")
+    use_https = data.get("use_https", False)
+
+    try:
+        if (data.get("devices") or "").strip():
+            devices = parse_device_list(data["devices"], username=username,
+                                        password=password, use_https=use_https)
+        elif data.get("camera_ip", "").strip():
+            devices = [{
+                "ip": data["camera_ip"].strip(),
+                "port": int(data.get("camera_port", 80)),
+                "username": username,
+                "password": password,
+                "use_https": use_https,
+            }]
+        else:
+            devices = []
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Invalid device list: {e}"}), 400
+    if not devices:
+        return jsonify({"success": False, "error": "Device list is empty"}), 400
+
+    try:
+        started = subscriptions.start(devices)
+        return jsonify({"success": True, "subscriptions": started})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Server error: {type(e).__name__}: {e}"}), 500
+
+
+@app.route("/api/subscriptions", methods=["GET"])
+def api_list_subscriptions():
+    """Return every subscription's state, events/sec and lag percentiles."""
+    return jsonify({"success": True, **subscriptions.status()})
+
+
+@app.route("/api/subscriptions", methods=["DELETE"])
+def api_stop_all_subscriptions():
+    """Stop every subscription."""
+    return jsonify({"success": True, "stopped": subscriptions.stop_all()})
+
+
+@app.route("/api/subscriptions/<subscription_id>", methods=["DELETE"])
+def api_stop_subscription(subscription_id):
+    """Stop one subscription (Unsubscribe is sent in the background)."""
+    if not subscriptions.stop(subscription_id):
+        return jsonify({"success": False, "error": "Subscription not found"}), 404
+    return jsonify({"success": True})
+
+
+@app.route("/api/subscriptions/<subscription_id>/events", methods=["GET"])
+def api_subscription_events(subscription_id):
+    """Return a subscription's buffered notifications, oldest first."""
+    sub = subscriptions.get(subscription_id)
+    if sub is None:
+        return jsonify({"success": False, "error": "Subscription not found"}), 404
+    limit = request.args.get("limit", type=int)
+    return jsonify({"success": True, "events": sub.recent(limit)})
+
+
+@app.route("/api/subscriptions/stream", methods=["GET"])
+def api_subscription_stream():
+    """Stream notifications to the browser as Server-Sent Events.
+
+    Each notification is an ``event: notification`` whose ``id`` is its
+    stream sequence number; a reconnecting EventSource resumes after its
+    ``Last-Event-ID`` (or ``?since=N``). A ``stats`` event with the
+    :meth:`SubscriptionManager.status` totals is sent about once a second.
+    ``?ids=a,b`` limits notifications to those subscriptions.
+    """
+    since = request.headers.get("Last-Event-ID") or request.args.get("since")
+    try:
+        since = int(since) if since else subscriptions.status()["last_seq"]
+    except ValueError:
+        return jsonify({"success": False, "error": f"Invalid event ID: {since}"}), 400
+    ids = {i for i in request.args.get("ids", "").split(",") if i}
+
+    def generate():
+        last = since
+        next_stats = 0.0
+        yield "retry: 3000\n\n"
+        while True:
+            events = subscriptions.wait_events(last, timeout=1.0)
+            for event in events:
+                last = event["seq"]
+                if ids and event["subscription_id"] not in ids:
+                    continue
+                yield f"id: {last}\nevent: notification\ndata: {app.json.dumps(event)}\n\n"
+            if time.monotonic() >= next_stats:
+                next_stats = time.monotonic() + 1.0
+                yield f"event: stats\ndata: {app.json.dumps(subscriptions.status())}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus text exposition of request, fault, pool and WSDL cache metrics."""
+    if metrics is None:
+        return Response("metrics disabled\n", status=404, mimetype="text/plain")
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+
+@app.route("/api/pool-stats", methods=["GET"])
+def api_pool_stats():
+    """Return client pool occupancy and hit/miss counters."""
+    return jsonify({"success": True, "pool": executor.pool.stats()})
+
+
+@app.route("/api/schema-registry", methods=["GET"])
+def api_schema_registry():
+    """Return the parsed WSDLs and shared XSDs in memory, with their resident size."""
+    registry = wsdl_loader.registry
+    return jsonify({"success": True, "stats": registry.stats(), "wsdls": registry.wsdls(),
+                    "xsds": registry.xsds()})
+
+
+@app.route("/api/schema-registry", methods=["DELETE"])
+def api_schema_registry_evict():
+    """Evict one parsed WSDL (``wsdl_url``) or all; they are loaded again on next use."""
+    wsdl_url = request.args.get("wsdl_url", "").strip()
+    if not wsdl_url:
+        wsdl_loader.registry.clear()
+    elif not wsdl_loader.registry.evict(wsdl_url):
+        return jsonify({"success": False, "error": f"WSDL not loaded: {wsdl_url}"}), 404
+    return jsonify({"success": True})
+
+
+@app.route("/api/response-cache", methods=["GET"])
+def api_response_cache_stats():
+    """Return response cache size, hit/miss and invalidation counters."""
+    if response_cache is None:
+        return jsonify({"success": True, "enabled": False})
+    return jsonify({"success": True, "enabled": True, "cache": response_cache.stats()})
+
+
+@app.route("/api/response-cache", methods=["DELETE"])
+def api_response_cache_clear():
+    """Drop cached results: of one device (``camera_ip`` + ``camera_port``) or all."""
+    if response_cache is None:
+        return jsonify({"success": False, "error": "Response cache is disabled"}), 404
+    camera_ip = request.args.get("camera_ip", "").strip()
+    try:
+        if camera_ip:
+            response_cache.invalidate(camera_ip, int(request.args.get("camera_port", 80)))
+        else:
+            response_cache.clear()
+    except ValueError:
+        return jsonify({"success": False, "error": "camera_port must be an integer"}), 400
+    return jsonify({"success": True})
+
+
+@app.route("/api/clock-offsets", methods=["GET"])
+def api_clock_offsets():
+    """Return the measured device clock offsets applied to WS-Security digests."""
+    clock_sync = executor.pool.clock_sync
+    if clock_sync is None:
+        return jsonify({"success": True, "enabled": False})
+    return jsonify({"success": True, "enabled": True, "stats": clock_sync.stats(),
+                    "devices": clock_sync.devices()})
+
+
+@app.route("/api/clock-offsets", methods=["DELETE"])
+def api_clock_offsets_clear():
+    """Forget measured offsets: of one device (``camera_ip`` [+ ``camera_port``]) or all."""
+    clock_sync = executor.pool.clock_sync
+    if clock_sync is None:
+        return jsonify({"success": False, "error": "Clock sync is disabled"}), 404
+    camera_ip = request.args.get("camera_ip", "").strip()
+    try:
+        if camera_ip:
+            camera_port = request.args.get("camera_port")
+            clock_sync.forget(camera_ip, int(camera_port) if camera_port else None)
+        else:
+            clock_sync.clear()
+    except ValueError:
+        return jsonify({"success": False, "error": "camera_port must be an integer"}), 400
+    return jsonify({"success": True})
+
+
+@app.route("/api/device-health", methods=["GET"])
+def api_device_health():
+    """Return circuit breaker states and adaptive timeouts per device."""
+    health = executor.pool.health
+    if health is None:
+        return jsonify({"success": True, "enabled": False})
+    devices = health.devices()
+    state = request.args.get("state", "").strip()
+    if state:
+        devices = [d for d in devices if d["state"] == state]
+    return jsonify({"success": True, "enabled": True, "stats": health.stats(),
+                    "devices": devices})
+
+
+@app.route("/api/device-health", methods=["DELETE"])
+def api_device_health_reset():
+    """Close the circuits and forget the timeouts of one device (``camera_ip``
+    [+ ``camera_port``]) or all."""
+    health = executor.pool.health
+    if health is None:
+        return jsonify({"success": False, "error": "Device health tracking is disabled"}), 404
+    camera_ip = request.args.get("camera_ip", "").strip()
+    try:
+        if camera_ip:
+            camera_port = request.args.get("camera_port")
+            health.reset(camera_ip, int(camera_port) if camera_port else None)
+        else:
+            health.reset()
+    except ValueError:
+        return jsonify({"success": False, "error": "camera_port must be an integer"}), 400
+    return jsonify({"success": True})
 
 
 @app.route("/api/check-profiles", methods=["POST"])
 def api_check_profiles():
     """Check ONVIF profile support via GetServices."""
-    from onvif_client.profile_checker import ProfileChecker
     data = request.get_json()
     camera_ip = data.get("camera_ip", "").strip()
     camera_port = int(data.get("camera_port", 80))
     username = data.get("username", "").strip()
     password = data.get("password", "")
     use_https = data.get("use_https", False)
+    refresh = data.get("refresh", False)
 
     if not all([camera_ip, username]):
         return jsonify({"success": False, "error": "Missing required fields"}), 400
 
-    result = ProfileChecker().check(camera_ip, camera_port, username, password, use_https)
+    result = profile_checker.check(camera_ip, camera_port, username, password, use_https,
+                                   refresh=refresh)
     return jsonify(result)
 
 
+@app.route("/api/scan-profiles", methods=["POST"])
+def api_scan_profiles():
+    """Check profile support for a device list in parallel (JSON or CSV matrix)."""
+    data = request.get_json()
+
+    try:
+        devices = parse_device_list(
+            data.get("devices", ""),
+            username=data.get("username", "").strip(),
+            password=data.get("password", ""),
+            use_https=data.get("use_https", False),
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Invalid device list: {e}"}), 400
+    if not devices:
+        return jsonify({"success": False, "error": "Device list is empty"}), 400
+
+    try:
+        result = profile_checker.scan(
+            devices,
+            max_workers=min(int(data.get("max_workers", PROFILE_SCAN_MAX_WORKERS)),
+                            PROFILE_SCAN_MAX_WORKERS),
+            refresh=data.get("refresh", False),
+            timeout=float(data.get("device_timeout", FLEET_DEVICE_TIMEOUT)),
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Server error: {type(e).__name__}: {e}"}), 500
+
+    if data.get("format") == "csv":
+        return Response(
+            matrix_to_csv(result),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=onvif_profiles.csv"},
+        )
+    return jsonify(result)
+
+
+@app.route("/api/snapshots", methods=["POST"])
+def api_take_snapshots():
+    """Snapshot the configuration of one or more devices in parallel."""
+    data = request.get_json()
+
+    try:
+        devices_text = data.get("devices", "").strip()
+        if not devices_text and data.get("camera_ip", "").strip():
+            devices_text = f"{data['camera_ip'].strip()}:{int(data.get('camera_port', 80))}"
+        devices = parse_device_list(
+            devices_text,
+            username=data.get("username", "").strip(),
+            password=data.get("password", ""),
+            use_https=data.get("use_https", False),
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Invalid device list: {e}"}), 400
+    if not devices:
+        return jsonify({"success": False, "error": "Device list is empty"}), 400
+
+    try:
+        return jsonify(snapshots.run(devices))
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Server error: {type(e).__name__}: {e}"}), 500
+
+
+@app.route("/api/snapshots", methods=["GET"])
+def api_list_snapshots():
+    """List stored snapshots, newest first (optionally of one device)."""
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return jsonify({"success": False, "error": "limit must be an integer"}), 400
+    try:
+        return jsonify({
+            "success": True,
+            "snapshots": snapshots.store.list(request.args.get("device", "").strip(), limit),
+            "stats": snapshots.store.stats(),
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Server error: {type(e).__name__}: {e}"}), 500
+
+
+@app.route("/api/snapshots/<int:snapshot_id>", methods=["GET"])
+def api_snapshot(snapshot_id):
+    """Return one snapshot with every operation result."""
+    try:
+        snapshot = snapshots.store.get(snapshot_id)
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Server error: {type(e).__name__}: {e}"}), 500
+    if snapshot is None:
+        return jsonify({"success": False, "error": "Snapshot not found"}), 404
+    snapshot.pop("manifest")
+    return jsonify({"success": True, "snapshot": snapshot})
+
+
+@app.route("/api/snapshots/<int:snapshot_id>/diff", methods=["GET"])
+def api_snapshot_diff(snapshot_id):
+    """Diff a snapshot against another one (default: the device's previous snapshot).
+
+    ``against`` is a snapshot ID; ``against_device`` ("ip:port") picks that
+    device's latest snapshot instead, for comparing two cameras.
+    """
+    try:
+        if request.args.get("against"):
+            base_id = int(request.args["against"])
+        elif request.args.get("against_device"):
+            base_id = snapshots.store.latest(request.args["against_device"].strip())
+        else:
+            base_id = snapshots.store.previous(snapshot_id)
+    except ValueError:
+        return jsonify({"success": False, "error": "against must be a snapshot ID"}), 400
+    if base_id is None:
+        return jsonify({"success": False, "error": "No snapshot to compare against"}), 404
+
+    try:
+        diff = snapshots.store.diff(base_id, snapshot_id)
+    except KeyError as e:
+        return jsonify({"success": False, "error": e.args[0]}), 404
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Server error: {type(e).__name__}: {e}"}), 500
+    return jsonify({"success": True, **diff})
+
+
 if __name__ == "__main__":
     is_frozen = getattr(sys, "frozen", False)
     port = DEFAULT_PORT
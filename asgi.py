@@ -0,0 +1,284 @@
+"""ONVIF Command Tester - ASGI entry point with the async execution backend.
+
+Usage:
+    pip install -r requirements-async.txt
+    python asgi.py                                          # uvicorn on DEFAULT_PORT
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+POST /api/execute and /api/execute-batch run on the event loop through
+:class:`AsyncCommandExecutor`, so a call waiting on a camera holds no
+thread and slow cameras no longer starve the others. GET /api/pool-stats
+also reports the async client pool. Every other route (UI, WSDL browsing,
+fleet, subscriptions, streams, /metrics) is the Flask app from ``app.py``,
+run in a pool of ``ASGI_WSGI_THREADS`` worker threads.
+
+Run a single worker process: subscriptions, load tests and deferred XML
+are kept in process memory.
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import app as flask_app
+from config import ASGI_WSGI_THREADS, DEFAULT_PORT
+from onvif_client.async_executor import AsyncCommandExecutor
+from onvif_client.metrics import pool_collector
+
+logger = logging.getLogger(__name__)
+
+executor = AsyncCommandExecutor(flask_app.executor)
+if flask_app.metrics is not None:
+    flask_app.metrics.add_collector(pool_collector(executor.pool, prefix="onvif_async_client_pool"))
+
+
+class WSGIBridge:
+    """Serve a WSGI app from ASGI, one worker thread per request.
+
+    Response chunks are sent as the app yields them, so NDJSON and SSE
+    streams keep working; when the client disconnects the app's iterator
+    is closed after its next chunk.
+    """
+
+    def __init__(self, wsgi_app, threads: int = ASGI_WSGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self._threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="asgi-wsgi")
+
+    async def __call__(self, scope, receive, send):
+        body = await _read_body(receive)
+        loop = asyncio.get_running_loop()
+        messages = asyncio.Queue()
+        disconnected = threading.Event()
+        environ = self._environ(scope, body)
+        worker = loop.run_in_executor(self._threads, self._run, environ,
+                                      loop, messages, disconnected)
+        watcher = asyncio.ensure_future(self._watch_disconnect(receive, disconnected))
+        try:
+            while True:
+                message = await messages.get()
+                if message is None:
+                    break
+                await send(message)
+        finally:
+            disconnected.set()
+            watcher.cancel()
+            await worker
+
+    def shutdown(self):
+        self._threads.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    async def _watch_disconnect(receive, disconnected: threading.Event):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+                return
+
+    def _run(self, environ: dict, loop, messages: asyncio.Queue,
+             disconnected: threading.Event):
+        def put(message):
+            loop.call_soon_threadsafe(messages.put_nowait, message)
+
+        start = []  # the response start message, until it is sent
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and start and start[0] is None:  # headers already sent
+                raise exc_info[1].with_traceback(exc_info[2])
+            start[:] = [{
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                            for name, value in headers],
+            }]
+            return write
+
+        def flush_start():
+            if start and start[0] is not None:
+                put(start[0])
+                start[0] = None
+
+        def write(data: bytes):
+            flush_start()
+            put({"type": "http.response.body", "body": data, "more_body": True})
+
+        iterable = None
+        try:
+            iterable = self.wsgi_app(environ, start_response)
+            for chunk in iterable:
+                if chunk:
+                    write(chunk)
+                if disconnected.is_set():
+                    break
+            flush_start()
+            put({"type": "http.response.body", "body": b"", "more_body": False})
+        except Exception:
+            logger.exception("Error serving %s %s", environ["REQUEST_METHOD"],
+                             environ["PATH_INFO"])
+            if not start or start[0] is not None:
+                put({"type": "http.response.start", "status": 500,
+                     "headers": [(b"content-type", b"text/plain; charset=utf-8")]})
+                put({"type": "http.response.body", "body": b"Internal Server Error"})
+            else:
+                put({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if hasattr(iterable, "close"):
+                try:
+                    iterable.close()
+                except Exception:
+                    logger.exception("Error closing response iterator")
+            put(None)
+
+    @staticmethod
+    def _environ(scope: dict, body: bytes) -> dict:
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0],
+            "REMOTE_PORT": str(client[1]),
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in scope.get("headers", []):
+            name = name.decode("latin-1").upper().replace("-", "_")
+            value = value.decode("latin-1")
+            if name == "CONTENT_TYPE":
+                environ["CONTENT_TYPE"] = value
+                continue
+            if name == "CONTENT_LENGTH":
+                continue
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def _send_json(send, data, status: int = 200):
+    body = flask_app.app.json.dumps(data).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _json_body(receive):
+    try:
+        data = json.loads(await _read_body(receive) or b"null")
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    return data
+
+
+async def api_execute(receive, send):
+    """Execute an ONVIF operation on the camera (async backend)."""
+    try:
+        kwargs = flask_app.parse_execute_request(await _json_body(receive))
+    except ValueError as e:
+        return await _send_json(send, {"success": False, "error": str(e)}, 400)
+
+    try:
+        result = await executor.execute(**kwargs)
+    except Exception as e:
+        return await _send_json(send, flask_app.execute_error_result(e), 500)
+    await _send_json(send, result)
+
+
+async def api_execute_batch(receive, send):
+    """Execute several ONVIF operations on one camera concurrently (async backend)."""
+    try:
+        kwargs = flask_app.parse_batch_request(await _json_body(receive))
+    except ValueError as e:
+        return await _send_json(send, {"success": False, "error": str(e)}, 400)
+
+    try:
+        result = await executor.execute_batch(**kwargs)
+    except Exception as e:
+        return await _send_json(send, flask_app.batch_error_result(e), 500)
+    await _send_json(send, result)
+
+
+async def api_pool_stats(receive, send):
+    """Return sync and async client pool occupancy and hit/miss counters."""
+    await _send_json(send, {
+        "success": True,
+        "pool": flask_app.executor.pool.stats(),
+        "async_pool": executor.pool.stats(),
+    })
+
+
+ROUTES = {
+    ("POST", "/api/execute"): api_execute,
+    ("POST", "/api/execute-batch"): api_execute_batch,
+    ("GET", "/api/pool-stats"): api_pool_stats,
+}
+
+wsgi = WSGIBridge(flask_app.app)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            flask_app.warmup.start()  # preset WSDLs in the background; see /api/ready
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            flask_app.subscriptions.stop_all()
+            await executor.aclose()
+            if flask_app.history is not None:
+                await asyncio.to_thread(flask_app.history.close)
+            wsgi.shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI application: async execute routes, everything else through Flask."""
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close"})
+        return
+    route = ROUTES.get((scope["method"], scope["path"]))
+    if route is None:
+        return await wsgi(scope, receive, send)
+    await route(receive, send)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(application, host="0.0.0.0", port=DEFAULT_PORT)
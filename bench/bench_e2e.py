@@ -0,0 +1,405 @@
+"""End-to-end benchmark of the tool against mock ONVIF devices.
+
+Usage:
+    python bench/bench_e2e.py                          # 4 mock devices, all scenarios
+    python bench/bench_e2e.py --latency 20 --jitter 5 --concurrency 16 --duration 20
+    python bench/bench_e2e.py --faults soap=0.01,drop=0.001 --scenarios execute
+    python bench/bench_e2e.py --device 192.168.1.100:80 --username admin --password secret
+    python bench/bench_e2e.py --wsdl DeviceBinding=wsdl/devicemgmt.wsdl --wsdl MediaBinding=wsdl/media.wsdl
+    python bench/bench_e2e.py --json results/after.json --compare results/before.json
+    python bench/bench_e2e.py --compare results/v1.json results/v2.json   # no run, just compare
+
+Unless ``--device`` is given, ``tools/mock_device.py`` is started in its own
+process (so it does not share the GIL with the tool) with ``--devices``
+devices on free ports, and stopped at the end.
+
+Scenarios:
+    execute     POST /api/execute (Flask test client, full request path) from
+                ``--concurrency`` threads for ``--duration`` seconds, cycling
+                through an operation mix over all devices
+    profiles    ProfileChecker.scan of all devices with refresh, ``--rounds`` times
+    serializer  ONVIFSerializer (+ json.dumps) on responses fetched from the device
+
+Each scenario reports ops/sec and latency percentiles. ``--json`` saves the
+results with the git revision; ``--compare`` prints saved results (plus the
+current run, if any) side by side with the change against the first file.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import ONVIF_PRESETS  # noqa: E402
+from onvif_client.serializer import ONVIFSerializer  # noqa: E402
+from onvif_client.stats import percentiles  # noqa: E402
+
+SCENARIOS = ("execute", "profiles", "serializer")
+
+# (preset, operation, params): a mix of small and larger responses per service
+OPERATION_MIX = [
+    ("Device Management", "GetDeviceInformation", {}),
+    ("Device Management", "GetSystemDateAndTime", {}),
+    ("Device Management", "GetNetworkInterfaces", {}),
+    ("Media (ver10)", "GetProfiles", {}),
+    ("Media (ver10)", "GetStreamUri", {
+        "StreamSetup": {"Stream": "RTP-Unicast", "Transport": {"Protocol": "RTSP"}},
+        "ProfileToken": "Profile_1",
+    }),
+    ("PTZ", "GetStatus", {"ProfileToken": "Profile_1"}),
+    ("Recording", "GetRecordings", {}),
+]
+
+
+def git_revision() -> str:
+    try:
+        out = subprocess.run(["git", "describe", "--always", "--dirty", "--tags"],
+                             cwd=ROOT, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def start_mock(args) -> tuple:
+    """Start tools/mock_device.py; return ``(process, [port, ...])``."""
+    cmd = [
+        sys.executable, os.path.join(ROOT, "tools", "mock_device.py"),
+        "--host", "127.0.0.1", "--port", "0", "--devices", str(args.devices),
+        "--username", args.username, "--password", args.password,
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--profiles", str(args.profiles), "--recordings", str(args.recordings),
+    ]
+    if args.faults:
+        cmd += ["--faults", args.faults]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    ports = []
+    for line in proc.stdout:
+        if line.startswith("Listening:"):
+            ports.append(urlsplit(line.split()[1]).port)
+        elif line.startswith("Ready:"):
+            return proc, ports
+    proc.wait()
+    raise RuntimeError(f"mock device exited with code {proc.returncode}")
+
+
+def operation_mix(args, overrides: dict) -> list:
+    """Resolve the mix to ``[(label, wsdl_url, binding_name, operation, params)]``."""
+    wanted = set(filter(None, (args.ops or "").split(",")))
+    mix = []
+    for preset_name, operation, params in OPERATION_MIX:
+        if wanted and operation not in wanted:
+            continue
+        preset = ONVIF_PRESETS[preset_name]
+        binding_name = f"{{{preset['namespace']}}}{preset['binding']}"
+        wsdl_url = overrides.get(preset["binding"], preset["wsdl"])
+        mix.append((operation, wsdl_url, binding_name, operation, params))
+    return mix
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    return {
+        "ops_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "calls": len(latencies),
+        "errors": errors,
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def bench_execute(tool_app, devices: list, mix: list, args) -> dict:
+    """Drive /api/execute from ``args.concurrency`` threads for ``args.duration`` s."""
+    def payload(index: int) -> dict:
+        device = devices[index % len(devices)]
+        _, wsdl_url, binding_name, operation, params = mix[index % len(mix)]
+        return {
+            "wsdl_url": wsdl_url, "binding_name": binding_name, "operation_name": operation,
+            "camera_ip": device["ip"], "camera_port": device["port"],
+            "username": device["username"], "password": device["password"],
+            "params": params, "use_https": device["use_https"], "xml_mode": args.xml_mode,
+        }
+
+    # Warm-up: build clients and resolve service endpoints once per device/binding
+    client = tool_app.app.test_client()
+    for i in range(len(devices) * len(mix)):
+        client.post("/api/execute", json=payload(i))
+
+    samples = [[] for _ in range(args.concurrency)]  # per thread: (op, ms, ok, error)
+    deadline = time.perf_counter() + args.duration
+
+    def worker(slot: int):
+        test_client = tool_app.app.test_client()
+        index = slot
+        while time.perf_counter() < deadline:
+            body = payload(index)
+            start = time.perf_counter()
+            data = test_client.post("/api/execute", json=body).get_json() or {}
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            samples[slot].append((body["operation_name"], elapsed_ms, bool(data.get("success")),
+                                  data.get("error_type") or data.get("error")))
+            index += args.concurrency
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    rows = [row for rows in samples for row in rows]
+    result = summarize([ms for _, ms, ok, _ in rows if ok],
+                       sum(1 for row in rows if not row[2]), elapsed)
+    result["operations"] = {}
+    for label, *_ in mix:
+        ok = [ms for op, ms, success, _ in rows if op == label and success]
+        failed = sum(1 for op, _, success, _ in rows if op == label and not success)
+        result["operations"][label] = summarize(ok, failed, elapsed)
+    result["error_types"] = {}
+    for _, _, success, error in rows:
+        if not success:
+            result["error_types"][error] = result["error_types"].get(error, 0) + 1
+    return result
+
+
+def bench_profiles(checker, devices: list, args) -> dict:
+    """Time ``ProfileChecker.scan`` over all devices, bypassing the services cache."""
+    checker.scan(devices, refresh=True)  # warm-up
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        result = checker.scan(devices, refresh=True)
+        latencies.append((time.perf_counter() - start) * 1000)
+        errors += sum(1 for row in result["rows"] if not row["success"])
+    elapsed = time.perf_counter() - started
+    summary = summarize(latencies, errors, elapsed)
+    summary["devices_per_sec"] = round(len(devices) * args.rounds / elapsed, 1)
+    return summary
+
+
+def bench_serializer(executor, device: dict, mix: list, args) -> dict:
+    """Best-of-N serialize and serialize+json.dumps times per mix operation."""
+    cases = {}
+    for label, wsdl_url, binding_name, operation, params in mix:
+        xaddr = executor.resolve_xaddr(binding_name, device["ip"], device["port"],
+                                       device["username"], device["password"],
+                                       device["use_https"])
+        try:
+            with executor.pool.lease(wsdl_url, binding_name, xaddr, device["username"],
+                                     device["password"], device["use_https"]) as entry:
+                value = getattr(entry.service, operation)(**params)
+        except Exception as e:
+            print(f"  skip {label}: {type(e).__name__}: {e}")
+            continue
+
+        def best(func):
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                func(value)
+                times.append((time.perf_counter() - start) * 1000)
+            return min(times)
+
+        serialize_ms = best(ONVIFSerializer.serialize)
+        json_ms = best(lambda v: json.dumps(ONVIFSerializer.serialize(v)))
+        cases[label] = {
+            "serialize_ms": round(serialize_ms, 4),
+            "json_ms": round(json_ms, 4),
+            "ops_per_sec": round(1000 / json_ms, 1) if json_ms else 0.0,
+            "bytes": len(json.dumps(ONVIFSerializer.serialize(value))),
+        }
+    return {"cases": cases}
+
+
+def print_latency_table(title: str, rows: list):
+    print(f"\n{title}")
+    print(f"  {'':<28} {'calls':>7} {'errors':>7} {'ops/s':>9} "
+          f"{'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}  (ms)")
+    for label, summary in rows:
+        lat = summary["latency_ms"]
+        print(f"  {label:<28} {summary['calls']:>7} {summary['errors']:>7} "
+              f"{summary['ops_per_sec']:>9.1f} {lat.get('p50', 0):>8.1f} {lat.get('p90', 0):>8.1f} "
+              f"{lat.get('p99', 0):>8.1f} {lat.get('max', 0):>8.1f}")
+
+
+def print_results(results: dict):
+    scenarios = results["scenarios"]
+    if "execute" in scenarios:
+        execute = scenarios["execute"]
+        s = results["settings"]
+        print_latency_table(
+            f"/api/execute: {s['concurrency']} threads, {s['duration']} s, {s['devices']} device(s)",
+            list(execute["operations"].items()) + [("all", execute)],
+        )
+        for error, count in sorted(execute["error_types"].items(), key=lambda kv: -kv[1]):
+            print(f"  error x{count}: {error}")
+    if "profiles" in scenarios:
+        profiles = scenarios["profiles"]
+        print_latency_table(f"ProfileChecker.scan: {profiles['devices_per_sec']} devices/s",
+                            [("scan", profiles)])
+    if "serializer" in scenarios:
+        print("\nONVIFSerializer (best of N)")
+        print(f"  {'':<28} {'serialize ms':>13} {'+json ms':>10} {'ops/s':>10} {'bytes':>8}")
+        for label, case in scenarios["serializer"]["cases"].items():
+            print(f"  {label:<28} {case['serialize_ms']:>13.3f} {case['json_ms']:>10.3f} "
+                  f"{case['ops_per_sec']:>10.1f} {case['bytes']:>8}")
+
+
+def flatten(results: dict) -> dict:
+    """Comparable metrics of one result: ``{name: (value, higher_is_better)}``."""
+    metrics = {}
+    scenarios = results["scenarios"]
+    execute = scenarios.get("execute")
+    if execute:
+        metrics["execute ops/s"] = (execute["ops_per_sec"], True)
+        for pct in ("p50", "p99"):
+            metrics[f"execute {pct} ms"] = (execute["latency_ms"].get(pct), False)
+        for label, summary in execute["operations"].items():
+            metrics[f"  {label} p50 ms"] = (summary["latency_ms"].get("p50"), False)
+    profiles = scenarios.get("profiles")
+    if profiles:
+        metrics["profiles devices/s"] = (profiles["devices_per_sec"], True)
+        metrics["profiles scan p50 ms"] = (profiles["latency_ms"].get("p50"), False)
+    for label, case in (scenarios.get("serializer") or {}).get("cases", {}).items():
+        metrics[f"serialize+json {label} ms"] = (case["json_ms"], False)
+    return metrics
+
+
+def compare(runs: list):
+    """Print ``[(name, results), ...]`` side by side with deltas against the first."""
+    flat = [flatten(results) for _, results in runs]
+    names = list(dict.fromkeys(name for metrics in flat for name in metrics))
+    width = max([len(n) for n in names] + [20])
+    print("\nComparison (change against the first column; + is better)")
+    print(f"  {'':<{width}}" + "".join(f" {name[-22:]:>22}" for name, _ in runs))
+    print(f"  {'revision':<{width}}" + "".join(f" {r.get('revision', '?')[-22:]:>22}" for _, r in runs))
+    for name in names:
+        base = flat[0].get(name, (None, True))[0]
+        cells = []
+        for metrics in flat:
+            value, higher_better = metrics.get(name, (None, True))
+            if value is None:
+                cells.append(f"{'-':>22}")
+                continue
+            cell = f"{value:.3f}" if value < 10 else f"{value:.1f}"
+            if base and metrics is not flat[0]:
+                change = (value - base) / base * 100
+                cell += f" ({change if higher_better else -change:+.0f}%)"
+            cells.append(f"{cell:>22}")
+        print(f"  {name:<{width}}" + "".join(f" {c}" for c in cells))
+
+
+def parse_device(spec: str, args) -> dict:
+    host, _, port = spec.rpartition(":") if ":" in spec else (spec, "", "80")
+    return {"ip": host, "port": int(port), "username": args.username,
+            "password": args.password, "use_https": args.https}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--device", action="append", default=[],
+                        help="HOST:PORT of a running device (repeatable; default: start mocks)")
+    parser.add_argument("--devices", type=int, default=4, help="mock devices to start")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--https", action="store_true", help="use HTTPS for --device targets")
+    parser.add_argument("--latency", type=float, default=0, help="mock response delay in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="mock +/- random delay in ms")
+    parser.add_argument("--faults", default="", help="mock fault rates, e.g. soap=0.01,drop=0.001")
+    parser.add_argument("--profiles", type=int, default=4, help="media profiles per mock device")
+    parser.add_argument("--recordings", type=int, default=8, help="recordings per mock device")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--ops", help="comma-separated operations of the mix to run (default: all)")
+    parser.add_argument("--concurrency", type=int, default=8, help="execute: client threads")
+    parser.add_argument("--duration", type=float, default=10, help="execute: seconds to run")
+    parser.add_argument("--xml-mode", default="inline", choices=("inline", "deferred", "none"))
+    parser.add_argument("--rounds", type=int, default=20, help="profiles: scans to time")
+    parser.add_argument("--repeat", type=int, default=50, help="serializer: runs per case (best is kept)")
+    parser.add_argument("--wsdl", action="append", default=[], metavar="BINDING=URL",
+                        help="WSDL for a binding, e.g. DeviceBinding=wsdl/devicemgmt.wsdl")
+    parser.add_argument("--json", help="save results to this file")
+    parser.add_argument("--compare", nargs="+", metavar="FILE", help="saved results to compare")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    overrides = {}
+    for item in args.wsdl:
+        binding, sep, url = item.partition("=")
+        if not sep:
+            parser.error(f"--wsdl expects BINDING=URL, got {item!r}")
+        overrides[binding] = url
+
+    runs = []
+    for path in args.compare or []:
+        with open(path, encoding="utf-8") as fh:
+            runs.append((os.path.basename(path), json.load(fh)))
+    if args.compare and not args.json:
+        compare(runs)
+        return
+
+    import app as tool_app  # after the argument checks: builds the pool and executor
+
+    if "DeviceBinding" in overrides:
+        tool_app.executor.profile_checker.device_wsdl = overrides["DeviceBinding"]
+    mix = operation_mix(args, overrides)
+
+    mock = None
+    if args.device:
+        devices = [parse_device(spec, args) for spec in args.device]
+    else:
+        mock, ports = start_mock(args)
+        devices = [{"ip": "127.0.0.1", "port": port, "username": args.username,
+                    "password": args.password, "use_https": False} for port in ports]
+
+    results = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "settings": {
+            "devices": len(devices), "mock": mock is not None, "latency_ms": args.latency,
+            "jitter_ms": args.jitter, "faults": args.faults, "concurrency": args.concurrency,
+            "duration": args.duration, "xml_mode": args.xml_mode, "rounds": args.rounds,
+            "repeat": args.repeat, "operations": [label for label, *_ in mix],
+        },
+        "scenarios": {},
+    }
+    print(f"revision {results['revision']}, {len(devices)} device(s), "
+          f"{len(mix)} operation(s), scenarios: {', '.join(scenarios)}")
+    try:
+        if "execute" in scenarios:
+            results["scenarios"]["execute"] = bench_execute(tool_app, devices, mix, args)
+        if "profiles" in scenarios:
+            results["scenarios"]["profiles"] = bench_profiles(
+                tool_app.executor.profile_checker, devices, args)
+        if "serializer" in scenarios:
+            results["scenarios"]["serializer"] = bench_serializer(
+                tool_app.executor, devices[0], mix, args)
+    finally:
+        if mock is not None:
+            mock.terminate()
+            mock.wait()
+
+    print_results(results)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"\nSaved {args.json}")
+    if runs:
+        compare(runs + [("this run", results)])
+
+
+if __name__ == "__main__":
+    main()
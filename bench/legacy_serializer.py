@@ -0,0 +1,69 @@
+"""The pre-Enhancement #16 serializer, kept as the benchmark baseline.
+
+``serialize_object`` copy + recursive ``_make_json_safe`` walk + one
+throwaway dict per lxml child. Do not use outside ``bench/``.
+"""
+
+from datetime import date, datetime
+from datetime import time as dt_time
+from datetime import timedelta
+from decimal import Decimal
+
+import zeep.helpers
+from lxml import etree
+
+
+def serialize(zeep_object):
+    raw = zeep.helpers.serialize_object(zeep_object, target_cls=dict)
+    return _make_json_safe(raw)
+
+
+def _make_json_safe(obj):
+    if isinstance(obj, dict):
+        return {k: _make_json_safe(v) for k, v in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [_make_json_safe(item) for item in obj]
+    elif isinstance(obj, etree._Element):
+        return _element_to_dict(obj)
+    elif isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    elif isinstance(obj, dt_time):
+        return obj.isoformat()
+    elif isinstance(obj, timedelta):
+        return str(obj)
+    elif isinstance(obj, Decimal):
+        return float(obj)
+    elif isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    return obj
+
+
+def _element_to_dict(element):
+    tag = etree.QName(element.tag).localname if "}" in element.tag else element.tag
+
+    children = list(element)
+    if not children and element.text and element.text.strip():
+        return {tag: element.text.strip()}
+
+    if not children and not (element.text and element.text.strip()):
+        if element.attrib:
+            return {tag: dict(element.attrib)}
+        return {tag: None}
+
+    result = {}
+    if element.attrib:
+        result["@attributes"] = dict(element.attrib)
+
+    for child in children:
+        child_data = _element_to_dict(child)
+        child_tag = list(child_data.keys())[0]
+        child_val = child_data[child_tag]
+
+        if child_tag in result:
+            if not isinstance(result[child_tag], list):
+                result[child_tag] = [result[child_tag]]
+            result[child_tag].append(child_val)
+        else:
+            result[child_tag] = child_val
+
+    return {tag: result}
@@ -159,7 +159,173 @@ ENDPOINT_MAP = {
     "CredentialBinding": "/onvif/credential_service",
 }
 
+# Offline WSDL bundle (see tools/fetch_wsdl_bundle.py) and parsed-document cache
+WSDL_BUNDLE_DIR = "wsdl"           # relative to the application directory
+WSDL_CACHE_DIR = "~/.onvif_tester/wsdl_cache"
+WSDL_OFFLINE = False               # True: never fetch documents missing from the bundle
+
+# Schema registry: parsed WSDLs (and the XSDs they share) kept for every client
+SCHEMA_REGISTRY_MAX_MB = 256       # resident size budget; least recently used WSDLs are evicted
+
 # Flask settings
 DEFAULT_PORT = 5000
 ZEEP_TIMEOUT = 15
 ZEEP_OPERATION_TIMEOUT = 30
+
+# Client pool settings (CommandExecutor)
+CLIENT_POOL_MAX_SIZE = 64          # idle clients kept across all cameras
+CLIENT_POOL_IDLE_TIMEOUT = 300     # seconds before an idle client is evicted
+CLIENT_POOL_CONNECTIONS_PER_HOST = 10
+
+# /api/execute-batch: max operations in flight per camera
+BATCH_MAX_CONCURRENCY = 8
+
+# Fleet mode (/api/fleet-execute)
+FLEET_MAX_WORKERS = 32
+FLEET_DEVICE_TIMEOUT = 10          # seconds per device (connect + read)
+
+# Profile check / fleet profile scan (/api/scan-profiles)
+PROFILE_SCAN_MAX_WORKERS = 32
+PROFILE_SERVICES_TTL = 600         # seconds a device's GetServices result is reused
+PROFILE_SERVICES_CACHE_SIZE = 4096
+
+# Deferred SOAP XML capture (raw envelopes kept server-side by result ID)
+XML_STORE_MAX_ENTRIES = 200
+XML_STORE_MAX_BYTES = 64 * 1024 * 1024
+
+# Service XAddr discovery (GetServices-based routing)
+SERVICE_DISCOVERY_FAILURE_TTL = 60  # seconds before retrying discovery on a failing device
+
+# PullPoint event subscriptions (/api/subscriptions)
+SUBSCRIPTION_MAX = 256               # concurrent subscriptions (one thread each)
+SUBSCRIPTION_TERMINATION = 60        # seconds requested per CreatePullPoint / Renew
+SUBSCRIPTION_PULL_TIMEOUT = 10       # PullMessages long-poll Timeout, seconds
+SUBSCRIPTION_MESSAGE_LIMIT = 100     # PullMessages MessageLimit
+SUBSCRIPTION_BUFFER_SIZE = 1000      # notifications kept per subscription
+SUBSCRIPTION_STREAM_BUFFER = 5000    # notifications kept for SSE replay (all devices)
+SUBSCRIPTION_MAX_BACKOFF = 30        # seconds between re-subscribe attempts, at most
+SUBSCRIPTION_RATE_WINDOW = 10        # seconds over which events/sec is measured
+
+# WS-Discovery scanner (/api/discover)
+DISCOVERY_MULTICAST_ADDR = "239.255.255.250"
+DISCOVERY_PORT = 3702
+DISCOVERY_TIMEOUT = 3                # seconds to keep listening after the last probe
+DISCOVERY_MAX_HOSTS = 4096           # largest unicast sweep (a /20)
+DISCOVERY_SEND_BATCH = 256           # unicast probes sent per writable socket event
+
+# Load / soak test mode (/api/load-test)
+LOAD_TEST_MAX_RATE = 1000            # requests/sec
+LOAD_TEST_MAX_CONCURRENCY = 128      # requests in flight (one worker + connection each)
+LOAD_TEST_MAX_DURATION = 24 * 3600   # seconds, all stages together
+LOAD_TEST_REQUEST_TIMEOUT = 10       # seconds per request (connect + read)
+LOAD_TEST_KEEP_REPORTS = 20          # finished runs kept for JSON/CSV export
+LOAD_TEST_PENDING_TIMEOUT = 60       # seconds a created run may wait for its stream before it is dropped
+
+# Prometheus-style metrics (/metrics)
+METRICS_ENABLED = True
+METRICS_MAX_DEVICES = 1000           # devices with their own label; the rest share "_other"
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # seconds
+
+# Async backend (asgi.py, requirements-async.txt)
+ASYNC_MAX_IN_FLIGHT = 5000           # camera calls awaited at once on the event loop
+ASGI_WSGI_THREADS = 32               # worker threads for the Flask routes served through asgi.py
+
+# Command history (/api/history)
+HISTORY_ENABLED = True
+HISTORY_DB_PATH = "~/.onvif_tester/history.sqlite3"
+HISTORY_MAX_ROWS = 5_000_000         # oldest results are pruned beyond this
+HISTORY_QUEUE_SIZE = 10000           # results waiting for the writer; more are dropped (counted)
+HISTORY_BATCH_SIZE = 500             # results per write transaction, at most
+HISTORY_COMPRESS_LEVEL = 6           # zlib level for envelopes and result JSON
+HISTORY_PAGE_MAX = 200               # largest /api/history page
+
+# Raw XML send (/api/raw-send)
+RAW_SEND_MAX_BYTES = 16 * 1024 * 1024  # largest envelope accepted, after the token is added
+
+# Configuration snapshots (/api/snapshots)
+SNAPSHOT_DB_PATH = "~/.onvif_tester/snapshots.sqlite3"
+SNAPSHOT_MAX_CONCURRENCY = 8         # Get* calls in flight per camera while snapshotting
+SNAPSHOT_MAX_DEVICES = 8             # cameras snapshotted at once
+SNAPSHOT_MAX_PER_DEVICE = 100        # oldest snapshots of a camera are pruned beyond this
+SNAPSHOT_DIFF_MAX_CHANGES = 200      # changes listed per operation in a diff
+SNAPSHOT_EXCLUDE_OPERATIONS = (      # volatile or heavy Get* calls left out of snapshots
+    "GetSystemDateAndTime",
+    "GetSystemLog",
+    "GetSystemSupportInformation",
+    "GetSystemBackup",
+    "GetSystemUris",
+    "GetEndpointReference",
+    "GetWsdlUrl",
+    "GetEventProperties",
+)
+
+# Response cache for Get* results (CommandExecutor, off by default)
+RESPONSE_CACHE_ENABLED = False
+RESPONSE_CACHE_MAX_SIZE = 5000       # cached results, least recently used dropped first
+RESPONSE_CACHE_DEFAULT_TTL = 30      # seconds, for Get* operations not listed below
+RESPONSE_CACHE_TTLS = {              # per-operation TTL in seconds (0 = never cached)
+    "GetServices": 300,
+    "GetCapabilities": 300,
+    "GetDeviceInformation": 300,
+    "GetWsdlUrl": 300,
+    "GetProfiles": 60,
+    "GetVideoSources": 60,
+    "GetAudioSources": 60,
+    "GetNodes": 60,
+    "GetSystemDateAndTime": 0,
+    "GetSystemLog": 0,
+    "GetStatus": 0,
+    "GetEventProperties": 0,
+    "GetRecordingSummary": 0,
+    "GetSearchState": 0,
+    "GetStreamUri": 0,               # some cameras hand out per-session URIs
+    "GetSnapshotUri": 0,
+}
+RESPONSE_CACHE_WRITE_PREFIXES = (    # operations that invalidate their binding's entries
+    "Set", "Create", "Delete", "Add", "Remove", "Modify", "Load", "Upload", "Start", "Stop",
+)
+RESPONSE_CACHE_DEVICE_WRITES = (     # operations that invalidate every binding of the device
+    "SystemReboot",
+    "SetSystemFactoryDefault",
+    "RestoreSystem",
+    "UpgradeSystemFirmware",
+    "StartFirmwareUpgrade",
+    "StartSystemRestore",
+    "SetNetworkInterfaces",
+    "SetNetworkProtocols",
+)
+
+# Device clock offsets for WS-Security Created times (ClientPool)
+CLOCK_SYNC_ENABLED = True
+CLOCK_SYNC_TTL = 3600                # seconds a device's measured clock offset is reused
+CLOCK_SYNC_FAILURE_TTL = 60          # seconds before re-measuring a device that did not answer
+CLOCK_SYNC_MIN_INTERVAL = 10         # seconds between re-syncs of one device after auth faults
+CLOCK_SYNC_MAX_DEVICES = 4096
+CLOCK_SYNC_AUTH_ERRORS = (           # error types that trigger a re-sync and one retry
+    "Fault:NotAuthorized",
+    "Fault:FailedAuthentication",
+    "Fault:InvalidSecurity",
+    "Fault:MessageExpired",
+    "HTTP 401",
+)
+
+# Adaptive per-device timeouts and circuit breaker (ClientPool)
+DEVICE_HEALTH_ENABLED = True
+DEVICE_HEALTH_MAX_DEVICES = 4096
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 5     # successful calls before a timeout adapts (ZEEP_* until then)
+ADAPTIVE_TIMEOUT_MULTIPLIER = 3      # timeout = multiplier x (smoothed latency + 4 x its deviation)
+ADAPTIVE_CONNECT_TIMEOUT_MIN = 1.0   # seconds; ZEEP_TIMEOUT is the upper bound
+ADAPTIVE_READ_TIMEOUT_MIN = 3.0      # seconds; ZEEP_OPERATION_TIMEOUT is the upper bound
+BREAKER_FAILURE_THRESHOLD = 3        # consecutive unreachable errors that open a device's circuit
+BREAKER_OPEN_SECONDS = 10            # calls fail fast this long before a half-open probe...
+BREAKER_MAX_OPEN_SECONDS = 300       # ...doubled after each failed probe, up to this
+BREAKER_FAILURE_ERRORS = ("Timeout", "ConnectionError")  # error types meaning "unreachable"
+
+# Production server (serve.py, requirements-serve.txt; Linux/macOS)
+SERVE_WORKERS = 4                    # pre-forked worker processes
+SERVE_THREADS = 16                   # request threads per worker
+SERVE_PRELOAD = True                 # parse the preset WSDLs once in the parent, before forking
+SERVE_MAX_REQUESTS = 10000           # a worker is replaced after this many requests...
+SERVE_MAX_REQUESTS_JITTER = 1000     # ...plus up to this many, so workers don't restart together
+SERVE_GRACEFUL_TIMEOUT = 30          # seconds a stopping worker gets to finish its requests
+SERVE_TIMEOUT = 120                  # a worker silent for this long is killed and replaced
@@ -0,0 +1,441 @@
+"""Async execution backend: zeep ``AsyncClient`` over pooled httpx connections.
+
+A call awaiting a camera holds no thread, so one event loop can keep
+thousands of calls in flight (see ``asgi.py``). WSDL parsing, the device
+service index and XML capture are shared with the sync
+:class:`CommandExecutor`, whose API is unchanged.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from time import perf_counter
+
+from zeep.client import AsyncClient
+from zeep.proxy import AsyncServiceProxy
+from zeep.transports import AsyncTransport
+from zeep.wsa import WsAddressingPlugin
+
+from config import (
+    ASYNC_MAX_IN_FLIGHT,
+    BATCH_MAX_CONCURRENCY,
+    CLIENT_POOL_CONNECTIONS_PER_HOST,
+    CLIENT_POOL_IDLE_TIMEOUT,
+    CLIENT_POOL_MAX_SIZE,
+    CLOCK_SYNC_AUTH_ERRORS,
+    ZEEP_OPERATION_TIMEOUT,
+    ZEEP_TIMEOUT,
+)
+from .client_pool import ClientPool, PooledClient, _endpoint, _pool_key
+from .command_executor import CommandExecutor, _device_key
+from .serializer import ONVIFSerializer
+from .timing import HttpxTraceHook, PhaseTimer, TimedUsernameToken, current_trace, trace_call
+
+try:
+    import httpx
+except ImportError:  # optional: pip install -r requirements-async.txt
+    httpx = None
+
+
+def _require_httpx():
+    if httpx is None:
+        raise RuntimeError("The async backend needs httpx: "
+                           "pip install -r requirements-async.txt")
+
+
+class CapturingAsyncTransport(AsyncTransport):
+    """Async counterpart of :class:`CapturingTransport`.
+
+    Keeps the raw bytes of the last request/response, applies the per-call
+    ``operation_timeout`` (seconds or a ``(connect, read)`` pair) and reports connect / TLS / headers times of the
+    request to the current call trace.
+    """
+
+    def __init__(self, client, wsdl_client):
+        super().__init__(client=client, wsdl_client=wsdl_client)
+        self.operation_timeout = None
+        self.last_sent = None
+        self.last_received = None
+
+    def reset_capture(self):
+        self.last_sent = None
+        self.last_received = None
+
+    async def post(self, address, message, headers):
+        self.last_sent = message if isinstance(message, bytes) else str(message).encode("utf-8")
+        kwargs = {}
+        if isinstance(self.operation_timeout, tuple):
+            connect, read = self.operation_timeout
+            kwargs["timeout"] = httpx.Timeout(read, connect=connect)
+        elif self.operation_timeout is not None:
+            kwargs["timeout"] = self.operation_timeout
+        trace = current_trace()
+        if trace is None:
+            response = await self.client.post(address, content=message,
+                                              headers=headers, **kwargs)
+        else:
+            # httpx builds the request inside post(), so sending starts here
+            trace.post_start = trace.send_start = perf_counter()
+            try:
+                response = await self.client.post(
+                    address, content=message, headers=headers,
+                    extensions={"trace": HttpxTraceHook(trace)}, **kwargs,
+                )
+            finally:
+                trace.post_end = perf_counter()
+        self.last_received = response.content
+        return response
+
+
+class AsyncClientPool(ClientPool):
+    """:class:`ClientPool` of zeep ``AsyncClient`` proxies on httpx connections.
+
+    Parsed WSDL documents come from the registry of ``documents`` (the sync
+    pool), so each WSDL is parsed once per process whichever backend uses it
+    first; clock offsets and device health are shared with it too. One
+    ``httpx.AsyncClient`` is kept per camera endpoint. ``lease`` is an async
+    context manager and must be used from the event loop serving the calls.
+    """
+
+    def __init__(self, documents: ClientPool = None, max_size: int = CLIENT_POOL_MAX_SIZE,
+                 idle_timeout: float = CLIENT_POOL_IDLE_TIMEOUT,
+                 connections_per_host: int = CLIENT_POOL_CONNECTIONS_PER_HOST):
+        _require_httpx()
+        self.documents = documents or ClientPool()
+        super().__init__(max_size, idle_timeout, connections_per_host,
+                         registry=self.documents.registry)
+        # Offsets are measured over the sync sessions, once for both backends
+        self.clock_sync = self.documents.clock_sync
+        self.health = self.documents.health
+        # zeep only fetches WSDLs through it, and documents are already parsed
+        self._wsdl_client = httpx.Client(timeout=ZEEP_TIMEOUT)
+        self._loop = None
+        self._closing = set()  # aclose() tasks of evicted sessions
+
+    @asynccontextmanager
+    async def lease(self, wsdl_url: str, binding_name: str, xaddr: str,
+                    username: str, password: str, use_https: bool = False,
+                    ws_addressing: bool = False):
+        """Check out a client for exclusive use, returning it to the pool afterwards."""
+        self._loop = asyncio.get_running_loop()
+        key = _pool_key(wsdl_url, binding_name, xaddr, username, password, use_https,
+                        ws_addressing)
+        entry = self._checkout(key)
+        if entry is None:
+            try:
+                # A first-time parse takes seconds; keep it off the event loop
+                await asyncio.to_thread(self.get_document, wsdl_url)
+                entry = self._create(key, password)
+            except Exception:
+                with self._lock:
+                    self._in_use -= 1
+                raise
+        entry.reset_history()
+        try:
+            yield entry
+        finally:
+            self._checkin(entry)
+
+    def get_session(self, xaddr: str, use_https: bool = False):
+        """Return the shared ``httpx.AsyncClient`` for the camera behind ``xaddr``."""
+        endpoint = _endpoint(xaddr)
+        with self._lock:
+            slot = self._sessions.get(endpoint)
+            if slot is None:
+                # For HTTPS: disable SSL verification (cameras use self-signed certs)
+                session = httpx.AsyncClient(
+                    verify=not use_https,
+                    limits=httpx.Limits(max_connections=self.connections_per_host,
+                                        max_keepalive_connections=self.connections_per_host),
+                    timeout=httpx.Timeout(ZEEP_OPERATION_TIMEOUT, connect=ZEEP_TIMEOUT),
+                )
+                slot = [session, time.monotonic()]
+                self._sessions[endpoint] = slot
+            slot[1] = time.monotonic()
+            return slot[0]
+
+    async def aclose(self):
+        """Close all idle clients, sessions and the WSDL client."""
+        with self._lock:
+            self._idle.clear()
+            self._idle_count = 0
+            sessions = [session for session, _ in self._sessions.values()]
+            self._sessions.clear()
+        await asyncio.gather(*(s.aclose() for s in sessions), *self._closing,
+                             return_exceptions=True)
+        self._wsdl_client.close()
+
+    def _create(self, key: tuple, password: str) -> PooledClient:
+        wsdl_url, binding_name, xaddr, username, _, use_https, ws_addressing = key
+        transport = CapturingAsyncTransport(self.get_session(xaddr, use_https),
+                                            self._wsdl_client)
+        plugins = [WsAddressingPlugin()] if ws_addressing else []
+        client = self.registry.client(
+            wsdl_url,
+            client_class=AsyncClient,
+            wsse=TimedUsernameToken(username, password, use_digest=True,
+                                    clock_offset=self.clock_offset(xaddr)),
+            transport=transport,
+        )
+        try:
+            binding = client.wsdl.bindings[binding_name]
+        except KeyError:
+            raise ValueError(
+                "No binding found with the given QName. Available bindings "
+                "are: %s" % (", ".join(client.wsdl.bindings.keys()))
+            )
+        service = AsyncServiceProxy(client, binding, address=xaddr)
+        return PooledClient(key, client, service, transport, plugins)
+
+    def _close_session(self, session):
+        # May run on any thread (stats() from a WSGI worker); close on the loop
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._schedule_close, session)
+
+    def _schedule_close(self, session):
+        task = asyncio.ensure_future(session.aclose())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+
+class AsyncCommandExecutor:
+    """Awaitable ``execute`` / ``execute_batch`` with the sync executor's results.
+
+    Wraps a :class:`CommandExecutor` and shares its XML store, metrics,
+    history, response cache, service discovery and parsed WSDLs. Endpoint
+    discovery (GetServices, once per device) runs in a worker thread;
+    concurrent first calls to the same device wait for a single lookup. At
+    most ``max_in_flight`` calls are awaited at once; the rest queue for a
+    slot.
+    """
+
+    def __init__(self, executor: CommandExecutor = None, pool: AsyncClientPool = None,
+                 max_in_flight: int = ASYNC_MAX_IN_FLIGHT):
+        _require_httpx()
+        self.executor = executor or CommandExecutor()
+        self.pool = pool or AsyncClientPool(documents=self.executor.pool)
+        self.xml_store = self.executor.xml_store
+        self.metrics = self.executor.metrics
+        self.history = self.executor.history
+        self.response_cache = self.executor.response_cache
+        self.max_in_flight = max_in_flight
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._discovering = {}  # device key -> Future of the running lookup
+
+    async def execute(
+        self,
+        wsdl_url: str,
+        binding_name: str,
+        operation_name: str,
+        camera_ip: str,
+        camera_port: int,
+        username: str,
+        password: str,
+        params: dict,
+        use_https: bool = False,
+        timeout: float = None,
+        xml_mode: str = "inline",
+        cache: bool = True,
+    ) -> dict:
+        """Execute an ONVIF operation; see :meth:`CommandExecutor.execute`."""
+        ticket = None
+        if self.response_cache is not None:
+            ticket, hit = self.response_cache.begin(
+                binding_name, operation_name, camera_ip, camera_port, username, password,
+                params, use_https, xml_mode, refresh=not cache,
+            )
+            if hit is not None:
+                return hit
+
+        async with self._slots:
+            if self.metrics is None:
+                result = await self._execute(wsdl_url, binding_name, operation_name,
+                                             camera_ip, camera_port, username, password,
+                                             params, use_https, timeout, xml_mode)
+            else:
+                with self.metrics.track_in_flight():
+                    result = await self._execute(wsdl_url, binding_name, operation_name,
+                                                 camera_ip, camera_port, username, password,
+                                                 params, use_https, timeout, xml_mode)
+        if self.metrics is not None:
+            self.metrics.observe(camera_ip, camera_port, binding_name, operation_name, result)
+
+        if self.response_cache is not None:
+            result["cached"] = False
+            self.response_cache.finish(ticket, result)
+        return result
+
+    async def _execute(self, wsdl_url, binding_name, operation_name, camera_ip, camera_port,
+                       username, password, params, use_https, timeout, xml_mode) -> dict:
+        timer = PhaseTimer()
+        health = self.pool.health
+        clock_sync = self.pool.clock_sync
+        offset, retried = 0.0, False
+        result, raw = None, (None, None)
+        try:
+            if health is not None:
+                health.acquire(camera_ip, camera_port)
+                timeout = health.timeouts(camera_ip, camera_port, operation_name, timeout)
+            if clock_sync is not None:
+                offset = clock_sync.cached(camera_ip, camera_port)
+                if offset is None:
+                    offset = await asyncio.to_thread(clock_sync.ensure, camera_ip,
+                                                     camera_port, use_https, timeout)
+                timer.mark("clock")
+        except Exception as e:
+            result = self.executor._error_result(e, None, None, xml_mode)
+
+        if result is None:
+            xaddr = await self._resolve_xaddr(binding_name, camera_ip, camera_port,
+                                              username, password, use_https, timeout)
+            timer.mark("resolve")
+
+            args = (timer, wsdl_url, binding_name, operation_name, xaddr,
+                    username, password, params, use_https, timeout, xml_mode)
+            result, raw = await self._call(*args)
+            if clock_sync is not None:
+                if result["error_type"] in CLOCK_SYNC_AUTH_ERRORS:
+                    resynced = await asyncio.to_thread(clock_sync.resync, camera_ip,
+                                                       camera_port, offset, use_https, timeout)
+                    timer.mark("clock")
+                    if resynced is not None:
+                        offset, retried = resynced, True
+                        result, raw = await self._call(*args)
+                elif result["success"] and operation_name == "SetSystemDateAndTime":
+                    clock_sync.forget(camera_ip, camera_port)
+        if clock_sync is not None:
+            result.update(clock_offset_s=offset, clock_retried=retried)
+        result["timings"] = timer.result()
+        if health is not None and result["error_type"] != "CircuitOpenError":
+            health.record(camera_ip, camera_port, operation_name, result["error_type"],
+                          result["execution_time_ms"] / 1000 or None)
+
+        if self.history is not None:
+            self.history.record(
+                result, *raw, wsdl_url=wsdl_url, binding_name=binding_name,
+                operation_name=operation_name, camera_ip=camera_ip, camera_port=camera_port,
+                username=username, params=params, use_https=use_https,
+            )
+        return result
+
+    async def _call(self, timer, wsdl_url, binding_name, operation_name, xaddr,
+                    username, password, params, use_https, timeout, xml_mode) -> tuple:
+        captured = None
+        raw = (None, None)
+        try:
+            async with self.pool.lease(wsdl_url, binding_name, xaddr,
+                                       username, password, use_https) as entry:
+                timer.mark("acquire")
+                timer.new_client = entry.use_count == 0
+                entry.transport.operation_timeout = timeout
+                try:
+                    operation_func = getattr(entry.service, operation_name)
+
+                    start_time = time.time()
+                    with trace_call() as trace:
+                        try:
+                            if params:
+                                result = await operation_func(**params)
+                            else:
+                                result = await operation_func()
+                        finally:
+                            timer.mark_call(trace)
+                    elapsed = (time.time() - start_time) * 1000
+
+                    result_json = ONVIFSerializer.serialize(result)
+                    timer.mark("serialize")
+                finally:
+                    # Read the capture before the client goes back to the pool
+                    captured = self.executor._capture_xml(entry, xml_mode)
+                    raw = (entry.transport.last_sent, entry.transport.last_received)
+                    timer.mark("xml")
+
+            result = {
+                "success": True,
+                "result_json": result_json,
+                **captured,
+                "error": None,
+                "error_type": None,
+                "execution_time_ms": round(elapsed, 1),
+                "xaddr": xaddr,
+            }
+        except Exception as e:
+            result = self.executor._error_result(e, xaddr, captured, xml_mode)
+        return result, raw
+
+    async def execute_batch(
+        self,
+        items: list,
+        camera_ip: str,
+        camera_port: int,
+        username: str,
+        password: str,
+        use_https: bool = False,
+        max_concurrency: int = BATCH_MAX_CONCURRENCY,
+        xml_mode: str = "inline",
+        timeout: float = None,
+        cache: bool = True,
+    ) -> dict:
+        """Execute several operations on one camera; see :meth:`CommandExecutor.execute_batch`."""
+        limit = asyncio.Semaphore(max(1, min(max_concurrency, BATCH_MAX_CONCURRENCY)))
+
+        async def run(index, item):
+            async with limit:
+                result = await self.execute(
+                    wsdl_url=item["wsdl_url"],
+                    binding_name=item["binding_name"],
+                    operation_name=item["operation_name"],
+                    camera_ip=camera_ip,
+                    camera_port=camera_port,
+                    username=username,
+                    password=password,
+                    params=item.get("params") or {},
+                    use_https=use_https,
+                    timeout=timeout,
+                    xml_mode=xml_mode,
+                    cache=cache,
+                )
+            return {
+                "index": index,
+                "binding_name": item["binding_name"],
+                "operation_name": item["operation_name"],
+                **result,
+            }
+
+        start_time = time.time()
+        results = await asyncio.gather(*(run(i, item) for i, item in enumerate(items)))
+        elapsed = (time.time() - start_time) * 1000
+
+        return {
+            "success": all(r["success"] for r in results),
+            "results": results,
+            "execution_time_ms": round(elapsed, 1),
+        }
+
+    async def aclose(self):
+        await self.pool.aclose()
+
+    async def _resolve_xaddr(self, binding_name, ip, port, username, password,
+                             use_https, timeout) -> str:
+        args = (binding_name, ip, port, username, password, use_https, timeout)
+        xaddr = self.executor.resolve_xaddr(*args, cached_only=True)
+        if xaddr is not None:
+            return xaddr
+
+        device_key = _device_key(ip, port, use_https, username, password)
+        pending = self._discovering.get(device_key)
+        if pending is None:
+            pending = asyncio.ensure_future(
+                asyncio.to_thread(self.executor.resolve_xaddr, *args))
+            self._discovering[device_key] = pending
+            pending.add_done_callback(lambda _: self._discovering.pop(device_key, None))
+            # Shielded: a cancelled caller must not cancel the others' lookup
+            return await asyncio.shield(pending)
+
+        await asyncio.shield(pending)
+        xaddr = self.executor.resolve_xaddr(*args, cached_only=True)
+        if xaddr is None:
+            xaddr = await asyncio.to_thread(self.executor.resolve_xaddr, *args)
+        return xaddr
@@ -0,0 +1,302 @@
+"""Pooled zeep clients and keep-alive HTTP sessions for repeated camera calls."""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from zeep.client import Client
+from zeep.plugins import HistoryPlugin
+from zeep.transports import Transport
+from zeep.wsa import WsAddressingPlugin
+from zeep.wsdl import Document
+
+from config import (
+    CLIENT_POOL_CONNECTIONS_PER_HOST,
+    CLIENT_POOL_IDLE_TIMEOUT,
+    CLIENT_POOL_MAX_SIZE,
+    CLOCK_SYNC_ENABLED,
+    DEVICE_HEALTH_ENABLED,
+    ZEEP_OPERATION_TIMEOUT,
+    ZEEP_TIMEOUT,
+)
+from .clock_sync import ClockSync
+from .device_health import DeviceHealth
+from .schema_registry import SchemaRegistry, shared_registry
+from .timing import TimedUsernameToken, TimingHTTPAdapter, current_trace
+
+
+def _endpoint(xaddr: str) -> tuple:
+    parts = urlsplit(xaddr)
+    return (parts.scheme, parts.hostname, parts.port)
+
+
+def _pool_key(wsdl_url, binding_name, xaddr, username, password, use_https,
+              ws_addressing) -> tuple:
+    """Key pooled clients by a digest of the password, never the password itself."""
+    return (wsdl_url, binding_name, xaddr, username,
+            hashlib.sha256((password or "").encode("utf-8")).hexdigest(),
+            bool(use_https), bool(ws_addressing))
+
+
+class CapturingTransport(Transport):
+    """Transport that keeps the raw bytes of the last SOAP request/response.
+
+    The bytes are recorded exactly as they went over the wire, so they can be
+    stored or downloaded without re-serializing the envelope. Calls are
+    bounded by ``operation_timeout`` (seconds or a ``(connect, read)`` pair),
+    ``ZEEP_TIMEOUT`` / ``ZEEP_OPERATION_TIMEOUT`` when it is not set.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("timeout", ZEEP_TIMEOUT)
+        super().__init__(**kwargs)
+        self.last_sent = None
+        self.last_received = None
+
+    @property
+    def operation_timeout(self):
+        return self._operation_timeout or (ZEEP_TIMEOUT, ZEEP_OPERATION_TIMEOUT)
+
+    @operation_timeout.setter
+    def operation_timeout(self, value):
+        self._operation_timeout = value
+
+    def reset_capture(self):
+        self.last_sent = None
+        self.last_received = None
+
+    def post(self, address, message, headers):
+        self.last_sent = message if isinstance(message, bytes) else str(message).encode("utf-8")
+        trace = current_trace()
+        if trace is None:
+            response = super().post(address, message, headers)
+        else:
+            trace.post_start = time.perf_counter()
+            try:
+                response = super().post(address, message, headers)
+            finally:
+                trace.post_end = time.perf_counter()
+        self.last_received = response.content
+        return response
+
+
+class PooledClient:
+    """An authenticated service proxy bound to one camera endpoint.
+
+    A leased client is used by one caller at a time, so the history plugin
+    only ever holds the envelopes of the current call.
+    """
+
+    def __init__(self, key: tuple, client: Client, service,
+                 transport: CapturingTransport, plugins: list = None):
+        self.key = key
+        self.client = client
+        self.service = service
+        self.transport = transport
+        self.plugins = plugins or []  # kept across leases, unlike the history
+        self.history = HistoryPlugin(maxlen=1)
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.use_count = 0
+
+    def reset_history(self):
+        """Drop envelopes captured by the previous lease."""
+        self.history = HistoryPlugin(maxlen=1)
+        self.client.plugins = [self.history, *self.plugins]
+        self.transport.reset_capture()
+
+
+class ClientPool:
+    """Bounded, thread-safe pool of zeep clients keyed by camera + credentials.
+
+    Clients are keyed by (wsdl_url, binding, xaddr, username, sha256 of the
+    password, https, ws_addressing).
+    Parsed WSDL documents come from ``registry`` (the process-wide
+    :class:`SchemaRegistry` by default), and one ``requests.Session``
+    (keep-alive connections) is shared per camera endpoint. Idle clients of
+    a WSDL the registry evicts are dropped with it. Idle clients are evicted LRU-first when the pool is full and
+    after ``idle_timeout`` seconds without use. With ``CLOCK_SYNC_ENABLED``
+    every client stamps its digests with the device's clock as measured by
+    ``clock_sync``. ``health`` (``DEVICE_HEALTH_ENABLED``) holds the
+    per-device timeouts and circuit breakers its users apply.
+    """
+
+    def __init__(self, max_size: int = CLIENT_POOL_MAX_SIZE,
+                 idle_timeout: float = CLIENT_POOL_IDLE_TIMEOUT,
+                 connections_per_host: int = CLIENT_POOL_CONNECTIONS_PER_HOST,
+                 registry: SchemaRegistry = None):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.connections_per_host = connections_per_host
+        self._lock = threading.Lock()
+        self._idle = OrderedDict()  # key -> [PooledClient, ...] in LRU order
+        self._idle_count = 0
+        self._in_use = 0
+        self._sessions = {}  # (scheme, host, port) -> [requests.Session, last_used]
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+        self.clock_sync = ClockSync(self.get_session) if CLOCK_SYNC_ENABLED else None
+        self.health = DeviceHealth() if DEVICE_HEALTH_ENABLED else None
+        self.registry = registry or shared_registry()
+        self.registry.on_evict(self._forget_wsdl)
+
+    @contextmanager
+    def lease(self, wsdl_url: str, binding_name: str, xaddr: str,
+              username: str, password: str, use_https: bool = False,
+              ws_addressing: bool = False):
+        """Check out a client for exclusive use, returning it to the pool afterwards.
+
+        ``ws_addressing`` adds WS-Addressing headers (Action, MessageID, To) to
+        every request, as event subscription endpoints require.
+        """
+        key = _pool_key(wsdl_url, binding_name, xaddr, username, password, use_https,
+                        ws_addressing)
+        entry = self._checkout(key)
+        if entry is None:
+            try:
+                entry = self._create(key, password)
+            except Exception:
+                with self._lock:
+                    self._in_use -= 1
+                raise
+        entry.reset_history()
+        try:
+            yield entry
+        finally:
+            self._checkin(entry)
+
+    def get_document(self, wsdl_url: str) -> Document:
+        """Return the parsed WSDL document from the registry."""
+        return self.registry.document(wsdl_url)
+
+    def get_session(self, xaddr: str, use_https: bool = False) -> requests.Session:
+        """Return the shared keep-alive session for the camera behind ``xaddr``."""
+        endpoint = _endpoint(xaddr)
+        with self._lock:
+            slot = self._sessions.get(endpoint)
+            if slot is None:
+                session = requests.Session()
+                adapter = TimingHTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.connections_per_host,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                # For HTTPS: disable SSL verification (cameras use self-signed certs)
+                if use_https:
+                    session.verify = False
+                slot = [session, time.monotonic()]
+                self._sessions[endpoint] = slot
+            slot[1] = time.monotonic()
+            return slot[0]
+
+    def clock_offset(self, xaddr: str):
+        """Return the ``clock_offset`` callable for tokens sent to ``xaddr``, or None."""
+        clock_sync = self.clock_sync
+        if clock_sync is None:
+            return None
+        parts = urlsplit(xaddr)
+        host, port = parts.hostname, parts.port or (443 if parts.scheme == "https" else 80)
+        return lambda: clock_sync.offset(host, port)
+
+    def stats(self) -> dict:
+        """Return pool counters and current occupancy."""
+        with self._lock:
+            self._evict_expired()
+            return {
+                "max_size": self.max_size,
+                "idle_timeout": self.idle_timeout,
+                "idle": self._idle_count,
+                "in_use": self._in_use,
+                "keys": len(self._idle),
+                "sessions": len(self._sessions),
+                "documents": len(self.registry),
+                **self._stats,
+            }
+
+    def clear(self):
+        """Close all idle clients and sessions (documents are kept)."""
+        with self._lock:
+            self._idle.clear()
+            self._idle_count = 0
+            for session, _ in self._sessions.values():
+                self._close_session(session)
+            self._sessions.clear()
+
+    def _forget_wsdl(self, wsdl_url: str):
+        """Drop idle clients of a WSDL evicted from the registry."""
+        with self._lock:
+            for key in [k for k in self._idle if k[0] == wsdl_url]:
+                self._idle_count -= len(self._idle.pop(key))
+
+    def _checkout(self, key: tuple):
+        with self._lock:
+            self._evict_expired()
+            self._in_use += 1
+            entries = self._idle.get(key)
+            if entries:
+                entry = entries.pop()
+                if not entries:
+                    del self._idle[key]
+                self._idle_count -= 1
+                self._stats["hits"] += 1
+                return entry
+            self._stats["misses"] += 1
+            return None
+
+    def _checkin(self, entry: PooledClient):
+        entry.last_used = time.monotonic()
+        entry.use_count += 1
+        with self._lock:
+            self._in_use -= 1
+            slot = self._sessions.get(_endpoint(entry.key[2]))
+            if slot is not None:
+                slot[1] = entry.last_used
+            self._idle.setdefault(entry.key, []).append(entry)
+            self._idle.move_to_end(entry.key)
+            self._idle_count += 1
+            while self._idle_count > self.max_size:
+                oldest_key = next(iter(self._idle))
+                oldest = self._idle[oldest_key]
+                oldest.pop(0)
+                if not oldest:
+                    del self._idle[oldest_key]
+                self._idle_count -= 1
+                self._stats["evictions"] += 1
+
+    def _create(self, key: tuple, password: str) -> PooledClient:
+        wsdl_url, binding_name, xaddr, username, _, use_https, ws_addressing = key
+        transport = CapturingTransport(session=self.get_session(xaddr, use_https))
+        plugins = [WsAddressingPlugin()] if ws_addressing else []
+        client = self.registry.client(
+            wsdl_url,
+            wsse=TimedUsernameToken(username, password, use_digest=True,
+                                    clock_offset=self.clock_offset(xaddr)),
+            transport=transport,
+        )
+        service = client.create_service(binding_name, xaddr)
+        return PooledClient(key, client, service, transport, plugins)
+
+    def _evict_expired(self):
+        """Drop idle clients and sessions unused for ``idle_timeout`` (lock held)."""
+        deadline = time.monotonic() - self.idle_timeout
+        for key in list(self._idle):
+            entries = self._idle[key]
+            kept = [e for e in entries if e.last_used >= deadline]
+            if len(kept) != len(entries):
+                self._stats["expired"] += len(entries) - len(kept)
+                self._idle_count -= len(entries) - len(kept)
+                if kept:
+                    self._idle[key] = kept
+                else:
+                    del self._idle[key]
+        for endpoint, (session, last_used) in list(self._sessions.items()):
+            if last_used < deadline:
+                self._close_session(session)
+                del self._sessions[endpoint]
+
+    def _close_session(self, session):
+        session.close()
@@ -0,0 +1,233 @@
+"""Per-device clock offsets for WS-Security UsernameToken Created times."""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+from lxml import etree
+
+from config import (
+    CLOCK_SYNC_FAILURE_TTL,
+    CLOCK_SYNC_MAX_DEVICES,
+    CLOCK_SYNC_MIN_INTERVAL,
+    CLOCK_SYNC_TTL,
+    ZEEP_TIMEOUT,
+)
+from .ttl_cache import TTLCache
+
+_DEVICE_NS = "http://www.onvif.org/ver10/device/wsdl"
+_REQUEST = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope"><s:Body>'
+    f'<tds:GetSystemDateAndTime xmlns:tds="{_DEVICE_NS}"/>'
+    "</s:Body></s:Envelope>"
+).encode("utf-8")
+_HEADERS = {
+    "Content-Type": "application/soap+xml; charset=utf-8; "
+                    f'action="{_DEVICE_NS}/GetSystemDateAndTime"',
+}
+_PARSER = etree.XMLParser(resolve_entities=False, no_network=True)
+_LOCK_STRIPES = 64
+
+
+def parse_device_time(body: bytes) -> datetime:
+    """Return the UTC time in a GetSystemDateAndTime response.
+
+    Raises ValueError for a Fault or a response without a UTCDateTime.
+    """
+    root = etree.fromstring(body, _PARSER)
+    fault = root.find("{*}Body/{*}Fault")
+    if fault is not None:
+        reason = " ".join(t.strip() for t in fault.itertext() if t.strip())
+        raise ValueError(f"GetSystemDateAndTime returned a Fault: {reason}")
+    utc = root.find(".//{*}SystemDateAndTime/{*}UTCDateTime")
+    if utc is None:
+        raise ValueError("GetSystemDateAndTime response has no UTCDateTime")
+
+    def number(path):
+        return int(utc.findtext(path).strip())
+
+    return datetime(number("{*}Date/{*}Year"), number("{*}Date/{*}Month"),
+                    number("{*}Date/{*}Day"), number("{*}Time/{*}Hour"),
+                    number("{*}Time/{*}Minute"), number("{*}Time/{*}Second"),
+                    tzinfo=timezone.utc)
+
+
+def _unreachable(exc: Exception) -> bool:
+    return isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)) \
+        and not isinstance(exc, requests.exceptions.SSLError)
+
+
+def _offset_of(entry) -> float:
+    if entry is None or entry["offset_s"] is None:
+        return 0.0
+    return entry["offset_s"]
+
+
+class ClockSync:
+    """Measured clock offsets of devices, applied to every digest sent to them.
+
+    A device checks the UsernameToken ``Created`` time against its own clock,
+    so a camera whose clock has drifted rejects every digest stamped from
+    ours. The offset (seconds the device clock is ahead of ours) is measured
+    with an unauthenticated GetSystemDateAndTime, compensating for half the
+    round trip, and reused for ``ttl`` seconds; devices that don't answer are
+    asked again after ``failure_ttl`` with no offset applied meanwhile.
+    Offsets are kept per device (``ip``, ``port``); a service on another
+    port of the same host uses the offset last measured on that host.
+
+    ``get_session(url, use_https)`` returns the ``requests.Session`` to send
+    through (``ClientPool.get_session``), so the measurement also opens the
+    keep-alive connection the following calls use. Concurrent first calls
+    to a device wait for a single measurement.
+    """
+
+    def __init__(self, get_session, ttl: float = CLOCK_SYNC_TTL,
+                 failure_ttl: float = CLOCK_SYNC_FAILURE_TTL,
+                 min_interval: float = CLOCK_SYNC_MIN_INTERVAL,
+                 max_size: int = CLOCK_SYNC_MAX_DEVICES):
+        self.get_session = get_session
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.min_interval = min_interval
+        self._offsets = TTLCache(ttl, max_size)  # (ip, port) -> entry, see devices()
+        self._hosts = TTLCache(ttl, max_size)  # ip -> (ip, port) last measured
+        self._locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        self._stats_lock = threading.Lock()
+        self.syncs = 0
+        self.failures = 0
+        self.resyncs = 0
+
+    def offset(self, host: str, port: int = None) -> float:
+        """Return the cached offset for an endpoint in seconds (0.0 when unknown)."""
+        entry = self._offsets.get((host, port))
+        if entry is None:
+            key = self._hosts.get(host)
+            entry = self._offsets.get(key) if key is not None else None
+        return _offset_of(entry)
+
+    def cached(self, ip: str, port: int):
+        """Return the device's cached offset, or None when it needs measuring."""
+        entry = self._offsets.get((ip, int(port)))
+        return None if entry is None else _offset_of(entry)
+
+    def ensure(self, ip: str, port: int, use_https: bool = False,
+               timeout: float = None) -> float:
+        """Return the device's offset, measuring it first if it is not cached.
+
+        A device that cannot be reached at all raises the connection error
+        or timeout, as the call itself would; later calls within
+        ``failure_ttl`` go ahead without an offset.
+        """
+        key = (ip, int(port))
+        entry = self._offsets.get(key)
+        if entry is None:
+            with self._locks[hash(key) % _LOCK_STRIPES]:
+                entry = self._offsets.get(key)
+                if entry is None:
+                    entry = self._measure(ip, port, use_https, timeout)
+        return _offset_of(entry)
+
+    def resync(self, ip: str, port: int, used: float, use_https: bool = False,
+               timeout: float = None):
+        """Measure the device's offset again after an authentication fault.
+
+        Returns the new offset when it differs from ``used`` (the offset the
+        failed call was stamped with) by a second or more, i.e. when a retry
+        can succeed where the call failed; otherwise None. A device measured
+        less than ``min_interval`` seconds ago is not asked again, so a burst
+        of faults (e.g. a wrong password) costs at most one measurement.
+        """
+        key = (ip, int(port))
+        with self._locks[hash(key) % _LOCK_STRIPES]:
+            age = self._offsets.age(key)
+            if age is not None and age < self.min_interval:
+                entry = self._offsets.get(key)
+            else:
+                with self._stats_lock:
+                    self.resyncs += 1
+                try:
+                    entry = self._measure(ip, port, use_https, timeout)
+                except Exception:
+                    return None  # unreachable now: a retry would not get through
+        offset = _offset_of(entry)
+        # Two readings of an unchanged clock differ by less than a second
+        return offset if abs(offset - used) >= 1.0 else None
+
+    def forget(self, ip: str, port: int = None):
+        """Drop a device's offset (without ``port``, every device on ``ip``),
+        e.g. after its clock was set."""
+        for key, _ in self._offsets.items():
+            if key[0] == ip and (port is None or key[1] == int(port)):
+                self._offsets.pop(key)
+        if port is None or self._hosts.get(ip) == (ip, int(port)):
+            self._hosts.pop(ip)
+
+    def clear(self):
+        self._offsets.clear()
+        self._hosts.clear()
+
+    def devices(self) -> list:
+        """Return the cached measurements, most recently used last.
+
+        Returns:
+            [
+                {
+                    "host": "192.168.1.100", "port": 80,
+                    "offset_s": 612.4,     # device clock ahead of ours; None if not measured
+                    "rtt_ms": 3.1,
+                    "device_time": "2026-10-17T09:12:44Z",
+                    "synced_at": 1792227152.0,  # epoch seconds
+                    "error": None or "error message",
+                },
+                ...
+            ]
+        """
+        return [dict(entry) for _, entry in self._offsets.items()]
+
+    def stats(self) -> dict:
+        devices = self.devices()
+        with self._stats_lock:
+            return {
+                "devices": len(devices),
+                "failed": sum(1 for d in devices if d["error"]),
+                "syncs": self.syncs,
+                "failures": self.failures,
+                "resyncs": self.resyncs,
+                "ttl": self.ttl,
+            }
+
+    def _measure(self, ip, port, use_https, timeout) -> dict:
+        scheme = "https" if use_https else "http"
+        url = f"{scheme}://{ip}:{port}/onvif/device_service"
+        entry = {"host": ip, "port": int(port), "offset_s": None, "rtt_ms": None,
+                 "device_time": None, "synced_at": time.time(), "error": None}
+        try:
+            session = self.get_session(url, use_https)
+            sent = time.time()
+            response = session.post(url, data=_REQUEST, headers=_HEADERS,
+                                    timeout=timeout or ZEEP_TIMEOUT)
+            received = time.time()
+            if response.status_code >= 300 and not response.content:
+                raise ValueError(f"HTTP {response.status_code}")
+            device_time = parse_device_time(response.content)
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+            self._offsets.set((ip, int(port)), entry, self.failure_ttl)
+            with self._stats_lock:
+                self.failures += 1
+            if _unreachable(e):
+                raise
+            return entry
+
+        # The device reports whole seconds, i.e. on average half a second
+        # behind; its reading was taken about halfway through the round trip
+        offset = device_time.timestamp() + 0.5 - (sent + received) / 2
+        entry.update(offset_s=round(offset, 3), rtt_ms=round((received - sent) * 1000, 1),
+                     device_time=device_time.isoformat().replace("+00:00", "Z"))
+        self._offsets.set((ip, int(port)), entry)
+        self._hosts.set(ip, (ip, int(port)))
+        with self._stats_lock:
+            self.syncs += 1
+        return entry
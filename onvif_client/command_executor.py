@@ -1,24 +1,129 @@
 """Execute ONVIF operations on cameras with XML capture."""
 
+import hashlib
+import ssl
 import time
 import urllib3
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 
 import requests
 from lxml import etree
-from zeep.client import CachingClient, Settings
+from zeep.exceptions import Fault, TransportError
 from zeep.plugins import HistoryPlugin
-from zeep.transports import Transport
-from zeep.wsse.username import UsernameToken
 
-from config import ENDPOINT_MAP
+from config import (
+    BATCH_MAX_CONCURRENCY,
+    CLOCK_SYNC_AUTH_ERRORS,
+    ENDPOINT_MAP,
+    PROFILE_SERVICES_CACHE_SIZE,
+    SERVICE_DISCOVERY_FAILURE_TTL,
+)
+from .client_pool import ClientPool
+from .history import HistoryStore
+from .metrics import ONVIFMetrics
+from .profile_checker import DEVICE_BINDING, ProfileChecker
+from .response_cache import ResponseCache
 from .serializer import ONVIFSerializer
+from .timing import PhaseTimer, trace_call
+from .ttl_cache import TTLCache
+from .xml_store import XMLStore
+
+try:
+    import httpx
+except ImportError:  # optional: only the async backend uses it
+    httpx = None
 
 # Suppress InsecureRequestWarning for self-signed camera certificates
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# resolve_xaddr(cached_only=True): the device's service index is not cached yet
+_NOT_CACHED = object()
+
+
+def _device_key(ip, port, use_https, username, password) -> tuple:
+    """Key service discovery per credentials: a wrong password must not
+    mark discovery failed for the right one."""
+    return (ip, int(port), bool(use_https), username,
+            hashlib.sha256((password or "").encode("utf-8")).hexdigest())
+
+
+def rebase_xaddr(xaddr: str, ip: str, port: int, use_https: bool = False) -> str:
+    """Point a device-reported address at the camera as we reach it.
+
+    The reported path and query are kept; the scheme follows ``use_https``.
+    A vendor-specific service port is kept only when the device reports the
+    address we reach it on; otherwise (NAT, wrong IP) ``ip:port`` is used.
+    """
+    parts = urlsplit(xaddr)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    netloc = parts.netloc if parts.hostname == ip and parts.port else f"{ip}:{port}"
+    scheme = "https" if use_https else "http"
+    return f"{scheme}://{netloc}{path}"
+
+
+def classify_error(exc: Exception) -> str:
+    """Return a short, groupable category for a failed call.
+
+    SOAP faults are named by their most specific subcode (``Fault:NotAuthorized``),
+    HTTP errors by status (``HTTP 500``), and network errors by kind.
+    """
+    if isinstance(exc, Fault):
+        code = exc.subcodes[-1] if exc.subcodes else exc.code
+        code = getattr(code, "localname", None) or str(code or "")
+        return f"Fault:{code.rpartition(':')[2]}" if code else "Fault"
+    if isinstance(exc, TransportError):
+        return f"HTTP {exc.status_code}"
+    if isinstance(exc, requests.exceptions.Timeout):
+        return "Timeout"
+    if isinstance(exc, requests.exceptions.SSLError):
+        return "SSLError"
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return "ConnectionError"
+    # urllib3 errors reach us unwrapped from RawSender
+    # (NewConnectionError subclasses ConnectTimeoutError)
+    if isinstance(exc, (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ProtocolError)):
+        return "ConnectionError"
+    if isinstance(exc, urllib3.exceptions.TimeoutError):
+        return "Timeout"
+    if isinstance(exc, urllib3.exceptions.SSLError):
+        return "SSLError"
+    if httpx is not None:
+        if isinstance(exc, httpx.TimeoutException):
+            return "Timeout"
+        if isinstance(exc, httpx.ConnectError) and isinstance(exc.__context__, ssl.SSLError):
+            return "SSLError"
+        if isinstance(exc, httpx.TransportError):
+            return "ConnectionError"
+    return type(exc).__name__
+
 
 class CommandExecutor:
-    """Creates authenticated service proxies and executes ONVIF operations."""
+    """Creates authenticated service proxies and executes ONVIF operations.
+
+    Service proxies and keep-alive connections are reused across calls
+    through a shared :class:`ClientPool`. Service endpoints come from the
+    device's own GetServices XAddrs (cached per device by the profile
+    checker), with ``ENDPOINT_MAP`` only as a fallback. With ``history``
+    set, every result and its raw envelopes are queued for the history
+    database. With ``response_cache`` set, Get* results are answered from
+    it while fresh.
+    """
+
+    def __init__(self, pool: ClientPool = None, xml_store: XMLStore = None,
+                 metrics: ONVIFMetrics = None, history: HistoryStore = None,
+                 response_cache: ResponseCache = None):
+        self.pool = pool or ClientPool()
+        self.xml_store = xml_store or XMLStore()
+        self.metrics = metrics
+        self.history = history
+        self.response_cache = response_cache
+        self.profile_checker = ProfileChecker(pool=self.pool)
+        # Devices whose discovery just failed -> error, so calls don't re-wait on it
+        self._discovery_failures = TTLCache(SERVICE_DISCOVERY_FAILURE_TTL,
+                                            PROFILE_SERVICES_CACHE_SIZE)
 
     def execute(
         self,
@@ -31,87 +136,335 @@ class CommandExecutor:
         password: str,
         params: dict,
         use_https: bool = False,
+        timeout: float = None,
+        xml_mode: str = "inline",
+        cache: bool = True,
     ) -> dict:
         """Execute an ONVIF operation and return result + raw XML.
 
+        ``timeout`` (seconds) bounds connect and read for this call only;
+        without it ``ZEEP_TIMEOUT`` / ``ZEEP_OPERATION_TIMEOUT`` do.
+        Calls are recorded in ``self.metrics`` when it is set.
+        With ``xml_mode="deferred"`` the envelopes are not formatted; their
+        raw bytes are kept in ``self.xml_store`` under ``result_id`` and
+        ``request_xml`` / ``response_xml`` are left empty. ``"none"`` skips
+        XML capture entirely.
+
+        With ``self.response_cache`` set, a fresh cached Get* result is
+        returned without calling the camera, marked ``"cached": True`` with
+        its ``cache_age_s`` (hits are not counted in metrics or history);
+        ``cache=False`` skips the lookup and refreshes the entry. Writes
+        invalidate the cached results of their binding on the device.
+
+        With the pool's ``health`` set, a device whose circuit is open fails
+        at once (``error_type`` ``CircuitOpenError``) and, unless ``timeout``
+        is lower, the call is bounded by the device's adaptive timeouts.
+        With the pool's ``clock_sync`` set, the device's clock offset is
+        measured on first contact and every digest is stamped with the
+        device's time. A call failing with an authentication error
+        (``CLOCK_SYNC_AUTH_ERRORS``) re-measures it and is retried once if
+        the offset turns out to have changed.
+
         Returns:
             {
                 "success": True/False,
                 "result_json": { ... },
                 "request_xml": "<soap:...>",
                 "response_xml": "<soap:...>",
+                "result_id": None or "<id in xml_store>",  # deferred mode
                 "error": None or "error message",
+                "error_type": None or "Fault:NotAuthorized",  # see classify_error
                 "execution_time_ms": 245,
+                "xaddr": "http://.../onvif/media_service",  # endpoint used
+                "timings": { ... },  # per-phase breakdown, see PhaseTimer.result
+                "cached": False,  # only with a response cache
+                "clock_offset_s": 612.4,  # device clock ahead of ours (only with clock sync)
+                "clock_retried": False,   # retried after a re-sync (only with clock sync)
             }
         """
-        history = HistoryPlugin(maxlen=1)
-
-        settings = Settings()
-        settings.strict = False
-        settings.xml_huge_tree = True
+        ticket = None
+        if self.response_cache is not None:
+            ticket, hit = self.response_cache.begin(
+                binding_name, operation_name, camera_ip, camera_port, username, password,
+                params, use_https, xml_mode, refresh=not cache,
+            )
+            if hit is not None:
+                return hit
 
-        xaddr = self._resolve_xaddr(binding_name, camera_ip, camera_port, use_https)
+        if self.metrics is None:
+            result = self._execute(wsdl_url, binding_name, operation_name, camera_ip,
+                                   camera_port, username, password, params,
+                                   use_https, timeout, xml_mode)
+        else:
+            with self.metrics.track_in_flight():
+                result = self._execute(wsdl_url, binding_name, operation_name, camera_ip,
+                                       camera_port, username, password, params,
+                                       use_https, timeout, xml_mode)
+            self.metrics.observe(camera_ip, camera_port, binding_name, operation_name, result)
 
-        # For HTTPS: disable SSL verification (cameras use self-signed certs)
-        session = requests.Session()
-        if use_https:
-            session.verify = False
-        transport = Transport(session=session)
+        if self.response_cache is not None:
+            result["cached"] = False
+            self.response_cache.finish(ticket, result)
+        return result
 
+    def _execute(self, wsdl_url, binding_name, operation_name, camera_ip, camera_port,
+                 username, password, params, use_https, timeout, xml_mode) -> dict:
+        timer = PhaseTimer()
+        health = self.pool.health
+        clock_sync = self.pool.clock_sync
+        offset, retried = 0.0, False
+        result, raw = None, (None, None)
         try:
-            client = CachingClient(
-                wsdl=wsdl_url,
-                wsse=UsernameToken(username, password, use_digest=True),
-                settings=settings,
-                plugins=[history],
-                transport=transport,
-            )
+            if health is not None:
+                health.acquire(camera_ip, camera_port)
+                timeout = health.timeouts(camera_ip, camera_port, operation_name, timeout)
+            if clock_sync is not None:
+                offset = clock_sync.ensure(camera_ip, camera_port, use_https, timeout)
+                timer.mark("clock")
+        except Exception as e:
+            # Circuit open, or the device did not answer the clock query either
+            result = self._error_result(e, None, None, xml_mode)
 
-            service = client.create_service(binding_name, xaddr)
-            operation_func = getattr(service, operation_name)
+        if result is None:
+            xaddr = self.resolve_xaddr(binding_name, camera_ip, camera_port,
+                                        username, password, use_https, timeout)
+            timer.mark("resolve")
 
-            start_time = time.time()
-            if params:
-                result = operation_func(**params)
-            else:
-                result = operation_func()
-            elapsed = (time.time() - start_time) * 1000
+            args = (timer, wsdl_url, binding_name, operation_name, xaddr,
+                    username, password, params, use_https, timeout, xml_mode)
+            result, raw = self._call(*args)
+            if clock_sync is not None:
+                if result["error_type"] in CLOCK_SYNC_AUTH_ERRORS:
+                    # The digest may have been stamped with a stale offset
+                    resynced = clock_sync.resync(camera_ip, camera_port, offset,
+                                                 use_https, timeout)
+                    timer.mark("clock")
+                    if resynced is not None:
+                        offset, retried = resynced, True
+                        result, raw = self._call(*args)
+                elif result["success"] and operation_name == "SetSystemDateAndTime":
+                    clock_sync.forget(camera_ip, camera_port)
+        if clock_sync is not None:
+            result.update(clock_offset_s=offset, clock_retried=retried)
+        result["timings"] = timer.result()
+        if health is not None and result["error_type"] != "CircuitOpenError":
+            health.record(camera_ip, camera_port, operation_name, result["error_type"],
+                          result["execution_time_ms"] / 1000 or None)
+
+        if self.history is not None:
+            self.history.record(
+                result, *raw, wsdl_url=wsdl_url, binding_name=binding_name,
+                operation_name=operation_name, camera_ip=camera_ip, camera_port=camera_port,
+                username=username, params=params, use_https=use_https,
+            )
+        return result
+
+    def _call(self, timer, wsdl_url, binding_name, operation_name, xaddr,
+              username, password, params, use_https, timeout, xml_mode) -> tuple:
+        """Make one SOAP call; returns ``(result, (sent_bytes, received_bytes))``."""
+        captured = None
+        raw = (None, None)
+        try:
+            with self.pool.lease(wsdl_url, binding_name, xaddr,
+                                 username, password, use_https) as entry:
+                timer.mark("acquire")
+                timer.new_client = entry.use_count == 0
+                entry.transport.operation_timeout = timeout
+                try:
+                    operation_func = getattr(entry.service, operation_name)
 
-            result_json = ONVIFSerializer.serialize(result)
+                    start_time = time.time()
+                    with trace_call() as trace:
+                        try:
+                            if params:
+                                result = operation_func(**params)
+                            else:
+                                result = operation_func()
+                        finally:
+                            timer.mark_call(trace)
+                    elapsed = (time.time() - start_time) * 1000
 
-            request_xml = self._extract_xml(history, "sent")
-            response_xml = self._extract_xml(history, "received")
+                    result_json = ONVIFSerializer.serialize(result)
+                    timer.mark("serialize")
+                finally:
+                    # Read the capture before the client goes back to the pool
+                    captured = self._capture_xml(entry, xml_mode)
+                    raw = (entry.transport.last_sent, entry.transport.last_received)
+                    timer.mark("xml")
 
-            return {
+            result = {
                 "success": True,
                 "result_json": result_json,
-                "request_xml": request_xml,
-                "response_xml": response_xml,
+                **captured,
                 "error": None,
+                "error_type": None,
                 "execution_time_ms": round(elapsed, 1),
+                "xaddr": xaddr,
             }
         except Exception as e:
-            request_xml = self._extract_xml(history, "sent")
-            response_xml = self._extract_xml(history, "received")
+            result = self._error_result(e, xaddr, captured, xml_mode)
+        return result, raw
+
+    def _error_result(self, exc: Exception, xaddr, captured, xml_mode: str) -> dict:
+        return {
+            "success": False,
+            "result_json": None,
+            **(captured or self._capture_xml(None, xml_mode)),
+            "error": str(exc),
+            "error_type": classify_error(exc),
+            "execution_time_ms": 0,
+            "xaddr": xaddr,
+        }
+
+    def execute_batch(
+        self,
+        items: list,
+        camera_ip: str,
+        camera_port: int,
+        username: str,
+        password: str,
+        use_https: bool = False,
+        max_concurrency: int = BATCH_MAX_CONCURRENCY,
+        xml_mode: str = "inline",
+        timeout: float = None,
+        cache: bool = True,
+    ) -> dict:
+        """Execute several operations against one camera concurrently.
+
+        Each item is ``{"wsdl_url", "binding_name", "operation_name", "params"}``.
+        Items share the camera's pooled keep-alive session, so the batch takes
+        roughly as long as its slowest call. ``xml_mode``, ``timeout`` and
+        ``cache`` are passed to every ``execute`` call.
+
+        Returns:
+            {
+                "success": True if every item succeeded,
+                "results": [ <execute() result + "index", "binding_name",
+                              "operation_name"> , ... ],
+                "execution_time_ms": 812,  # wall time for the whole batch
+            }
+        """
+        def run(index_item):
+            index, item = index_item
+            result = self.execute(
+                wsdl_url=item["wsdl_url"],
+                binding_name=item["binding_name"],
+                operation_name=item["operation_name"],
+                camera_ip=camera_ip,
+                camera_port=camera_port,
+                username=username,
+                password=password,
+                params=item.get("params") or {},
+                use_https=use_https,
+                timeout=timeout,
+                xml_mode=xml_mode,
+                cache=cache,
+            )
             return {
-                "success": False,
-                "result_json": None,
-                "request_xml": request_xml,
-                "response_xml": response_xml,
-                "error": str(e),
-                "execution_time_ms": 0,
+                "index": index,
+                "binding_name": item["binding_name"],
+                "operation_name": item["operation_name"],
+                **result,
             }
 
-    def _resolve_xaddr(self, binding_name: str, ip: str, port: int,
-                        use_https: bool = False) -> str:
-        """Map binding name to the correct ONVIF service endpoint path."""
-        local_name = binding_name.split("}")[-1] if "}" in binding_name else binding_name
-        path = ENDPOINT_MAP.get(local_name, "/onvif/device_service")
+        workers = max(1, min(max_concurrency, BATCH_MAX_CONCURRENCY, len(items)))
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=workers,
+                                thread_name_prefix="onvif-batch") as pool:
+            results = list(pool.map(run, enumerate(items)))
+        elapsed = (time.time() - start_time) * 1000
+
+        return {
+            "success": all(r["success"] for r in results),
+            "results": results,
+            "execution_time_ms": round(elapsed, 1),
+        }
+
+    def resolve_xaddr(self, binding_name: str, ip: str, port: int,
+                       username: str = "", password: str = "",
+                       use_https: bool = False, timeout: float = None,
+                       cached_only: bool = False):
+        """Return the service endpoint for a binding on this camera.
+
+        The binding's namespace is looked up in the device's GetServices
+        (or GetCapabilities) XAddrs, fetched once and cached per device.
+        ``ENDPOINT_MAP`` is used when the binding has no namespace, the
+        device does not list it, or discovery fails. With ``cached_only``
+        the device is never queried: None is returned when the answer
+        needs a GetServices round trip.
+        """
         scheme = "https" if use_https else "http"
+        namespace, _, local_name = binding_name[1:].partition("}") \
+            if binding_name.startswith("{") else ("", "", binding_name)
+
+        # The device service itself is the fixed ONVIF entry point
+        if namespace and binding_name != DEVICE_BINDING:
+            discovered = self._discovered_xaddr(namespace, ip, port, username,
+                                                password, use_https, timeout, cached_only)
+            if discovered is _NOT_CACHED:
+                return None
+            if discovered:
+                return discovered
+
+        path = ENDPOINT_MAP.get(local_name, "/onvif/device_service")
         return f"{scheme}://{ip}:{port}{path}"
 
+    def _discovered_xaddr(self, namespace: str, ip: str, port: int, username: str,
+                          password: str, use_https: bool, timeout: float,
+                          cached_only: bool = False):
+        """Look up ``namespace`` in the device's service index, or return None.
+
+        Returns ``_NOT_CACHED`` when ``cached_only`` is set and the index
+        is not cached yet.
+        """
+        device_key = _device_key(ip, port, use_https, username, password)
+        if self._discovery_failures.get(device_key) is not None:
+            return None
+        if cached_only:
+            services = self.profile_checker.cached_services(ip, port, username, password,
+                                                            use_https)
+            if services is None:
+                return _NOT_CACHED
+        else:
+            try:
+                # The calling execute() already went through the circuit breaker
+                services, _ = self.profile_checker.get_services(
+                    ip, port, username, password, use_https, timeout=timeout,
+                    guarded=False,
+                )
+            except Exception as e:
+                self._discovery_failures.set(device_key, str(e))
+                return None
+        if not services:
+            self._discovery_failures.set(device_key, "no services reported")
+            return None
+
+        xaddr = next((s["xaddr"] for s in services
+                      if s["namespace"] == namespace and s["xaddr"]), None)
+        if not xaddr:
+            return None
+        return rebase_xaddr(xaddr, ip, port, use_https)
+
+    def _capture_xml(self, entry, xml_mode: str) -> dict:
+        """Return the request/response XML fields of a result for ``xml_mode``."""
+        if xml_mode in ("deferred", "none"):
+            if xml_mode == "none" or entry is None or entry.transport.last_sent is None:
+                return {"request_xml": "", "response_xml": "", "result_id": None}
+            result_id = self.xml_store.put(entry.transport.last_sent,
+                                           entry.transport.last_received)
+            return {"request_xml": "", "response_xml": "", "result_id": result_id}
+
+        history = entry.history if entry else None
+        return {
+            "request_xml": self._extract_xml(history, "sent"),
+            "response_xml": self._extract_xml(history, "received"),
+            "result_id": None,
+        }
+
     def _extract_xml(self, history: HistoryPlugin, direction: str) -> str:
         """Extract and pretty-print XML from history plugin."""
+        if history is None:
+            return ""
         try:
             if direction == "sent" and history.last_sent:
                 envelope = history.last_sent["envelope"]
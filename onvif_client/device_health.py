@@ -0,0 +1,294 @@
+"""Adaptive per-device timeouts and a circuit breaker for unreachable cameras."""
+
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    ADAPTIVE_CONNECT_TIMEOUT_MIN,
+    ADAPTIVE_READ_TIMEOUT_MIN,
+    ADAPTIVE_TIMEOUT_MIN_SAMPLES,
+    ADAPTIVE_TIMEOUT_MULTIPLIER,
+    BREAKER_FAILURE_ERRORS,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_MAX_OPEN_SECONDS,
+    BREAKER_OPEN_SECONDS,
+    DEVICE_HEALTH_MAX_DEVICES,
+    ZEEP_OPERATION_TIMEOUT,
+    ZEEP_TIMEOUT,
+)
+
+_MAX_BACKOFF = 64
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a device whose circuit is open."""
+
+    def __init__(self, device: str, retry_in: float, last_error: str):
+        super().__init__(f"{device} is unreachable ({last_error}); circuit open, "
+                         f"next attempt in {retry_in:.1f} s")
+        self.device = device
+        self.retry_in = retry_in
+
+
+class _Latency:
+    """Smoothed latency and deviation (RFC 6298 estimator) of one call type."""
+
+    __slots__ = ("samples", "srtt", "rttvar", "backoff")
+
+    def __init__(self):
+        self.samples = 0
+        self.srtt = 0.0
+        self.rttvar = 0.0
+        self.backoff = 1
+
+    def add(self, seconds: float):
+        if self.samples == 0:
+            self.srtt, self.rttvar = seconds, seconds / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - seconds)
+            self.srtt = 0.875 * self.srtt + 0.125 * seconds
+        self.samples += 1
+        self.backoff = 1
+
+    def timeout(self, multiplier: float, floor: float, cap: float,
+                min_samples: int) -> float:
+        if self.samples < min_samples:
+            return cap
+        value = multiplier * (self.srtt + 4 * self.rttvar) * self.backoff
+        return min(max(value, floor), cap)
+
+    def as_dict(self, timeout: float) -> dict:
+        return {
+            "samples": self.samples,
+            "srtt_ms": round(self.srtt * 1000, 1),
+            "rttvar_ms": round(self.rttvar * 1000, 1),
+            "backoff": self.backoff,
+            "timeout_s": round(timeout, 2),
+        }
+
+
+class _Device:
+    __slots__ = ("state", "failures", "last_error", "opened_at", "open_for",
+                 "probe_started", "rejected", "opens", "latency", "operations")
+
+    def __init__(self, open_for: float):
+        self.state = "closed"  # closed -> open -> half_open -> closed / open
+        self.failures = 0      # consecutive unreachable errors
+        self.last_error = None
+        self.opened_at = 0.0
+        self.open_for = open_for
+        self.probe_started = None
+        self.rejected = 0
+        self.opens = 0
+        self.latency = _Latency()  # every operation: bounds the connect timeout
+        self.operations = {}       # operation name -> _Latency: the read timeout
+
+
+class DeviceHealth:
+    """Per-device timeouts learned from observed latency, plus a circuit breaker.
+
+    Every call's latency feeds a smoothed estimate (RFC 6298: mean + 4 x
+    deviation, times ``multiplier``) per device and per operation on it.
+    After ``min_samples`` successful calls the read timeout of an operation
+    is its estimate and the connect timeout that of the device, between
+    the ``*_min`` floors and ``ZEEP_TIMEOUT`` / ``ZEEP_OPERATION_TIMEOUT``
+    (or the caller's timeout, whichever is lower). A call that times out
+    doubles the timeouts it used until the next success, so an operation
+    slower than its history gets more time rather than failing repeatedly.
+
+    ``threshold`` consecutive unreachable errors (``failure_errors``:
+    timeouts and connection errors; faults and HTTP errors mean the device
+    answered) open the device's circuit: calls then fail at once with
+    :class:`CircuitOpenError` for ``open_seconds``. After that a single
+    call is let through as a probe (half-open) while the others keep failing
+    fast; its success closes the circuit, its failure reopens it for twice
+    as long, up to ``max_open_seconds``.
+    """
+
+    def __init__(self, threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 open_seconds: float = BREAKER_OPEN_SECONDS,
+                 max_open_seconds: float = BREAKER_MAX_OPEN_SECONDS,
+                 failure_errors: tuple = BREAKER_FAILURE_ERRORS,
+                 multiplier: float = ADAPTIVE_TIMEOUT_MULTIPLIER,
+                 min_samples: int = ADAPTIVE_TIMEOUT_MIN_SAMPLES,
+                 connect_min: float = ADAPTIVE_CONNECT_TIMEOUT_MIN,
+                 read_min: float = ADAPTIVE_READ_TIMEOUT_MIN,
+                 max_devices: int = DEVICE_HEALTH_MAX_DEVICES):
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.failure_errors = set(failure_errors)
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.connect_min = connect_min
+        self.read_min = read_min
+        self.max_devices = max_devices
+        self._lock = threading.Lock()
+        self._devices = OrderedDict()  # (ip, port) -> _Device, LRU order
+        self.rejected = 0
+        self.opens = 0
+
+    def acquire(self, ip: str, port: int):
+        """Let a call to the device through, or raise :class:`CircuitOpenError`.
+
+        Every call let through must be followed by :meth:`record`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            device = self._device(ip, port)
+            if device.state == "closed":
+                return
+            if device.state == "open" and now >= device.opened_at + device.open_for:
+                device.state = "half_open"
+                device.probe_started = now
+                return
+            if device.state == "half_open" and \
+                    now - device.probe_started > ZEEP_TIMEOUT + ZEEP_OPERATION_TIMEOUT:
+                device.probe_started = now  # the probe never reported back
+                return
+            device.rejected += 1
+            self.rejected += 1
+            retry_in = max(device.opened_at + device.open_for - now, 0.0)
+            raise CircuitOpenError(f"{ip}:{port}", retry_in, device.last_error)
+
+    def timeouts(self, ip: str, port: int, operation: str, limit=None) -> tuple:
+        """Return the ``(connect, read)`` timeouts for a call, in seconds.
+
+        ``limit`` (seconds, or a ``(connect, read)`` pair) caps them; None
+        means ``ZEEP_TIMEOUT`` / ``ZEEP_OPERATION_TIMEOUT``.
+        """
+        if limit is None:
+            connect_cap, read_cap = ZEEP_TIMEOUT, ZEEP_OPERATION_TIMEOUT
+        elif isinstance(limit, tuple):
+            connect_cap, read_cap = limit
+        else:
+            connect_cap = read_cap = limit
+        with self._lock:
+            device = self._devices.get((ip, int(port)))
+            if device is None:
+                return connect_cap, read_cap
+            latency = device.operations.get(operation)
+            connect = device.latency.timeout(self.multiplier, self.connect_min,
+                                             connect_cap, self.min_samples)
+            read = latency.timeout(self.multiplier, self.read_min, read_cap,
+                                   self.min_samples) if latency else read_cap
+        return connect, read
+
+    def record(self, ip: str, port: int, operation: str = None,
+               error_type: str = None, latency: float = None):
+        """Report how a call let through by :meth:`acquire` ended.
+
+        ``latency`` (seconds) of a call the device answered, fault or not,
+        updates its timeouts.
+        """
+        unreachable = error_type in self.failure_errors
+        with self._lock:
+            device = self._device(ip, port)
+            if unreachable:
+                device.failures += 1
+                device.last_error = error_type
+                if device.state == "half_open" or (device.state == "closed"
+                                                   and device.failures >= self.threshold):
+                    if device.state == "half_open":
+                        device.open_for = min(device.open_for * 2, self.max_open_seconds)
+                    device.state = "open"
+                    device.opened_at = time.monotonic()
+                    device.opens += 1
+                    self.opens += 1
+            else:
+                device.failures = 0
+                device.state = "closed"
+                device.open_for = self.open_seconds
+
+            op_latency = None
+            if operation is not None:
+                op_latency = device.operations.get(operation)
+                if op_latency is None:
+                    op_latency = device.operations[operation] = _Latency()
+            if latency is not None and not unreachable:
+                device.latency.add(latency)
+                if op_latency is not None:
+                    op_latency.add(latency)
+            elif error_type == "Timeout":
+                for estimate in (device.latency, op_latency):
+                    if estimate is not None:
+                        estimate.backoff = min(estimate.backoff * 2, _MAX_BACKOFF)
+
+    def state(self, ip: str, port: int) -> str:
+        with self._lock:
+            device = self._devices.get((ip, int(port)))
+            return device.state if device is not None else "closed"
+
+    def devices(self) -> list:
+        """Return the breaker state and timeouts of every tracked device.
+
+        Returns:
+            [
+                {
+                    "device": "192.168.1.100:80",
+                    "state": "closed" / "open" / "half_open",
+                    "consecutive_failures": 0, "last_error": None or "Timeout",
+                    "retry_in_s": None or 8.2,  # open: seconds until the next probe
+                    "rejected": 0, "opens": 0,
+                    "connect_timeout_s": 1.0,
+                    "latency": {"samples", "srtt_ms", "rttvar_ms", "backoff", "timeout_s"},
+                    "operations": {"GetProfiles": { same as latency }, ...},
+                },
+                ...
+            ]
+        """
+        now = time.monotonic()
+        rows = []
+        with self._lock:
+            for (ip, port), device in self._devices.items():
+                connect = device.latency.timeout(self.multiplier, self.connect_min,
+                                                 ZEEP_TIMEOUT, self.min_samples)
+                rows.append({
+                    "device": f"{ip}:{port}",
+                    "state": device.state,
+                    "consecutive_failures": device.failures,
+                    "last_error": device.last_error,
+                    "retry_in_s": round(max(device.opened_at + device.open_for - now, 0.0), 1)
+                    if device.state == "open" else None,
+                    "rejected": device.rejected,
+                    "opens": device.opens,
+                    "connect_timeout_s": round(connect, 2),
+                    "latency": device.latency.as_dict(connect),
+                    "operations": {
+                        name: op.as_dict(op.timeout(self.multiplier, self.read_min,
+                                                    ZEEP_OPERATION_TIMEOUT, self.min_samples))
+                        for name, op in device.operations.items()
+                    },
+                })
+        return rows
+
+    def reset(self, ip: str = None, port: int = None):
+        """Forget one device (``ip`` [+ ``port``]) or every device: circuits close."""
+        with self._lock:
+            if ip is None:
+                self._devices.clear()
+                return
+            for key in [k for k in self._devices
+                        if k[0] == ip and (port is None or k[1] == int(port))]:
+                del self._devices[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            states = {"closed": 0, "open": 0, "half_open": 0}
+            for device in self._devices.values():
+                states[device.state] += 1
+            return {"devices": len(self._devices), **states,
+                    "rejected": self.rejected, "opens": self.opens}
+
+    def _device(self, ip: str, port: int) -> _Device:
+        """Return (creating) the device's entry, most recently used (lock held)."""
+        key = (ip, int(port))
+        device = self._devices.get(key)
+        if device is None:
+            device = self._devices[key] = _Device(self.open_seconds)
+            while len(self._devices) > self.max_devices:
+                self._devices.popitem(last=False)
+        else:
+            self._devices.move_to_end(key)
+        return device
@@ -0,0 +1,305 @@
+"""WS-Discovery Probe scanner (multicast + unicast CIDR sweep)."""
+
+import ipaddress
+import selectors
+import socket
+import time
+import uuid
+from collections import deque
+from urllib.parse import unquote, urlsplit
+
+from lxml import etree
+
+from config import (
+    DISCOVERY_MAX_HOSTS,
+    DISCOVERY_MULTICAST_ADDR,
+    DISCOVERY_PORT,
+    DISCOVERY_SEND_BATCH,
+    DISCOVERY_TIMEOUT,
+)
+
+PROBE_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope"'
+    ' xmlns:a="http://schemas.xmlsoap.org/ws/2004/08/addressing"'
+    ' xmlns:d="http://schemas.xmlsoap.org/ws/2005/04/discovery"'
+    ' xmlns:dn="http://www.onvif.org/ver10/network/wsdl">'
+    "<s:Header>"
+    "<a:Action s:mustUnderstand=\"1\">"
+    "http://schemas.xmlsoap.org/ws/2005/04/discovery/Probe</a:Action>"
+    "<a:MessageID>urn:uuid:{message_id}</a:MessageID>"
+    "<a:ReplyTo><a:Address>"
+    "http://schemas.xmlsoap.org/ws/2004/08/addressing/role/anonymous"
+    "</a:Address></a:ReplyTo>"
+    "<a:To s:mustUnderstand=\"1\">urn:schemas-xmlsoap-org:ws:2005:04:discovery</a:To>"
+    "</s:Header>"
+    "<s:Body><d:Probe><d:Types>dn:NetworkVideoTransmitter</d:Types></d:Probe></s:Body>"
+    "</s:Envelope>"
+)
+
+# Multicast probes are sent twice (UDP may drop one; WS-Discovery repeats too)
+_MULTICAST_REPEAT = 2
+_RECV_BUFFER = 1024 * 1024
+_MAX_DATAGRAM = 65535
+_ONVIF_SCOPE = "onvif://www.onvif.org/"
+
+
+def build_probe(message_id: str) -> bytes:
+    return PROBE_TEMPLATE.format(message_id=message_id).encode("utf-8")
+
+
+def sweep_targets(cidr: str) -> list:
+    """Return the host addresses of ``cidr`` (a single IP is allowed).
+
+    Raises ValueError for malformed or too large ranges.
+    """
+    network = ipaddress.ip_network(cidr.strip(), strict=False)
+    if network.version != 4:
+        raise ValueError("Only IPv4 ranges are supported")
+    if network.num_addresses > DISCOVERY_MAX_HOSTS:
+        raise ValueError(f"Range {network} has {network.num_addresses} addresses "
+                         f"(limit {DISCOVERY_MAX_HOSTS})")
+    hosts = list(network.hosts())
+    return [str(h) for h in hosts or [network.network_address]]
+
+
+class WSDiscovery:
+    """Send WS-Discovery Probes and collect ProbeMatches concurrently.
+
+    Multicast and unicast probes all go out from non-blocking sockets served
+    by one selector loop, so a whole /22 is swept in a few milliseconds of
+    sending and replies are read while the sweep is still going. Matches
+    are merged by endpoint reference (a camera answering on several
+    interfaces or both probe paths is listed once).
+    """
+
+    def __init__(self, port: int = DISCOVERY_PORT,
+                 multicast_addr: str = DISCOVERY_MULTICAST_ADDR,
+                 send_batch: int = DISCOVERY_SEND_BATCH):
+        self.port = port
+        self.multicast_addr = multicast_addr
+        self.send_batch = send_batch
+
+    def scan(self, multicast: bool = True, cidr: str = None,
+             timeout: float = DISCOVERY_TIMEOUT, interface: str = None) -> dict:
+        """Probe the local segment and/or every host in ``cidr``.
+
+        ``timeout`` is how long to keep listening after the last probe was
+        sent. ``interface`` is the local IPv4 address to send multicast from.
+
+        Returns:
+            {
+                "devices": [<see parse_probe_matches>, ...],
+                "probes_sent": 1024,
+                "responses": 37,
+                "errors": ["multicast: [Errno 101] Network is unreachable"],
+                "execution_time_ms": 3012.4,
+            }
+        """
+        start_time = time.time()
+        message_id = str(uuid.uuid4())
+        probe = build_probe(message_id)
+        targets = sweep_targets(cidr) if cidr else []
+
+        selector = selectors.DefaultSelector()
+        pending = {}  # socket -> deque of destination addresses still to probe
+        errors = []
+        if multicast:
+            try:
+                sock = self._multicast_socket(interface)
+                pending[sock] = deque([(self.multicast_addr, self.port)] * _MULTICAST_REPEAT)
+            except OSError as e:
+                errors.append(f"multicast: {e}")
+        if targets:
+            pending[self._udp_socket()] = deque((host, self.port) for host in targets)
+        sockets = list(pending)
+        for sock in sockets:
+            selector.register(sock, selectors.EVENT_READ | selectors.EVENT_WRITE)
+
+        devices = {}
+        answered = set()  # source IPs that replied
+        sent = 0
+        responses = 0
+        deadline = None
+        try:
+            # A unicast-only sweep is done as soon as every target has answered
+            while sockets and not (targets and not multicast and len(answered) >= len(targets)):
+                if deadline is None and not any(pending.values()):
+                    # Everything is out: listen for ``timeout`` more seconds
+                    deadline = time.monotonic() + timeout
+                wait = None if deadline is None else deadline - time.monotonic()
+                if wait is not None and wait <= 0:
+                    break
+                for key, events in selector.select(wait):
+                    sock = key.fileobj
+                    if events & selectors.EVENT_READ:
+                        for data, addr in self._drain(sock):
+                            responses += 1
+                            answered.add(addr[0])
+                            for match in parse_probe_matches(data, addr[0], message_id):
+                                _merge(devices, match)
+                    if events & selectors.EVENT_WRITE:
+                        count, error = self._send_some(sock, pending[sock], probe)
+                        sent += count
+                        if error:
+                            errors.append(error)
+                        if not pending[sock]:
+                            selector.modify(sock, selectors.EVENT_READ)
+        finally:
+            for sock in sockets:
+                selector.unregister(sock)
+                sock.close()
+            selector.close()
+
+        return {
+            "devices": sorted(devices.values(), key=_address_order),
+            "probes_sent": sent,
+            "responses": responses,
+            "errors": errors,
+            "execution_time_ms": round((time.time() - start_time) * 1000, 1),
+        }
+
+    def _send_some(self, sock, destinations: deque, probe: bytes):
+        """Send up to ``send_batch`` queued probes; returns (sent, error)."""
+        count = 0
+        for _ in range(min(self.send_batch, len(destinations))):
+            addr = destinations.popleft()
+            try:
+                sock.sendto(probe, addr)
+                count += 1
+            except BlockingIOError:
+                # Kernel buffer full: retry this address once writable again
+                destinations.appendleft(addr)
+                break
+            except OSError as e:
+                if addr[0] == self.multicast_addr:
+                    destinations.clear()
+                    return count, f"multicast: {e}"
+                # Unreachable host/network: skip it, keep sweeping
+        return count, None
+
+    @staticmethod
+    def _drain(sock):
+        while True:
+            try:
+                yield sock.recvfrom(_MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # ICMP port unreachable from a swept host surfaces here
+                continue
+
+    @staticmethod
+    def _udp_socket() -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _RECV_BUFFER)
+        sock.setblocking(False)
+        sock.bind(("", 0))
+        return sock
+
+    def _multicast_socket(self, interface: str = None) -> socket.socket:
+        sock = self._udp_socket()
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        if interface:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                            socket.inet_aton(interface))
+        return sock
+
+
+def parse_probe_matches(data: bytes, source_ip: str, message_id: str = None) -> list:
+    """Parse a ProbeMatches datagram into device dicts.
+
+    Replies that relate to another probe (``RelatesTo`` set to a different
+    MessageID) and datagrams that are not XML are ignored.
+
+    Returns:
+        [{"epr": "urn:uuid:...", "ip": "192.168.1.100", "port": 80,
+          "use_https": False, "xaddrs": ["http://192.168.1.100/onvif/device_service"],
+          "source_ip": "192.168.1.100", "types": ["dn:NetworkVideoTransmitter"],
+          "scopes": ["onvif://www.onvif.org/name/Cam1", ...],
+          "name": "Cam1", "hardware": "XNO-6080R", "location": "lobby",
+          "profiles": ["Streaming", "T"], "metadata_version": "1"}, ...]
+    """
+    parser = etree.XMLParser(resolve_entities=False, no_network=True)
+    try:
+        root = etree.fromstring(data, parser)
+    except etree.XMLSyntaxError:
+        return []
+    if message_id:
+        relates_to = root.find(".//{*}Header/{*}RelatesTo")
+        if relates_to is not None and relates_to.text \
+                and relates_to.text.strip() not in (f"urn:uuid:{message_id}", message_id):
+            return []
+
+    matches = []
+    for match in root.iter("{*}ProbeMatch"):
+        epr = _text(match.find("{*}EndpointReference/{*}Address"))
+        xaddrs = _text(match.find("{*}XAddrs")).split()
+        scopes = _text(match.find("{*}Scopes")).split()
+        device = {
+            "epr": epr or f"xaddrs:{' '.join(xaddrs) or source_ip}",
+            "source_ip": source_ip,
+            "xaddrs": xaddrs,
+            "types": _text(match.find("{*}Types")).split(),
+            "scopes": scopes,
+            "metadata_version": _text(match.find("{*}MetadataVersion")),
+            **_scope_fields(scopes),
+        }
+        device.update(_device_address(xaddrs, source_ip))
+        matches.append(device)
+    return matches
+
+
+def _device_address(xaddrs: list, source_ip: str) -> dict:
+    """Pick ip/port/https from the XAddr that matches the sender, else the first."""
+    parsed = [urlsplit(x) for x in xaddrs if "://" in x]
+    chosen = next((p for p in parsed if p.hostname == source_ip),
+                  parsed[0] if parsed else None)
+    if chosen is None or not chosen.hostname:
+        return {"ip": source_ip, "port": 80, "use_https": False}
+    use_https = chosen.scheme == "https"
+    return {
+        "ip": chosen.hostname,
+        "port": chosen.port or (443 if use_https else 80),
+        "use_https": use_https,
+    }
+
+
+def _scope_fields(scopes: list) -> dict:
+    """Extract name / hardware / location / profiles from ONVIF scope URIs."""
+    fields = {"name": "", "hardware": "", "location": "", "profiles": []}
+    for scope in scopes:
+        if not scope.startswith(_ONVIF_SCOPE):
+            continue
+        category, _, value = scope[len(_ONVIF_SCOPE):].partition("/")
+        value = unquote(value)
+        category = category.lower()
+        if category == "profile":
+            fields["profiles"].append(value)
+        elif category in fields and not fields[category]:
+            fields[category] = value
+    return fields
+
+
+def _merge(devices: dict, match: dict):
+    """Add a match to ``devices`` keyed by EPR, merging repeated answers."""
+    existing = devices.get(match["epr"])
+    if existing is None:
+        devices[match["epr"]] = match
+        return
+    for field in ("xaddrs", "scopes", "types", "profiles"):
+        for value in match[field]:
+            if value not in existing[field]:
+                existing[field].append(value)
+
+
+def _text(element) -> str:
+    return (element.text or "").strip() if element is not None else ""
+
+
+def _address_order(device: dict) -> tuple:
+    """Sort IPv4 devices numerically, then anything else by name."""
+    try:
+        return (0, int(ipaddress.IPv4Address(device["ip"])), device["port"])
+    except ValueError:
+        return (1, device["ip"], device["port"])
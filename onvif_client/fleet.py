@@ -0,0 +1,157 @@
+"""Run one ONVIF operation across many cameras with streamed results."""
+
+import csv
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import FLEET_DEVICE_TIMEOUT, FLEET_MAX_WORKERS
+from .stats import percentiles
+
+# Accepted column / key aliases in device lists
+_FIELD_ALIASES = {
+    "ip": ("ip", "camera_ip", "host", "address"),
+    "port": ("port", "camera_port"),
+    "username": ("username", "user"),
+    "password": ("password", "pass"),
+    "use_https": ("use_https", "https"),
+}
+
+_TRUE_VALUES = {"1", "true", "yes", "y", "on", "https"}
+
+
+def parse_device_list(text: str, username: str = "", password: str = "",
+                      use_https: bool = False) -> list:
+    """Parse a CSV or JSON device list into normalized device dicts.
+
+    JSON may be a list of objects (or a list of IP strings). CSV may have a
+    header row naming its columns (only the IP column is required); without
+    one, columns are read positionally as ``ip[:port],port,username,password,https``
+    so a plain list of IPs works too. Missing credentials / HTTPS
+    fall back to the given defaults, and the port defaults to 80 (443 for HTTPS).
+
+    Returns:
+        [{"ip": "10.0.0.5", "port": 80, "username": "admin",
+          "password": "...", "use_https": False}, ...]
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+    if text[0] in "[{":
+        rows = json.loads(text)
+        if isinstance(rows, dict):
+            rows = rows.get("devices", [])
+        rows = [{"ip": r} if isinstance(r, str) else r for r in rows]
+    else:
+        lines = [line for line in text.splitlines() if line.strip()]
+        first = {c.strip().lower() for c in lines[0].split(",")}
+        if first & set(_FIELD_ALIASES["ip"]):
+            reader = csv.DictReader(io.StringIO("\n".join(lines)))
+            rows = [{(k or "").strip().lower(): (v or "").strip() for k, v in r.items()}
+                    for r in reader]
+        else:
+            rows = []
+            for values in csv.reader(lines):
+                values = [v.strip() for v in values]
+                row = dict(zip(("ip", "port", "username", "password", "use_https"), values))
+                if ":" in row["ip"] and not row.get("port"):
+                    row["ip"], row["port"] = row["ip"].rsplit(":", 1)
+                rows.append(row)
+
+    devices = []
+    for row in rows:
+        device = {}
+        for field, aliases in _FIELD_ALIASES.items():
+            device[field] = next((row[a] for a in aliases if row.get(a) not in (None, "")), None)
+        if not device["ip"]:
+            continue
+        https = device["use_https"]
+        https = use_https if https is None else str(https).strip().lower() in _TRUE_VALUES
+        devices.append({
+            "ip": str(device["ip"]).strip(),
+            "port": int(device["port"] or (443 if https else 80)),
+            "username": device["username"] or username,
+            "password": device["password"] if device["password"] is not None else password,
+            "use_https": https,
+        })
+    return devices
+
+
+class FleetRunner:
+    """Fan one operation out over a device list using a worker pool."""
+
+    def __init__(self, executor, max_workers: int = FLEET_MAX_WORKERS,
+                 device_timeout: float = FLEET_DEVICE_TIMEOUT):
+        self.executor = executor
+        self.max_workers = max_workers
+        self.device_timeout = device_timeout
+
+    def run(self, devices: list, wsdl_url: str, binding_name: str,
+            operation_name: str, params: dict = None, xml_mode: str = "inline"):
+        """Yield one event per device as it finishes, then a summary event.
+
+        Result events are the ``CommandExecutor.execute`` result plus
+        ``{"type": "result", "device": {...}, "elapsed_ms": ...}`` (passwords
+        are never echoed). The final event is ``{"type": "summary", ...}`` with
+        throughput and latency percentiles.
+        """
+        start_time = time.time()
+        latencies = []
+        succeeded = 0
+
+        def run_one(device):
+            t0 = time.time()
+            result = self.executor.execute(
+                wsdl_url=wsdl_url,
+                binding_name=binding_name,
+                operation_name=operation_name,
+                camera_ip=device["ip"],
+                camera_port=device["port"],
+                username=device["username"],
+                password=device["password"],
+                params=params or {},
+                use_https=device["use_https"],
+                timeout=self.device_timeout,
+                xml_mode=xml_mode,
+            )
+            return result, (time.time() - t0) * 1000
+
+        workers = max(1, min(self.max_workers, len(devices)))
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="onvif-fleet")
+        try:
+            futures = {pool.submit(run_one, d): d for d in devices}
+            for future in as_completed(futures):
+                device = futures[future]
+                public = {k: v for k, v in device.items() if k != "password"}
+                try:
+                    result, elapsed = future.result()
+                except Exception as e:
+                    result, elapsed = {
+                        "success": False,
+                        "result_json": None,
+                        "request_xml": "",
+                        "response_xml": "",
+                        "result_id": None,
+                        "error": f"{type(e).__name__}: {e}",
+                        "execution_time_ms": 0,
+                    }, 0.0
+                latencies.append(elapsed)
+                succeeded += bool(result["success"])
+                yield {"type": "result", "device": public,
+                       "elapsed_ms": round(elapsed, 1), **result}
+        finally:
+            # A client that goes away mid-run closes this generator: devices
+            # not started yet are cancelled instead of still being called
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        wall = time.time() - start_time
+        yield {
+            "type": "summary",
+            "total": len(devices),
+            "succeeded": succeeded,
+            "failed": len(devices) - succeeded,
+            "wall_time_ms": round(wall * 1000, 1),
+            "throughput_per_sec": round(len(devices) / wall, 2) if wall > 0 else 0,
+            "latency_ms": percentiles(latencies),
+        }
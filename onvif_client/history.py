@@ -0,0 +1,397 @@
+"""Persistent command history in SQLite, written by a background batching thread."""
+
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date, datetime
+from datetime import time as dt_time
+
+from config import (
+    HISTORY_BATCH_SIZE,
+    HISTORY_COMPRESS_LEVEL,
+    HISTORY_DB_PATH,
+    HISTORY_MAX_ROWS,
+    HISTORY_PAGE_MAX,
+    HISTORY_QUEUE_SIZE,
+)
+from .xml_store import _SECURITY_RE, pretty_xml
+
+# The summary columns returned by search(); blobs live in history_data so
+# index and table scans of history stay small.
+_SUMMARY_COLUMNS = (
+    "id", "created_at", "camera_ip", "camera_port", "username", "use_https",
+    "wsdl_url", "binding_name", "operation_name", "success", "error",
+    "error_type", "execution_time_ms", "xaddr",
+)
+
+# Secondary indexes end in the rowid, so each one also serves
+# "ORDER BY id DESC" within its key for keyset paging.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    camera_ip TEXT NOT NULL,
+    camera_port INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    use_https INTEGER NOT NULL,
+    wsdl_url TEXT NOT NULL,
+    binding_name TEXT NOT NULL,
+    operation_name TEXT NOT NULL,
+    params TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    error TEXT,
+    error_type TEXT,
+    execution_time_ms REAL NOT NULL,
+    xaddr TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_history_device ON history (camera_ip, camera_port);
+CREATE INDEX IF NOT EXISTS ix_history_operation ON history (operation_name);
+CREATE INDEX IF NOT EXISTS ix_history_created ON history (created_at);
+CREATE INDEX IF NOT EXISTS ix_history_success ON history (success);
+CREATE INDEX IF NOT EXISTS ix_history_error_type ON history (error_type)
+    WHERE error_type IS NOT NULL;
+CREATE TABLE IF NOT EXISTS history_data (
+    id INTEGER PRIMARY KEY,
+    result BLOB,
+    request_xml BLOB,
+    response_xml BLOB
+);
+"""
+
+_INSERT_HISTORY = (
+    f"INSERT INTO history ({', '.join(_SUMMARY_COLUMNS[:9])}, params, "
+    f"{', '.join(_SUMMARY_COLUMNS[9:])}) VALUES ({', '.join('?' * 15)})"
+)
+_INSERT_DATA = "INSERT INTO history_data VALUES (?, ?, ?, ?)"
+
+# Password elements in a request body (e.g. SetUser / CreateUsers)
+_PASSWORD_RE = re.compile(rb"(<(?:[\w.-]+:)?Password\b[^>/]*>)[^<]*(?=</)")
+_REDACTED = "***"
+
+
+def _redact_params(value):
+    """Return ``value`` with every ``*Password*`` key's value masked, at any depth."""
+    if isinstance(value, dict):
+        return {k: _REDACTED if "password" in str(k).lower()
+                and not isinstance(v, (dict, list, tuple)) and v not in (None, "")
+                else _redact_params(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_redact_params(v) for v in value]
+    return value
+
+
+def _redact_envelope(raw: bytes) -> bytes:
+    """Drop the WS-Security header (its digest, nonce and created time are
+    enough to brute-force the password offline) and mask Password elements."""
+    body = re.search(rb"<(?:[\w.-]+:)?Body\b", raw)
+    end = body.start() if body is not None else len(raw)
+    security = _SECURITY_RE.search(raw, 0, end)
+    if security is not None:
+        raw = raw[:security.start()] + raw[security.end():]
+    return _PASSWORD_RE.sub(rb"\1" + _REDACTED.encode(), raw)
+
+
+def _json_default(o):
+    if isinstance(o, (datetime, date, dt_time)):
+        return o.isoformat()
+    if isinstance(o, bytes):
+        return o.decode("utf-8", errors="replace")
+    return str(o)
+
+
+class HistoryStore:
+    """Every ``execute`` result, with its raw envelopes, kept in SQLite.
+
+    ``record`` only queues the result, so the request path never waits for
+    the disk; a single writer thread drains the queue and inserts whatever
+    has accumulated in one transaction (up to ``batch_size`` rows), zlib-
+    compressing the envelopes and result JSON on the way. When the queue is
+    full, results are dropped and counted rather than blocking the caller.
+
+    Rows beyond ``max_rows`` are pruned oldest-first. Passwords are never
+    stored: the request's WS-Security header is dropped and password
+    parameters and elements are masked, so a re-run needs them again.
+    """
+
+    def __init__(self, path: str = HISTORY_DB_PATH, max_rows: int = HISTORY_MAX_ROWS,
+                 queue_size: int = HISTORY_QUEUE_SIZE,
+                 batch_size: int = HISTORY_BATCH_SIZE,
+                 compress_level: int = HISTORY_COMPRESS_LEVEL):
+        self.path = os.path.expanduser(path)
+        self.max_rows = max_rows
+        self.batch_size = batch_size
+        self.compress_level = compress_level
+        self.queue_size = queue_size
+        self._stats = {"written": 0, "dropped": 0, "batches": 0, "write_errors": 0}
+        self._last_error = None
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+        self._start_writer()
+        if hasattr(os, "register_at_fork"):
+            # Neither threads nor open SQLite connections survive fork(): the
+            # writer closes its connection first and each process (e.g. every
+            # pre-forked server worker) starts its own. The parent keeps its
+            # queue, so results recorded meanwhile are still written; the
+            # child's copy holds the parent's results and is replaced.
+            os.register_at_fork(before=self.close, after_in_parent=self._run_writer,
+                                after_in_child=self._start_writer)
+
+    def record(self, result: dict, request_xml: bytes = None, response_xml: bytes = None,
+               **call):
+        """Queue one ``execute`` result for writing; never blocks.
+
+        ``call`` holds the execute arguments (``wsdl_url``, ``binding_name``,
+        ``operation_name``, ``camera_ip``, ``camera_port``, ``username``,
+        ``params``, ``use_https``).
+        """
+        try:
+            self._queue.put_nowait((time.time(), call, result, request_xml, response_xml))
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything recorded so far is written; False on timeout."""
+        return self._control("flush", timeout)
+
+    def clear(self, timeout: float = 30.0) -> bool:
+        """Delete every stored result (after writing the queued ones)."""
+        return self._control("clear", timeout)
+
+    def search(self, device: str = None, operation: str = None, binding: str = None,
+               success: bool = None, error_type: str = None, since: float = None,
+               until: float = None, before_id: int = None, limit: int = 50) -> dict:
+        """Return one page of results, newest first.
+
+        ``device`` is ``ip`` or ``ip:port``; ``since`` / ``until`` are Unix
+        times. Pages are keyset-paginated: pass the returned ``next_cursor``
+        as ``before_id`` for the next (older) page, so deep pages cost the
+        same as the first.
+
+        Returns:
+            {"items": [{"id", "created_at", "camera_ip", ...}, ...],
+             "next_cursor": 1234 or None}
+        """
+        clauses, args = [], []
+        if device:
+            ip, _, port = device.partition(":") if device.count(":") == 1 else (device, "", "")
+            clauses.append("camera_ip = ?")
+            args.append(ip)
+            if port:
+                clauses.append("camera_port = ?")
+                args.append(int(port))
+        for column, value in (("operation_name", operation), ("binding_name", binding),
+                              ("error_type", error_type)):
+            if value:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if success is not None:
+            clauses.append("success = ?")
+            args.append(int(bool(success)))
+        if before_id is not None:
+            clauses.append("id < ?")
+            args.append(int(before_id))
+        # Filtered on created_at itself (ix_history_created): several server
+        # worker processes write batches, so ids don't follow created_at
+        if since is not None:
+            clauses.append("created_at >= ?")
+            args.append(float(since))
+        if until is not None:
+            clauses.append("created_at < ?")
+            args.append(float(until))
+
+        limit = max(1, min(int(limit), HISTORY_PAGE_MAX))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (f"SELECT {', '.join(_SUMMARY_COLUMNS)} FROM history {where} "
+               f"ORDER BY id DESC LIMIT ?")
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, (*args, limit + 1)).fetchall()
+        finally:
+            conn.close()
+
+        items = [self._summary(row) for row in rows[:limit]]
+        return {
+            "items": items,
+            "next_cursor": items[-1]["id"] if len(rows) > limit else None,
+        }
+
+    def get(self, entry_id: int) -> dict:
+        """Return one stored result with params, result JSON and pretty-printed
+        envelopes, or None if unknown (or pruned)."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                f"SELECT {', '.join(_SUMMARY_COLUMNS)}, params, result, request_xml, response_xml "
+                f"FROM history LEFT JOIN history_data USING (id) WHERE id = ?",
+                (int(entry_id),),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+
+        n = len(_SUMMARY_COLUMNS)
+        entry = self._summary(row[:n])
+        params, result, request_xml, response_xml = row[n:]
+        result = json.loads(zlib.decompress(result)) if result else {}
+        entry.update({
+            "params": json.loads(params),
+            "result_json": result.get("result_json"),
+            "timings": result.get("timings"),
+            "request_xml": pretty_xml(zlib.decompress(request_xml)) if request_xml else "",
+            "response_xml": pretty_xml(zlib.decompress(response_xml)) if response_xml else "",
+        })
+        return entry
+
+    def stats(self) -> dict:
+        """Return writer counters, queue depth and database size."""
+        conn = self._connect()
+        try:
+            first, last = conn.execute("SELECT MIN(id), MAX(id) FROM history").fetchone()
+        finally:
+            conn.close()
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + "-wal")
+                   if os.path.exists(p))
+        with self._stats_lock:
+            counters = dict(self._stats)
+        return {
+            "path": self.path,
+            # ids are allocated in order and pruned from the front, so this
+            # is exact unless rows were deleted by hand
+            "rows": (last - first + 1) if last is not None else 0,
+            "max_rows": self.max_rows,
+            "queued": self._queue.qsize(),
+            "db_bytes": size,
+            "last_error": self._last_error,
+            **counters,
+        }
+
+    def close(self, timeout: float = 5.0):
+        """Write what is queued and stop the writer thread."""
+        if self._writer.is_alive():
+            self._queue.put(("stop", None))
+            self._writer.join(timeout)
+
+    def _start_writer(self):
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._stats_lock = threading.Lock()
+        self._run_writer()
+
+    def _run_writer(self):
+        self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _control(self, command: str, timeout: float) -> bool:
+        done = threading.Event()
+        self._queue.put((command, done), timeout=timeout)
+        return done.wait(timeout)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _summary(row) -> dict:
+        entry = dict(zip(_SUMMARY_COLUMNS, row))
+        entry["success"] = bool(entry["success"])
+        entry["use_https"] = bool(entry["use_https"])
+        return entry
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            batch, controls = [], []
+            while True:
+                if len(item) == 2:
+                    controls.append(item)
+                else:
+                    batch.append(item)
+                # Take what has piled up meanwhile: the busier, the bigger the batch
+                if len(batch) >= self.batch_size or controls:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(conn, batch)
+            for command, done in controls:
+                if command == "stop":
+                    conn.close()
+                    return
+                try:
+                    if command == "clear":
+                        with conn:
+                            conn.execute("DELETE FROM history")
+                            conn.execute("DELETE FROM history_data")
+                        conn.execute("VACUUM")
+                except Exception as e:  # the writer must outlive any one failure
+                    self._failed(e)
+                finally:
+                    done.set()
+
+    def _write(self, conn: sqlite3.Connection, batch: list):
+        try:
+            self._insert(conn, batch)
+        except Exception as e:  # e.g. a result JSON can't encode: drop the batch, not the writer
+            self._failed(e)
+            return
+        with self._stats_lock:
+            self._stats["written"] += len(batch)
+            self._stats["batches"] += 1
+
+    def _failed(self, exc: Exception):
+        self._last_error = f"{type(exc).__name__}: {exc}"
+        with self._stats_lock:
+            self._stats["write_errors"] += 1
+
+    def _insert(self, conn: sqlite3.Connection, batch: list):
+        level = self.compress_level
+        rows, data = [], []
+        for created_at, call, result, request_xml, response_xml in batch:
+            rows.append((
+                created_at, call["camera_ip"], int(call["camera_port"]),
+                call["username"], int(bool(call["use_https"])), call["wsdl_url"],
+                call["binding_name"], call["operation_name"],
+                json.dumps(_redact_params(call.get("params") or {}), default=_json_default),
+                int(bool(result["success"])), result.get("error"), result.get("error_type"),
+                result.get("execution_time_ms") or 0, result.get("xaddr"),
+            ))
+            payload = json.dumps({"result_json": result.get("result_json"),
+                                  "timings": result.get("timings")},
+                                 default=_json_default).encode("utf-8")
+            data.append((
+                zlib.compress(payload, level),
+                zlib.compress(_redact_envelope(request_xml), level) if request_xml else None,
+                zlib.compress(response_xml, level) if response_xml else None,
+            ))
+        with conn:
+            # Take the write lock before reading MAX(id): other server
+            # worker processes may be writing to the same database
+            conn.execute("BEGIN IMMEDIATE")
+            first_id = (conn.execute("SELECT MAX(id) FROM history").fetchone()[0] or 0) + 1
+            conn.executemany(_INSERT_HISTORY, [(first_id + i, *row)
+                                               for i, row in enumerate(rows)])
+            conn.executemany(_INSERT_DATA, [(first_id + i, *row)
+                                            for i, row in enumerate(data)])
+            cutoff = first_id + len(rows) - self.max_rows
+            if cutoff > 1:
+                conn.execute("DELETE FROM history WHERE id < ?", (cutoff,))
+                conn.execute("DELETE FROM history_data WHERE id < ?", (cutoff,))
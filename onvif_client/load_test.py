@@ -0,0 +1,362 @@
+"""Load / soak testing of one ONVIF operation against one camera."""
+
+import csv
+import io
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    LOAD_TEST_KEEP_REPORTS,
+    LOAD_TEST_MAX_CONCURRENCY,
+    LOAD_TEST_MAX_DURATION,
+    LOAD_TEST_MAX_RATE,
+    LOAD_TEST_PENDING_TIMEOUT,
+    LOAD_TEST_REQUEST_TIMEOUT,
+)
+from .client_pool import ClientPool
+from .command_executor import CommandExecutor
+from .stats import LatencyHistogram
+
+# Seconds between live progress events (and timeline rows)
+PROGRESS_INTERVAL = 1.0
+# Below this target rate the scheduler idles instead of sending
+_MIN_RATE = 0.05
+
+TIMELINE_FIELDS = ("second", "target_rate", "sent", "ok", "errors", "throughput_per_sec",
+                   "in_flight", "p50", "p95", "p99", "max")
+
+
+def build_stages(rate: float = None, duration: float = None, stages: list = None) -> list:
+    """Validate a run profile and return its stages.
+
+    Either a constant ``rate`` for ``duration`` seconds, or a ramp profile:
+    ``stages = [{"duration": 30, "rate": 50}, ...]`` where each stage moves
+    linearly from the previous stage's rate to its own (the first stage
+    starts from ``stages[0].get("start_rate", 0)``). A rate of 0 in
+    constant mode means closed loop: every worker sends back to back.
+
+    Raises ValueError for out-of-range values.
+    """
+    if stages:
+        result = []
+        previous = float(stages[0].get("start_rate", 0))
+        for stage in stages:
+            target = float(stage["rate"])
+            result.append({"duration": float(stage["duration"]),
+                           "start_rate": previous, "rate": target})
+            previous = target
+    else:
+        rate = float(rate or 0)
+        result = [{"duration": float(duration or 0), "start_rate": rate, "rate": rate}]
+
+    total = sum(s["duration"] for s in result)
+    if any(s["duration"] <= 0 for s in result):
+        raise ValueError("Every stage needs a positive duration")
+    if total > LOAD_TEST_MAX_DURATION:
+        raise ValueError(f"Total duration {total:g}s exceeds {LOAD_TEST_MAX_DURATION}s")
+    if any(not 0 <= r <= LOAD_TEST_MAX_RATE for s in result for r in (s["start_rate"], s["rate"])):
+        raise ValueError(f"Rates must be between 0 and {LOAD_TEST_MAX_RATE} req/s")
+    return result
+
+
+class LoadTest:
+    """One load test run: open-loop request schedule + live statistics.
+
+    Requests are scheduled at the target rate regardless of how fast the
+    camera answers (up to ``concurrency`` in flight). Response time is
+    measured from the *scheduled* send time, so a camera that stalls is
+    charged for the requests that queued behind it (no coordinated
+    omission); ``service_time_ms`` is the call alone.
+    """
+
+    def __init__(self, request: dict, stages: list, concurrency: int,
+                 timeout: float = LOAD_TEST_REQUEST_TIMEOUT):
+        self.id = uuid.uuid4().hex[:12]
+        self.request = request
+        self.stages = stages
+        self.duration = sum(s["duration"] for s in stages)
+        self.closed_loop = len(stages) == 1 and stages[0]["rate"] == 0
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.state = "pending"  # pending | running | stopped | finished
+        self.created_at = time.monotonic()
+        self.report = None
+        self.stop_event = threading.Event()
+        # A dedicated pool: one connection per worker, UI clients untouched
+        pool = ClientPool(max_size=concurrency, connections_per_host=concurrency)
+        # Report the camera's own timeouts and failures: no adaptive timeouts
+        # or fail-fast circuit under load
+        pool.health = None
+        self.executor = CommandExecutor(pool=pool)
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._response = LatencyHistogram()
+        self._service = LatencyHistogram()
+        self._window = LatencyHistogram()
+        self._window_counts = [0, 0]  # ok, errors
+        self._errors = {}  # error_type -> count
+        self._error_samples = {}  # error_type -> first message
+        self._sent = 0
+        self._ok = 0
+        self._failed = 0
+        self._timeline = []
+
+    def rate_at(self, t: float) -> float:
+        """Target requests/sec ``t`` seconds into the run."""
+        for stage in self.stages:
+            if t < stage["duration"]:
+                frac = t / stage["duration"]
+                return stage["start_rate"] + (stage["rate"] - stage["start_rate"]) * frac
+            t -= stage["duration"]
+        return 0.0
+
+    def run(self):
+        """Run the test, yielding a progress event per second and a summary.
+
+        Events: ``{"type": "started", ...}``, ``{"type": "progress", ...}``
+        and a final ``{"type": "summary", ...}`` (also kept as ``self.report``).
+        Closing the generator early (client gone) stops the run.
+        """
+        self.state = "running"
+        started_at = time.time()
+        t0 = time.monotonic()
+        pool = ThreadPoolExecutor(max_workers=self.concurrency,
+                                  thread_name_prefix=f"onvif-load-{self.id}")
+        dispatcher = threading.Thread(target=self._dispatch, args=(pool, t0),
+                                      name=f"onvif-load-dispatch-{self.id}", daemon=True)
+        dispatcher.start()
+        completed = False
+        try:
+            yield {"type": "started", "run_id": self.id, "duration_s": self.duration,
+                   "concurrency": self.concurrency, "stages": self.stages}
+            second = 0
+            while True:
+                tick = t0 + (second + 1) * PROGRESS_INTERVAL
+                dispatcher.join(max(0.0, tick - time.monotonic()))
+                if not dispatcher.is_alive():
+                    break
+                second += 1
+                yield self._progress(second, t0)
+            # Let in-flight requests finish (bounded by the request timeout);
+            # the last row covers the tail of the schedule plus this drain
+            pool.shutdown(wait=True)
+            if self._window.count:
+                yield self._progress(second + 1, t0)
+            completed = True
+        finally:
+            if self.state == "running":
+                self.state = "finished" if completed and not self.stop_event.is_set() \
+                    else "stopped"
+            self.stop_event.set()
+            # The dispatcher notices within its 0.1 s slot wait; joining it
+            # first keeps it from submitting to the shut-down pool
+            dispatcher.join()
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.executor.pool.clear()
+            self.report = self._summary(started_at, time.monotonic() - t0)
+        yield self.report
+
+    def stop(self):
+        if self.state in ("pending", "running"):
+            self.state = "stopped"
+        self.stop_event.set()
+
+    # ── Scheduling ──────────────────────────────────────────
+
+    def _dispatch(self, pool: ThreadPoolExecutor, t0: float):
+        next_at = 0.0  # scheduled send time, seconds since t0
+        while not self.stop_event.is_set():
+            now = time.monotonic() - t0
+            if now >= self.duration:
+                break
+            if self.closed_loop:
+                scheduled = now
+            else:
+                rate = self.rate_at(next_at)
+                if rate < _MIN_RATE:
+                    next_at = max(next_at, now) + 0.05
+                    self.stop_event.wait(min(next_at, self.duration) - now)
+                    continue
+                if next_at > now:
+                    self.stop_event.wait(min(next_at, self.duration) - now)
+                    continue
+                scheduled = next_at
+                # Step by the rate at mid-interval so ramps send the right total
+                step = 1.0 / rate
+                mid_rate = self.rate_at(next_at + step / 2)
+                next_at += 1.0 / mid_rate if mid_rate >= _MIN_RATE else step
+            # Wait for a free worker; the wait counts toward response time
+            while not self._slots.acquire(timeout=0.1):
+                if self.stop_event.is_set() or time.monotonic() - t0 >= self.duration:
+                    return
+            with self._lock:
+                self._sent += 1
+            try:
+                pool.submit(self._call, t0 + scheduled)
+            except RuntimeError:  # pool already shut down: the run was closed
+                with self._lock:
+                    self._sent -= 1
+                self._slots.release()
+                return
+
+    def _call(self, scheduled: float):
+        try:
+            start = time.monotonic()
+            request = self.request
+            try:
+                result = self.executor.execute(
+                    wsdl_url=request["wsdl_url"],
+                    binding_name=request["binding_name"],
+                    operation_name=request["operation_name"],
+                    camera_ip=request["camera_ip"],
+                    camera_port=request["camera_port"],
+                    username=request["username"],
+                    password=request["password"],
+                    params=request.get("params") or {},
+                    use_https=request.get("use_https", False),
+                    timeout=self.timeout,
+                    xml_mode="none",
+                )
+            except Exception as e:
+                result = {"success": False, "error": str(e), "error_type": type(e).__name__}
+            end = time.monotonic()
+            self._record(result, (end - scheduled) * 1000, (end - start) * 1000)
+        finally:
+            self._slots.release()
+
+    def _record(self, result: dict, response_ms: float, service_ms: float):
+        with self._lock:
+            self._response.record(response_ms)
+            self._service.record(service_ms)
+            self._window.record(response_ms)
+            if result["success"]:
+                self._ok += 1
+                self._window_counts[0] += 1
+            else:
+                self._failed += 1
+                self._window_counts[1] += 1
+                error_type = result.get("error_type") or "Error"
+                self._errors[error_type] = self._errors.get(error_type, 0) + 1
+                self._error_samples.setdefault(error_type, result.get("error"))
+
+    # ── Reporting ───────────────────────────────────────────
+
+    def _progress(self, second: int, t0: float) -> dict:
+        with self._lock:
+            window, self._window = self._window, LatencyHistogram()
+            ok, errors = self._window_counts
+            self._window_counts = [0, 0]
+            sent, total_ok, total_errors = self._sent, self._ok, self._failed
+            errors_by_type = dict(self._errors)
+        latency = window.summary((50, 95, 99))
+        row = {
+            "second": second,
+            "target_rate": None if self.closed_loop
+            else round(self.rate_at(min(second, self.duration) - PROGRESS_INTERVAL / 2), 2),
+            "sent": sent,
+            "ok": ok,
+            "errors": errors,
+            "throughput_per_sec": round((ok + errors) / PROGRESS_INTERVAL, 2),
+            "in_flight": sent - total_ok - total_errors,
+            **{k: latency.get(k) for k in ("p50", "p95", "p99", "max")},
+        }
+        self._timeline.append(row)
+        return {
+            "type": "progress",
+            "run_id": self.id,
+            "elapsed_s": round(time.monotonic() - t0, 1),
+            **row,
+            "total_ok": total_ok,
+            "total_errors": total_errors,
+            "errors_by_type": errors_by_type,
+        }
+
+    def _summary(self, started_at: float, elapsed: float) -> dict:
+        with self._lock:
+            done = self._ok + self._failed
+            request = {k: v for k, v in self.request.items() if k != "password"}
+            return {
+                "type": "summary",
+                "run_id": self.id,
+                "state": self.state,
+                "request": request,
+                "stages": self.stages,
+                "concurrency": self.concurrency,
+                "timeout": self.timeout,
+                "started_at": started_at,
+                "elapsed_s": round(elapsed, 2),
+                "sent": self._sent,
+                "completed": done,
+                "ok": self._ok,
+                "errors": self._failed,
+                "error_rate": round(self._failed / done, 4) if done else 0,
+                "throughput_per_sec": round(done / elapsed, 2) if elapsed > 0 else 0,
+                "errors_by_type": [
+                    {"type": t, "count": c, "sample": self._error_samples.get(t)}
+                    for t, c in sorted(self._errors.items(), key=lambda kv: -kv[1])
+                ],
+                "latency_ms": self._response.summary(),
+                "service_time_ms": self._service.summary(),
+                "histogram": self._response.buckets(),
+                "timeline": list(self._timeline),
+            }
+
+
+class LoadTestRunner:
+    """Creates load tests and keeps the most recent ones for stop/export."""
+
+    def __init__(self, keep: int = LOAD_TEST_KEEP_REPORTS):
+        self.keep = keep
+        self._tests = OrderedDict()  # run_id -> LoadTest
+        self._lock = threading.Lock()
+
+    def create(self, request: dict, stages: list, concurrency: int,
+               timeout: float = LOAD_TEST_REQUEST_TIMEOUT) -> LoadTest:
+        concurrency = max(1, min(int(concurrency), LOAD_TEST_MAX_CONCURRENCY))
+        test = LoadTest(request, stages, concurrency, timeout)
+        now = time.monotonic()
+        with self._lock:
+            # Runs whose stream never started were abandoned
+            for run_id, old in list(self._tests.items()):
+                if old.state == "pending" and now - old.created_at > LOAD_TEST_PENDING_TIMEOUT:
+                    old.stop()
+                    del self._tests[run_id]
+            self._tests[test.id] = test
+            # Forget the oldest finished runs beyond ``keep``
+            for run_id in list(self._tests):
+                if len(self._tests) <= self.keep:
+                    break
+                if self._tests[run_id].state in ("stopped", "finished"):
+                    del self._tests[run_id]
+        return test
+
+    def get(self, run_id: str):
+        return self._tests.get(run_id)
+
+    def stop(self, run_id: str) -> bool:
+        test = self._tests.get(run_id)
+        if test is None:
+            return False
+        test.stop()
+        return True
+
+
+def report_to_csv(report: dict) -> str:
+    """Render a run's per-second timeline as CSV, preceded by summary rows."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    latency = report.get("latency_ms", {})
+    writer.writerow(["# run_id", report["run_id"], "state", report["state"],
+                     "ok", report["ok"], "errors", report["errors"],
+                     "throughput_per_sec", report["throughput_per_sec"]])
+    writer.writerow(["# latency_ms"] + [f"{k}={v}" for k, v in latency.items()])
+    for error in report.get("errors_by_type", []):
+        writer.writerow(["# error", error["type"], error["count"]])
+    writer.writerow(TIMELINE_FIELDS)
+    for row in report.get("timeline", []):
+        writer.writerow([row.get(field) for field in TIMELINE_FIELDS])
+    return buf.getvalue()
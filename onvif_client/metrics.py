@@ -0,0 +1,370 @@
+"""In-process metrics in the Prometheus text exposition format (no dependencies)."""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from config import METRICS_LATENCY_BUCKETS, METRICS_MAX_DEVICES
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Label value used for devices beyond METRICS_MAX_DEVICES
+OVERFLOW_DEVICE = "_other"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return f"{value:.12g}" if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # label values tuple -> value
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def inc_many(self, increments):
+        """Apply ``(labels, amount)`` pairs under a single lock acquisition."""
+        with self._lock:
+            values = self._values
+            for labels, amount in increments:
+                values[labels] = values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(items)
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def set(self, labels: tuple = (), value: float = 0):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; ``observe`` is a bisect plus one locked update."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (),
+                 buckets: tuple = METRICS_LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # [per-bucket counts (last = +Inf), sum, count]
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            items = [(labels, (list(s[0]), s[1], s[2])) for labels, s in self._values.items()]
+        lines = self.header()
+        bounds = [*self.buckets, float("inf")]
+        for labels, (counts, total, count) in sorted(items):
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket"
+                             f"{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics plus collectors that sample other components at scrape time.
+
+    A collector is a callable returning ``[(name, type, help, [(labels_dict,
+    value), ...]), ...]``; it runs only when ``/metrics`` is scraped, so
+    components like the client pool need no hot-path instrumentation.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self._add(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()) -> Gauge:
+        return self._add(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=METRICS_LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    label_str = _format_labels(tuple(labels), tuple(labels.values()))
+                    lines.append(f"{name}{label_str} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+class ONVIFMetrics:
+    """Request telemetry recorded by ``CommandExecutor.execute``.
+
+    Series are labelled by device (``ip:port``), binding local name and
+    operation. Devices beyond ``max_devices`` share the ``_other`` label so a
+    large fleet scan cannot grow the series count without bound.
+    """
+
+    def __init__(self, max_devices: int = METRICS_MAX_DEVICES,
+                 buckets: tuple = METRICS_LATENCY_BUCKETS):
+        self.max_devices = max_devices
+        self.registry = MetricsRegistry()
+        self._devices = set()
+        self._devices_lock = threading.Lock()
+        self.started_at = time.time()
+
+        labels = ("device", "binding", "operation")
+        self.requests = self.registry.counter(
+            "onvif_requests_total", "ONVIF operations executed, by outcome (ok, fault, timeout, error).",
+            labels + ("outcome",))
+        self.duration = self.registry.histogram(
+            "onvif_request_duration_seconds", "Wall time of an ONVIF operation call, end to end.",
+            labels, buckets)
+        self.faults = self.registry.counter(
+            "onvif_soap_faults_total", "SOAP faults returned by devices, by fault subcode.",
+            labels + ("code",))
+        self.timeouts = self.registry.counter(
+            "onvif_timeouts_total", "ONVIF operation calls that timed out.", labels)
+        self.errors = self.registry.counter(
+            "onvif_request_errors_total", "Failed ONVIF operation calls, by error type.",
+            labels + ("type",))
+        self.phases = self.registry.counter(
+            "onvif_request_phase_seconds_total",
+            "Time spent in each phase of ONVIF calls (see the Timing tab).", ("phase",))
+        self.in_flight = self.registry.gauge(
+            "onvif_requests_in_flight", "ONVIF operation calls currently running.")
+        self.in_flight.set((), 0)
+        self.registry.add_collector(self._process_samples)
+
+    @contextmanager
+    def track_in_flight(self):
+        self.in_flight.inc()
+        try:
+            yield
+        finally:
+            self.in_flight.dec()
+
+    def observe(self, camera_ip: str, camera_port: int, binding_name: str,
+                operation_name: str, result: dict):
+        """Record one ``execute`` result."""
+        labels = (self._device_label(camera_ip, camera_port),
+                  binding_name.rpartition("}")[2], operation_name)
+        error_type = result.get("error_type")
+        if result.get("success"):
+            outcome = "ok"
+        elif error_type == "Timeout":
+            outcome = "timeout"
+            self.timeouts.inc(labels)
+        elif error_type and error_type.startswith("Fault"):
+            outcome = "fault"
+            self.faults.inc(labels + (error_type.partition(":")[2] or "unknown",))
+        else:
+            outcome = "error"
+        if outcome != "ok":
+            self.errors.inc(labels + (error_type or "unknown",))
+        self.requests.inc(labels + (outcome,))
+
+        timings = result.get("timings")
+        if timings:
+            self.duration.observe(labels, timings["total_ms"] / 1000)
+            self.phases.inc_many(((p["phase"],), p["duration_ms"] / 1000)
+                                 for p in timings["phases"])
+
+    def add_collector(self, collector):
+        self.registry.add_collector(collector)
+
+    def render(self) -> str:
+        return self.registry.render()
+
+    def _device_label(self, ip: str, port: int) -> str:
+        device = f"{ip}:{port}"
+        if device in self._devices:
+            return device
+        with self._devices_lock:
+            if len(self._devices) >= self.max_devices:
+                return OVERFLOW_DEVICE
+            self._devices.add(device)
+        return device
+
+    def _process_samples(self) -> list:
+        return [
+            ("onvif_tool_start_time_seconds", "gauge", "Unix time the tool was started.",
+             [({}, round(self.started_at, 3))]),
+            ("onvif_metrics_devices", "gauge", "Devices with their own metric labels.",
+             [({}, len(self._devices))]),
+        ]
+
+
+def pool_collector(pool, prefix: str = "onvif_client_pool"):
+    """Collector for a ``ClientPool``'s occupancy and hit/miss counters.
+
+    ``prefix`` names the metrics, so several pools can be exported together.
+    """
+    def collect():
+        stats = pool.stats()
+        return [
+            (f"{prefix}_clients", "gauge", "Pooled zeep clients by state.",
+             [({"state": "idle"}, stats["idle"]), ({"state": "in_use"}, stats["in_use"])]),
+            (f"{prefix}_max_size", "gauge", "Idle clients kept at most.",
+             [({}, stats["max_size"])]),
+            (f"{prefix}_sessions", "gauge", "Keep-alive HTTP sessions (one per camera endpoint).",
+             [({}, stats["sessions"])]),
+            (f"{prefix}_lookups_total", "counter", "Client pool lookups by result.",
+             [({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"])]),
+            (f"{prefix}_removed_total", "counter", "Idle clients dropped, by reason.",
+             [({"reason": "evicted"}, stats["evictions"]), ({"reason": "expired"}, stats["expired"])]),
+        ]
+    return collect
+
+
+def wsdl_cache_collector(loader):
+    """Collector for ``WSDLLoader``, schema registry and parsed-document cache counters."""
+    def collect():
+        stats = loader.stats()
+        return [
+            ("onvif_wsdl_cache_requests_total", "counter",
+             "WSDL cache lookups by cache (registry, schema, document) and result.",
+             [({"cache": cache, "result": result}, stats[cache][result])
+              for cache in ("registry", "schema", "document") for result in ("hit", "miss")]),
+            ("onvif_wsdl_loaded", "gauge", "Parsed WSDLs resident in the schema registry.",
+             [({}, stats["wsdls"])]),
+            ("onvif_schema_registry_bytes", "gauge",
+             "Resident size of parsed WSDLs (own objects) and the XSDs they share.",
+             [({"kind": kind}, size) for kind, size in stats["resident_bytes"].items()]),
+            ("onvif_schema_registry_max_bytes", "gauge", "Schema registry memory budget.",
+             [({}, stats["max_bytes"])]),
+            ("onvif_schema_registry_evictions_total", "counter",
+             "Parsed WSDLs evicted to stay within the budget (or reloaded).",
+             [({}, stats["evictions"])]),
+        ]
+    return collect
+
+
+def subscriptions_collector(manager):
+    """Collector for ``SubscriptionManager`` states and notification counts."""
+    def collect():
+        status = manager.status()
+        states = {}
+        for sub in status["subscriptions"]:
+            states[sub["state"]] = states.get(sub["state"], 0) + 1
+        return [
+            ("onvif_subscriptions", "gauge", "PullPoint event subscriptions by state.",
+             [({"state": state}, count) for state, count in sorted(states.items())]),
+            ("onvif_subscription_notifications_total", "counter",
+             "Notifications received since the process started.",
+             [({}, status["received"])]),
+        ]
+    return collect
+
+
+def history_collector(history):
+    """Collector for ``HistoryStore`` writer throughput and backlog."""
+    def collect():
+        stats = history.stats()
+        return [
+            ("onvif_history_rows", "gauge", "Results stored in the history database.",
+             [({}, stats["rows"])]),
+            ("onvif_history_queue", "gauge", "Results waiting for the history writer.",
+             [({}, stats["queued"])]),
+            ("onvif_history_results_total", "counter", "Results passed to the history, by outcome.",
+             [({"outcome": "written"}, stats["written"]),
+              ({"outcome": "dropped"}, stats["dropped"])]),
+            ("onvif_history_db_bytes", "gauge", "Size of the history database files.",
+             [({}, stats["db_bytes"])]),
+        ]
+    return collect
+
+
+def response_cache_collector(cache):
+    """Collector for ``ResponseCache`` occupancy, hit/miss and invalidation counters."""
+    def collect():
+        stats = cache.stats()
+        return [
+            ("onvif_response_cache_entries", "gauge", "Cached Get* results.",
+             [({}, stats["size"])]),
+            ("onvif_response_cache_lookups_total", "counter", "Response cache lookups by result.",
+             [({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"])]),
+            ("onvif_response_cache_invalidations_total", "counter",
+             "Cache invalidations caused by write operations.",
+             [({}, stats["invalidations"])]),
+        ]
+    return collect
+
+
+def device_health_collector(health):
+    """Collector for ``DeviceHealth`` circuit states and fail-fast counters."""
+    def collect():
+        stats = health.stats()
+        return [
+            ("onvif_device_circuits", "gauge", "Tracked devices by circuit breaker state.",
+             [({"state": state}, stats[state]) for state in ("closed", "open", "half_open")]),
+            ("onvif_circuit_opens_total", "counter", "Times a device's circuit opened.",
+             [({}, stats["opens"])]),
+            ("onvif_circuit_rejected_total", "counter",
+             "Calls failed fast because the device's circuit was open.",
+             [({}, stats["rejected"])]),
+        ]
+    return collect
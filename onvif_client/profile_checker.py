@@ -1,10 +1,22 @@
 """Check ONVIF profile support via GetServices / GetCapabilities fallback."""
 
+import csv
+import hashlib
+import io
+import time
 import urllib3
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-from zeep.client import CachingClient, Settings
-from zeep.transports import Transport
-from zeep.wsse.username import UsernameToken
+
+from config import (
+    FLEET_DEVICE_TIMEOUT,
+    PROFILE_SCAN_MAX_WORKERS,
+    PROFILE_SERVICES_CACHE_SIZE,
+    PROFILE_SERVICES_TTL,
+)
+from .client_pool import ClientPool
+from .ttl_cache import TTLCache
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -74,8 +86,40 @@ PROFILE_DEFINITIONS = {
 }
 
 
+def _error_type(exc: Exception) -> str:
+    """Name a failed query the way ``classify_error`` would, for the breaker."""
+    if isinstance(exc, requests.exceptions.Timeout):
+        return "Timeout"
+    if isinstance(exc, requests.exceptions.SSLError):
+        return "SSLError"
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return "ConnectionError"
+    return type(exc).__name__
+
+
+def _services_key(camera_ip, camera_port, use_https, username, password) -> tuple:
+    return (camera_ip, int(camera_port), bool(use_https), username,
+            hashlib.sha256((password or "").encode("utf-8")).hexdigest())
+
+
+# Device service lists keyed by _services_key(); shared by all checkers
+services_cache = TTLCache(PROFILE_SERVICES_TTL, PROFILE_SERVICES_CACHE_SIZE)
+
+
 class ProfileChecker:
-    """Detect ONVIF profile support using GetServices (with GetCapabilities fallback)."""
+    """Detect ONVIF profile support using GetServices (with GetCapabilities fallback).
+
+    Device clients come from the shared :class:`ClientPool` (one parsed device
+    WSDL for all cameras), and each device's service list is kept in a TTL
+    cache so repeat checks and scans skip the round trip. ``device_wsdl``
+    replaces the onvif.org device WSDL (e.g. a local copy for benchmarks).
+    """
+
+    def __init__(self, pool: ClientPool = None, cache: TTLCache = None,
+                 device_wsdl: str = DEVICE_WSDL):
+        self.pool = pool or ClientPool()
+        self.cache = services_cache if cache is None else cache
+        self.device_wsdl = device_wsdl
 
     def check(
         self,
@@ -84,6 +128,8 @@ class ProfileChecker:
         username: str,
         password: str,
         use_https: bool = False,
+        refresh: bool = False,
+        timeout: float = None,
     ) -> dict:
         """Check which ONVIF profiles the device supports.
 
@@ -93,29 +139,85 @@ class ProfileChecker:
                 "services": [{"namespace": ..., "xaddr": ..., "version": ...}],
                 "profiles": {"S": True, "T": False, ...},
                 "profile_details": PROFILE_DEFINITIONS,
+                "cached": True if the service list came from the TTL cache,
                 "error": None or "message",
             }
         """
-        scheme = "https" if use_https else "http"
-        xaddr = f"{scheme}://{camera_ip}:{camera_port}/onvif/device_service"
+        try:
+            services, cached = self.get_services(
+                camera_ip, camera_port, username, password, use_https,
+                refresh=refresh, timeout=timeout,
+            )
+            return {
+                "success": True,
+                "services": services,
+                "profiles": self._match_profiles(services),
+                "profile_details": PROFILE_DEFINITIONS,
+                "cached": cached,
+                "error": None,
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "services": [],
+                "profiles": {},
+                "profile_details": PROFILE_DEFINITIONS,
+                "cached": False,
+                "error": str(e),
+            }
 
-        session = requests.Session()
-        if use_https:
-            session.verify = False
-        transport = Transport(session=session)
+    def get_services(
+        self,
+        camera_ip: str,
+        camera_port: int,
+        username: str,
+        password: str,
+        use_https: bool = False,
+        refresh: bool = False,
+        timeout: float = None,
+        guarded: bool = True,
+    ) -> tuple:
+        """Return ``(services, from_cache)`` for the device, querying it on a cache miss.
 
-        settings = Settings()
-        settings.strict = False
-        settings.xml_huge_tree = True
+        With the pool's ``health`` set, a query goes through the device's
+        circuit breaker (raising ``CircuitOpenError`` while it is open) and
+        adaptive timeouts; ``guarded=False`` is for callers that already did.
+        """
+        if not refresh:
+            services = self.cached_services(camera_ip, camera_port, username, password,
+                                            use_https)
+            if services is not None:
+                return services, True
 
+        health = self.pool.health if guarded else None
+        if health is None:
+            return self._query_services(camera_ip, camera_port, username, password,
+                                        use_https, timeout), False
+        health.acquire(camera_ip, camera_port)
+        timeout = health.timeouts(camera_ip, camera_port, "GetServices", timeout)
+        start = time.perf_counter()
         try:
-            client = CachingClient(
-                wsdl=DEVICE_WSDL,
-                wsse=UsernameToken(username, password, use_digest=True),
-                settings=settings,
-                transport=transport,
-            )
-            service = client.create_service(DEVICE_BINDING, xaddr)
+            services = self._query_services(camera_ip, camera_port, username, password,
+                                            use_https, timeout)
+        except Exception as e:
+            health.record(camera_ip, camera_port, "GetServices", _error_type(e))
+            raise
+        health.record(camera_ip, camera_port, "GetServices",
+                      latency=time.perf_counter() - start)
+        return services, False
+
+    def _query_services(self, camera_ip, camera_port, username, password,
+                        use_https, timeout) -> list:
+        key = _services_key(camera_ip, camera_port, use_https, username, password)
+        scheme = "https" if use_https else "http"
+        xaddr = f"{scheme}://{camera_ip}:{camera_port}/onvif/device_service"
+        if self.pool.clock_sync is not None:
+            self.pool.clock_sync.ensure(camera_ip, camera_port, use_https, timeout)
+
+        with self.pool.lease(self.device_wsdl, DEVICE_BINDING, xaddr,
+                             username, password, use_https) as entry:
+            entry.transport.operation_timeout = timeout
+            service = entry.service
 
             services = []
             try:
@@ -135,32 +237,84 @@ class ProfileChecker:
                             "xaddr": str(xaddr_svc) if xaddr_svc else "",
                             "version": ver_str,
                         })
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                # Unreachable device: GetCapabilities would fail the same way
+                raise
             except Exception:
                 # Fallback for older firmware that does not support GetServices
                 services = self._check_via_capabilities(service)
 
-            supported_ns = {s["namespace"] for s in services}
-            profiles = {
-                key: all(ns in supported_ns for ns in defn["required"])
-                for key, defn in PROFILE_DEFINITIONS.items()
-            }
+        # An empty list usually means both calls failed (e.g. auth); don't cache it
+        if services:
+            self.cache.set(key, services)
+        return services
 
-            return {
+    def cached_services(self, camera_ip: str, camera_port: int, username: str,
+                        password: str, use_https: bool = False):
+        """Return the cached service list of the device, or None (never queries it).
+
+        Entries are per credentials, so a wrong password never gets the
+        list an authenticated query cached.
+        """
+        return self.cache.get(_services_key(camera_ip, camera_port, use_https,
+                                            username, password))
+
+    def scan(
+        self,
+        devices: list,
+        max_workers: int = PROFILE_SCAN_MAX_WORKERS,
+        refresh: bool = False,
+        timeout: float = FLEET_DEVICE_TIMEOUT,
+    ) -> dict:
+        """Check profile support for a whole device list in parallel.
+
+        ``devices`` are dicts as returned by ``fleet.parse_device_list``.
+
+        Returns:
+            {
                 "success": True,
-                "services": services,
-                "profiles": profiles,
+                "profile_keys": ["S", "T", ...],
                 "profile_details": PROFILE_DEFINITIONS,
-                "error": None,
+                "rows": [{"device": {...}, "success": True, "cached": False,
+                          "profiles": {"S": True, ...}, "error": None}, ...],
+                "execution_time_ms": 1830.2,
             }
-        except Exception as e:
+        """
+        def check_one(device):
+            result = self.check(
+                device["ip"], device["port"], device["username"], device["password"],
+                device["use_https"], refresh=refresh, timeout=timeout,
+            )
             return {
-                "success": False,
-                "services": [],
-                "profiles": {},
-                "profile_details": PROFILE_DEFINITIONS,
-                "error": str(e),
+                "device": {k: v for k, v in device.items() if k != "password"},
+                "success": result["success"],
+                "cached": result["cached"],
+                "profiles": result["profiles"],
+                "error": result["error"],
             }
 
+        start_time = time.time()
+        workers = max(1, min(max_workers, len(devices)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="onvif-scan") as pool:
+            rows = list(pool.map(check_one, devices))
+        elapsed = (time.time() - start_time) * 1000
+
+        return {
+            "success": True,
+            "profile_keys": list(PROFILE_DEFINITIONS),
+            "profile_details": PROFILE_DEFINITIONS,
+            "rows": rows,
+            "execution_time_ms": round(elapsed, 1),
+        }
+
+    @staticmethod
+    def _match_profiles(services: list) -> dict:
+        supported_ns = {s["namespace"] for s in services}
+        return {
+            key: all(ns in supported_ns for ns in defn["required"])
+            for key, defn in PROFILE_DEFINITIONS.items()
+        }
+
     def _check_via_capabilities(self, service) -> list:
         """Map GetCapabilities response to service namespace list (older firmware fallback)."""
         services = []
@@ -202,3 +356,18 @@ class ProfileChecker:
         except Exception:
             pass
         return services
+
+
+def matrix_to_csv(scan_result: dict) -> str:
+    """Render a ``ProfileChecker.scan`` result as a device × profile CSV matrix."""
+    keys = scan_result["profile_keys"]
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["ip", "port", "https", "status", *keys, "error"])
+    for row in scan_result["rows"]:
+        dev = row["device"]
+        marks = ["Y" if row["profiles"].get(k) else "" for k in keys]
+        status = ("cached" if row["cached"] else "ok") if row["success"] else "error"
+        writer.writerow([dev["ip"], dev["port"], int(dev["use_https"]), status,
+                         *marks, row["error"] or ""])
+    return out.getvalue()
@@ -0,0 +1,308 @@
+"""Send hand-written or replayed SOAP envelopes to a camera without zeep."""
+
+import base64
+import hashlib
+import os
+import re
+import time
+from urllib.parse import urlsplit
+from xml.sax.saxutils import escape
+
+import requests
+from lxml import etree
+from urllib3.util import Timeout
+
+from config import (
+    CLIENT_POOL_IDLE_TIMEOUT,
+    CLIENT_POOL_MAX_SIZE,
+    RAW_SEND_MAX_BYTES,
+    ZEEP_OPERATION_TIMEOUT,
+    ZEEP_TIMEOUT,
+)
+from .client_pool import ClientPool, _endpoint
+from .command_executor import classify_error
+from .profile_checker import DEVICE_BINDING
+from .timing import PhaseTimer, trace_call
+from .ttl_cache import TTLCache
+from .xml_store import _SECURITY_RE
+
+SOAP12_NS = "http://www.w3.org/2003/05/soap-envelope"
+SOAP11_NS = "http://schemas.xmlsoap.org/soap/envelope/"
+
+_WSSE_NS = "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd"
+_WSU_NS = "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-utility-1.0.xsd"
+_PASSWORD_DIGEST = ("http://docs.oasis-open.org/wss/2004/01/"
+                    "oasis-200401-wss-username-token-profile-1.0#PasswordDigest")
+_BASE64_BINARY = ("http://docs.oasis-open.org/wss/2004/01/"
+                  "oasis-200401-wss-soap-message-security-1.0#Base64Binary")
+_SECURITY_TEMPLATE = (
+    f'<wsse:Security xmlns:wsse="{_WSSE_NS}" xmlns:wsu="{_WSU_NS}">'
+    "<wsse:UsernameToken><wsse:Username>{username}</wsse:Username>"
+    f'<wsse:Password Type="{_PASSWORD_DIGEST}">{{digest}}</wsse:Password>'
+    f'<wsse:Nonce EncodingType="{_BASE64_BINARY}">{{nonce}}</wsse:Nonce>'
+    "<wsu:Created>{created}</wsu:Created>"
+    "</wsse:UsernameToken></wsse:Security>"
+)
+
+# Matched on the raw bytes, so malformed payloads are sent as written
+_ENVELOPE_RE = re.compile(rb"^\s*(?:<\?xml[^>]*\?>\s*)?<(?:([\w.-]+):)?Envelope\b([^>]*)>")
+_SOAP_VERSIONS = {SOAP12_NS.encode(): "1.2", SOAP11_NS.encode(): "1.1"}
+_CONTENT_TYPES = {"1.2": "application/soap+xml; charset=utf-8", "1.1": "text/xml; charset=utf-8"}
+
+_PARSER = etree.XMLParser(remove_blank_text=True, resolve_entities=False,
+                          no_network=True, huge_tree=True)
+
+
+def security_header(username: str, password: str, clock_offset: float = 0.0) -> bytes:
+    """Return a fresh WS-Security UsernameToken (PasswordDigest) header block.
+
+    ``clock_offset`` (seconds the device clock is ahead of ours) shifts the
+    Created time to the device's clock.
+    """
+    nonce = os.urandom(16)
+    created = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + clock_offset))
+    digest = hashlib.sha1(nonce + created.encode() + password.encode("utf-8")).digest()
+    return _SECURITY_TEMPLATE.format(
+        username=escape(username),
+        digest=base64.b64encode(digest).decode(),
+        nonce=base64.b64encode(nonce).decode(),
+        created=created,
+    ).encode("utf-8")
+
+
+def build_envelope(xml, security: bytes = None) -> tuple:
+    """Turn a SOAP body or a full envelope into the bytes to send.
+
+    A body (one or more elements) is wrapped in a SOAP 1.2 envelope. A full
+    envelope is kept byte for byte, except that an existing ``Security``
+    header is replaced by ``security`` when given; the envelope is never
+    parsed, so malformed XML goes out as written.
+
+    Returns:
+        (envelope_bytes, soap_version)  # "1.2" or "1.1"
+    """
+    data = xml.encode("utf-8") if isinstance(xml, str) else bytes(xml)
+    match = _ENVELOPE_RE.match(data)
+    if match is None:
+        header = b"<s:Header>" + security + b"</s:Header>" if security else b""
+        envelope = (b'<?xml version="1.0" encoding="utf-8"?>'
+                    b'<s:Envelope xmlns:s="' + SOAP12_NS.encode() + b'">'
+                    + header + b"<s:Body>" + data.strip() + b"</s:Body></s:Envelope>")
+        return envelope, "1.2"
+
+    prefix = match.group(1) + b":" if match.group(1) else b""
+    version = next((v for ns, v in _SOAP_VERSIONS.items() if ns in match.group(2)), "1.2")
+    if security is None:
+        return data, version
+
+    tag = re.escape(prefix)
+    body = re.search(rb"<" + tag + rb"Body\b", data)
+    end = body.start() if body is not None else len(data)
+    stale = _SECURITY_RE.search(data, 0, end)  # only look in front of the Body
+    if stale is not None:
+        data = data[:stale.start()] + data[stale.end():]
+        end -= stale.end() - stale.start()
+
+    header = re.compile(rb"<" + tag + rb"Header\b[^>]*?(/?)>").search(data, 0, end)
+    if header is not None:
+        if header.group(1):  # <s:Header/>
+            block = data[header.start():header.end() - 2] + b">" + security \
+                + b"</" + prefix + b"Header>"
+        else:
+            block = data[header.start():header.end()] + security
+        return data[:header.start()] + block + data[header.end():], version
+    at = end if body is not None else match.end()
+    block = b"<" + prefix + b"Header>" + security + b"</" + prefix + b"Header>"
+    return data[:at] + block + data[at:], version
+
+
+def parse_fault(root) -> dict:
+    """Return ``{"code", "subcode", "reason"}`` of a SOAP 1.1/1.2 Fault, or None."""
+    fault = root.find("{*}Body/{*}Fault")
+    if fault is None:
+        return None
+    if fault.find("{*}Code") is not None:  # SOAP 1.2
+        values = [v.text or "" for v in fault.iterfind(".//{*}Code//{*}Value")]
+        reason = fault.findtext("{*}Reason/{*}Text") or ""
+    else:
+        values = [fault.findtext("faultcode") or ""]
+        reason = fault.findtext("faultstring") or ""
+    values = [v.strip().rpartition(":")[2] for v in values]
+    return {
+        "code": values[0] if values else "",
+        "subcode": values[-1] if len(values) > 1 else None,
+        "reason": reason.strip(),
+    }
+
+
+class RawSender:
+    """POSTs raw SOAP envelopes over the pooled keep-alive connections.
+
+    No zeep client is involved: the envelope is assembled from bytes, a
+    fresh UsernameToken is spliced in, and the request goes straight to the
+    urllib3 connection pool behind the camera's shared session, skipping
+    ``requests``' per-call preparation. The response is returned as
+    received, optionally parsed with lxml to pretty-print it and detect a
+    SOAP Fault.
+    """
+
+    def __init__(self, pool: ClientPool = None, resolve_xaddr=None):
+        self.pool = pool or ClientPool()
+        # binding name -> endpoint, e.g. CommandExecutor.resolve_xaddr
+        self.resolve_xaddr = resolve_xaddr
+        # (scheme, host, port) -> (session, urllib3 pool of that session)
+        self._conn_pools = TTLCache(CLIENT_POOL_IDLE_TIMEOUT, CLIENT_POOL_MAX_SIZE)
+
+    def send(self, xml, camera_ip: str, camera_port: int, username: str = "",
+             password: str = "", use_https: bool = False, xaddr: str = None,
+             binding_name: str = None, soap_action: str = None, wsse: bool = True,
+             parse: bool = False, timeout: float = None) -> dict:
+        """Send ``xml`` (a SOAP body or full envelope) and return the raw response.
+
+        The endpoint is ``xaddr`` (full URL, or a path on the camera), else
+        the endpoint of ``binding_name``, else the device service. With
+        ``wsse`` a fresh UsernameToken digest replaces any Security header
+        in the envelope, stamped with the device's clock when its offset is
+        already known (no extra request is made for it). Without ``parse``
+        success means an HTTP 2xx status.
+
+        Returns:
+            {
+                "success": True/False,
+                "status_code": 200,            # None if no response
+                "content_type": "application/soap+xml; charset=utf-8",
+                "response_bytes": 512,
+                "fault": None or {"code", "subcode", "reason"},  # parse only
+                "request_xml": "<s:Envelope...",   # as sent
+                "response_xml": "<env:Envelope...",  # as received, pretty with parse
+                "error": None or "error message",
+                "error_type": None or "Fault:NotAuthorized",  # see classify_error
+                "execution_time_ms": 1.2,
+                "xaddr": "http://.../onvif/device_service",
+                "timings": { ... },  # see PhaseTimer.result
+            }
+        """
+        timer = PhaseTimer()
+        url = self._endpoint(xaddr, binding_name, camera_ip, camera_port,
+                             username, password, use_https, timeout)
+        timer.mark("resolve")
+
+        result = {
+            "success": False, "status_code": None, "content_type": None,
+            "response_bytes": 0, "fault": None, "request_xml": "", "response_xml": "",
+            "error": None, "error_type": None, "execution_time_ms": 0, "xaddr": url,
+        }
+        with trace_call() as trace:
+            try:
+                if wsse and username:
+                    start = time.perf_counter()
+                    clock_sync = self.pool.clock_sync
+                    offset = clock_sync.offset(*_endpoint(url)[1:]) if clock_sync else 0.0
+                    security = security_header(username, password, offset)
+                    trace.wsse = time.perf_counter() - start
+                else:
+                    security = None
+                envelope, version = build_envelope(xml, security)
+                if len(envelope) > RAW_SEND_MAX_BYTES:
+                    raise ValueError(f"Envelope is {len(envelope)} bytes "
+                                     f"(RAW_SEND_MAX_BYTES = {RAW_SEND_MAX_BYTES})")
+                result["request_xml"] = envelope.decode("utf-8", errors="replace")
+                headers = {"Content-Type": _CONTENT_TYPES[version]}
+                if soap_action:
+                    if version == "1.2":
+                        headers["Content-Type"] += f'; action="{soap_action}"'
+                    else:
+                        headers["SOAPAction"] = f'"{soap_action}"'
+
+                trace.post_start = time.perf_counter()
+                status, content_type, body = self._post(url, envelope, headers,
+                                                        use_https, timeout, trace)
+                trace.post_end = time.perf_counter()
+                result.update(status_code=status, content_type=content_type,
+                              response_bytes=len(body), success=200 <= status < 300)
+                if not result["success"]:
+                    result.update(error=f"HTTP {status}", error_type=f"HTTP {status}")
+                result["response_xml"] = self._response_xml(body, parse, result)
+            except Exception as e:
+                result.update(success=False, error=str(e), error_type=classify_error(e))
+            finally:
+                timer.mark_call(trace)
+
+        if trace.post_end is not None:
+            result["execution_time_ms"] = round((trace.post_end - trace.post_start) * 1000, 2)
+        result["timings"] = timer.result()
+        return result
+
+    def _endpoint(self, xaddr, binding_name, ip, port, username, password,
+                  use_https, timeout) -> str:
+        scheme = "https" if use_https else "http"
+        if xaddr:
+            return xaddr if "://" in xaddr else f"{scheme}://{ip}:{port}/{xaddr.lstrip('/')}"
+        if self.resolve_xaddr is not None:
+            return self.resolve_xaddr(binding_name or DEVICE_BINDING, ip, port,
+                                      username, password, use_https, timeout)
+        return f"{scheme}://{ip}:{port}/onvif/device_service"
+
+    def _post(self, url: str, envelope: bytes, headers: dict, use_https: bool,
+              timeout: float, trace) -> tuple:
+        conn_pool = self._connection_pool(url, use_https)
+        parts = urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        connect, read = (timeout, timeout) if timeout else (ZEEP_TIMEOUT, ZEEP_OPERATION_TIMEOUT)
+
+        trace.send_start = time.perf_counter()
+        response = conn_pool.urlopen(
+            "POST", path, body=envelope, headers=headers, retries=False,
+            redirect=False, preload_content=False,
+            timeout=Timeout(connect=connect, read=read),
+        )
+        trace.headers_at = time.perf_counter()
+        try:
+            body = response.read()
+        except Exception:
+            response.close()  # don't hand a half-read connection back to the pool
+            raise
+        finally:
+            response.release_conn()
+        return response.status, response.headers.get("Content-Type"), body
+
+    def _connection_pool(self, url: str, use_https: bool):
+        """Return the urllib3 pool that the camera's session sends ``url`` through.
+
+        Looked up once per session, the way ``requests`` would for the same
+        URL and TLS settings, so raw sends share the keep-alive connections
+        (and connect / TLS timing hooks) of zeep calls to this camera.
+        """
+        session = self.pool.get_session(url, use_https)
+        key = _endpoint(url)
+        cached = self._conn_pools.get(key)
+        if cached is not None and cached[0] is session:
+            return cached[1]
+        adapter = session.get_adapter(url)
+        get_pool = getattr(adapter, "get_connection_with_tls_context", None)
+        if get_pool is not None:
+            verify = session.merge_environment_settings(url, {}, None, None, None)["verify"]
+            conn_pool = get_pool(requests.Request("POST", url).prepare(), verify)
+        else:  # requests < 2.32.2
+            conn_pool = adapter.get_connection(url)
+        self._conn_pools.set(key, (session, conn_pool))
+        return conn_pool
+
+    @staticmethod
+    def _response_xml(body: bytes, parse: bool, result: dict) -> str:
+        if not parse or not body:
+            return body.decode("utf-8", errors="replace")
+        try:
+            root = etree.fromstring(body, _PARSER)
+        except etree.XMLSyntaxError as e:
+            result["error"] = result["error"] or f"Response is not well-formed XML: {e}"
+            result["error_type"] = result["error_type"] or "XMLSyntaxError"
+            result["success"] = False
+            return body.decode("utf-8", errors="replace")
+        fault = parse_fault(root)
+        if fault is not None:
+            code = fault["subcode"] or fault["code"]
+            result.update(success=False, fault=fault, error=fault["reason"] or code,
+                          error_type=f"Fault:{code}" if code else "Fault")
+        return etree.tostring(root, pretty_print=True, encoding="unicode")
+
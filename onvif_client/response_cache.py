@@ -0,0 +1,129 @@
+"""Opt-in cache of Get* results in front of ``CommandExecutor``."""
+
+import hashlib
+import json
+import threading
+
+from config import (
+    RESPONSE_CACHE_DEFAULT_TTL,
+    RESPONSE_CACHE_DEVICE_WRITES,
+    RESPONSE_CACHE_MAX_SIZE,
+    RESPONSE_CACHE_TTLS,
+    RESPONSE_CACHE_WRITE_PREFIXES,
+)
+from .ttl_cache import TTLCache
+
+
+class ResponseCache:
+    """Successful Get* results, keyed by device, binding, operation and params.
+
+    Each operation has its own TTL (``ttls``, else ``default_ttl``; 0 means
+    never cached) and the cache holds at most ``max_size`` results, least
+    recently used dropped first. The key also holds the user (and a digest
+    of the password), so a wrong password is never answered from the cache,
+    and the ``xml_mode`` the result was captured with.
+
+    A write (``Set*``, ``Create*``, ``Delete*``, ...) to a binding on a device
+    invalidates every cached result of that binding on that device: it bumps
+    the pair's generation number, which is part of every key. The writes in
+    ``device_writes`` (reboot, factory default, ...) invalidate every binding
+    of the device. Results of calls that were already running under the old
+    generation are stored under keys that are never looked up again, so a
+    read racing a write cannot put the pre-write answer back into the cache.
+    """
+
+    def __init__(self, max_size: int = RESPONSE_CACHE_MAX_SIZE,
+                 default_ttl: float = RESPONSE_CACHE_DEFAULT_TTL,
+                 ttls: dict = RESPONSE_CACHE_TTLS,
+                 write_prefixes: tuple = RESPONSE_CACHE_WRITE_PREFIXES,
+                 device_writes: tuple = RESPONSE_CACHE_DEVICE_WRITES):
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls)
+        self.write_prefixes = tuple(write_prefixes)
+        self.device_writes = set(device_writes)
+        self._cache = TTLCache(default_ttl, max_size)
+        self._lock = threading.Lock()
+        self._generations = {}  # (ip, port, binding_name) -> int
+        self.stored = 0
+        self.invalidations = 0
+
+    def ttl_for(self, operation_name: str) -> float:
+        """Return the TTL of an operation's results (0 = not cached)."""
+        if not operation_name.startswith("Get"):
+            return 0
+        return self.ttls.get(operation_name, self.default_ttl)
+
+    def is_write(self, operation_name: str) -> bool:
+        return (operation_name.startswith(self.write_prefixes)
+                or operation_name in self.device_writes)
+
+    def begin(self, binding_name: str, operation_name: str, camera_ip: str,
+              camera_port: int, username: str, password: str, params: dict,
+              use_https: bool, xml_mode: str, refresh: bool = False) -> tuple:
+        """Look a call up before it runs.
+
+        Returns ``(ticket, hit)``: ``hit`` is the cached result (marked
+        ``"cached": True`` with its ``cache_age_s``) or None; ``ticket`` is
+        passed to :meth:`finish` with the fresh result. With ``refresh`` the
+        lookup is skipped but the fresh result is still stored.
+        """
+        scope = (camera_ip, int(camera_port), binding_name)
+        if self.is_write(operation_name):
+            if operation_name in self.device_writes:
+                scope = scope[:2] + (None,)
+            return ("write", scope), None
+        ttl = self.ttl_for(operation_name)
+        if ttl <= 0:
+            return None, None
+
+        try:
+            params_key = json.dumps(params, sort_keys=True, separators=(",", ":")) \
+                if params else ""
+        except (TypeError, ValueError):
+            return None, None
+        with self._lock:
+            generation = self._generations.setdefault(scope, 0)
+        key = (scope, generation, bool(use_https), username,
+               hashlib.sha256(password.encode("utf-8")).hexdigest(),
+               operation_name, params_key, xml_mode)
+
+        if not refresh:
+            result = self._cache.get(key)
+            if result is not None:
+                age = self._cache.age(key)
+                return None, {**result, "cached": True,
+                              "cache_age_s": round(age or 0.0, 1)}
+        return ("read", key, ttl), None
+
+    def finish(self, ticket, result: dict):
+        """Store a fresh successful read, or invalidate after a write."""
+        if ticket is None:
+            return
+        if ticket[0] == "write":
+            self.invalidate(*ticket[1])
+        elif result.get("success"):
+            self._cache.set(ticket[1], result, ticket[2])
+            with self._lock:
+                self.stored += 1
+
+    def invalidate(self, camera_ip: str, camera_port: int, binding_name: str = None):
+        """Drop the cached results of one binding (or, without one, the whole device)."""
+        with self._lock:
+            if binding_name is not None:
+                scopes = [(camera_ip, int(camera_port), binding_name)]
+            else:
+                scopes = [s for s in self._generations if s[:2] == (camera_ip, int(camera_port))]
+            for scope in scopes:
+                self._generations[scope] = self._generations.get(scope, 0) + 1
+            self.invalidations += 1
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        with self._lock:
+            stats.update(stored=self.stored, invalidations=self.invalidations,
+                         scopes=len(self._generations))
+        stats["default_ttl"] = stats.pop("ttl")
+        return stats
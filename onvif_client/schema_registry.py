@@ -0,0 +1,284 @@
+"""Process-wide registry of parsed WSDL documents within a memory budget."""
+
+import gc
+import sys
+import threading
+import time
+import types
+import weakref
+from collections import OrderedDict
+
+from zeep.client import Client, Settings
+from zeep.wsdl import Document
+
+from config import SCHEMA_REGISTRY_MAX_MB
+from .wsdl_bundle import BundleTransport, SharedSchemas, deps_current, load_document
+
+# zeep creates a class per XSD type while parsing; those belong to the document
+_DYNAMIC_MODULES = ("zeep.xsd.dynamic_types", "zeep.objects")
+_NOT_FOLLOWED = (types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                 types.MethodType, types.CodeType, weakref.ref)
+
+
+def make_settings() -> Settings:
+    """Return the zeep settings used for every ONVIF client."""
+    settings = Settings()
+    settings.strict = False
+    settings.xml_huge_tree = True
+    return settings
+
+
+def resident_size(roots: list, stop=()) -> int:
+    """Approximate bytes of the Python objects reachable from ``roots``.
+
+    Objects whose ``id`` is in ``stop`` are neither counted nor followed,
+    nor are modules, functions and classes other than the ones zeep
+    created for parsed types.
+    """
+    seen = set(stop)
+    pending = list(roots)
+    total = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, _NOT_FOLLOWED) or \
+                (isinstance(obj, type) and obj.__module__ not in _DYNAMIC_MODULES):
+            continue
+        total += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+    return total
+
+
+class _Entry:
+    __slots__ = ("document", "deps", "groups", "size", "load_ms", "loaded_at", "hits")
+
+    def __init__(self, document, deps, groups, size, load_ms):
+        self.document = document
+        self.deps = deps        # url -> (sha256, is_local) it was parsed from
+        self.groups = groups    # SchemaGroups of the shared XSDs it uses
+        self.size = size        # resident bytes of its own objects
+        self.load_ms = load_ms
+        self.loaded_at = time.time()
+        self.hits = 0
+
+
+class SchemaRegistry:
+    """Parsed WSDL documents shared by every zeep client in the process.
+
+    Each WSDL is parsed (or read from the disk cache) once, and each XSD it
+    imports once for all of them (``schemas``), whichever of the UI, the
+    executors, the profile checker or the load tests asks first. Clients
+    from :meth:`client` are bound to the shared document, so creating one
+    costs no parsing.
+
+    Documents are kept within ``max_bytes`` of resident memory, counting
+    each WSDL's own objects (measured when it is loaded) and the shared XSDs
+    still in use; beyond it the least recently used WSDLs are evicted, and
+    XSDs no remaining WSDL uses go with them. The callbacks registered with
+    :meth:`on_evict` are then told, so pools drop idle clients that still
+    hold the document. A WSDL larger than the whole budget is still kept.
+    """
+
+    def __init__(self, max_bytes: int = SCHEMA_REGISTRY_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.schemas = SharedSchemas()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # wsdl_url -> _Entry, LRU order
+        self._load_locks = {}  # wsdl_url -> threading.Lock
+        self._listeners = []  # weak references to on_evict callbacks
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "reloads": 0}
+
+    def document(self, wsdl_url: str, reload: bool = False) -> Document:
+        """Return the parsed WSDL document, loading it at most once at a time.
+
+        With ``reload`` a resident document is checked against the bundled
+        files it was parsed from and loaded again if any of them changed.
+        """
+        if not reload:
+            document = self._resident(wsdl_url)
+            if document is not None:
+                return document
+        with self._lock:
+            load_lock = self._load_locks.setdefault(wsdl_url, threading.Lock())
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(wsdl_url)
+            if entry is not None:
+                if not reload:
+                    return self._resident(wsdl_url) or self._load(wsdl_url)
+                transport = BundleTransport()
+                if deps_current(entry.deps, transport):
+                    return self._resident(wsdl_url) or self._load(wsdl_url)
+                self.schemas.discard_stale(transport)
+                self.evict(wsdl_url)
+                with self._lock:
+                    self._stats["reloads"] += 1
+            return self._load(wsdl_url)
+
+    def client(self, wsdl_url: str, client_class=Client, **kwargs) -> Client:
+        """Return a new zeep client (``client_class``) bound to the shared document.
+
+        ``kwargs`` go to the client; ``settings`` default to :func:`make_settings`
+        and ``transport`` to the one the document was loaded with.
+        """
+        document = self.document(wsdl_url)
+        kwargs.setdefault("settings", make_settings())
+        kwargs.setdefault("transport", document.transport)
+        return client_class(wsdl=document, **kwargs)
+
+    def on_evict(self, callback):
+        """Call ``callback(wsdl_url)`` when a document is evicted.
+
+        Bound methods are held weakly, so registering does not keep their
+        object alive.
+        """
+        if isinstance(callback, types.MethodType):
+            ref = weakref.WeakMethod(callback)
+        else:
+            def ref():
+                return callback
+        with self._lock:
+            self._listeners = [r for r in self._listeners if r() is not None] + [ref]
+
+    def evict(self, wsdl_url: str) -> bool:
+        """Drop a document (and the shared XSDs only it used); False if not resident."""
+        with self._lock:
+            entry = self._entries.pop(wsdl_url, None)
+            if entry is None:
+                return False
+            self._stats["evictions"] += 1
+        self.schemas.release(entry.groups)
+        self._notify(wsdl_url)
+        return True
+
+    def clear(self):
+        """Drop every document."""
+        with self._lock:
+            urls = list(self._entries)
+        for wsdl_url in urls:
+            self.evict(wsdl_url)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def wsdls(self) -> list:
+        """Return the resident documents, least recently used first.
+
+        Returns:
+            [
+                {
+                    "wsdl_url": "https://www.onvif.org/ver10/media/wsdl/media.wsdl",
+                    "resident_bytes": 812344,  # its own objects
+                    "shared_bytes": 3120480,   # shared XSDs it uses (counted once overall)
+                    "shared_xsds": 9,
+                    "load_ms": 96.1, "loaded_at": 1792227152.0, "hits": 42,
+                },
+                ...
+            ]
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+        return [{
+            "wsdl_url": wsdl_url,
+            "resident_bytes": entry.size,
+            "shared_bytes": sum(group.size or 0 for group in entry.groups),
+            "shared_xsds": sum(len(group.documents) for group in entry.groups),
+            "load_ms": entry.load_ms,
+            "loaded_at": round(entry.loaded_at, 3),
+            "hits": entry.hits,
+        } for wsdl_url, entry in entries]
+
+    def xsds(self) -> list:
+        """Return the shared XSD groups: their files, size and number of users."""
+        return [{
+            "key": group.key[:16],
+            "locations": group.locations,
+            "resident_bytes": group.size,
+            "wsdls": group.users,
+        } for group in self.schemas.groups()]
+
+    def stats(self) -> dict:
+        groups = self.schemas.groups()
+        with self._lock:
+            own = sum(entry.size for entry in self._entries.values())
+            shared = sum(group.size or 0 for group in groups)
+            return {
+                "wsdls": len(self._entries),
+                "xsds": sum(len(group.documents) for group in groups),
+                "resident_bytes": own + shared,
+                "own_bytes": own,
+                "shared_bytes": shared,
+                "max_bytes": self.max_bytes,
+                **self._stats,
+            }
+
+    def _resident(self, wsdl_url: str):
+        with self._lock:
+            entry = self._entries.get(wsdl_url)
+            if entry is None:
+                return None
+            self._entries.move_to_end(wsdl_url)
+            entry.hits += 1
+            self._stats["hits"] += 1
+            return entry.document
+
+    def _load(self, wsdl_url: str) -> Document:
+        """Load a document and make room for it (its load lock held)."""
+        started = time.perf_counter()
+        transport = BundleTransport()
+        document = load_document(wsdl_url, make_settings(), transport, schemas=self.schemas)
+        load_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        groups = self.schemas.groups_of(document)
+        self.schemas.acquire(groups)
+        for group in groups:
+            if group.size is None:
+                group.size = resident_size(group.documents, self.schemas.shared_ids(group.key))
+        shared = self.schemas.shared_ids()
+        shared.add(id(transport))
+        size = resident_size([document], shared)
+
+        with self._lock:
+            self._stats["misses"] += 1
+            self._entries[wsdl_url] = _Entry(document, dict(transport.loaded), groups,
+                                             size, load_ms)
+            victims = self._over_budget()
+        for victim in victims:
+            self.evict(victim)
+        return document
+
+    def _over_budget(self) -> list:
+        """Return the LRU documents to evict to get within budget (lock held)."""
+        users = {}  # SchemaGroup -> resident documents using it
+        for entry in self._entries.values():
+            for group in entry.groups:
+                users[group] = users.get(group, 0) + 1
+        total = sum(entry.size for entry in self._entries.values()) \
+            + sum(group.size or 0 for group in users)
+        victims = []
+        for wsdl_url, entry in list(self._entries.items())[:-1]:
+            if total <= self.max_bytes:
+                break
+            victims.append(wsdl_url)
+            total -= entry.size
+            for group in entry.groups:
+                users[group] -= 1
+                if not users[group]:
+                    total -= group.size or 0
+        return victims
+
+    def _notify(self, wsdl_url: str):
+        for ref in list(self._listeners):
+            callback = ref()
+            if callback is not None:
+                callback(wsdl_url)
+
+
+_registry = SchemaRegistry()
+
+
+def shared_registry() -> SchemaRegistry:
+    """The process-wide registry every pool and loader uses by default."""
+    return _registry
@@ -6,28 +6,69 @@ from datetime import time as dt_time
 from datetime import timedelta
 from decimal import Decimal
 
-import zeep.helpers
 from lxml import etree
+from zeep.xsd.valueobjects import CompoundValue
+
+# Values JSON can encode as-is (checked by exact type, the common case)
+_JSON_SCALARS = frozenset((str, int, float, bool, type(None)))
+
+# Exact-type converters for the other scalars zeep produces
+_SCALAR_CONVERTERS = {
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    dt_time: dt_time.isoformat,
+    timedelta: str,
+    Decimal: float,
+}
 
 
 class ONVIFSerializer:
-    """Custom JSON serializer that handles zeep-specific types."""
+    """Custom JSON serializer that handles zeep-specific types.
+
+    Conversion is a single iterative pass: zeep objects, lists and lxml
+    elements (``xsd:any`` content) are turned straight into dicts, lists and
+    JSON scalars, with no intermediate ``serialize_object`` copy and no
+    recursion limit on deeply nested responses.
+    """
 
     @staticmethod
     def serialize(zeep_object):
         """Convert zeep response object to a JSON-serializable dict."""
-        raw = zeep.helpers.serialize_object(zeep_object, target_cls=dict)
-        return ONVIFSerializer._make_json_safe(raw)
+        root = [None]
+        # Work items: (value, container, key). Containers get their keys
+        # (or list slots) assigned up front, so output order matches input.
+        stack = [(zeep_object, root, 0)]
+        pop = stack.pop
+        push = stack.append
+
+        while stack:
+            value, parent, key = pop()
+            cls = type(value)
+            if cls in _JSON_SCALARS:
+                parent[key] = value
+            elif isinstance(value, CompoundValue):
+                out = parent[key] = dict.fromkeys(value.__values__)
+                for k, v in value.__values__.items():
+                    push((v, out, k))
+            elif isinstance(value, dict):
+                out = parent[key] = dict.fromkeys(value)
+                for k, v in value.items():
+                    push((v, out, k))
+            elif isinstance(value, (list, tuple)):
+                out = parent[key] = [None] * len(value)
+                for i, v in enumerate(value):
+                    push((v, out, i))
+            elif cls in _SCALAR_CONVERTERS:
+                parent[key] = _SCALAR_CONVERTERS[cls](value)
+            elif isinstance(value, etree._Element):
+                parent[key] = ONVIFSerializer._element_to_dict(value)
+            else:
+                parent[key] = ONVIFSerializer._convert_scalar(value)
+        return root[0]
 
     @staticmethod
-    def _make_json_safe(obj):
-        if isinstance(obj, dict):
-            return {k: ONVIFSerializer._make_json_safe(v) for k, v in obj.items()}
-        elif isinstance(obj, (list, tuple)):
-            return [ONVIFSerializer._make_json_safe(item) for item in obj]
-        elif isinstance(obj, etree._Element):
-            return ONVIFSerializer._element_to_dict(obj)
-        elif isinstance(obj, (datetime, date)):
+    def _convert_scalar(obj):
+        if isinstance(obj, (datetime, date)):
             return obj.isoformat()
         elif isinstance(obj, dt_time):
             return obj.isoformat()
@@ -41,43 +82,68 @@ class ONVIFSerializer:
 
     @staticmethod
     def _element_to_dict(element):
-        """Convert an lxml Element to a JSON-friendly dict."""
-        # Strip namespace for cleaner keys
-        tag = etree.QName(element.tag).localname if "}" in element.tag else element.tag
-
-        children = list(element)
-        if not children and element.text and element.text.strip():
-            # Leaf element with text content
-            return {tag: element.text.strip()}
-
-        if not children and not (element.text and element.text.strip()):
-            # Empty element - include attributes if any
-            if element.attrib:
-                return {tag: dict(element.attrib)}
-            return {tag: None}
-
-        # Element with children
-        result = {}
-        if element.attrib:
-            result["@attributes"] = dict(element.attrib)
-
-        for child in children:
-            child_data = ONVIFSerializer._element_to_dict(child)
-            child_tag = list(child_data.keys())[0]
-            child_val = child_data[child_tag]
-
-            if child_tag in result:
-                # Multiple children with same tag -> list
-                if not isinstance(result[child_tag], list):
-                    result[child_tag] = [result[child_tag]]
-                result[child_tag].append(child_val)
-            else:
-                result[child_tag] = child_val
+        """Convert an lxml Element to a JSON-friendly ``{tag: value}`` dict.
+
+        Leaf elements become their stripped text (or their attributes, or
+        None when empty). Elements with children become a dict of child tag
+        to value, with ``@attributes`` first and repeated tags collected into
+        lists. Comments and processing instructions are skipped.
+        """
+        root = {}
+        stack = [(element, root, _local_name(element.tag))]
+        pop = stack.pop
+        push = stack.append
 
-        return {tag: result}
+        while stack:
+            elem, parent, key = pop()
+            children = []
+            tags = []
+            for child in elem:
+                tag = child.tag
+                if tag.__class__ is str:
+                    children.append(child)
+                    tags.append(tag.rpartition("}")[2])
+
+            if not children:
+                text = elem.text
+                text = text.strip() if text else ""
+                if text:
+                    # Leaf element with text content
+                    parent[key] = text
+                elif len(elem.attrib):
+                    # Empty element - include attributes if any
+                    parent[key] = dict(elem.attrib)
+                else:
+                    parent[key] = None
+                continue
+
+            # Element with children
+            result = parent[key] = {}
+            if len(elem.attrib):
+                result["@attributes"] = dict(elem.attrib)
+
+            counts = {}
+            for tag in tags:
+                counts[tag] = counts.get(tag, 0) + 1
+            for child, tag in zip(children, tags):
+                if counts[tag] > 1:
+                    # Multiple children with same tag -> list
+                    items = result.setdefault(tag, [])
+                    items.append(None)
+                    push((child, items, len(items) - 1))
+                else:
+                    result[tag] = None
+                    push((child, result, tag))
+
+        return root
 
     @staticmethod
     def to_json_string(zeep_object, indent=2):
         """Return a formatted JSON string from a zeep object."""
         data = ONVIFSerializer.serialize(zeep_object)
         return json.dumps(data, indent=indent, ensure_ascii=False, default=str)
+
+
+def _local_name(tag: str) -> str:
+    """Strip the namespace from a Clark-notation tag for cleaner keys."""
+    return tag.rpartition("}")[2]
@@ -0,0 +1,491 @@
+"""Full-configuration snapshots of cameras, stored as content-addressed blobs."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    FLEET_DEVICE_TIMEOUT,
+    ONVIF_PRESETS,
+    SNAPSHOT_DB_PATH,
+    SNAPSHOT_DIFF_MAX_CHANGES,
+    SNAPSHOT_EXCLUDE_OPERATIONS,
+    SNAPSHOT_MAX_CONCURRENCY,
+    SNAPSHOT_MAX_DEVICES,
+    SNAPSHOT_MAX_PER_DEVICE,
+)
+from .history import _json_default
+from .profile_checker import DEVICE_BINDING
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    device TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    operations INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    manifest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_snapshots_device ON snapshots (device);
+"""
+
+_SUMMARY_COLUMNS = ("id", "device", "created_at", "operations", "failed")
+
+
+def canonical_json(value) -> bytes:
+    """Serialize ``value`` the same way every time (sorted keys, no spaces)."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+                      default=_json_default).encode("utf-8")
+
+
+def _token_index(items: list):
+    """Map ``token`` -> item when every item is a dict with a unique token."""
+    if not items or not all(isinstance(i, dict) and i.get("token") is not None for i in items):
+        return None
+    index = {str(i["token"]): i for i in items}
+    return index if len(index) == len(items) else None
+
+
+def diff_values(old, new, path: str = "", changes: list = None,
+                limit: int = SNAPSHOT_DIFF_MAX_CHANGES) -> list:
+    """Return the structural differences between two JSON values.
+
+    Dicts are compared key by key. Lists of ONVIF entities (dicts with a
+    ``token``) are matched by token, so a reordered list is not reported as
+    changed; other lists are compared by position. At most ``limit``
+    changes are collected.
+
+    Returns:
+        [{"path": "Profiles[token=Profile_1].Name", "change": "changed",
+          "old": "main", "new": "Main"}, ...]  # change: added / removed / changed
+    """
+    changes = [] if changes is None else changes
+    if len(changes) >= limit or old == new:
+        return changes
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in sorted(old.keys() | new.keys(), key=str):
+            child = f"{path}.{key}" if path else str(key)
+            if key not in new:
+                changes.append({"path": child, "change": "removed", "old": old[key], "new": None})
+            elif key not in old:
+                changes.append({"path": child, "change": "added", "old": None, "new": new[key]})
+            else:
+                diff_values(old[key], new[key], child, changes, limit)
+            if len(changes) >= limit:
+                break
+        return changes
+
+    if isinstance(old, list) and isinstance(new, list):
+        old_index, new_index = _token_index(old), _token_index(new)
+        if old_index is not None and new_index is not None:
+            pairs = [(f"{path}[token={t}]", old_index.get(t), new_index.get(t), t in old_index,
+                      t in new_index) for t in dict.fromkeys([*old_index, *new_index])]
+        else:
+            pairs = [(f"{path}[{i}]", old[i] if i < len(old) else None,
+                      new[i] if i < len(new) else None, i < len(old), i < len(new))
+                     for i in range(max(len(old), len(new)))]
+        for child, a, b, in_old, in_new in pairs:
+            if not in_new:
+                changes.append({"path": child, "change": "removed", "old": a, "new": None})
+            elif not in_old:
+                changes.append({"path": child, "change": "added", "old": None, "new": b})
+            else:
+                diff_values(a, b, child, changes, limit)
+            if len(changes) >= limit:
+                break
+        return changes
+
+    changes.append({"path": path, "change": "changed", "old": old, "new": new})
+    return changes
+
+
+class SnapshotStore:
+    """Snapshots in SQLite: one manifest per snapshot, results as shared blobs.
+
+    Each operation result is stored once under the SHA-256 of its canonical
+    JSON; a snapshot's manifest maps ``Binding.Operation`` to that hash (or
+    to the error of a failed call). A new snapshot only writes the results
+    that differ from every stored one, and a diff only loads the results
+    whose hashes differ. The oldest snapshots of a device are pruned beyond
+    ``max_per_device``, together with blobs no snapshot refers to anymore.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_DB_PATH,
+                 max_per_device: int = SNAPSHOT_MAX_PER_DEVICE):
+        self.path = os.path.expanduser(path)
+        self.max_per_device = max_per_device
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def save(self, device: str, results: dict) -> dict:
+        """Store one snapshot of ``device``.
+
+        ``results`` maps ``Binding.Operation`` to the result JSON, or to
+        ``{"error": ..., "error_type": ...}`` wrapped as ``("error", dict)``.
+
+        Returns:
+            {"id": 12, "device": "10.0.0.5:80", "created_at": ..., "operations": 41,
+             "failed": 3, "new_blobs": 2}
+        """
+        manifest, payloads = {}, {}
+        for key, (kind, value) in results.items():
+            if kind == "error":
+                manifest[key] = value
+                continue
+            data = canonical_json(value)
+            digest = hashlib.sha256(data).hexdigest()
+            manifest[key] = digest
+            payloads[digest] = data
+
+        conn = self._connect()
+        try:
+            with conn:
+                # Take the write lock before looking up known blobs: another
+                # device's save may otherwise prune one of them before our
+                # manifest refers to it
+                conn.execute("BEGIN IMMEDIATE")
+                known = self._existing(conn, payloads)
+                new = [(h, zlib.compress(d)) for h, d in payloads.items() if h not in known]
+                conn.executemany("INSERT OR IGNORE INTO blobs VALUES (?, ?)", new)
+                created_at = time.time()
+                failed = sum(1 for v in manifest.values() if isinstance(v, dict))
+                snapshot_id = conn.execute(
+                    "INSERT INTO snapshots (device, created_at, operations, failed, manifest) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (device, created_at, len(manifest), failed, json.dumps(manifest, sort_keys=True)),
+                ).lastrowid
+                self._prune(conn, device)
+        finally:
+            conn.close()
+        return {"id": snapshot_id, "device": device, "created_at": created_at,
+                "operations": len(manifest), "failed": failed, "new_blobs": len(new)}
+
+    def list(self, device: str = None, limit: int = 50) -> list:
+        """Return snapshot summaries, newest first."""
+        sql = f"SELECT {', '.join(_SUMMARY_COLUMNS)} FROM snapshots"
+        args = []
+        if device:
+            sql += " WHERE device = ?"
+            args.append(device)
+        sql += " ORDER BY id DESC LIMIT ?"
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, (*args, max(1, int(limit)))).fetchall()
+        finally:
+            conn.close()
+        return [dict(zip(_SUMMARY_COLUMNS, row)) for row in rows]
+
+    def get(self, snapshot_id: int, with_results: bool = True) -> dict:
+        """Return a snapshot summary with its manifest (and results), or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                f"SELECT {', '.join(_SUMMARY_COLUMNS)}, manifest FROM snapshots WHERE id = ?",
+                (int(snapshot_id),),
+            ).fetchone()
+            if row is None:
+                return None
+            snapshot = dict(zip(_SUMMARY_COLUMNS, row[:-1]))
+            snapshot["manifest"] = json.loads(row[-1])
+            if with_results:
+                blobs = self._load(conn, [h for h in snapshot["manifest"].values()
+                                          if isinstance(h, str)])
+                snapshot["results"] = {
+                    key: value if isinstance(value, dict) else blobs.get(value)
+                    for key, value in snapshot["manifest"].items()
+                }
+        finally:
+            conn.close()
+        return snapshot
+
+    def previous(self, snapshot_id: int, device: str = None):
+        """Return the id of the snapshot before ``snapshot_id`` (of ``device``,
+        by default the same device), or None."""
+        conn = self._connect()
+        try:
+            if device is None:
+                row = conn.execute("SELECT device FROM snapshots WHERE id = ?",
+                                   (int(snapshot_id),)).fetchone()
+                if row is None:
+                    return None
+                device = row[0]
+            row = conn.execute(
+                "SELECT MAX(id) FROM snapshots WHERE device = ? AND id < ?",
+                (device, int(snapshot_id)),
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0]
+
+    def latest(self, device: str):
+        """Return the id of the newest snapshot of ``device``, or None."""
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT MAX(id) FROM snapshots WHERE device = ?",
+                                (device,)).fetchone()[0]
+        finally:
+            conn.close()
+
+    def diff(self, base_id: int, target_id: int, details: bool = True) -> dict:
+        """Compare two snapshots (of the same or different devices).
+
+        Operations with the same hash in both manifests are skipped without
+        reading their results. Without ``details`` only the changed keys are
+        listed and no result is loaded at all.
+
+        Returns:
+            {
+                "base": {"id", "device", "created_at", ...},
+                "target": {...},
+                "summary": {"unchanged": 38, "changed": 2, "added": 0,
+                            "removed": 0, "failed": 1, "recovered": 0},
+                "operations": [{"operation": "MediaBinding.GetProfiles",
+                                "status": "changed",
+                                "changes": [ <diff_values() items> ],
+                                "truncated": False}, ...],
+            }
+        """
+        base = self.get(base_id, with_results=False)
+        target = self.get(target_id, with_results=False)
+        if base is None or target is None:
+            raise KeyError("Snapshot not found")
+        old, new = base.pop("manifest"), target.pop("manifest")
+
+        operations, load = [], []
+        summary = dict.fromkeys(("unchanged", "changed", "added", "removed",
+                                 "failed", "recovered"), 0)
+        for key in sorted(old.keys() | new.keys()):
+            a, b = old.get(key), new.get(key)
+            if a == b:
+                summary["unchanged"] += 1
+                continue
+            if a is None or b is None:
+                status = "added" if a is None else "removed"
+            elif isinstance(b, dict):
+                status = "failed"
+            elif isinstance(a, dict):
+                status = "recovered"
+            else:
+                status = "changed"
+                load += [a, b]
+            summary[status] += 1
+            entry = {"operation": key, "status": status}
+            if status in ("failed", "recovered"):
+                entry["error"] = (b if status == "failed" else a).get("error")
+            operations.append(entry)
+
+        if details and load:
+            conn = self._connect()
+            try:
+                blobs = self._load(conn, load)
+            finally:
+                conn.close()
+            for entry in operations:
+                if entry["status"] == "changed":
+                    key = entry["operation"]
+                    if old[key] not in blobs or new[key] not in blobs:
+                        entry["error"] = "Stored result is missing from the database"
+                        continue
+                    changes = diff_values(blobs[old[key]], blobs[new[key]])
+                    entry["changes"] = changes
+                    entry["truncated"] = len(changes) >= SNAPSHOT_DIFF_MAX_CHANGES
+        return {"base": base, "target": target, "summary": summary, "operations": operations}
+
+    def stats(self) -> dict:
+        """Return snapshot / blob counts and the database size."""
+        conn = self._connect()
+        try:
+            snapshots, devices = conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT device) FROM snapshots").fetchone()
+            blobs, blob_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM blobs").fetchone()
+        finally:
+            conn.close()
+        return {"snapshots": snapshots, "devices": devices, "blobs": blobs,
+                "blob_bytes": blob_bytes, "max_per_device": self.max_per_device}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _existing(conn: sqlite3.Connection, hashes) -> set:
+        hashes = list(hashes)
+        known = set()
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            known.update(h for (h,) in conn.execute(
+                f"SELECT hash FROM blobs WHERE hash IN ({', '.join('?' * len(chunk))})", chunk))
+        return known
+
+    @staticmethod
+    def _load(conn: sqlite3.Connection, hashes) -> dict:
+        hashes = list(set(hashes))
+        blobs = {}
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            for digest, data in conn.execute(
+                    f"SELECT hash, data FROM blobs WHERE hash IN ({', '.join('?' * len(chunk))})",
+                    chunk):
+                blobs[digest] = json.loads(zlib.decompress(data))
+        return blobs
+
+    def _prune(self, conn: sqlite3.Connection, device: str):
+        """Drop the device's oldest snapshots beyond the limit, then orphaned blobs."""
+        deleted = conn.execute(
+            "DELETE FROM snapshots WHERE device = ? AND id NOT IN "
+            "(SELECT id FROM snapshots WHERE device = ? ORDER BY id DESC LIMIT ?)",
+            (device, device, self.max_per_device),
+        ).rowcount
+        if deleted:
+            conn.execute(
+                "DELETE FROM blobs WHERE hash NOT IN (SELECT value FROM snapshots, "
+                "json_each(snapshots.manifest) WHERE json_each.type = 'text')"
+            )
+
+
+class SnapshotRunner:
+    """Runs every parameterless Get* operation a device offers, in parallel.
+
+    The operations come from the device's discovered services (GetServices)
+    matched to the preset WSDLs by namespace; within a device up to
+    ``max_concurrency`` calls run at once over its pooled session, and up to
+    ``max_devices`` devices are snapshotted at a time.
+    """
+
+    def __init__(self, executor, wsdl_loader, store: SnapshotStore,
+                 presets: dict = ONVIF_PRESETS,
+                 max_devices: int = SNAPSHOT_MAX_DEVICES,
+                 max_concurrency: int = SNAPSHOT_MAX_CONCURRENCY,
+                 device_timeout: float = FLEET_DEVICE_TIMEOUT,
+                 exclude: tuple = SNAPSHOT_EXCLUDE_OPERATIONS):
+        self.executor = executor
+        self.wsdl_loader = wsdl_loader
+        self.store = store
+        self.max_devices = max_devices
+        self.max_concurrency = max_concurrency
+        self.device_timeout = device_timeout
+        self.exclude = set(exclude)
+        # namespace -> [(wsdl_url, qualified binding name), ...]
+        self._services = {}
+        for preset in presets.values():
+            binding = f"{{{preset['namespace']}}}{preset['binding']}"
+            entries = self._services.setdefault(preset["namespace"], [])
+            if all(b != binding for _, b in entries):
+                entries.append((preset["wsdl"], binding))
+
+    def plan(self, namespaces) -> tuple:
+        """Return ``(items, errors)``: the Get* calls for a set of service namespaces.
+
+        An operation qualifies when its name starts with ``Get``, none of
+        its parameters is required and it is not in ``exclude``. WSDLs that
+        fail to load are reported in ``errors`` and skipped.
+        """
+        items, errors = [], []
+        for namespace in sorted(namespaces):
+            for wsdl_url, binding in self._services.get(namespace, ()):
+                try:
+                    schemas, _, _ = self.wsdl_loader.get_binding_schemas(wsdl_url, binding)
+                except Exception as e:
+                    errors.append(f"{binding}: {e}")
+                    continue
+                for name, params in schemas.items():
+                    if (name.startswith("Get") and name not in self.exclude
+                            and not any(p.get("required") for p in params)):
+                        items.append({"wsdl_url": wsdl_url, "binding_name": binding,
+                                      "operation_name": name, "params": {}})
+        return items, errors
+
+    def take(self, device: dict) -> dict:
+        """Snapshot one device and compare it with its previous snapshot.
+
+        ``device`` is a dict as returned by ``fleet.parse_device_list``.
+
+        Returns:
+            {
+                "device": {...},  # without the password
+                "success": True/False,
+                "snapshot": {"id", "device", "created_at", "operations",
+                             "failed", "new_blobs"} or None,
+                "previous_id": 11 or None,
+                "diff": {"summary": {...}, "operations": [...]} or None,
+                "plan_errors": [...],
+                "error": None or "message",
+                "execution_time_ms": 812.4,
+            }
+        """
+        start_time = time.time()
+        key = f"{device['ip']}:{device['port']}"
+        result = {
+            "device": {k: v for k, v in device.items() if k != "password"},
+            "success": False, "snapshot": None, "previous_id": None, "diff": None,
+            "plan_errors": [], "error": None,
+        }
+        try:
+            services, _ = self.executor.profile_checker.get_services(
+                device["ip"], device["port"], device["username"], device["password"],
+                device["use_https"], timeout=self.device_timeout,
+            )
+            if not services:
+                raise RuntimeError("Device reported no services (check credentials)")
+            namespaces = {s["namespace"] for s in services}
+            namespaces.add(DEVICE_BINDING[1:].partition("}")[0])
+            items, result["plan_errors"] = self.plan(namespaces)
+
+            batch = self.executor.execute_batch(
+                items, device["ip"], device["port"], device["username"], device["password"],
+                use_https=device["use_https"], max_concurrency=self.max_concurrency,
+                xml_mode="none", timeout=self.device_timeout, cache=False,
+            )
+            results = {}
+            for r in batch["results"]:
+                name = f"{r['binding_name'].rpartition('}')[2]}.{r['operation_name']}"
+                if r["success"]:
+                    results[name] = ("ok", r["result_json"])
+                else:
+                    results[name] = ("error", {"error": r["error"], "error_type": r["error_type"]})
+
+            previous_id = self.store.latest(key)
+            snapshot = self.store.save(key, results)
+            result.update(success=True, snapshot=snapshot, previous_id=previous_id)
+            if previous_id is not None:
+                diff = self.store.diff(previous_id, snapshot["id"], details=False)
+                result["diff"] = {"summary": diff["summary"], "operations": diff["operations"]}
+        except Exception as e:
+            result["error"] = str(e)
+        result["execution_time_ms"] = round((time.time() - start_time) * 1000, 1)
+        return result
+
+    def run(self, devices: list) -> dict:
+        """Snapshot a device list in parallel.
+
+        Returns:
+            {"success": True, "snapshots": [ <take() result>, ... ],
+             "execution_time_ms": 2301.5}
+        """
+        start_time = time.time()
+        workers = max(1, min(self.max_devices, len(devices)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="onvif-snapshot") as pool:
+            snapshots = list(pool.map(self.take, devices))
+        elapsed = (time.time() - start_time) * 1000
+        return {
+            "success": True,
+            "snapshots": snapshots,
+            "execution_time_ms": round(elapsed, 1),
+        }
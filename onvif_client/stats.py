@@ -0,0 +1,114 @@
+"""Latency statistics helpers shared by fleet, scan and load-test runs."""
+
+import math
+
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+
+def percentiles(values, pcts=DEFAULT_PERCENTILES) -> dict:
+    """Return nearest-rank percentiles plus min/max/mean of ``values``.
+
+    Returns:
+        {"count": 120, "min": 12.1, "mean": 40.2, "max": 311.0,
+         "p50": 35.0, "p90": 80.4, "p95": 120.9, "p99": 290.3}
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+    summary = {
+        "count": len(ordered),
+        "min": round(ordered[0], 1),
+        "mean": round(sum(ordered) / len(ordered), 1),
+        "max": round(ordered[-1], 1),
+    }
+    for pct in pcts:
+        rank = max(1, math.ceil(pct / 100 * len(ordered)))
+        summary[f"p{pct}"] = round(ordered[rank - 1], 1)
+    return summary
+
+
+class LatencyHistogram:
+    """Log-linear latency histogram in the style of HdrHistogram.
+
+    Values are recorded in microseconds into buckets of 128 linear steps per
+    power of two, so every percentile is within 1/128 (< 0.8%) of the true
+    value whatever the range, in constant memory per run. Count, min, max
+    and mean are exact.
+    """
+
+    _SUB_BITS = 8
+    _HALF = 1 << (_SUB_BITS - 1)
+
+    def __init__(self):
+        self.counts = {}  # bucket index -> count
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def record(self, value_ms: float):
+        value_ms = max(0.0, value_ms)
+        index = self._index(int(value_ms * 1000))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value_ms
+        if self.min is None or value_ms < self.min:
+            self.min = value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, pct: float) -> float:
+        """Value (ms) at or below which ``pct`` percent of samples fall."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def summary(self, pcts=(50, 90, 95, 99, 99.9)) -> dict:
+        """Return count/min/mean/max plus percentiles, like :func:`percentiles`."""
+        if not self.count:
+            return {"count": 0}
+        summary = {
+            "count": self.count,
+            "min": round(self.min, 1),
+            "mean": round(self.total / self.count, 1),
+            "max": round(self.max, 1),
+        }
+        for pct in pcts:
+            summary[f"p{pct:g}"] = round(self.percentile(pct), 1)
+        return summary
+
+    def buckets(self) -> list:
+        """Return ``[[value_ms, count], ...]`` for non-empty buckets, ascending."""
+        return [[round(self._value(i), 3), self.counts[i]] for i in sorted(self.counts)]
+
+    @classmethod
+    def _index(cls, value_us: int) -> int:
+        bits = value_us.bit_length()
+        if bits <= cls._SUB_BITS:
+            return value_us
+        shift = bits - cls._SUB_BITS
+        return shift * cls._HALF + (value_us >> shift)
+
+    @classmethod
+    def _value(cls, index: int) -> float:
+        """Midpoint (ms) of a bucket."""
+        if index < (1 << cls._SUB_BITS):
+            return index / 1000
+        shift = index // cls._HALF - 1
+        low = (index - shift * cls._HALF) << shift
+        return (low + (1 << shift) / 2) / 1000
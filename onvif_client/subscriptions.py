@@ -0,0 +1,454 @@
+"""Background PullPoint event subscriptions for many cameras at once."""
+
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+import isodate
+from lxml import etree
+
+from config import (
+    ONVIF_PRESETS,
+    SUBSCRIPTION_BUFFER_SIZE,
+    SUBSCRIPTION_MAX,
+    SUBSCRIPTION_MAX_BACKOFF,
+    SUBSCRIPTION_MESSAGE_LIMIT,
+    SUBSCRIPTION_PULL_TIMEOUT,
+    SUBSCRIPTION_RATE_WINDOW,
+    SUBSCRIPTION_STREAM_BUFFER,
+    SUBSCRIPTION_TERMINATION,
+)
+from .client_pool import ClientPool
+from .command_executor import rebase_xaddr
+from .stats import percentiles
+
+EVENTS_WSDL = ONVIF_PRESETS["Events"]["wsdl"]
+_EVENTS_NS = ONVIF_PRESETS["Events"]["namespace"]
+EVENT_BINDING = f"{{{_EVENTS_NS}}}EventBinding"
+PULLPOINT_BINDING = f"{{{_EVENTS_NS}}}PullPointSubscriptionBinding"
+SUBSCRIPTION_MANAGER_BINDING = f"{{{_EVENTS_NS}}}SubscriptionManagerBinding"
+
+_WSNT_NS = "http://docs.oasis-open.org/wsn/b-2"
+_TT_NS = "http://www.onvif.org/ver10/schema"
+_NOTIFICATION_TAG = f"{{{_WSNT_NS}}}NotificationMessage"
+_TOPIC_TAG = f"{{{_WSNT_NS}}}Topic"
+_MESSAGE_TAG = f"{{{_WSNT_NS}}}Message"
+
+# Renew once less than this share of the subscription's lifetime is left
+_RENEW_FRACTION = 1 / 3
+# Extra seconds on top of the PullMessages Timeout before the HTTP read gives up
+_PULL_GRACE = 5
+# Lag samples kept per subscription for the p50/p95 figures
+_LAG_SAMPLES = 1000
+
+
+class Subscription:
+    """State and counters of one device's PullPoint subscription."""
+
+    def __init__(self, device: dict, buffer_size: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.device = device
+        self.state = "starting"  # starting | active | error | stopped
+        self.error = None
+        self.address = None
+        self.reference_headers = []
+        self.terminates_at = 0.0  # time.monotonic() deadline
+        self.events = deque(maxlen=buffer_size)
+        self.total = 0
+        self.renewals = 0
+        self.reconnects = 0
+        self.started_at = time.time()
+        self.last_event_at = None
+        self._received = deque()  # monotonic receipt times within the rate window
+        self._lags = deque(maxlen=_LAG_SAMPLES)
+        self._lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.device['ip']}:{self.device['port']}"
+
+    def record(self, events: list):
+        now = time.monotonic()
+        with self._lock:
+            for event in events:
+                self.events.append(event)
+                self._received.append(now)
+                if event["lag_ms"] is not None:
+                    self._lags.append(event["lag_ms"])
+            self.total += len(events)
+            if events:
+                self.last_event_at = events[-1]["received_at"]
+
+    def rate(self) -> float:
+        """Events per second over the last ``SUBSCRIPTION_RATE_WINDOW`` seconds."""
+        cutoff = time.monotonic() - SUBSCRIPTION_RATE_WINDOW
+        with self._lock:
+            while self._received and self._received[0] < cutoff:
+                self._received.popleft()
+            return round(len(self._received) / SUBSCRIPTION_RATE_WINDOW, 2)
+
+    def recent(self, limit: int = None) -> list:
+        """Return buffered notifications, oldest first."""
+        with self._lock:
+            events = list(self.events)
+        return events[-limit:] if limit else events
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lag = percentiles(self._lags, (50, 95, 99))
+        return {
+            "id": self.id,
+            "device": self.label,
+            "ip": self.device["ip"],
+            "port": self.device["port"],
+            "use_https": self.device["use_https"],
+            "state": self.state,
+            "error": self.error,
+            "address": self.address,
+            "total": self.total,
+            "buffered": len(self.events),
+            "events_per_sec": self.rate(),
+            "lag_ms": lag,
+            "renewals": self.renewals,
+            "reconnects": self.reconnects,
+            "started_at": self.started_at,
+            "last_event_at": self.last_event_at,
+        }
+
+
+class SubscriptionManager:
+    """Keeps PullMessages long-poll loops running for many devices.
+
+    Each subscription runs in its own daemon thread: it creates a PullPoint
+    through the device's Events service, pulls with a long-poll ``Timeout``,
+    renews before the camera lets it expire, and re-creates it with
+    exponential backoff after any error. Notifications go into the
+    subscription's ring buffer and into one manager-wide stream that
+    :meth:`wait_events` (and the SSE endpoint) reads by sequence number.
+
+    Calls go through a client pool of their own (with WS-Addressing),
+    sized for ``max_subscriptions`` so an Event Monitor never evicts the
+    executor's pooled clients; it shares the executor pool's schema
+    registry and clock offsets. The Events XAddr comes from the executor's
+    GetServices-based discovery.
+
+    A stopped subscription still counts toward ``max_subscriptions`` until
+    its thread has unsubscribed and exited.
+    """
+
+    def __init__(self, executor, max_subscriptions: int = SUBSCRIPTION_MAX,
+                 termination: int = SUBSCRIPTION_TERMINATION,
+                 pull_timeout: int = SUBSCRIPTION_PULL_TIMEOUT,
+                 message_limit: int = SUBSCRIPTION_MESSAGE_LIMIT,
+                 buffer_size: int = SUBSCRIPTION_BUFFER_SIZE,
+                 stream_size: int = SUBSCRIPTION_STREAM_BUFFER):
+        self.executor = executor
+        # Each subscription keeps a PullPoint and a SubscriptionManager client
+        self.pool = ClientPool(max_size=2 * max_subscriptions,
+                               registry=executor.pool.registry)
+        self.pool.clock_sync = executor.pool.clock_sync
+        self.pool.health = None  # long polls are not call latencies
+        self.max_subscriptions = max_subscriptions
+        self.termination = termination
+        self.pull_timeout = pull_timeout
+        self.message_limit = message_limit
+        self.buffer_size = buffer_size
+        self._subscriptions = {}  # id -> Subscription
+        self._retiring = {}  # id -> stopped Subscription whose thread is still running
+        self._lock = threading.Lock()
+        self._stream = deque(maxlen=stream_size)  # notifications, in seq order
+        self._seq = itertools.count(1)
+        self._last_seq = 0
+        self.received = 0  # notifications since start, including stopped subscriptions
+        self._stream_cond = threading.Condition()
+
+    # ── Public API ──────────────────────────────────────────
+
+    def start(self, devices: list) -> list:
+        """Subscribe to each device; returns their snapshots.
+
+        A device that already has a running subscription (same address,
+        port and user) keeps it. Raises ValueError when the new
+        subscriptions would exceed ``max_subscriptions``.
+        """
+        started = []
+        with self._lock:
+            running = {self._device_key(s.device): s for s in self._subscriptions.values()
+                       if s.state != "stopped"}
+            new = {self._device_key(d) for d in devices} - running.keys()
+            if len(running) + len(self._retiring) + len(new) > self.max_subscriptions:
+                raise ValueError(
+                    f"Too many subscriptions: {len(running)} running, "
+                    f"{len(self._retiring)} stopping, {len(new)} new, "
+                    f"limit {self.max_subscriptions}"
+                )
+            for device in devices:
+                key = self._device_key(device)
+                sub = running.get(key)
+                if sub is None:
+                    sub = Subscription(device, self.buffer_size)
+                    self._subscriptions[sub.id] = sub
+                    running[key] = sub
+                    sub.thread = threading.Thread(
+                        target=self._run, args=(sub,),
+                        name=f"onvif-events-{sub.label}", daemon=True,
+                    )
+                    sub.thread.start()
+                started.append(sub)
+        return [s.snapshot() for s in started]
+
+    def stop(self, subscription_id: str) -> bool:
+        """Stop and forget one subscription; returns False if unknown."""
+        with self._lock:
+            sub = self._subscriptions.pop(subscription_id, None)
+            if sub is None:
+                return False
+            self._retire(sub)
+        sub.stop_event.set()
+        return True
+
+    def stop_all(self) -> int:
+        with self._lock:
+            subs = list(self._subscriptions.values())
+            self._subscriptions.clear()
+            for sub in subs:
+                self._retire(sub)
+        for sub in subs:
+            sub.stop_event.set()
+        return len(subs)
+
+    def get(self, subscription_id: str):
+        return self._subscriptions.get(subscription_id)
+
+    def status(self) -> dict:
+        """Return every subscription's snapshot plus totals."""
+        with self._lock:
+            subs = list(self._subscriptions.values())
+        snapshots = [s.snapshot() for s in subs]
+        return {
+            "subscriptions": snapshots,
+            "active": sum(1 for s in snapshots if s["state"] == "active"),
+            "events_per_sec": round(sum(s["events_per_sec"] for s in snapshots), 2),
+            "total": sum(s["total"] for s in snapshots),
+            "received": self.received,
+            "last_seq": self._last_seq,
+        }
+
+    def wait_events(self, since_seq: int, timeout: float = 1.0) -> list:
+        """Return stream notifications with ``seq > since_seq``.
+
+        Blocks up to ``timeout`` seconds when there are none yet. Events that
+        already fell out of the stream buffer are skipped.
+        """
+        with self._stream_cond:
+            if self._last_seq <= since_seq:
+                self._stream_cond.wait(timeout)
+            if self._last_seq <= since_seq or not self._stream:
+                return []
+            skip = max(0, since_seq - self._stream[0]["seq"] + 1)
+            return list(itertools.islice(self._stream, skip, None))
+
+    # ── Subscription loop ───────────────────────────────────
+
+    def _retire(self, sub: Subscription):
+        """Keep counting a stopped subscription until its thread exits (lock held)."""
+        if sub.thread is not None and sub.thread.is_alive():
+            self._retiring[sub.id] = sub
+
+    def _run(self, sub: Subscription):
+        try:
+            self._loop(sub)
+        finally:
+            with self._lock:
+                self._retiring.pop(sub.id, None)
+
+    def _loop(self, sub: Subscription):
+        backoff = 1
+        while not sub.stop_event.is_set():
+            try:
+                self._create(sub)
+                backoff = 1
+                # Renew early enough that no long poll outlives the subscription
+                renew_margin = max(self.termination * _RENEW_FRACTION,
+                                   self.pull_timeout + _PULL_GRACE)
+                while not sub.stop_event.is_set():
+                    if sub.terminates_at - time.monotonic() < renew_margin:
+                        self._renew(sub)
+                    self._pull(sub)
+            except Exception as e:
+                if sub.stop_event.is_set():
+                    break
+                sub.state = "error"
+                sub.error = str(e) or type(e).__name__
+                sub.reconnects += 1
+                sub.stop_event.wait(backoff)
+                backoff = min(backoff * 2, SUBSCRIPTION_MAX_BACKOFF)
+        self._unsubscribe(sub)
+        sub.state = "stopped"
+
+    def _call(self, sub: Subscription, binding: str, xaddr: str, operation: str,
+              timeout: float, **kwargs):
+        """Run one Events operation on a pooled WS-Addressing client.
+
+        Returns ``(result, raw_response_bytes)``.
+        """
+        device = sub.device
+        with self.pool.lease(EVENTS_WSDL, binding, xaddr, device["username"],
+                                      device["password"], device["use_https"],
+                                      ws_addressing=True) as entry:
+            entry.transport.operation_timeout = timeout
+            result = getattr(entry.service, operation)(**kwargs)
+            return result, entry.transport.last_received
+
+    def _create(self, sub: Subscription):
+        device = sub.device
+        clock_sync = self.pool.clock_sync
+        if clock_sync is not None:
+            # (Re)measured on every (re)subscribe; pulls use the cached offset
+            clock_sync.ensure(device["ip"], device["port"], device["use_https"],
+                              self.pull_timeout)
+        xaddr = self.executor.resolve_xaddr(
+            EVENT_BINDING, device["ip"], device["port"], device["username"],
+            device["password"], device["use_https"], timeout=self.pull_timeout,
+        )
+        result, _ = self._call(
+            sub, EVENT_BINDING, xaddr, "CreatePullPointSubscription", self.pull_timeout,
+            InitialTerminationTime=f"PT{self.termination}S",
+        )
+        reference = result.SubscriptionReference
+        address = getattr(reference.Address, "_value_1", reference.Address)
+        params = getattr(reference, "ReferenceParameters", None)
+        sub.address = rebase_xaddr(address, device["ip"], device["port"],
+                                   device["use_https"])
+        sub.reference_headers = list(getattr(params, "_value_1", None) or [])
+        self._set_termination(sub, result.CurrentTime, result.TerminationTime)
+        sub.state = "active"
+        sub.error = None
+
+    def _pull(self, sub: Subscription):
+        result, raw = self._call(
+            sub, PULLPOINT_BINDING, sub.address, "PullMessages",
+            self.pull_timeout + _PULL_GRACE,
+            Timeout=timedelta(seconds=self.pull_timeout),
+            MessageLimit=self.message_limit,
+            _soapheaders=sub.reference_headers or None,
+        )
+        received_at = datetime.now(timezone.utc)
+        # Some cameras extend the subscription on every pull
+        self._set_termination(sub, result.CurrentTime, result.TerminationTime)
+        events = parse_notifications(raw, sub, result.CurrentTime, received_at)
+        if events:
+            self._publish(events)
+            sub.record(events)
+
+    def _renew(self, sub: Subscription):
+        result, _ = self._call(
+            sub, SUBSCRIPTION_MANAGER_BINDING, sub.address, "Renew", self.pull_timeout,
+            TerminationTime=f"PT{self.termination}S",
+            _soapheaders=sub.reference_headers or None,
+        )
+        self._set_termination(sub, getattr(result, "CurrentTime", None),
+                              result.TerminationTime)
+        sub.renewals += 1
+
+    def _unsubscribe(self, sub: Subscription):
+        """Best-effort Unsubscribe so the camera frees the PullPoint."""
+        if not sub.address or sub.state != "active":
+            return
+        try:
+            self._call(sub, PULLPOINT_BINDING, sub.address, "Unsubscribe",
+                       self.pull_timeout, _soapheaders=sub.reference_headers or None)
+        except Exception:
+            pass
+
+    def _set_termination(self, sub: Subscription, current_time, termination_time):
+        """Convert the camera's TerminationTime into a local monotonic deadline.
+
+        The remaining lifetime is measured on the camera clock (TerminationTime
+        minus CurrentTime), so clock skew does not cause early expiry. Without
+        CurrentTime, the requested termination is assumed.
+        """
+        remaining = self.termination
+        if isinstance(current_time, datetime) and isinstance(termination_time, datetime):
+            remaining = (termination_time - current_time).total_seconds()
+        sub.terminates_at = time.monotonic() + remaining
+
+    def _publish(self, events: list):
+        with self._stream_cond:
+            for event in events:
+                event["seq"] = self._last_seq = next(self._seq)
+                self._stream.append(event)
+            self.received += len(events)
+            self._stream_cond.notify_all()
+
+    @staticmethod
+    def _device_key(device: dict) -> tuple:
+        return (device["ip"], int(device["port"]), device["username"])
+
+
+def parse_notifications(raw: bytes, sub: Subscription, current_time,
+                        received_at: datetime) -> list:
+    """Extract notifications from a raw PullMessagesResponse envelope.
+
+    The raw bytes are read directly because zeep drops the text of the
+    mixed-content ``Topic`` element. ``lag_ms`` is the time from the event's
+    ``UtcTime`` to the camera sending the response, both on the camera clock.
+
+    Returns:
+        [{"subscription_id", "device", "topic", "utc_time", "operation",
+          "source": {"VideoSourceToken": "vs1"}, "data": {"IsMotion": "true"},
+          "received_at": "2026-...Z", "lag_ms": 42.0}, ...]
+    """
+    if not raw:
+        return []
+    parser = etree.XMLParser(resolve_entities=False, huge_tree=True)
+    root = etree.fromstring(raw, parser)
+    events = []
+    for notification in root.iter(_NOTIFICATION_TAG):
+        topic = notification.find(_TOPIC_TAG)
+        holder = notification.find(_MESSAGE_TAG)
+        message = holder[0] if holder is not None and len(holder) else None
+        utc_time = message.get("UtcTime") if message is not None else None
+        events.append({
+            "subscription_id": sub.id,
+            "device": sub.label,
+            "topic": (topic.text or "").strip() if topic is not None else "",
+            "utc_time": utc_time,
+            "operation": message.get("PropertyOperation") if message is not None else None,
+            "source": _simple_items(message, "Source"),
+            "data": _simple_items(message, "Data"),
+            "received_at": received_at.isoformat(),
+            "lag_ms": _lag_ms(utc_time, current_time),
+        })
+    return events
+
+
+def _simple_items(message, section: str) -> dict:
+    """Return ``{Name: Value}`` of the SimpleItems under tt:Source / tt:Data."""
+    if message is None:
+        return {}
+    container = message.find(f"{{{_TT_NS}}}{section}")
+    if container is None:
+        return {}
+    return {item.get("Name"): item.get("Value")
+            for item in container.iter(f"{{{_TT_NS}}}SimpleItem")}
+
+
+def _lag_ms(utc_time: str, current_time):
+    if not utc_time or not isinstance(current_time, datetime):
+        return None
+    try:
+        event_time = isodate.parse_datetime(utc_time)
+        # Cameras that omit the zone mean UTC
+        if event_time.tzinfo is None:
+            event_time = event_time.replace(tzinfo=timezone.utc)
+        if current_time.tzinfo is None:
+            current_time = current_time.replace(tzinfo=timezone.utc)
+        return round((current_time - event_time).total_seconds() * 1000, 1)
+    except (ValueError, TypeError, isodate.ISO8601Error):
+        return None
@@ -0,0 +1,285 @@
+"""Per-phase timing of one ONVIF call, from client lease to JSON conversion."""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from zeep.wsse.username import UsernameToken
+
+# Phase -> group. "camera" is time the device spends answering; "network" is
+# connection setup and transfer; "setup" and "tool" are spent in this process.
+PHASE_GROUPS = {
+    "clock": "setup",       # device clock offset (GetSystemDateAndTime, cached per device)
+    "resolve": "setup",     # service endpoint lookup (GetServices, cached per device)
+    "acquire": "setup",     # pool lease, or zeep client build on a miss
+    "build": "tool",        # zeep envelope build + HTTP request preparation
+    "wsse": "tool",         # WS-Security UsernameToken digest
+    "queue": "setup",       # wait for a free pooled connection (async backend)
+    "connect": "network",   # DNS + TCP connect (new connections only)
+    "tls": "network",       # TLS handshake (new HTTPS connections only)
+    "server": "camera",     # request write -> response headers received
+    "download": "network",  # response body transfer
+    "parse": "tool",        # zeep XML parse + deserialization
+    "serialize": "tool",    # zeep objects -> JSON-friendly dicts
+    "xml": "tool",          # SOAP envelope capture (xml_mode)
+}
+
+_current = ContextVar("onvif_call_trace", default=None)
+
+
+class CallTrace:
+    """Timestamps recorded by the transport hooks during one SOAP call."""
+
+    __slots__ = ("wsse", "queue", "connect", "tls", "connections", "connect_failed",
+                 "post_start", "send_start", "headers_at", "post_end")
+
+    def __init__(self):
+        self.wsse = 0.0
+        self.queue = 0.0  # httpx only: requests opens a new connection instead
+        self.connect = 0.0
+        self.tls = 0.0
+        self.connections = 0  # new TCP connections opened during the call
+        self.connect_failed = False
+        self.post_start = None  # transport.post entered (envelope is built)
+        self.send_start = None  # HTTP request prepared, handed to the adapter
+        self.headers_at = None  # response headers received
+        self.post_end = None    # response body read
+
+
+def current_trace():
+    """Return the trace of the call running in this thread or task, if any."""
+    return _current.get()
+
+
+@contextmanager
+def trace_call():
+    """Collect hook timings for the SOAP call made inside the block.
+
+    The hooks find the trace through a context variable, which is per
+    thread for sync calls and per task for async ones; calls made outside
+    the block (e.g. endpoint discovery) are not recorded.
+    """
+    trace = CallTrace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+class PhaseTimer:
+    """Splits the wall time of one ``execute`` call into consecutive phases."""
+
+    def __init__(self):
+        self.started = self._last = perf_counter()
+        self.phases = []  # [(phase, seconds)] in order
+        self.new_client = False
+        self.new_connections = 0
+
+    def mark(self, phase: str):
+        """End ``phase`` now; it started where the previous phase ended."""
+        now = perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def mark_call(self, trace: CallTrace):
+        """End the operation call, split by the hook timestamps in ``trace``.
+
+        A call that failed before sending is all ``build``. One that got no
+        response has no ``download``; its wait counts as ``connect`` when the
+        connection could not be opened and as ``server`` otherwise (timeout).
+        """
+        now = perf_counter()
+        start = self._last
+        self._last = now
+        if trace.post_start is None:
+            self.phases.append(("build", now - start))
+            return
+
+        self.new_connections = trace.connections
+        post_end = trace.post_end or now
+        send_start = trace.send_start or trace.post_start
+        headers_at = trace.headers_at or post_end
+        connect = trace.connect
+        waited = max(headers_at - send_start - trace.queue - connect - trace.tls, 0.0)
+        if trace.headers_at is None and trace.connect_failed:
+            connect, waited = connect + waited, 0.0
+        self.phases += [
+            # zeep envelope + requests' request preparation, minus the digest
+            ("build", max(send_start - start - trace.wsse, 0.0)),
+            ("wsse", trace.wsse),
+            ("queue", trace.queue),
+            ("connect", connect),
+            ("tls", trace.tls),
+            ("server", waited),
+            ("download", post_end - headers_at),
+            ("parse", now - post_end),
+        ]
+
+    def result(self) -> dict:
+        """Return the breakdown as JSON-friendly data for the UI waterfall.
+
+        Returns:
+            {
+                "total_ms": 131.2,
+                "phases": [{"phase": "resolve", "group": "setup",
+                            "start_ms": 0.0, "duration_ms": 0.1}, ...],
+                "groups": {"setup": 0.4, "tool": 3.1, "network": 1.2, "camera": 126.5},
+                "new_client": False,     # zeep client was built for this call
+                "new_connections": 0,    # 0 = keep-alive connection reused
+            }
+        """
+        phases = []
+        groups = dict.fromkeys(("setup", "tool", "network", "camera"), 0.0)
+        offset = 0.0
+        for phase, seconds in self.phases:
+            group = PHASE_GROUPS[phase]
+            phases.append({
+                "phase": phase,
+                "group": group,
+                "start_ms": round(offset * 1000, 2),
+                "duration_ms": round(seconds * 1000, 2),
+            })
+            groups[group] += seconds
+            offset += seconds
+        return {
+            "total_ms": round((self._last - self.started) * 1000, 2),
+            "phases": phases,
+            "groups": {g: round(s * 1000, 2) for g, s in groups.items()},
+            "new_client": self.new_client,
+            "new_connections": self.new_connections,
+        }
+
+
+class TimedUsernameToken(UsernameToken):
+    """UsernameToken that records how long building the digest header took.
+
+    ``clock_offset`` returns how many seconds the device clock is ahead of
+    ours (see ``ClockSync``); each digest's Created time is shifted by
+    it, so a device with a drifted clock still accepts the token.
+    """
+
+    def __init__(self, *args, clock_offset=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.clock_offset = clock_offset
+
+    def apply(self, envelope, headers):
+        start = perf_counter()
+        try:
+            if self.clock_offset is not None:
+                offset = self.clock_offset()
+                self.created = datetime.now(timezone.utc) + timedelta(seconds=offset) \
+                    if offset else None
+            return super().apply(envelope, headers)
+        finally:
+            trace = current_trace()
+            if trace is not None:
+                trace.wsse += perf_counter() - start
+
+
+class _ConnectTimingMixin:
+    def _new_conn(self):
+        # Socket creation covers DNS resolution and the TCP handshake
+        start = perf_counter()
+        trace = current_trace()
+        try:
+            return super()._new_conn()
+        except Exception:
+            if trace is not None:
+                trace.connect_failed = True
+            raise
+        finally:
+            if trace is not None:
+                trace.connect += perf_counter() - start
+                trace.connections += 1
+
+
+class _TimedHTTPConnection(_ConnectTimingMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_ConnectTimingMixin, HTTPSConnection):
+    def connect(self):
+        trace = current_trace()
+        if trace is None:
+            return super().connect()
+        start = perf_counter()
+        connect_before = trace.connect
+        try:
+            return super().connect()
+        finally:
+            # Whatever connect() spent beyond the socket setup is the handshake
+            total = perf_counter() - start
+            trace.tls += max(total - (trace.connect - connect_before), 0.0)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that reports send / headers times and the connect / TLS
+    time of new connections to the trace of the current call."""
+
+    def send(self, request, *args, **kwargs):
+        trace = current_trace()
+        if trace is None:
+            return super().send(request, *args, **kwargs)
+        trace.send_start = perf_counter()
+        # Returns once the headers are in; requests reads the body afterwards
+        response = super().send(request, *args, **kwargs)
+        trace.headers_at = perf_counter()
+        return response
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class HttpxTraceHook:
+    """httpcore ``trace`` extension filling a CallTrace (async backend).
+
+    Passed per request as ``extensions={"trace": hook}``; httpcore reports
+    ``<step>.started`` / ``.complete`` / ``.failed`` events around the TCP
+    connect, TLS handshake and response headers of that request. The first
+    event comes once the pool has handed out a connection, so the time
+    before it is the ``queue`` wait.
+    """
+
+    __slots__ = ("trace", "_started")
+
+    def __init__(self, trace: CallTrace):
+        self.trace = trace
+        self._started = None
+
+    async def __call__(self, event_name: str, info: dict):
+        now = perf_counter()
+        if self._started is None:
+            self._started = {}
+            if self.trace.send_start is not None:
+                self.trace.queue += now - self.trace.send_start
+        step, _, state = event_name.rpartition(".")
+        if state == "started":
+            self._started[step] = now
+            return
+        elapsed = now - self._started.pop(step, now)
+        trace = self.trace
+        if step == "connection.connect_tcp":
+            trace.connect += elapsed
+            trace.connections += 1
+            trace.connect_failed = trace.connect_failed or state == "failed"
+        elif step == "connection.start_tls":
+            trace.tls += elapsed
+        elif step.endswith("receive_response_headers") and state == "complete":
+            trace.headers_at = now
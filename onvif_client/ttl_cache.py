@@ -0,0 +1,75 @@
+"""Small thread-safe TTL + LRU cache."""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Map keys to values that expire ``ttl`` seconds after being stored.
+
+    The cache holds at most ``max_size`` entries; the least recently used
+    entry is dropped first when it is full.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires_at, stored_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Return the live value for ``key`` or ``default``."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[2]
+
+    def age(self, key):
+        """Return seconds since ``key`` was stored, or None if it is not cached."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                return None
+            return time.monotonic() - item[1]
+
+    def set(self, key, value, ttl: float = None):
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (now + (self.ttl if ttl is None else ttl), now, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[2]
+
+    def items(self) -> list:
+        """Return the live ``(key, value)`` pairs, least recently used first."""
+        now = time.monotonic()
+        with self._lock:
+            return [(k, item[2]) for k, item in self._data.items() if item[0] >= now]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -1,14 +1,21 @@
-"""Recursive XSD type introspection for dynamic parameter form generation."""
+"""XSD type introspection for dynamic parameter form generation.
 
-from zeep.xsd.types.complex import ComplexType
+Complex types are emitted once into a shared type table and referenced by
+key from parameters, so repeated and recursive types cost one entry each
+and no depth limit is needed.
+"""
 
-MAX_RECURSION_DEPTH = 5
+from zeep.xsd.types.complex import ComplexType
 
 
-def introspect_operation(client, binding_name: str, operation_name: str) -> list:
+def introspect_operation(client, binding_name: str, operation_name: str,
+                         types: dict = None, anonymous: dict = None) -> list:
     """Extract the input parameter schema for an operation.
 
-    Returns a list of parameter descriptors:
+    Complex types encountered are added to ``types`` (a type table shared
+    across calls) instead of being inlined; ``anonymous`` keeps the keys
+    given to anonymous types so they stay stable across calls. Returns a
+    list of parameter descriptors:
     [
         {
             "name": "ProfileToken",
@@ -23,10 +30,14 @@ def introspect_operation(client, binding_name: str, operation_name: str) -> list
             "type": "VideoSourceConfiguration",
             "required": False,
             "is_complex": True,
-            "children": [ ... ]
+            "ref": "{http://www.onvif.org/ver10/schema}VideoSourceConfiguration",
         }
     ]
+
+    and ``types[ref]`` is ``{"name": "VideoSourceConfiguration", "children": [...]}``.
     """
+    types = {} if types is None else types
+    anonymous = {} if anonymous is None else anonymous
     # Look up binding directly (ONVIF WSDLs don't define <service> elements)
     binding = client.wsdl.bindings.get(binding_name)
     if binding:
@@ -34,12 +45,25 @@ def introspect_operation(client, binding_name: str, operation_name: str) -> list
         if operation and operation.input and operation.input.body:
             body_type = operation.input.body.type
             if hasattr(body_type, "elements"):
-                return _resolve_elements(body_type.elements, depth=0)
+                return _resolve_elements(body_type.elements, types, anonymous)
     return []
 
 
-def _resolve_elements(elements, depth: int) -> list:
-    """Recursively resolve element list into parameter descriptors."""
+def referenced_types(params: list, types: dict) -> dict:
+    """Return the subset of ``types`` reachable from ``params``."""
+    found = {}
+    pending = list(params)
+    while pending:
+        param = pending.pop()
+        ref = param.get("ref")
+        if ref and ref not in found:
+            found[ref] = types[ref]
+            pending.extend(types[ref]["children"])
+    return found
+
+
+def _resolve_elements(elements, types: dict, anonymous: dict) -> list:
+    """Resolve an element list into parameter descriptors."""
     result = []
     for attr_name, element in elements:
         # Skip AnyAttribute / Any elements that lack a .type property
@@ -54,32 +78,10 @@ def _resolve_elements(elements, depth: int) -> list:
         }
 
         elem_type = element.type
-        if isinstance(elem_type, ComplexType) and depth < MAX_RECURSION_DEPTH:
+        if isinstance(elem_type, ComplexType):
             param["type"] = getattr(elem_type, "name", None) or "complexType"
             param["is_complex"] = True
-            if hasattr(elem_type, "elements"):
-                param["children"] = _resolve_elements(elem_type.elements, depth + 1)
-            else:
-                param["children"] = []
-
-            # Check for enum restrictions on attributes
-            if hasattr(elem_type, "attributes"):
-                for attr_key, attr_val in elem_type.attributes:
-                    # Skip AnyAttribute entries that lack a .type property
-                    if not hasattr(attr_val, "type"):
-                        continue
-                    attr_param = {
-                        "name": f"@{attr_key}",
-                        "type": _get_simple_type_name(attr_val.type),
-                        "required": False,
-                        "is_complex": False,
-                        "min_occurs": 0,
-                        "max_occurs": "1",
-                    }
-                    enum_values = _get_enum_values(attr_val.type)
-                    if enum_values:
-                        attr_param["enum_values"] = enum_values
-                    param["children"].append(attr_param)
+            param["ref"] = _register_type(elem_type, param["name"], types, anonymous)
         else:
             param["type"] = _get_simple_type_name(elem_type)
             param["is_complex"] = False
@@ -91,9 +93,59 @@ def _resolve_elements(elements, depth: int) -> list:
     return result
 
 
+def _register_type(xsd_type, element_name: str, types: dict, anonymous: dict) -> str:
+    """Add a complex type to the type table (once) and return its key.
+
+    Named types are keyed by their qualified name. Anonymous types get a
+    key derived from the element name, made unique per type object.
+    """
+    qname = getattr(xsd_type, "qname", None)
+    if qname is not None:
+        key = qname.text if hasattr(qname, "text") else str(qname)
+    else:
+        key = anonymous.get(id(xsd_type))
+        if key is None:
+            key = f"{element_name}#anonymous"
+            suffix = 1
+            while key in types:
+                suffix += 1
+                key = f"{element_name}#anonymous{suffix}"
+            anonymous[id(xsd_type)] = key
+    if key in types:
+        return key
+
+    # Register before resolving children so recursive types terminate
+    entry = {"name": getattr(xsd_type, "name", None) or "complexType", "children": []}
+    types[key] = entry
+    if hasattr(xsd_type, "elements"):
+        entry["children"] = _resolve_elements(xsd_type.elements, types, anonymous)
+
+    # Check for enum restrictions on attributes
+    if hasattr(xsd_type, "attributes"):
+        for attr_key, attr_val in xsd_type.attributes:
+            # Skip AnyAttribute entries that lack a .type property
+            if not hasattr(attr_val, "type"):
+                continue
+            attr_param = {
+                "name": f"@{attr_key}",
+                "type": _get_simple_type_name(attr_val.type),
+                "required": False,
+                "is_complex": False,
+                "min_occurs": 0,
+                "max_occurs": "1",
+            }
+            enum_values = _get_enum_values(attr_val.type)
+            if enum_values:
+                attr_param["enum_values"] = enum_values
+            entry["children"].append(attr_param)
+    return key
+
+
 def _get_simple_type_name(xsd_type) -> str:
     """Map zeep XSD type to a friendly name."""
-    name = getattr(xsd_type, "name", None) or str(xsd_type)
+    # Unnamed types (e.g. xsd:any) fall back to the class name; the object
+    # repr would differ per process and break schema ETags
+    name = getattr(xsd_type, "name", None) or type(xsd_type).__name__
     type_map = {
         "string": "string",
         "int": "integer",
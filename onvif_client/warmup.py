@@ -0,0 +1,94 @@
+"""Preload the preset WSDLs so the first calls don't pay for parsing them."""
+
+import os
+import threading
+import time
+
+from config import ONVIF_PRESETS
+
+
+class WarmUp:
+    """Parses every preset WSDL once, for both the UI and the executor.
+
+    Each WSDL is loaded into the schema registry the executor's pool and the
+    loader share, and the parameter schemas of every preset binding are
+    introspected. Run it in the parent of a pre-forking
+    server and the workers inherit all of it; run it in the background
+    (``start``) and ``status()["ready"]`` tells when it is done. A WSDL that
+    fails to load is reported and left to load on first use, as without
+    warm-up.
+    """
+
+    def __init__(self, wsdl_loader, pool, presets: dict = ONVIF_PRESETS):
+        self.wsdl_loader = wsdl_loader
+        self.pool = pool
+        # wsdl_url -> [qualified binding name, ...]
+        self._bindings = {}
+        for preset in presets.values():
+            bindings = self._bindings.setdefault(preset["wsdl"], [])
+            binding = f"{{{preset['namespace']}}}{preset['binding']}"
+            if binding not in bindings:
+                bindings.append(binding)
+        self._lock = threading.Lock()
+        self._state = "idle"  # idle -> running -> done
+        self._loaded = 0
+        self._failed = {}
+        self._started_at = None
+        self._finished_at = None
+
+    def run(self) -> dict:
+        """Load every preset WSDL now; returns :meth:`status`."""
+        with self._lock:
+            if self._state != "idle":
+                return self.status()
+            self._state = "running"
+            self._started_at = time.time()
+
+        for wsdl_url, bindings in self._bindings.items():
+            try:
+                self.pool.get_document(wsdl_url)
+                for binding in bindings:
+                    self.wsdl_loader.get_binding_schemas(wsdl_url, binding)
+            except Exception as e:
+                with self._lock:
+                    self._failed[wsdl_url] = f"{type(e).__name__}: {e}"
+                continue
+            with self._lock:
+                self._loaded += 1
+
+        with self._lock:
+            self._state = "done"
+            self._finished_at = time.time()
+        return self.status()
+
+    def start(self) -> threading.Thread:
+        """Run the warm-up in a background thread."""
+        thread = threading.Thread(target=self.run, name="wsdl-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> dict:
+        """Return the warm-up state.
+
+        Returns:
+            {
+                "ready": True,  # False only while the warm-up is running
+                "state": "idle" / "running" / "done",
+                "wsdls": 21, "loaded": 20,
+                "failed": {"<wsdl url>": "<error>"},
+                "duration_ms": 5012.3 or None,
+                "pid": 12345,
+            }
+        """
+        with self._lock:
+            end = self._finished_at or time.time()
+            return {
+                "ready": self._state != "running",
+                "state": self._state,
+                "wsdls": len(self._bindings),
+                "loaded": self._loaded,
+                "failed": dict(self._failed),
+                "duration_ms": round((end - self._started_at) * 1000, 1)
+                if self._started_at else None,
+                "pid": os.getpid(),
+            }
@@ -0,0 +1,558 @@
+"""Offline WSDL/XSD bundle resolver and persistent parsed-document cache.
+
+ONVIF WSDLs import dozens of XSDs from onvif.org, oasis-open.org and w3.org.
+``BundleTransport`` resolves those URLs against a local mirror (``wsdl/``,
+laid out as ``<host>/<path>``) so loading works without network access.
+``load_document`` additionally keeps pickled zeep ``Document`` objects on disk,
+keyed by the SHA-256 of the WSDL content, so a cold start skips XSD parsing.
+With a ``SharedSchemas`` store the XSDs imported by several WSDLs are parsed,
+pickled and kept in memory once for all of them.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import zeep
+from lxml import etree
+from zeep.cache import SqliteCache
+from zeep.client import Settings
+from zeep.transports import Transport
+from zeep.wsdl import Document
+from zeep.xsd.schema import _SchemaContainer
+
+from config import WSDL_BUNDLE_DIR, WSDL_CACHE_DIR, WSDL_OFFLINE
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the pickle layout below changes
+_CACHE_FORMAT = 2
+
+
+def _get_base_path():
+    """Return base path for bundled data (handles PyInstaller bundle)."""
+    if getattr(sys, "frozen", False):
+        return sys._MEIPASS
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bundle_path(url: str, bundle_dir: str = None) -> str:
+    """Map a remote document URL to its location inside the local bundle."""
+    parts = urlsplit(url)
+    bundle_dir = bundle_dir or os.path.join(_get_base_path(), WSDL_BUNDLE_DIR)
+    return os.path.join(bundle_dir, parts.hostname or "", *parts.path.lstrip("/").split("/"))
+
+
+class BundleTransport(Transport):
+    """zeep transport that serves WSDL/XSD documents from the local bundle.
+
+    Documents missing from the bundle are fetched remotely (through zeep's
+    SQLite cache) unless ``offline`` is set. Every loaded URL and the SHA-256
+    of its content is recorded so the document cache can be validated later.
+    """
+
+    def __init__(self, bundle_dir: str = None, offline: bool = WSDL_OFFLINE, **kwargs):
+        if not offline:
+            kwargs.setdefault("cache", SqliteCache())
+        super().__init__(**kwargs)
+        self.bundle_dir = bundle_dir or os.path.join(_get_base_path(), WSDL_BUNDLE_DIR)
+        self.offline = offline
+        self.loaded = {}  # url -> (sha256, is_local)
+
+    def load(self, url):
+        local = self.local_path(url)
+        if local and os.path.isfile(local):
+            with open(local, "rb") as fh:
+                content = fh.read()
+            self.loaded[url] = (hashlib.sha256(content).hexdigest(), True)
+            return content
+        if self.offline and urlsplit(url).scheme in ("http", "https"):
+            raise IOError(f"{url} is not in the offline WSDL bundle ({self.bundle_dir})")
+        content = super().load(url)
+        self.loaded[url] = (hashlib.sha256(content).hexdigest(), False)
+        return content
+
+    def local_path(self, url: str):
+        """Return the bundle path for an http(s) URL, or the path itself for local files."""
+        scheme = urlsplit(url).scheme
+        if scheme in ("http", "https"):
+            return bundle_path(url, self.bundle_dir)
+        if scheme == "file":
+            return urlsplit(url).path
+        return os.path.expanduser(url)
+
+
+# ── Document pickling ─────────────────────────────────────
+# zeep builds one Python class per XSD type at parse time (module
+# "zeep.xsd.dynamic_types" / "zeep.objects"), which the stock pickler cannot
+# import. Those classes are rebuilt from name, bases and attributes instead.
+
+def _rebuild_class(name, bases, attrs):
+    return type(name, bases, attrs)
+
+
+def _reduce_settings(settings):
+    state = {k: v for k, v in vars(settings).items() if k != "_tls"}
+    return (Settings, (), state)
+
+
+_ODICT_VALUES = type(OrderedDict().values())
+
+
+class _DocumentPickler(pickle.Pickler):
+    def __init__(self, fh, transport, schemas=None, own_group=None):
+        super().__init__(fh, protocol=pickle.HIGHEST_PROTOCOL)
+        self._transport = transport
+        self._schemas = schemas
+        self._own_group = own_group
+
+    def reducer_override(self, obj):
+        if isinstance(obj, type) and obj.__module__ in (
+            "zeep.xsd.dynamic_types", "zeep.objects"
+        ):
+            attrs = {
+                k: v for k, v in vars(obj).items()
+                if k not in ("__dict__", "__weakref__", "__doc__")
+            }
+            return (_rebuild_class, (obj.__name__, obj.__bases__, attrs))
+        if isinstance(obj, Settings):
+            return _reduce_settings(obj)
+        if isinstance(obj, etree.QName):
+            return (etree.QName, (obj.text,))
+        if isinstance(obj, _ODICT_VALUES):
+            # zeep keeps extended types' attributes as a dict view; it only iterates it
+            return (list, (list(obj),))
+        return NotImplemented
+
+    def persistent_id(self, obj):
+        # The transport (and its HTTP session) is rebound on load
+        if obj is self._transport:
+            return "transport"
+        # Shared XSD documents and their components are pickled once, on their own
+        if self._schemas is not None:
+            return self._schemas.persistent_id(obj, self._own_group)
+        return None
+
+
+class _DocumentUnpickler(pickle.Unpickler):
+    def __init__(self, fh, transport, schemas=None, cache=None):
+        super().__init__(fh)
+        self._transport = transport
+        self._schemas = schemas
+        self._cache = cache
+
+    def persistent_load(self, pid):
+        if pid == "transport":
+            return self._transport
+        if self._schemas is None:
+            raise pickle.UnpicklingError("document refers to shared XSDs")
+        return self._schemas.resolve(pid, self._cache, self._transport)
+
+
+# ── Shared XSD documents ──────────────────────────────────
+# Every ONVIF WSDL imports onvif.xsd, common.xsd and the WS-* schemas; parsed
+# separately, each document carries its own copy of all of them. zeep looks
+# an import up in the schema (by namespace and location) before fetching it,
+# so a container that also looks in the shared store imports them parsed.
+
+_COMPONENTS = ("_types", "_elements", "_groups", "_attributes", "_attribute_groups")
+
+
+class _SharedSchemaContainer(_SchemaContainer):
+    """zeep schema container that imports already-parsed XSDs from ``shared``."""
+
+    def __init__(self, shared, documents):
+        super().__init__()
+        self.shared = shared
+        for document in documents:
+            self.add(document)
+
+    def get_by_namespace_and_location(self, namespace, location):
+        document = super().get_by_namespace_and_location(namespace, location)
+        if document is None and location:
+            document = self.shared.import_into(self, namespace, location)
+        return document
+
+
+class _SharedDocument(Document):
+    """zeep ``Document`` parsed with its XSD imports served by ``shared``.
+
+    Once parsed it is a plain ``Document`` again, so nothing of the store is
+    kept (or pickled) with it.
+    """
+
+    def __init__(self, location, transport, settings, shared):
+        self._shared = shared
+        try:
+            super().__init__(location, transport, settings=settings)
+        finally:
+            self.types.documents.__class__ = _SchemaContainer
+            del self.types.documents.shared
+            del self._shared
+            self.__class__ = Document
+
+    def load(self, location):
+        self.types.documents = _SharedSchemaContainer(self._shared, self.types.documents)
+        super().load(location)
+
+
+class SchemaGroup:
+    """XSD documents first parsed together (by one WSDL), shared as a unit.
+
+    Members refer to each other freely, so they are pickled together;
+    a group only refers to groups created before it.
+    """
+
+    __slots__ = ("key", "documents", "deps", "users", "size")
+
+    def __init__(self, key: str, documents: list, deps: dict):
+        self.key = key
+        self.documents = documents  # zeep SchemaDocuments, by location
+        self.deps = deps            # url -> (sha256, is_local) they were parsed from
+        self.users = 0              # documents holding the group (SharedSchemas.acquire)
+        self.size = None            # resident bytes, measured by the owner
+
+    @property
+    def locations(self) -> list:
+        return [document._location for document in self.documents]
+
+
+class SharedSchemas:
+    """Imported XSDs parsed once and shared by every document loaded with them.
+
+    After a WSDL is parsed, the XSDs it imported that are not shared yet are
+    ``adopt``-ed as a new :class:`SchemaGroup`; later documents import them
+    from the group instead of parsing them. A pickled document refers to
+    group members by persistent ID (group key, document index, component)
+    rather than containing them, and each group is pickled once on its own,
+    so documents read from the disk cache share them too. Groups are
+    reference-counted by the documents using them (``acquire`` /
+    ``release``) and dropped with the last one.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._groups = {}     # key -> SchemaGroup
+        self._locations = {}  # XSD location -> (SchemaGroup, index) serving new imports
+        self._pids = {}       # id(document or global component) -> persistent ID
+
+    def import_into(self, container, namespace, location):
+        """Add the shared XSD at ``location`` (and its imports) to a schema being parsed.
+
+        Returns the XSD's document, or None when it has not been shared.
+        """
+        with self._lock:
+            found = self._locations.get(location)
+        if found is None:
+            return None
+        group, index = found
+        document = group.documents[index]
+        if document._target_namespace != namespace:
+            return None
+        present = {id(d) for d in container.values()}
+        pending = [document]
+        while pending:
+            schema_document = pending.pop()
+            if id(schema_document) in present:
+                continue
+            present.add(id(schema_document))
+            container.add(schema_document)
+            for imported in schema_document._imports.values():
+                pending.extend(imported)
+        return document
+
+    def adopt(self, document: Document, deps: dict, cache=None, transport=None):
+        """Share the XSDs ``document`` parsed itself; returns the new group or None.
+
+        ``deps`` maps every URL the document was parsed from to its
+        ``(sha256, is_local)``. With ``cache`` the group is pickled for the
+        documents cached with references to it.
+        """
+        definitions = {location for _, location in document._definitions}
+        with self._lock:
+            counts, candidates = {}, []
+            for schema_document in document.types.documents:
+                location = schema_document._location
+                if schema_document._is_internal or not location or location in definitions \
+                        or location not in deps or id(schema_document) in self._pids:
+                    continue
+                counts[location] = counts.get(location, 0) + 1
+                candidates.append(schema_document)
+            # A location parsed into several documents (per namespace) is ambiguous
+            members = sorted((d for d in candidates if counts[d._location] == 1),
+                             key=lambda d: d._location)
+            if not members:
+                return None
+            key = _group_key([(d._location, deps[d._location][0]) for d in members])
+            if key in self._groups:
+                return None
+            group = SchemaGroup(key, members, {url: dep for url, dep in deps.items()
+                                               if url not in definitions})
+            self._register(group)
+        if cache is not None:
+            cache.put_schemas(group, transport or document.transport, self)
+        return group
+
+    def add(self, group: SchemaGroup) -> SchemaGroup:
+        """Register a group read from the cache; returns the one registered first."""
+        with self._lock:
+            existing = self._groups.get(group.key)
+            if existing is not None:
+                return existing
+            self._register(group)
+            return group
+
+    def persistent_id(self, obj, own_group: str = None):
+        """Return the persistent ID of a shared object outside ``own_group``, or None."""
+        pid = self._pids.get(id(obj))
+        if pid is None or pid[1] == own_group:
+            return None
+        return pid
+
+    def resolve(self, pid, cache=None, transport=None):
+        """Return the object a persistent ID refers to, reading its group if needed."""
+        _, key, index, attribute, name = pid
+        group = self._groups.get(key)
+        if group is None and cache is not None:
+            group = cache.get_schemas(key, transport, self)
+        if group is None:
+            raise LookupError(f"shared XSD group {key} is not available")
+        schema_document = group.documents[index]
+        if attribute is None:
+            return schema_document
+        return getattr(schema_document, attribute)[name]
+
+    def shared_ids(self, except_group: str = None) -> set:
+        """Return the ids of shared objects (outside ``except_group``)."""
+        with self._lock:
+            return {key for key, pid in self._pids.items() if pid[1] != except_group}
+
+    def groups_of(self, document: Document) -> list:
+        """Return the groups whose XSDs ``document`` uses."""
+        keys = []
+        for schema_document in document.types.documents:
+            pid = self._pids.get(id(schema_document))
+            if pid is not None and pid[3] is None and pid[1] not in keys:
+                keys.append(pid[1])
+        with self._lock:
+            return [self._groups[key] for key in keys if key in self._groups]
+
+    def deps_of(self, document: Document) -> dict:
+        """Return the URLs (and hashes) the shared XSDs in ``document`` were parsed from."""
+        deps = {}
+        for group in self.groups_of(document):
+            deps.update(group.deps)
+        return deps
+
+    def acquire(self, groups: list):
+        with self._lock:
+            for group in groups:
+                group.users += 1
+
+    def release(self, groups: list) -> list:
+        """Drop a use of each group; returns the groups dropped with it."""
+        dropped = []
+        with self._lock:
+            for group in groups:
+                group.users -= 1
+                if group.users <= 0 and self._groups.get(group.key) is group:
+                    self._unregister(group)
+                    dropped.append(group)
+        return dropped
+
+    def discard_stale(self, transport: BundleTransport):
+        """Stop importing shared XSDs whose bundled files have changed.
+
+        Documents parsed from them keep them until they are reloaded.
+        """
+        with self._lock:
+            for location, (group, _) in list(self._locations.items()):
+                if not deps_current(group.deps, transport):
+                    del self._locations[location]
+
+    def groups(self) -> list:
+        with self._lock:
+            return list(self._groups.values())
+
+    def _register(self, group: SchemaGroup):
+        """Index a group's documents and global components (lock held)."""
+        self._groups[group.key] = group
+        for index, schema_document in enumerate(group.documents):
+            self._locations.setdefault(schema_document._location, (group, index))
+            self._pids.setdefault(id(schema_document), ("xsd", group.key, index, None, None))
+            for attribute in _COMPONENTS:
+                for name, component in getattr(schema_document, attribute).items():
+                    self._pids.setdefault(id(component),
+                                          ("xsd", group.key, index, attribute, name))
+
+    def _unregister(self, group: SchemaGroup):
+        del self._groups[group.key]
+        for location, (owner, _) in list(self._locations.items()):
+            if owner is group:
+                del self._locations[location]
+        for schema_document in group.documents:
+            objects = [schema_document]
+            for attribute in _COMPONENTS:
+                objects.extend(getattr(schema_document, attribute).values())
+            for obj in objects:
+                pid = self._pids.get(id(obj))
+                if pid is not None and pid[1] == group.key:
+                    del self._pids[id(obj)]
+
+
+def _group_key(members: list) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{_CACHE_FORMAT}:{zeep.__version__}:{sys.version_info[:2]}:".encode())
+    for location, sha in members:
+        digest.update(f"{location}\0{sha}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def deps_current(deps: dict, transport: BundleTransport) -> bool:
+    """Check that every bundled dependency still has the content it was parsed from."""
+    for url, (sha, is_local) in deps.items():
+        if not is_local:
+            continue
+        local = transport.local_path(url)
+        try:
+            with open(local, "rb") as fh:
+                if hashlib.sha256(fh.read()).hexdigest() != sha:
+                    return False
+        except OSError:
+            return False
+    return True
+
+
+class DocumentCache:
+    """On-disk cache of parsed zeep documents keyed by WSDL content hash."""
+
+    def __init__(self, cache_dir: str = WSDL_CACHE_DIR):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self._lock = threading.Lock()  # counters: documents load on many threads
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, wsdl_url: str, content: bytes) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{_CACHE_FORMAT}:{zeep.__version__}:{sys.version_info[:2]}:".encode())
+        digest.update(wsdl_url.encode("utf-8"))
+        digest.update(content)
+        return digest.hexdigest()
+
+    def get(self, key: str, transport: BundleTransport, schemas: SharedSchemas = None):
+        """Return the cached document, or None when missing or out of date.
+
+        The URLs it was parsed from are recorded in ``transport.loaded``.
+        """
+        path = os.path.join(self.cache_dir, key + ".pickle")
+        document = None
+        try:
+            with open(path, "rb") as fh:
+                deps = pickle.load(fh)
+                if deps_current(deps, transport):
+                    document = _DocumentUnpickler(fh, transport, schemas, self).load()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Discarding unreadable WSDL cache entry %s: %s", path, e)
+        with self._lock:
+            if document is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if document is not None:
+            transport.loaded.update(deps)
+        return document
+
+    def put(self, key: str, document: Document, transport: BundleTransport,
+            schemas: SharedSchemas = None):
+        """Persist a parsed document; failures only cost a re-parse next time."""
+        self._write(key + ".pickle", transport.loaded, document, document.transport,
+                    schemas, None, document.location)
+
+    def get_schemas(self, key: str, transport: BundleTransport, schemas: SharedSchemas):
+        """Read a shared XSD group into ``schemas``; None when missing or out of date."""
+        path = os.path.join(self.cache_dir, key + ".xsd.pickle")
+        try:
+            with open(path, "rb") as fh:
+                deps = pickle.load(fh)
+                if not deps_current(deps, transport):
+                    return None
+                documents = _DocumentUnpickler(fh, transport, schemas, self).load()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Discarding unreadable XSD cache entry %s: %s", path, e)
+            return None
+        return schemas.add(SchemaGroup(key, documents, deps))
+
+    def put_schemas(self, group: SchemaGroup, transport: BundleTransport,
+                    schemas: SharedSchemas):
+        """Persist a shared XSD group, referring to other groups by persistent ID."""
+        self._write(group.key + ".xsd.pickle", group.deps, group.documents, transport,
+                    schemas, group.key, group.locations[0])
+
+    def _write(self, name, deps, obj, transport, schemas, own_group, label):
+        buffer = io.BytesIO()
+        try:
+            pickle.dump(deps, buffer, protocol=pickle.HIGHEST_PROTOCOL)
+            _DocumentPickler(buffer, transport, schemas, own_group).dump(obj)
+        except Exception as e:
+            logger.warning("Could not cache parsed WSDL %s: %s", label, e)
+            return
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "wb") as fh:
+                fh.write(buffer.getvalue())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write WSDL cache entry %s: %s", path, e)
+
+
+_default_cache = DocumentCache()
+
+
+def document_cache_stats() -> dict:
+    """Hit/miss counters of the shared parsed-document cache."""
+    with _default_cache._lock:
+        return {"hit": _default_cache.hits, "miss": _default_cache.misses}
+
+
+def load_document(wsdl_url: str, settings: Settings, transport: BundleTransport = None,
+                  cache: DocumentCache = None, schemas: SharedSchemas = None) -> Document:
+    """Load a parsed WSDL document from the bundle, using the on-disk cache.
+
+    With ``schemas`` the XSDs it imports are taken from (and added to) the
+    shared store. Afterwards ``transport.loaded`` holds every URL the
+    document was parsed from.
+    """
+    transport = transport or BundleTransport()
+    cache = cache or _default_cache
+    content = transport.load(wsdl_url)
+    key = cache.key(wsdl_url, content)
+
+    document = cache.get(key, transport, schemas)
+    if document is not None:
+        if schemas is not None:
+            # Cached without sharing (or before its XSDs were shared): share them now
+            schemas.adopt(document, transport.loaded, cache, transport)
+        return document
+
+    transport.loaded.clear()
+    if schemas is None:
+        document = Document(wsdl_url, transport, settings=settings)
+    else:
+        document = _SharedDocument(wsdl_url, transport, settings, schemas)
+        # Not loaded by this transport, but parsed from
+        transport.loaded.update(schemas.deps_of(document))
+        schemas.adopt(document, transport.loaded, cache, transport)
+    cache.put(key, document, transport, schemas)
+    return document
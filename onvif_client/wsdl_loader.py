@@ -1,24 +1,40 @@
 """WSDL loading and service/binding/operation discovery using zeep."""
 
+import hashlib
+import json
 import operator
-from zeep.client import CachingClient, Settings
+import threading
+import weakref
+
+from .schema_registry import SchemaRegistry, shared_registry
+from .type_introspector import introspect_operation, referenced_types
+from .wsdl_bundle import document_cache_stats
 
 
 class WSDLLoader:
-    """Loads ONVIF WSDL files and discovers available bindings and operations."""
+    """Loads ONVIF WSDL files and discovers available bindings and operations.
 
-    def __init__(self):
-        self._clients = {}  # wsdl_url -> CachingClient
+    Parsed documents come from ``registry`` (the process-wide
+    :class:`SchemaRegistry` by default), shared with the executors; only the
+    introspected parameter schemas are kept here.
+    """
 
-    def _get_settings(self):
-        settings = Settings()
-        settings.strict = False
-        settings.xml_huge_tree = True
-        return settings
+    def __init__(self, registry: SchemaRegistry = None):
+        self.registry = registry or shared_registry()
+        self._schemas = {}  # (wsdl_url, binding, operation) -> parameter schema
+        self._types = {}  # wsdl_url -> (type table, anonymous type keys)
+        self._binding_schemas = {}  # (wsdl_url, binding) -> (schemas, types, etag)
+        self._documents = {}  # wsdl_url -> weak reference to the document last loaded
+        self._schema_lock = threading.RLock()
+        self._stats = {"schema": {"hit": 0, "miss": 0}}
 
-    def load_wsdl(self, wsdl_url: str) -> dict:
+    def load_wsdl(self, wsdl_url: str, refresh: bool = False) -> dict:
         """Load a WSDL and return its structure.
 
+        With ``refresh`` the bundled files a loaded WSDL was parsed from are
+        checked and it is loaded again if any of them changed. Memoized
+        parameter schemas are only dropped when the document did change.
+
         Returns:
             {
                 "bindings": {
@@ -27,17 +43,23 @@ class WSDLLoader:
                         "local_name": "BindingName",
                         "operations": ["Op1", "Op2", ...]
                     }
-                }
+                },
+                "reloaded": True if schemas memoized for an earlier document were dropped,
             }
         """
-        client = CachingClient(wsdl=wsdl_url, settings=self._get_settings())
-        self._clients[wsdl_url] = client
+        document = self.registry.document(wsdl_url, reload=refresh)
+        with self._schema_lock:
+            previous = self._documents.get(wsdl_url)
+            reloaded = previous is not None and previous() is not document
+            self._documents[wsdl_url] = weakref.ref(document)
+        if reloaded:
+            self._forget_schemas(wsdl_url)
 
-        result = {"bindings": {}}
+        result = {"bindings": {}, "reloaded": reloaded}
 
         # ONVIF WSDLs typically don't define <service> elements,
-        # so iterate client.wsdl.bindings directly
-        for binding_qname, binding in client.wsdl.bindings.items():
+        # so iterate the document's bindings directly
+        for binding_qname, binding in document.bindings.items():
             qname = str(binding_qname)
             local_name = qname.split("}")[-1] if "}" in qname else qname
 
@@ -56,8 +78,79 @@ class WSDLLoader:
         return result
 
     def get_client(self, wsdl_url: str):
-        """Return cached CachingClient for the given WSDL URL."""
-        if wsdl_url not in self._clients:
-            client = CachingClient(wsdl=wsdl_url, settings=self._get_settings())
-            self._clients[wsdl_url] = client
-        return self._clients[wsdl_url]
+        """Return a Client bound to the registry's document for the WSDL URL."""
+        return self.registry.client(wsdl_url)
+
+    def get_operation_schema(self, wsdl_url: str, binding_name: str,
+                             operation_name: str) -> tuple:
+        """Return ``(params, types)`` for one operation, introspected once.
+
+        ``types`` holds only the complex types the parameters refer to.
+        """
+        key = (wsdl_url, binding_name, operation_name)
+        with self._schema_lock:
+            params = self._schemas.get(key)
+            table, anonymous = self._types.setdefault(wsdl_url, ({}, {}))
+            self._stats["schema"]["hit" if params is not None else "miss"] += 1
+            if params is None:
+                client = self.get_client(wsdl_url)
+                params = introspect_operation(client, binding_name, operation_name,
+                                              table, anonymous)
+                self._schemas[key] = params
+            return params, referenced_types(params, table)
+
+    def get_binding_schemas(self, wsdl_url: str, binding_name: str) -> tuple:
+        """Return ``(schemas, types, etag)`` for every operation of a binding.
+
+        ``schemas`` maps operation name to its parameters and ``types`` is the
+        type table they share. The ETag is a hash of both, so it only changes
+        when the WSDL does.
+        """
+        key = (wsdl_url, binding_name)
+        cached = self._binding_schemas.get(key)
+        if cached is not None:
+            return cached
+
+        with self._schema_lock:
+            cached = self._binding_schemas.get(key)
+            if cached is not None:
+                return cached
+            binding = self.registry.document(wsdl_url).bindings.get(binding_name)
+            if binding is None:
+                raise ValueError(f"Binding not found: {binding_name}")
+            schemas, types = {}, {}
+            for name in sorted(binding._operations):
+                schemas[name], op_types = self.get_operation_schema(
+                    wsdl_url, binding_name, name)
+                types.update(op_types)
+            body = json.dumps([schemas, types], sort_keys=True, separators=(",", ":"))
+            etag = hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+            cached = (schemas, types, etag)
+            self._binding_schemas[key] = cached
+        return cached
+
+    def stats(self) -> dict:
+        """Return cache hit/miss counters (schema registry, operation schemas,
+        parsed-document cache) and the registry's resident size."""
+        registry = self.registry.stats()
+        with self._schema_lock:
+            schema = dict(self._stats["schema"])
+        return {
+            "registry": {"hit": registry["hits"], "miss": registry["misses"]},
+            "schema": schema,
+            "document": document_cache_stats(),
+            "wsdls": registry["wsdls"],
+            "xsds": registry["xsds"],
+            "resident_bytes": {"own": registry["own_bytes"], "shared": registry["shared_bytes"]},
+            "max_bytes": registry["max_bytes"],
+            "evictions": registry["evictions"],
+        }
+
+    def _forget_schemas(self, wsdl_url: str):
+        """Drop memoized schemas of a (re)loaded WSDL."""
+        with self._schema_lock:
+            for key in [k for k in self._schemas if k[0] == wsdl_url]:
+                del self._schemas[key]
+            for key in [k for k in self._binding_schemas if k[0] == wsdl_url]:
+                del self._binding_schemas[key]
+            self._types.pop(wsdl_url, None)
@@ -0,0 +1,73 @@
+"""Bounded in-memory store of raw SOAP envelopes for on-demand viewing."""
+
+import re
+import threading
+import uuid
+from collections import OrderedDict
+
+from lxml import etree
+
+from config import XML_STORE_MAX_BYTES, XML_STORE_MAX_ENTRIES
+
+DIRECTIONS = ("request", "response")
+
+# A WS-Security header element, matched on the raw bytes
+_SECURITY_RE = re.compile(
+    rb"<(?:[\w.-]+:)?Security\b[^>]*?(?:/>|>.*?</(?:[\w.-]+:)?Security\s*>)", re.S)
+
+
+class XMLStore:
+    """Keep raw request/response bytes of recent calls under a result ID.
+
+    Envelopes are stored exactly as sent/received and only formatted when
+    someone asks for them. The oldest entries are dropped once either the
+    entry count or the total byte size exceeds its limit.
+    """
+
+    def __init__(self, max_entries: int = XML_STORE_MAX_ENTRIES,
+                 max_bytes: int = XML_STORE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # result_id -> (request_bytes, response_bytes)
+        self._bytes = 0
+
+    def put(self, request_xml: bytes, response_xml: bytes) -> str:
+        """Store one call's envelopes and return the new result ID."""
+        result_id = uuid.uuid4().hex
+        request_xml = request_xml or b""
+        response_xml = response_xml or b""
+        with self._lock:
+            self._entries[result_id] = (request_xml, response_xml)
+            self._bytes += len(request_xml) + len(response_xml)
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._bytes > self.max_bytes):
+                _, (req, res) = self._entries.popitem(last=False)
+                self._bytes -= len(req) + len(res)
+        return result_id
+
+    def get(self, result_id: str, direction: str):
+        """Return the raw bytes for ``direction``, or None if unknown/evicted."""
+        with self._lock:
+            entry = self._entries.get(result_id)
+        if entry is None:
+            return None
+        return entry[DIRECTIONS.index(direction)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes,
+                    "max_entries": self.max_entries, "max_bytes": self.max_bytes}
+
+
+def pretty_xml(raw: bytes) -> str:
+    """Pretty-print raw XML bytes; returns the text unchanged if it doesn't parse."""
+    if not raw:
+        return ""
+    parser = etree.XMLParser(remove_blank_text=True, resolve_entities=False,
+                             huge_tree=True)
+    try:
+        root = etree.fromstring(raw, parser)
+    except etree.XMLSyntaxError:
+        return raw.decode("utf-8", errors="replace")
+    return etree.tostring(root, pretty_print=True, encoding="unicode")
@@ -13,6 +13,7 @@ a = Analysis(
     datas=[
         ("templates", "templates"),
         ("static", "static"),
+        ("wsdl", "wsdl"),
     ],
     hiddenimports=[
         "zeep.plugins",
@@ -0,0 +1,102 @@
+"""ONVIF Command Tester - production server: pre-forked gunicorn workers.
+
+Usage:
+    pip install -r requirements-serve.txt
+    python serve.py                                 # SERVE_WORKERS workers on DEFAULT_PORT
+    python serve.py --workers 8 --bind 0.0.0.0:8080
+
+Linux/macOS only (workers are forked); on Windows use run.bat or app.py.
+
+With ``SERVE_PRELOAD`` the app is imported and every preset WSDL parsed
+once in the parent process; the parsed documents (with the XSDs they
+share) and parameter schemas are then frozen out of the garbage
+collector's reach (``gc.freeze``) so the forked workers share them
+copy-on-write instead of each parsing its own. Without it, each worker
+warms up in the background and ``GET /api/ready`` answers 503 until it
+is done.
+
+Workers are replaced gracefully after ``SERVE_MAX_REQUESTS`` requests
+(plus jitter): a retiring worker stops accepting and finishes its requests.
+Each worker has its own deferred XML, event subscriptions, load tests and
+/metrics counters, so the UI switches to inline XML with several workers;
+use ``--workers 1`` (or app.py) for the Event Monitor and load tests.
+History, snapshots and the parsed-WSDL disk cache are shared.
+"""
+
+import argparse
+import gc
+
+from gunicorn.app.base import BaseApplication
+
+from config import (
+    DEFAULT_PORT,
+    SERVE_GRACEFUL_TIMEOUT,
+    SERVE_MAX_REQUESTS,
+    SERVE_MAX_REQUESTS_JITTER,
+    SERVE_PRELOAD,
+    SERVE_THREADS,
+    SERVE_TIMEOUT,
+    SERVE_WORKERS,
+)
+
+
+def post_fork(server, worker):
+    # The parent keeps collection off after freezing; workers collect normally
+    gc.enable()
+
+
+class ONVIFServer(BaseApplication):
+    """gunicorn application for ``app.app`` with the warm-up wired in."""
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        if self.cfg.preload_app:
+            # Objects built now are shared with every worker: don't let a
+            # collection in between touch (and so copy) their pages
+            gc.disable()
+            import app as flask_app
+
+            flask_app.warmup.run()
+            gc.collect()
+            gc.freeze()
+        else:
+            import app as flask_app
+
+            flask_app.warmup.start()
+        if self.cfg.workers > 1:
+            flask_app.app.config["ONVIF_XML_MODE"] = "inline"
+        return flask_app.app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ONVIF Command Tester production server")
+    parser.add_argument("--bind", default=f"0.0.0.0:{DEFAULT_PORT}")
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--threads", type=int, default=SERVE_THREADS)
+    parser.add_argument("--no-preload", action="store_true",
+                        help="import and warm up in each worker instead of the parent")
+    args = parser.parse_args(argv)
+
+    ONVIFServer({
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": "gthread",
+        "threads": args.threads,
+        "preload_app": SERVE_PRELOAD and not args.no_preload,
+        "max_requests": SERVE_MAX_REQUESTS,
+        "max_requests_jitter": SERVE_MAX_REQUESTS_JITTER,
+        "graceful_timeout": SERVE_GRACEFUL_TIMEOUT,
+        "timeout": SERVE_TIMEOUT,
+        "post_fork": post_fork,
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,9 @@
     // ── State ──────────────────────────────────────────────
     let currentBindings = {};    // { qualifiedName: { local_name, operations } }
     let currentWsdlUrl = "";
+    let deferredXml = null;      // { resultId, loaded: { request, response } } for the shown result
+    let shownResult = null;      // the result in the Result panel (Raw XML "Load last request")
+    const bindingSchemaCache = {};  // "wsdl\nbinding" -> Promise<{ schemas, types }>
 
     // ── DOM Elements ───────────────────────────────────────
     const $ = (sel) => document.querySelector(sel);
@@ -26,6 +29,8 @@
     const paramsContainer = $("#params-container");
     const paramsForm = $("#params-form");
     const btnExecute = $("#btn-execute");
+    const btnFleet = $("#btn-fleet");
+    const btnLoadTest = $("#btn-load-test");
     const btnTestConn = $("#btn-test-connection");
     const btnCheckProfiles = $("#btn-check-profiles");
     const operationFilterContainer = $("#operation-filter-container");
@@ -40,6 +45,7 @@
     const resultJson = $("#result-json");
     const resultReqXml = $("#result-req-xml");
     const resultResXml = $("#result-res-xml");
+    const resultTiming = $("#result-timing");
     const statusBar = $("#status-bar");
     const statusBadge = $("#status-badge");
     const statusTime = $("#status-time");
@@ -124,7 +130,9 @@
         btnLoadWsdl.disabled = true;
 
         try {
-            const result = await apiCall("/api/load-wsdl", { wsdl_url: url });
+            // Loading the WSDL already shown again checks it for changes
+            const result = await apiCall("/api/load-wsdl",
+                { wsdl_url: url, refresh: url === currentWsdlUrl });
 
             if (!result.success) {
                 showToast("Failed to load WSDL: " + result.error);
@@ -134,6 +142,12 @@
 
             currentBindings = result.bindings;
             currentWsdlUrl = url;
+            // The WSDL changed since its schemas were fetched
+            if (result.reloaded) {
+                Object.keys(bindingSchemaCache)
+                    .filter(key => key.startsWith(`${url}\n`))
+                    .forEach(key => delete bindingSchemaCache[key]);
+            }
 
             // Populate binding dropdown
             bindingSelect.innerHTML = "";
@@ -196,6 +210,8 @@
             opt.textContent = "No matching operations";
             operationSelect.appendChild(opt);
             btnExecute.disabled = true;
+            btnFleet.disabled = true;
+            btnLoadTest.disabled = true;
             paramsContainer.style.display = "none";
         } else {
             filtered.forEach(op => {
@@ -211,6 +227,8 @@
                 onOperationChange();
             }
             btnExecute.disabled = false;
+            btnFleet.disabled = false;
+            btnLoadTest.disabled = false;
         }
         btnClearFilter.style.display = query ? "inline-block" : "none";
     }
@@ -222,6 +240,8 @@
             operationSelect.innerHTML = '<option value="">-- Select binding first --</option>';
             operationSelect.disabled = true;
             btnExecute.disabled = true;
+            btnFleet.disabled = true;
+            btnLoadTest.disabled = true;
             paramsContainer.style.display = "none";
             operationFilterContainer.style.display = "none";
             return;
@@ -243,6 +263,8 @@
 
         operationSelect.disabled = false;
         btnExecute.disabled = false;
+        btnFleet.disabled = false;
+        btnLoadTest.disabled = false;
 
         // Auto-load params for first operation
         if (ops.length > 0) {
@@ -262,15 +284,21 @@
         }
 
         try {
-            const result = await apiCall("/api/operation-params", {
-                wsdl_url: currentWsdlUrl,
-                binding_name: bindingName,
-                operation_name: operationName,
-            });
+            const bulk = await getBindingSchemas(currentWsdlUrl, bindingName);
+            if (bindingSelect.value !== bindingName || operationSelect.value !== operationName) {
+                return;  // selection changed while loading
+            }
+            const result = bulk && bulk.schemas[operationName]
+                ? { success: true, params: bulk.schemas[operationName], types: bulk.types }
+                : await apiCall("/api/operation-params", {
+                    wsdl_url: currentWsdlUrl,
+                    binding_name: bindingName,
+                    operation_name: operationName,
+                });
 
             if (result.success) {
                 paramsContainer.style.display = "block";
-                ParamBuilder.buildForm(result.params, paramsForm);
+                ParamBuilder.buildForm(result.params, paramsForm, "", result.types);
             } else {
                 paramsContainer.style.display = "none";
                 showToast("Failed to load params: " + result.error);
@@ -280,6 +308,29 @@
         }
     }
 
+    /**
+     * Fetch every operation schema of a binding once (ETag-revalidated by the
+     * browser cache). Resolves to null on failure so callers fall back to
+     * the per-operation endpoint.
+     */
+    function getBindingSchemas(wsdl, bindingName) {
+        const key = `${wsdl}\n${bindingName}`;
+        if (!bindingSchemaCache[key]) {
+            const query = new URLSearchParams({ wsdl_url: wsdl, binding_name: bindingName });
+            bindingSchemaCache[key] = fetch(`/api/binding-schemas?${query}`)
+                .then(resp => resp.json())
+                .then(result => {
+                    if (!result.success) throw new Error(result.error);
+                    return { schemas: result.schemas, types: result.types };
+                })
+                .catch(() => {
+                    delete bindingSchemaCache[key];
+                    return null;
+                });
+        }
+        return bindingSchemaCache[key];
+    }
+
     // ── Execute Operation ──────────────────────────────────
     async function executeOperation() {
         const ip = cameraIp.value.trim();
@@ -317,6 +368,7 @@
                 password: pass,
                 params: params,
                 use_https: useHttps.checked,
+                xml_mode: document.body.dataset.xmlMode || "deferred",
             });
 
             displayResult(result);
@@ -339,6 +391,7 @@
 
     // ── Display Result ─────────────────────────────────────
     function displayResult(result) {
+        shownResult = result;
         // JSON
         if (result.result_json !== null && result.result_json !== undefined) {
             const jsonStr = JSON.stringify(result.result_json, null, 2);
@@ -349,15 +402,36 @@
             resultJson.innerHTML = '<span class="text-muted">No result.</span>';
         }
 
-        // Request XML
-        resultReqXml.innerHTML = result.request_xml
-            ? highlightXml(result.request_xml)
-            : '<span class="text-muted">No request captured.</span>';
+        // Request / Response XML (deferred: fetched when the tab is opened)
+        deferredXml = result.result_id
+            ? { resultId: result.result_id, loaded: { request: false, response: false } }
+            : null;
+        ["req", "res"].forEach(dir => {
+            const direction = dir === "req" ? "request" : "response";
+            const toolbar = $(`#${dir}-xml-toolbar`);
+            toolbar.style.display = deferredXml ? "block" : "none";
+            if (deferredXml) {
+                $(`#${dir}-xml-download`).href =
+                    `/api/result-xml/${deferredXml.resultId}/${direction}?format=raw`;
+            }
+        });
+        if (deferredXml) {
+            resultReqXml.innerHTML = '<span class="text-muted">Loading request XML...</span>';
+            resultResXml.innerHTML = '<span class="text-muted">Loading response XML...</span>';
+            const activePane = document.querySelector(".tab-pane.show.active");
+            if (activePane) loadDeferredXml(activePane.id);
+        } else {
+            resultReqXml.innerHTML = result.request_xml
+                ? highlightXml(result.request_xml)
+                : '<span class="text-muted">No request captured.</span>';
+            resultResXml.innerHTML = result.response_xml
+                ? highlightXml(result.response_xml)
+                : '<span class="text-muted">No response captured.</span>';
+        }
 
-        // Response XML
-        resultResXml.innerHTML = result.response_xml
-            ? highlightXml(result.response_xml)
-            : '<span class="text-muted">No response captured.</span>';
+        resultTiming.innerHTML = result.timings
+            ? renderTimings(result.timings)
+            : '<span class="text-muted">No timing recorded.</span>';
 
         // Status bar
         statusBar.style.display = "flex";
@@ -366,6 +440,10 @@
         } else {
             statusBadge.innerHTML = '<span class="badge bg-danger">FAILED</span>';
         }
+        if (result.cached) {
+            statusBadge.innerHTML += ` <span class="badge bg-info text-dark" title="Answered from the response cache">CACHED ${result.cache_age_s}s ago</span>`;
+        }
+        statusBadge.title = result.xaddr || "";
         statusTime.textContent = result.execution_time_ms
             ? `${result.execution_time_ms} ms`
             : "";
@@ -377,6 +455,78 @@
         displayResponseValues(result.success ? result.result_json : null);
     }
 
+    const PHASE_LABELS = {
+        clock: "Device clock sync",
+        resolve: "Endpoint lookup",
+        acquire: "Client acquisition",
+        build: "Envelope build",
+        wsse: "WS-Security digest",
+        queue: "Connection wait",
+        connect: "DNS + TCP connect",
+        tls: "TLS handshake",
+        server: "Camera (to first byte)",
+        download: "Response transfer",
+        parse: "Response parsing",
+        serialize: "JSON conversion",
+        xml: "XML capture",
+    };
+
+    /**
+     * Render the per-phase breakdown of one call as a waterfall.
+     * @param {object} t - result.timings (see PhaseTimer.result)
+     */
+    function renderTimings(t) {
+        const total = t.total_ms || 1;
+        const rows = t.phases.map(p => `
+            <div class="timing-row" title="${p.group}">
+                <div class="timing-label">${PHASE_LABELS[p.phase] || p.phase}</div>
+                <div class="timing-track">
+                    <div class="timing-bar timing-${p.group}"
+                         style="left:${(p.start_ms / total * 100).toFixed(2)}%;width:${(p.duration_ms / total * 100).toFixed(2)}%"></div>
+                </div>
+                <div class="timing-ms">${p.duration_ms.toFixed(2)} ms</div>
+            </div>`).join("");
+        const g = t.groups;
+        const notes = [
+            t.new_client ? "new zeep client" : "pooled client",
+            t.new_connections ? `${t.new_connections} new connection(s)` : "keep-alive connection reused",
+        ].join(" &middot; ");
+        return `
+            <div class="mb-2">Total <strong>${t.total_ms.toFixed(2)} ms</strong> &middot; ${notes}</div>
+            <div class="timing-legend small mb-2">
+                <span class="timing-camera"></span>Camera ${g.camera.toFixed(2)} ms
+                <span class="timing-network"></span>Network ${g.network.toFixed(2)} ms
+                <span class="timing-tool"></span>Tool ${g.tool.toFixed(2)} ms
+                <span class="timing-setup"></span>Setup ${g.setup.toFixed(2)} ms
+            </div>
+            ${rows}`;
+    }
+
+    /**
+     * Fetch and show a deferred envelope the first time its tab is opened.
+     * @param {string} paneId - "tab-req-xml" or "tab-res-xml" (others ignored)
+     */
+    async function loadDeferredXml(paneId) {
+        const direction = { "tab-req-xml": "request", "tab-res-xml": "response" }[paneId];
+        if (!deferredXml || !direction || deferredXml.loaded[direction]) return;
+
+        const state = deferredXml;
+        state.loaded[direction] = true;
+        const target = direction === "request" ? resultReqXml : resultResXml;
+        try {
+            const resp = await fetch(`/api/result-xml/${state.resultId}/${direction}?format=pretty`);
+            const result = await resp.json();
+            if (deferredXml !== state) return;  // a newer result is shown
+            target.innerHTML = result.success && result.xml
+                ? highlightXml(result.xml)
+                : `<span class="text-muted">${escapeHtml(result.error || `No ${direction} captured.`)}</span>`;
+        } catch (e) {
+            if (deferredXml !== state) return;
+            state.loaded[direction] = false;
+            target.innerHTML = `<span style="color:#f44747">Error: ${escapeHtml(e.message)}</span>`;
+        }
+    }
+
     // ── Response Values Panel ──────────────────────────────
     function displayResponseValues(resultJson) {
         if (!resultJson) {
@@ -498,6 +648,7 @@
                 password: pass,
                 params: {},
                 use_https: useHttps.checked,
+                xml_mode: "none",
             });
 
             if (result.success) {
@@ -620,6 +771,850 @@
         body.innerHTML = `<div class="row g-2">${cards}</div>${svcTable}`;
     }
 
+    // ── Fleet Execution ────────────────────────────────────
+    function openFleetModal() {
+        const operationName = operationSelect.disabled ? "" : operationSelect.value;
+        $("#fleet-operation").textContent = operationName;
+        $("#btn-fleet-run").disabled = !(bindingSelect.value && operationName);
+        bootstrap.Modal.getOrCreateInstance(document.getElementById("fleet-modal")).show();
+    }
+
+    function fleetRequestBase() {
+        return {
+            devices: $("#fleet-devices").value.trim(),
+            username: cameraUser.value.trim(),
+            password: cameraPass.value,
+            use_https: useHttps.checked,
+            max_workers: parseInt($("#fleet-workers").value) || 32,
+            device_timeout: parseFloat($("#fleet-timeout").value) || 10,
+        };
+    }
+
+    async function runFleet() {
+        const devices = $("#fleet-devices").value.trim();
+        if (!devices) {
+            showToast("Please enter a device list.");
+            return;
+        }
+
+        const btnRun = $("#btn-fleet-run");
+        const progress = $("#fleet-progress");
+        const tbody = $("#fleet-results");
+        tbody.innerHTML = "";
+        $("#fleet-results-head").innerHTML =
+            '<tr><th>Device</th><th>Status</th><th class="text-end">ms</th><th>Detail</th></tr>';
+        $("#fleet-summary").innerHTML = "";
+        progress.textContent = "Running...";
+        btnRun.disabled = true;
+
+        let done = 0;
+        let failed = 0;
+        try {
+            const resp = await fetch("/api/fleet-execute", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({
+                    ...fleetRequestBase(),
+                    wsdl_url: currentWsdlUrl,
+                    binding_name: bindingSelect.value,
+                    operation_name: operationSelect.value,
+                    params: ParamBuilder.collectParams(paramsForm),
+                    xml_mode: "none",  // the fleet table doesn't show envelopes
+                }),
+            });
+            if (!(resp.headers.get("content-type") || "").includes("application/x-ndjson")) {
+                const err = await resp.json();
+                throw new Error(err.error || `HTTP ${resp.status}`);
+            }
+
+            const reader = resp.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = "";
+            while (true) {
+                const { value, done: eof } = await reader.read();
+                if (eof) break;
+                buffer += decoder.decode(value, { stream: true });
+                let nl;
+                while ((nl = buffer.indexOf("\n")) >= 0) {
+                    const line = buffer.slice(0, nl).trim();
+                    buffer = buffer.slice(nl + 1);
+                    if (!line) continue;
+                    const event = JSON.parse(line);
+                    if (event.type === "result") {
+                        done++;
+                        if (!event.success) failed++;
+                        tbody.insertAdjacentHTML("beforeend", renderFleetRow(event));
+                        progress.textContent = `${done} done, ${failed} failed`;
+                    } else if (event.type === "summary") {
+                        $("#fleet-summary").innerHTML = renderFleetSummary(event);
+                    } else if (event.type === "error") {
+                        showToast(event.error);
+                    }
+                }
+            }
+        } catch (e) {
+            showToast("Fleet error: " + e.message);
+        } finally {
+            btnRun.disabled = false;
+        }
+    }
+
+    function renderFleetRow(event) {
+        const dev = event.device;
+        const badge = event.success
+            ? '<span class="badge bg-success">OK</span>'
+            : '<span class="badge bg-danger">FAIL</span>';
+        const detail = event.success
+            ? JSON.stringify(event.result_json)
+            : event.error;
+        return `
+            <tr>
+                <td class="text-nowrap">${escapeHtml(`${dev.ip}:${dev.port}`)}</td>
+                <td>${badge}</td>
+                <td class="text-end">${event.elapsed_ms}</td>
+                <td class="text-break small" style="max-width:480px">${escapeHtml((detail || "").slice(0, 300))}</td>
+            </tr>`;
+    }
+
+    function renderFleetSummary(s) {
+        const lat = s.latency_ms || {};
+        return `
+            <div class="alert alert-secondary py-1 px-2 mt-2 mb-0 small">
+                <strong>${s.succeeded}/${s.total}</strong> succeeded in ${s.wall_time_ms} ms
+                &middot; ${s.throughput_per_sec} devices/s
+                &middot; p50 ${lat.p50 ?? "-"} / p95 ${lat.p95 ?? "-"} / p99 ${lat.p99 ?? "-"} / max ${lat.max ?? "-"} ms
+            </div>`;
+    }
+
+    async function scanFleetProfiles() {
+        const req = fleetRequestBase();
+        if (!req.devices) {
+            showToast("Please enter a device list.");
+            return;
+        }
+
+        const btnScan = $("#btn-fleet-scan");
+        const progress = $("#fleet-progress");
+        $("#fleet-summary").innerHTML = "";
+        $("#fleet-results").innerHTML = "";
+        progress.textContent = "Scanning profiles...";
+        btnScan.disabled = true;
+
+        try {
+            const result = await apiCall("/api/scan-profiles", req);
+            if (!result.success) {
+                showToast("Scan failed: " + result.error);
+                progress.textContent = "";
+                return;
+            }
+            const keys = result.profile_keys;
+            $("#fleet-results-head").innerHTML = `<tr><th>Device</th>${
+                keys.map(k => `<th class="text-center" title="${escapeHtml(result.profile_details[k].name)}">${escapeHtml(k)}</th>`).join("")
+            }<th>Detail</th></tr>`;
+            $("#fleet-results").innerHTML = result.rows.map(row => {
+                const dev = row.device;
+                const cells = keys.map(k => `<td class="text-center">${
+                    !row.success ? "" : row.profiles[k]
+                        ? '<i class="bi bi-check-circle-fill text-success"></i>'
+                        : '<i class="bi bi-dash text-secondary"></i>'
+                }</td>`).join("");
+                const detail = row.success
+                    ? (row.cached ? '<span class="text-muted">cached</span>' : "")
+                    : `<span class="text-danger">${escapeHtml((row.error || "").slice(0, 200))}</span>`;
+                return `<tr><td class="text-nowrap">${escapeHtml(`${dev.ip}:${dev.port}`)}</td>${cells}<td class="small">${detail}</td></tr>`;
+            }).join("");
+            const ok = result.rows.filter(r => r.success).length;
+            progress.textContent = `${ok}/${result.rows.length} devices scanned in ${result.execution_time_ms} ms`;
+        } catch (e) {
+            showToast("Scan error: " + e.message);
+            progress.textContent = "";
+        } finally {
+            btnScan.disabled = false;
+        }
+    }
+
+    async function exportFleetProfilesCsv() {
+        const req = fleetRequestBase();
+        if (!req.devices) {
+            showToast("Please enter a device list.");
+            return;
+        }
+        try {
+            const resp = await fetch("/api/scan-profiles", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ ...req, format: "csv" }),
+            });
+            if (!resp.ok) {
+                const err = await resp.json();
+                throw new Error(err.error || `HTTP ${resp.status}`);
+            }
+            const url = URL.createObjectURL(await resp.blob());
+            const a = document.createElement("a");
+            a.href = url;
+            a.download = "onvif_profiles.csv";
+            a.click();
+            URL.revokeObjectURL(url);
+        } catch (e) {
+            showToast("Export error: " + e.message);
+        }
+    }
+
+    // ── Load Test ──────────────────────────────────────────
+    let loadTestRunId = null;
+
+    function openLoadTestModal() {
+        $("#load-test-operation").textContent = `${operationSelect.value} @ ${cameraIp.value.trim()}`;
+        bootstrap.Modal.getOrCreateInstance(document.getElementById("load-test-modal")).show();
+    }
+
+    function parseLoadStages(text) {
+        // One "duration,rate" pair per line
+        return text.split("\n").map(l => l.trim()).filter(Boolean).map(line => {
+            const [duration, rate] = line.split(/[,\s]+/).map(Number);
+            if (!(duration > 0) || !(rate >= 0)) throw new Error(`Invalid stage "${line}"`);
+            return { duration, rate };
+        });
+    }
+
+    async function runLoadTest() {
+        const ip = cameraIp.value.trim();
+        const user = cameraUser.value.trim();
+        if (!ip || !user) {
+            showToast("Please enter camera IP and username.");
+            return;
+        }
+        let stages;
+        try {
+            stages = parseLoadStages($("#load-test-stages").value);
+        } catch (e) {
+            showToast(e.message);
+            return;
+        }
+
+        const btnStart = $("#btn-load-test-start");
+        const btnStop = $("#btn-load-test-stop");
+        const progress = $("#load-test-progress");
+        const timeline = $("#load-test-timeline");
+        timeline.innerHTML = "";
+        $("#load-test-summary").innerHTML = "";
+        $("#load-test-errors").innerHTML = "";
+        $("#load-test-export").style.display = "none";
+        progress.textContent = "Starting...";
+        btnStart.disabled = true;
+        loadTestRunId = null;
+
+        const body = {
+            wsdl_url: currentWsdlUrl,
+            binding_name: bindingSelect.value,
+            operation_name: operationSelect.value,
+            params: ParamBuilder.collectParams(paramsForm),
+            camera_ip: ip,
+            camera_port: parseInt(cameraPort.value) || 80,
+            username: user,
+            password: cameraPass.value,
+            use_https: useHttps.checked,
+            concurrency: parseInt($("#load-test-concurrency").value) || 8,
+            timeout: parseFloat($("#load-test-timeout").value) || 10,
+        };
+        if (stages.length) {
+            body.stages = stages;
+        } else {
+            body.rate = parseFloat($("#load-test-rate").value) || 0;
+            body.duration = parseFloat($("#load-test-duration").value) || 30;
+        }
+
+        try {
+            const resp = await fetch("/api/load-test", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify(body),
+            });
+            if (!(resp.headers.get("content-type") || "").includes("application/x-ndjson")) {
+                const err = await resp.json();
+                throw new Error(err.error || `HTTP ${resp.status}`);
+            }
+
+            const reader = resp.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = "";
+            while (true) {
+                const { value, done: eof } = await reader.read();
+                if (eof) break;
+                buffer += decoder.decode(value, { stream: true });
+                let nl;
+                while ((nl = buffer.indexOf("\n")) >= 0) {
+                    const line = buffer.slice(0, nl).trim();
+                    buffer = buffer.slice(nl + 1);
+                    if (!line) continue;
+                    const event = JSON.parse(line);
+                    if (event.type === "started") {
+                        loadTestRunId = event.run_id;
+                        btnStop.disabled = false;
+                    } else if (event.type === "progress") {
+                        timeline.insertAdjacentHTML("afterbegin", renderLoadTestRow(event));
+                        progress.textContent = `${event.second}s · ${event.throughput_per_sec} req/s · `
+                            + `${event.total_ok} ok, ${event.total_errors} errors · ${event.in_flight} in flight`;
+                        $("#load-test-errors").innerHTML = renderLoadTestErrors(
+                            Object.entries(event.errors_by_type || {}).map(([type, count]) => ({ type, count })));
+                    } else if (event.type === "summary") {
+                        $("#load-test-summary").innerHTML = renderLoadTestSummary(event);
+                        $("#load-test-errors").innerHTML = renderLoadTestErrors(event.errors_by_type);
+                        progress.textContent = `Run ${event.state}`;
+                        $("#load-test-export-json").href = `/api/load-test/${event.run_id}/report`;
+                        $("#load-test-export-csv").href = `/api/load-test/${event.run_id}/report?format=csv`;
+                        $("#load-test-export").style.display = "";
+                    } else if (event.type === "error") {
+                        showToast(escapeHtml(event.error));
+                    }
+                }
+            }
+        } catch (e) {
+            showToast("Load test error: " + escapeHtml(e.message));
+            progress.textContent = "";
+        } finally {
+            btnStart.disabled = false;
+            btnStop.disabled = true;
+        }
+    }
+
+    async function stopLoadTest() {
+        if (!loadTestRunId) return;
+        $("#btn-load-test-stop").disabled = true;
+        await apiCall(`/api/load-test/${loadTestRunId}/stop`, {});
+    }
+
+    function renderLoadTestRow(row) {
+        const cell = (v) => `<td class="text-end">${v ?? "-"}</td>`;
+        return `<tr><td>${row.second}</td>${cell(row.target_rate)}${cell(row.sent)}${cell(row.ok)}${
+            cell(row.errors ? `<span class="text-danger">${row.errors}</span>` : 0)}${cell(row.in_flight)}${
+            cell(row.p50)}${cell(row.p95)}${cell(row.p99)}${cell(row.max)}</tr>`;
+    }
+
+    function renderLoadTestSummary(s) {
+        const lat = s.latency_ms || {};
+        const svc = s.service_time_ms || {};
+        return `
+            <div class="alert alert-secondary py-1 px-2 mt-2 mb-0 small">
+                <strong>${s.ok}/${s.completed}</strong> OK (${(s.error_rate * 100).toFixed(2)}% errors)
+                in ${s.elapsed_s} s &middot; ${s.throughput_per_sec} req/s
+                <br>Latency p50 ${lat.p50 ?? "-"} / p90 ${lat.p90 ?? "-"} / p99 ${lat.p99 ?? "-"}
+                / p99.9 ${lat["p99.9"] ?? "-"} / max ${lat.max ?? "-"} ms
+                &middot; service time p50 ${svc.p50 ?? "-"} / p99 ${svc.p99 ?? "-"} ms
+            </div>`;
+    }
+
+    function renderLoadTestErrors(errors) {
+        if (!errors || !errors.length) return "";
+        const rows = errors.map(e => `
+            <tr><td>${escapeHtml(e.type)}</td><td class="text-end">${e.count}</td>
+                <td class="text-break small">${escapeHtml((e.sample || "").slice(0, 200))}</td></tr>`).join("");
+        return `
+            <table class="table table-sm mt-2 mb-0 small">
+                <thead><tr><th>Error type</th><th class="text-end">Count</th><th>Sample</th></tr></thead>
+                <tbody>${rows}</tbody>
+            </table>`;
+    }
+
+    // ── WS-Discovery ───────────────────────────────────────
+    let discoveredDevices = [];
+
+    function openDiscoverModal() {
+        bootstrap.Modal.getOrCreateInstance(document.getElementById("discover-modal")).show();
+    }
+
+    async function runDiscovery() {
+        const btnScan = $("#btn-discover-scan");
+        const summary = $("#discover-summary");
+        btnScan.disabled = true;
+        summary.textContent = "Scanning...";
+        try {
+            const result = await apiCall("/api/discover", {
+                cidr: $("#discover-cidr").value.trim(),
+                multicast: $("#discover-multicast").checked,
+                timeout: parseFloat($("#discover-timeout").value) || 3,
+                port: parseInt($("#discover-port").value) || 3702,
+            });
+            if (!result.success) {
+                showToast("Discovery failed: " + result.error);
+                summary.textContent = "";
+                return;
+            }
+            discoveredDevices = result.devices;
+            renderDiscoveredDevices();
+            summary.textContent = `${result.devices.length} device(s), ${result.probes_sent} probes in ${result.execution_time_ms} ms`;
+            result.errors.forEach(err => showToast("Discovery: " + escapeHtml(err)));
+        } catch (e) {
+            showToast("Discovery error: " + e.message);
+            summary.textContent = "";
+        } finally {
+            btnScan.disabled = false;
+        }
+    }
+
+    function renderDiscoveredDevices() {
+        $("#btn-discover-fleet").disabled = discoveredDevices.length === 0;
+        $("#discover-results").innerHTML = discoveredDevices.map((dev, i) => `
+            <tr>
+                <td>${escapeHtml(dev.name || "-")}</td>
+                <td>${escapeHtml(dev.hardware || "-")}</td>
+                <td class="text-nowrap">${escapeHtml(`${dev.ip}:${dev.port}`)}${dev.use_https ? ' <i class="bi bi-lock-fill" title="HTTPS"></i>' : ""}</td>
+                <td>${escapeHtml(dev.profiles.join(", "))}</td>
+                <td class="small text-break" style="max-width:320px">${escapeHtml(dev.xaddrs.join(" "))}</td>
+                <td class="text-end">
+                    <button class="btn btn-outline-primary btn-sm py-0" data-discover-index="${i}">Use</button>
+                </td>
+            </tr>`).join("");
+    }
+
+    function useDiscoveredDevice(dev) {
+        cameraIp.value = dev.ip;
+        cameraPort.value = dev.port;
+        useHttps.checked = dev.use_https;
+        saveConnectionInfo();
+        bootstrap.Modal.getOrCreateInstance(document.getElementById("discover-modal")).hide();
+        showToast(`Camera set to ${dev.ip}:${dev.port}`, "success");
+    }
+
+    function useDiscoveredInFleet() {
+        $("#fleet-devices").value = ["ip,port,https",
+            ...discoveredDevices.map(d => `${d.ip},${d.port},${d.use_https ? 1 : 0}`)].join("\n");
+        bootstrap.Modal.getOrCreateInstance(document.getElementById("discover-modal")).hide();
+        openFleetModal();
+    }
+
+    // ── Command History ────────────────────────────────────
+    let historyItems = [];
+    let historyCursor = null;
+
+    function openHistoryModal() {
+        bootstrap.Modal.getOrCreateInstance(document.getElementById("history-modal")).show();
+        searchHistory();
+    }
+
+    /**
+     * Fetch one page of stored results with the current filters.
+     * @param {boolean} append - load the next (older) page instead of starting over
+     */
+    async function searchHistory(append = false) {
+        const query = new URLSearchParams({ limit: 50 });
+        const device = $("#history-device").value.trim();
+        const operation = $("#history-operation").value.trim();
+        const status = $("#history-status").value;
+        if (device) query.set("device", device);
+        if (operation) query.set("operation", operation);
+        if (status) query.set("success", status);
+        if (append && historyCursor) query.set("cursor", historyCursor);
+        try {
+            const resp = await fetch(`/api/history?${query}`);
+            const result = await resp.json();
+            if (!result.success) {
+                showToast("History failed: " + result.error);
+                return;
+            }
+            historyItems = append ? historyItems.concat(result.items) : result.items;
+            historyCursor = result.next_cursor;
+            renderHistoryRows();
+        } catch (e) {
+            showToast("History error: " + e.message);
+        }
+    }
+
+    function renderHistoryRows() {
+        $("#btn-history-more").disabled = !historyCursor;
+        $("#history-summary").textContent = `${historyItems.length} shown${historyCursor ? ", more available" : ""}`;
+        $("#history-results").innerHTML = historyItems.map(item => `
+            <tr>
+                <td class="text-nowrap small">${escapeHtml(new Date(item.created_at * 1000).toLocaleString())}</td>
+                <td class="text-nowrap">${escapeHtml(`${item.camera_ip}:${item.camera_port}`)}${item.use_https ? ' <i class="bi bi-lock-fill" title="HTTPS"></i>' : ""}</td>
+                <td>${escapeHtml(item.operation_name)}</td>
+                <td>${item.success
+                    ? '<span class="badge bg-success">OK</span>'
+                    : `<span class="badge bg-danger" title="${escapeHtml(item.error || "")}">${escapeHtml(item.error_type || "FAILED")}</span>`}</td>
+                <td class="text-end">${item.execution_time_ms}</td>
+                <td class="text-end text-nowrap">
+                    <button class="btn btn-outline-secondary btn-sm py-0" data-history-view="${item.id}">View</button>
+                    <button class="btn btn-outline-primary btn-sm py-0" data-history-rerun="${item.id}">Re-run</button>
+                </td>
+            </tr>`).join("");
+    }
+
+    async function viewHistoryEntry(id) {
+        try {
+            const resp = await fetch(`/api/history/${id}`);
+            const result = await resp.json();
+            if (!result.success) {
+                showToast("History failed: " + result.error);
+                return;
+            }
+            bootstrap.Modal.getOrCreateInstance(document.getElementById("history-modal")).hide();
+            displayResult(result.entry);
+        } catch (e) {
+            showToast("History error: " + e.message);
+        }
+    }
+
+    async function rerunHistoryEntry(id) {
+        showLoading("Re-running...");
+        try {
+            // The password is not stored with the history entry
+            const result = await apiCall(`/api/history/${id}/rerun`, {
+                password: cameraPass.value,
+                xml_mode: "inline",
+            });
+            bootstrap.Modal.getOrCreateInstance(document.getElementById("history-modal")).hide();
+            displayResult(result);
+            if (!result.success) showToast("Re-run failed: " + result.error);
+        } catch (e) {
+            showToast("Re-run error: " + e.message);
+        } finally {
+            hideLoading();
+        }
+    }
+
+    async function clearHistory() {
+        if (!confirm("Delete every stored result?")) return;
+        try {
+            const resp = await fetch("/api/history", { method: "DELETE" });
+            const result = await resp.json();
+            if (!result.success) {
+                showToast("Clear failed: " + (result.error || "timed out"));
+                return;
+            }
+            historyItems = [];
+            historyCursor = null;
+            renderHistoryRows();
+        } catch (e) {
+            showToast("Clear error: " + e.message);
+        }
+    }
+
+    // ── Raw XML Send ───────────────────────────────────────
+    function openRawModal() {
+        if (!$("#raw-xaddr").value && shownResult && shownResult.xaddr) {
+            $("#raw-xaddr").value = shownResult.xaddr;
+        }
+        bootstrap.Modal.getOrCreateInstance(document.getElementById("raw-modal")).show();
+    }
+
+    // Fill the editor with the request envelope of the result shown in the Result panel
+    async function loadLastRequest() {
+        if (!shownResult) {
+            showToast("Execute an operation first.");
+            return;
+        }
+        let xml = shownResult.request_xml;
+        if (!xml && shownResult.result_id) {
+            try {
+                const resp = await fetch(`/api/result-xml/${shownResult.result_id}/request?format=pretty`);
+                const result = await resp.json();
+                xml = result.success ? result.xml : "";
+            } catch (e) {
+                showToast("Load error: " + e.message);
+                return;
+            }
+        }
+        if (!xml) {
+            showToast("No request envelope captured for this result.");
+            return;
+        }
+        $("#raw-xml").value = xml;
+        if (shownResult.xaddr) $("#raw-xaddr").value = shownResult.xaddr;
+    }
+
+    async function sendRawXml() {
+        const ip = cameraIp.value.trim();
+        const xml = $("#raw-xml").value;
+        if (!ip || !xml.trim()) {
+            showToast("Please enter a camera IP and the XML to send.");
+            return;
+        }
+        saveConnectionInfo();
+        const btnSend = $("#btn-raw-send");
+        btnSend.disabled = true;
+        showLoading("Sending raw XML...");
+        try {
+            const result = await apiCall("/api/raw-send", {
+                xml,
+                camera_ip: ip,
+                camera_port: parseInt(cameraPort.value) || 80,
+                username: cameraUser.value.trim(),
+                password: cameraPass.value,
+                use_https: useHttps.checked,
+                xaddr: $("#raw-xaddr").value.trim(),
+                soap_action: $("#raw-action").value.trim(),
+                wsse: $("#raw-wsse").checked,
+                parse: $("#raw-parse").checked,
+            });
+            bootstrap.Modal.getOrCreateInstance(document.getElementById("raw-modal")).hide();
+            displayResult({
+                ...result,
+                result_json: result.status_code === undefined ? null : {
+                    status_code: result.status_code,
+                    content_type: result.content_type,
+                    response_bytes: result.response_bytes,
+                    fault: result.fault,
+                },
+            });
+        } catch (e) {
+            showToast("Raw send error: " + e.message);
+        } finally {
+            btnSend.disabled = false;
+            hideLoading();
+        }
+    }
+
+    // ── Configuration Snapshots ────────────────────────────
+    function openSnapshotModal() {
+        bootstrap.Modal.getOrCreateInstance(document.getElementById("snapshot-modal")).show();
+        listSnapshots();
+    }
+
+    async function listSnapshots() {
+        try {
+            const resp = await fetch("/api/snapshots?limit=50");
+            const result = await resp.json();
+            if (!result.success) {
+                showToast("Snapshots failed: " + result.error);
+                return;
+            }
+            const stats = result.stats;
+            $("#snapshot-summary").textContent =
+                `${stats.snapshots} snapshots of ${stats.devices} devices, ${stats.blobs} unique results`;
+            renderSnapshotRows(result.snapshots.map(snapshot => ({ snapshot })));
+        } catch (e) {
+            showToast("Snapshots error: " + e.message);
+        }
+    }
+
+    /**
+     * @param {Array} rows - {snapshot, diff?, previous_id?, error?, device?} per table row
+     */
+    function renderSnapshotRows(rows) {
+        $("#snapshot-results").innerHTML = rows.map(row => {
+            const snap = row.snapshot;
+            if (!snap) {
+                return `<tr><td></td><td>${escapeHtml(`${row.device.ip}:${row.device.port}`)}</td>
+                    <td colspan="5"><span class="badge bg-danger">FAILED</span> ${escapeHtml(row.error || "")}</td></tr>`;
+            }
+            let vsPrevious = "";
+            if (row.diff) {
+                const s = row.diff.summary;
+                const changed = s.changed + s.added + s.removed + s.failed + s.recovered;
+                vsPrevious = changed
+                    ? `<span class="badge bg-warning text-dark">${changed} changed</span>`
+                    : '<span class="badge bg-success">no change</span>';
+            } else if (row.diff === null) {
+                vsPrevious = '<span class="text-muted small">first snapshot</span>';
+            }
+            return `
+            <tr>
+                <td>${snap.id}</td>
+                <td class="text-nowrap">${escapeHtml(snap.device)}</td>
+                <td class="text-nowrap small">${escapeHtml(new Date(snap.created_at * 1000).toLocaleString())}</td>
+                <td class="text-end">${snap.operations}</td>
+                <td class="text-end">${snap.failed}</td>
+                <td>${vsPrevious}</td>
+                <td class="text-end text-nowrap">
+                    <button class="btn btn-outline-secondary btn-sm py-0" data-snapshot-view="${snap.id}">View</button>
+                    <button class="btn btn-outline-primary btn-sm py-0" data-snapshot-diff="${snap.id}">Diff</button>
+                </td>
+            </tr>`;
+        }).join("");
+    }
+
+    async function takeSnapshots() {
+        const devices = $("#snapshot-devices").value.trim();
+        const ip = cameraIp.value.trim();
+        if (!devices && !ip) {
+            showToast("Please enter a device list or a camera IP.");
+            return;
+        }
+        const btnTake = $("#btn-snapshot-take");
+        btnTake.disabled = true;
+        showLoading("Taking configuration snapshots...");
+        try {
+            const result = await apiCall("/api/snapshots", {
+                devices,
+                camera_ip: ip,
+                camera_port: parseInt(cameraPort.value) || 80,
+                username: cameraUser.value.trim(),
+                password: cameraPass.value,
+                use_https: useHttps.checked,
+            });
+            if (!result.success) {
+                showToast("Snapshot failed: " + result.error);
+                return;
+            }
+            $("#snapshot-summary").textContent =
+                `${result.snapshots.length} devices in ${result.execution_time_ms} ms`;
+            renderSnapshotRows(result.snapshots);
+            $("#snapshot-diff").innerHTML = "";
+        } catch (e) {
+            showToast("Snapshot error: " + e.message);
+        } finally {
+            btnTake.disabled = false;
+            hideLoading();
+        }
+    }
+
+    async function viewSnapshot(id) {
+        try {
+            const resp = await fetch(`/api/snapshots/${id}`);
+            const result = await resp.json();
+            if (!result.success) {
+                showToast("Snapshot failed: " + result.error);
+                return;
+            }
+            bootstrap.Modal.getOrCreateInstance(document.getElementById("snapshot-modal")).hide();
+            displayResult({
+                success: true,
+                operation_name: `Snapshot #${id} (${result.snapshot.device})`,
+                result_json: result.snapshot.results,
+            });
+        } catch (e) {
+            showToast("Snapshot error: " + e.message);
+        }
+    }
+
+    /**
+     * Show the diff of snapshot ``targetId`` against ``baseId`` (default: previous one).
+     */
+    async function showSnapshotDiff(targetId, baseId) {
+        const query = baseId ? `?against=${encodeURIComponent(baseId)}` : "";
+        try {
+            const resp = await fetch(`/api/snapshots/${targetId}/diff${query}`);
+            const result = await resp.json();
+            if (!result.success) {
+                showToast("Diff failed: " + result.error);
+                return;
+            }
+            const s = result.summary;
+            const fmt = v => escapeHtml(v === null || v === undefined ? "" : JSON.stringify(v));
+            const header = `<div class="small mb-1"><strong>#${result.base.id}</strong> ${escapeHtml(result.base.device)}
+                &rarr; <strong>#${result.target.id}</strong> ${escapeHtml(result.target.device)}:
+                ${s.unchanged} unchanged, ${s.changed} changed, ${s.added} added, ${s.removed} removed,
+                ${s.failed} failed, ${s.recovered} recovered</div>`;
+            const body = result.operations.map(op => {
+                const changes = (op.changes || []).map(c => `
+                    <tr><td class="font-monospace small">${escapeHtml(c.path)}</td><td>${c.change}</td>
+                        <td class="font-monospace small text-danger">${fmt(c.old)}</td>
+                        <td class="font-monospace small text-success">${fmt(c.new)}</td></tr>`).join("");
+                return `<div class="mt-2"><strong>${escapeHtml(op.operation)}</strong>
+                    <span class="badge bg-secondary">${op.status}</span>
+                    ${op.error ? `<span class="small text-danger">${escapeHtml(op.error)}</span>` : ""}
+                    ${op.truncated ? '<span class="small text-muted">(truncated)</span>' : ""}
+                    ${changes ? `<table class="table table-sm mb-0">${changes}</table>` : ""}</div>`;
+            }).join("");
+            $("#snapshot-diff").innerHTML = header + (body || '<div class="text-muted small">No differences.</div>');
+        } catch (e) {
+            showToast("Diff error: " + e.message);
+        }
+    }
+
+    // ── Event Monitor ──────────────────────────────────────
+    const EVENT_LOG_MAX_ROWS = 500;
+    let eventSource = null;
+
+    function openEventModal() {
+        bootstrap.Modal.getOrCreateInstance(document.getElementById("events-modal")).show();
+    }
+
+    function connectEventStream() {
+        if (eventSource) return;
+        eventSource = new EventSource("/api/subscriptions/stream");
+        eventSource.addEventListener("notification", (e) => addEventRow(JSON.parse(e.data)));
+        eventSource.addEventListener("stats", (e) => renderSubscriptions(JSON.parse(e.data)));
+    }
+
+    function disconnectEventStream() {
+        if (eventSource) {
+            eventSource.close();
+            eventSource = null;
+        }
+    }
+
+    async function startSubscriptions() {
+        const devices = $("#events-devices").value.trim();
+        if (!devices && !cameraIp.value.trim()) {
+            showToast("Please enter a device list or a camera IP.");
+            return;
+        }
+        const btnStart = $("#btn-events-start");
+        btnStart.disabled = true;
+        try {
+            const result = await apiCall("/api/subscriptions", {
+                devices,
+                camera_ip: cameraIp.value.trim(),
+                camera_port: parseInt(cameraPort.value) || 80,
+                username: cameraUser.value.trim(),
+                password: cameraPass.value,
+                use_https: useHttps.checked,
+            });
+            if (!result.success) {
+                showToast("Subscribe failed: " + result.error);
+                return;
+            }
+            showToast(`${result.subscriptions.length} subscription(s) running`, "success");
+        } catch (e) {
+            showToast("Subscribe error: " + e.message);
+        } finally {
+            btnStart.disabled = false;
+        }
+    }
+
+    // id = null stops every subscription
+    async function stopSubscription(id = null) {
+        const url = id ? `/api/subscriptions/${encodeURIComponent(id)}` : "/api/subscriptions";
+        try {
+            const resp = await fetch(url, { method: "DELETE" });
+            const result = await resp.json();
+            if (!result.success) showToast("Stop failed: " + result.error);
+        } catch (e) {
+            showToast("Stop error: " + e.message);
+        }
+    }
+
+    function renderSubscriptions(status) {
+        $("#events-totals").textContent =
+            `${status.active} active · ${status.events_per_sec} events/s · ${status.total} total`;
+        const stateClass = { active: "bg-success", starting: "bg-secondary", error: "bg-danger", stopped: "bg-dark" };
+        $("#events-subscriptions").innerHTML = status.subscriptions.map(sub => {
+            const lag = sub.lag_ms || {};
+            return `
+                <tr>
+                    <td class="text-nowrap" title="${escapeHtml(sub.address || "")}">${escapeHtml(sub.device)}</td>
+                    <td><span class="badge ${stateClass[sub.state] || "bg-secondary"}"
+                              title="${escapeHtml(sub.error || "")}">${escapeHtml(sub.state)}</span></td>
+                    <td class="text-end">${sub.events_per_sec}</td>
+                    <td class="text-end">${sub.total}</td>
+                    <td class="text-end">${lag.p50 ?? "-"} / ${lag.p95 ?? "-"}</td>
+                    <td class="text-end">${sub.renewals}</td>
+                    <td class="text-end">${sub.reconnects}</td>
+                    <td class="text-end">
+                        <button class="btn btn-outline-danger btn-sm py-0" data-sub-id="${escapeHtml(sub.id)}" title="Stop">
+                            <i class="bi bi-stop-fill"></i>
+                        </button>
+                    </td>
+                </tr>`;
+        }).join("");
+    }
+
+    function addEventRow(event) {
+        const items = (obj) => Object.entries(obj || {}).map(([k, v]) => `${k}=${v}`).join(", ");
+        const tbody = $("#events-log");
+        tbody.insertAdjacentHTML("afterbegin", `
+            <tr>
+                <td class="text-nowrap">${escapeHtml(event.utc_time || event.received_at)}</td>
+                <td class="text-nowrap">${escapeHtml(event.device)}</td>
+                <td class="text-break">${escapeHtml(event.topic)}</td>
+                <td>${escapeHtml(event.operation || "")}</td>
+                <td class="text-break">${escapeHtml(items(event.source))}</td>
+                <td class="text-break">${escapeHtml(items(event.data))}</td>
+            </tr>`);
+        while (tbody.rows.length > EVENT_LOG_MAX_ROWS) tbody.deleteRow(-1);
+    }
+
     // ── Copy to Clipboard ──────────────────────────────────
     function copyResult() {
         // Copy the currently active tab's content
@@ -660,9 +1655,71 @@
         applyOperationFilter();
     });
     btnExecute.addEventListener("click", executeOperation);
+    btnFleet.addEventListener("click", openFleetModal);
+    $("#btn-fleet-run").addEventListener("click", runFleet);
+    $("#btn-fleet-open").addEventListener("click", openFleetModal);
+    btnLoadTest.addEventListener("click", openLoadTestModal);
+    $("#btn-load-test-start").addEventListener("click", runLoadTest);
+    $("#btn-load-test-stop").addEventListener("click", stopLoadTest);
+    $("#btn-fleet-scan").addEventListener("click", scanFleetProfiles);
+    $("#btn-fleet-scan-csv").addEventListener("click", exportFleetProfilesCsv);
+    $("#btn-discover-open").addEventListener("click", openDiscoverModal);
+    $("#btn-discover-scan").addEventListener("click", runDiscovery);
+    $("#btn-discover-fleet").addEventListener("click", useDiscoveredInFleet);
+    $("#discover-results").addEventListener("click", (e) => {
+        const btn = e.target.closest("[data-discover-index]");
+        if (btn) useDiscoveredDevice(discoveredDevices[btn.dataset.discoverIndex]);
+    });
+    $("#btn-raw-open").addEventListener("click", openRawModal);
+    $("#btn-raw-load-last").addEventListener("click", loadLastRequest);
+    $("#btn-raw-send").addEventListener("click", sendRawXml);
+    $("#btn-snapshot-open").addEventListener("click", openSnapshotModal);
+    $("#btn-snapshot-take").addEventListener("click", takeSnapshots);
+    $("#btn-snapshot-diff").addEventListener("click", () => {
+        const target = $("#snapshot-target").value.trim();
+        if (!target) {
+            showToast("Please enter a target snapshot ID.");
+            return;
+        }
+        showSnapshotDiff(target, $("#snapshot-base").value.trim());
+    });
+    $("#snapshot-results").addEventListener("click", (e) => {
+        const view = e.target.closest("[data-snapshot-view]");
+        if (view) viewSnapshot(view.dataset.snapshotView);
+        const diff = e.target.closest("[data-snapshot-diff]");
+        if (diff) showSnapshotDiff(diff.dataset.snapshotDiff);
+    });
+    $("#btn-history-open").addEventListener("click", openHistoryModal);
+    $("#btn-history-search").addEventListener("click", () => searchHistory());
+    $("#btn-history-more").addEventListener("click", () => searchHistory(true));
+    $("#btn-history-clear").addEventListener("click", clearHistory);
+    ["#history-device", "#history-operation"].forEach(sel =>
+        $(sel).addEventListener("keydown", (e) => { if (e.key === "Enter") searchHistory(); }));
+    $("#history-results").addEventListener("click", (e) => {
+        const view = e.target.closest("[data-history-view]");
+        if (view) viewHistoryEntry(view.dataset.historyView);
+        const rerun = e.target.closest("[data-history-rerun]");
+        if (rerun) rerunHistoryEntry(rerun.dataset.historyRerun);
+    });
+    $("#btn-events-open").addEventListener("click", openEventModal);
+    $("#btn-events-start").addEventListener("click", startSubscriptions);
+    $("#btn-events-stop-all").addEventListener("click", () => stopSubscription());
+    $("#btn-events-clear").addEventListener("click", () => { $("#events-log").innerHTML = ""; });
+    $("#events-subscriptions").addEventListener("click", (e) => {
+        const btn = e.target.closest("[data-sub-id]");
+        if (btn) stopSubscription(btn.dataset.subId);
+    });
+    const eventsModal = document.getElementById("events-modal");
+    eventsModal.addEventListener("shown.bs.modal", connectEventStream);
+    eventsModal.addEventListener("hidden.bs.modal", disconnectEventStream);
     btnTestConn.addEventListener("click", testConnection);
     btnCheckProfiles.addEventListener("click", checkProfiles);
     btnCopy.addEventListener("click", copyResult);
+    document.querySelectorAll('[data-bs-toggle="tab"]').forEach(tab => {
+        tab.addEventListener("shown.bs.tab", (e) => {
+            loadDeferredXml(e.target.dataset.bsTarget.slice(1));
+        });
+    });
     btnClearResponseValues.addEventListener("click", () => {
         responseValuesCard.style.display = "none";
     });
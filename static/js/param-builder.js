@@ -6,19 +6,25 @@
 const ParamBuilder = {
     /**
      * Build parameter form from schema returned by /api/operation-params.
+     * Complex parameters refer to entries of the type table by `ref`; their
+     * fields are only built when the fieldset is first expanded.
      * @param {Array} params - Parameter descriptors
      * @param {HTMLElement} container - DOM container to append fields into
      * @param {string} prefix - Dot-notation prefix for nested params
+     * @param {Object} types - Type table: { ref: { name, children } }
+     * @param {Set} openRefs - Types already auto-expanded on this path (stops
+     *                         recursive required types from expanding forever)
      */
-    buildForm(params, container, prefix = "") {
+    buildForm(params, container, prefix = "", types = {}, openRefs = new Set()) {
         container.innerHTML = "";
         if (!params || params.length === 0) {
             container.innerHTML = '<div class="text-muted small fst-italic">No parameters required.</div>';
             return;
         }
         params.forEach(param => {
-            if (param.is_complex && param.children && param.children.length > 0) {
-                this._buildComplexField(param, container, prefix);
+            const type = param.ref ? types[param.ref] : null;
+            if (param.is_complex && type && type.children.length > 0) {
+                this._buildComplexField(param, type.children, container, prefix, types, openRefs);
             } else {
                 this._buildSimpleField(param, container, prefix);
             }
@@ -103,7 +109,7 @@ const ParamBuilder = {
     /**
      * Build a collapsible fieldset for complex (nested) types.
      */
-    _buildComplexField(param, container, prefix) {
+    _buildComplexField(param, children, container, prefix, types, openRefs) {
         const fullName = prefix ? `${prefix}.${param.name}` : param.name;
 
         const fieldset = document.createElement("div");
@@ -127,19 +133,27 @@ const ParamBuilder = {
         const childContainer = document.createElement("div");
         childContainer.className = "ps-2";
         // Auto-expand required complex fields so required children are visible
-        const expanded = !!param.required;
+        const expanded = !!param.required && !openRefs.has(param.ref);
         childContainer.style.display = expanded ? "block" : "none";
 
-        this.buildForm(param.children, childContainer, fullName);
+        let built = false;
+        const buildChildren = () => {
+            if (built) return;
+            built = true;
+            const childRefs = new Set(openRefs).add(param.ref);
+            this.buildForm(children, childContainer, fullName, types, childRefs);
+        };
+        if (expanded) buildChildren();
         fieldset.appendChild(childContainer);
 
         toggleBtn.innerHTML = expanded
             ? '<i class="bi bi-chevron-up"></i>'
             : '<i class="bi bi-chevron-down"></i>';
 
-        // Toggle expand/collapse
+        // Toggle expand/collapse (children are built on first expand)
         toggleBtn.addEventListener("click", () => {
             const isHidden = childContainer.style.display === "none";
+            if (isHidden) buildChildren();
             childContainer.style.display = isHidden ? "block" : "none";
             toggleBtn.innerHTML = isHidden
                 ? '<i class="bi bi-chevron-up"></i>'
@@ -0,0 +1,76 @@
+"""Mirror the ONVIF preset WSDLs and every imported XSD into the offline bundle.
+
+Run once on a machine with internet access, then ship the ``wsdl/`` directory:
+
+    python tools/fetch_wsdl_bundle.py            # all ONVIF_PRESETS
+    python tools/fetch_wsdl_bundle.py URL [URL]  # extra custom WSDLs
+
+Files are stored as ``wsdl/<host>/<path>`` so ``BundleTransport`` can resolve
+the original URLs (including relative imports) without network access.
+"""
+
+import os
+import sys
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from lxml import etree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import ONVIF_PRESETS  # noqa: E402
+from onvif_client.wsdl_bundle import bundle_path  # noqa: E402
+
+IMPORT_XPATH = (
+    "//*[local-name()='import' or local-name()='include' or local-name()='redefine']"
+)
+
+
+def _references(content: bytes, base_url: str) -> list:
+    """Return absolute URLs of all wsdl:import / xs:import / xs:include targets."""
+    root = etree.fromstring(content, parser=etree.XMLParser(resolve_entities=False))
+    urls = []
+    for node in root.xpath(IMPORT_XPATH):
+        location = node.get("schemaLocation") or node.get("location")
+        if location:
+            urls.append(urljoin(base_url, location))
+    return urls
+
+
+def fetch(urls: list, session: requests.Session) -> int:
+    """Download ``urls`` and everything they import; return the number of files written."""
+    pending = list(urls)
+    seen = set()
+    written = 0
+    while pending:
+        url = pending.pop()
+        if url in seen or urlsplit(url).scheme not in ("http", "https"):
+            continue
+        seen.add(url)
+        path = bundle_path(url)
+        if os.path.isfile(path):
+            with open(path, "rb") as fh:
+                content = fh.read()
+        else:
+            print(f"GET {url}")
+            response = session.get(url, timeout=30)
+            response.raise_for_status()
+            content = response.content
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as fh:
+                fh.write(content)
+            written += 1
+        pending.extend(_references(content, url))
+    return written
+
+
+def main(argv: list) -> int:
+    urls = argv or [preset["wsdl"] for preset in ONVIF_PRESETS.values()]
+    with requests.Session() as session:
+        written = fetch(urls, session)
+    print(f"Bundle up to date ({written} new file(s)).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
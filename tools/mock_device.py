@@ -0,0 +1,1093 @@
+"""Mock ONVIF device for benchmarks and end-to-end checks without a camera.
+
+Usage:
+    python tools/mock_device.py                           # http://127.0.0.1:8080, admin / admin
+    python tools/mock_device.py --devices 50              # 50 devices on ports 8080-8129
+    python tools/mock_device.py --latency 40 --jitter 20  # 20-60 ms per response
+    python tools/mock_device.py --faults soap=0.01,http503=0.005,drop=0.001,hang=0.001
+    python tools/mock_device.py --responses DIR           # canned response overrides
+    python tools/mock_device.py --discovery               # also answer WS-Discovery probes
+
+Serves the Device, Media, Media2, PTZ, Events (PullPoint), Recording and
+Search operations the tool uses most. Responses are templates filled per
+request (``$base``, ``$serial``, ``$hostname``, ``$utc_now``, ...); a file
+``DIR/<Operation>.xml`` or ``DIR/<service>.<Operation>.xml`` replaces an
+operation's response element with its content, using the same placeholders.
+
+Requests must carry a valid WS-Security UsernameToken: password digest,
+unused nonce and a Created time within ``--max-skew`` seconds of the device
+clock (``--clock-offset`` skews it). The operations ONVIF allows before
+authentication (GetSystemDateAndTime, GetServices, ...) are exempt.
+
+Fault injection rates (0-1, per request):
+    soap     500 with a SOAP Receiver fault (ter:Action)
+    http503  503 with a plain-text body
+    drop     connection closed without a response
+    hang     response delayed by --hang seconds
+
+``GET /mock/stats`` returns per-operation request and fault counts as JSON.
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import socket
+import struct
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+
+import isodate
+from lxml import etree
+
+NS = {
+    "s": "http://www.w3.org/2003/05/soap-envelope",
+    "tds": "http://www.onvif.org/ver10/device/wsdl",
+    "trt": "http://www.onvif.org/ver10/media/wsdl",
+    "tr2": "http://www.onvif.org/ver20/media/wsdl",
+    "tptz": "http://www.onvif.org/ver20/ptz/wsdl",
+    "tev": "http://www.onvif.org/ver10/events/wsdl",
+    "trc": "http://www.onvif.org/ver10/recording/wsdl",
+    "tse": "http://www.onvif.org/ver10/search/wsdl",
+    "tt": "http://www.onvif.org/ver10/schema",
+    "ter": "http://www.onvif.org/ver10/error",
+    "wsnt": "http://docs.oasis-open.org/wsn/b-2",
+    "wsa": "http://www.w3.org/2005/08/addressing",
+    "wstop": "http://docs.oasis-open.org/wsn/t-1",
+    "tns1": "http://www.onvif.org/ver10/topics",
+}
+
+# service -> (namespace, path, (major, minor)) as reported by GetServices
+SERVICES = {
+    "device": (NS["tds"], "/onvif/device_service", (2, 60)),
+    "media": (NS["trt"], "/onvif/media_service", (2, 60)),
+    "media2": (NS["tr2"], "/onvif/media2_service", (2, 60)),
+    "ptz": (NS["tptz"], "/onvif/ptz_service", (2, 60)),
+    "events": (NS["tev"], "/onvif/event_service", (2, 60)),
+    "recording": (NS["trc"], "/onvif/recording_service", (2, 60)),
+    "search": (NS["tse"], "/onvif/search_service", (2, 60)),
+}
+NAMESPACE_SERVICES = {ns: name for name, (ns, _, _) in SERVICES.items()}
+NAMESPACE_SERVICES[NS["wsnt"]] = "events"  # Renew / Unsubscribe
+
+# Operations ONVIF allows without credentials
+PRE_AUTH = {"GetSystemDateAndTime", "GetServices", "GetServiceCapabilities",
+            "GetCapabilities", "GetWsdlUrl", "GetHostname", "GetEndpointReference"}
+
+FAULT_KINDS = ("soap", "http503", "drop", "hang")
+
+ENVELOPE = ('<?xml version="1.0" encoding="UTF-8"?>\n<s:Envelope '
+            + " ".join(f'xmlns:{p}="{u}"' for p, u in NS.items())
+            + "><s:Body>{body}</s:Body></s:Envelope>")
+
+PAN_TILT_SPACE = "http://www.onvif.org/ver10/tptz/PanTiltSpaces/PositionGenericSpace"
+ZOOM_SPACE = "http://www.onvif.org/ver10/tptz/ZoomSpaces/PositionGenericSpace"
+PAN_TILT_VELOCITY = "http://www.onvif.org/ver10/tptz/PanTiltSpaces/VelocityGenericSpace"
+ZOOM_VELOCITY = "http://www.onvif.org/ver10/tptz/ZoomSpaces/VelocityGenericSpace"
+
+_NONCES_KEPT = 4096
+
+
+class SoapFault(Exception):
+    """A SOAP 1.2 fault to send back (HTTP 400 for Sender, 500 for Receiver)."""
+
+    def __init__(self, code: str, subcodes: tuple, reason: str):
+        super().__init__(reason)
+        self.code = code
+        self.subcodes = subcodes
+        self.reason = reason
+
+    @property
+    def status(self) -> int:
+        return 400 if self.code == "Sender" else 500
+
+    def body(self) -> str:
+        subcode = ""
+        for value in reversed(self.subcodes):
+            subcode = f"<s:Subcode><s:Value>ter:{value}</s:Value>{subcode}</s:Subcode>"
+        return (f"<s:Fault><s:Code><s:Value>s:{self.code}</s:Value>{subcode}</s:Code>"
+                f'<s:Reason><s:Text xml:lang="en">{_escape(self.reason)}</s:Text></s:Reason>'
+                "</s:Fault>")
+
+
+def _escape(text: str) -> str:
+    return (str(text).replace("&", "&amp;").replace("<", "&lt;")
+            .replace(">", "&gt;").replace('"', "&quot;"))
+
+
+def _iso(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _text(element, path: str, default: str = "") -> str:
+    found = element.find(path) if element is not None else None
+    return found.text.strip() if found is not None and found.text else default
+
+
+def _duration(value: str, default: float) -> float:
+    """Seconds of an xs:duration (``PT10S``) or an absolute xs:dateTime from now."""
+    if not value:
+        return default
+    try:
+        if value.startswith("P"):
+            return isodate.parse_duration(value).total_seconds()
+        moment = isodate.parse_datetime(value)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return (moment - datetime.now(timezone.utc)).total_seconds()
+    except (isodate.ISO8601Error, ValueError):
+        raise SoapFault("Sender", ("InvalidArgVal",), f"Invalid time value {value!r}")
+
+
+# ── Response templates ─────────────────────────────────────
+# (service, operation) -> response element; $placeholders come from
+# MockDevice.context(). Operations with state or loops have handlers below.
+
+TEMPLATES = {
+    ("device", "GetDeviceInformation"):
+        "<tds:GetDeviceInformationResponse><tds:Manufacturer>$manufacturer</tds:Manufacturer>"
+        "<tds:Model>$model</tds:Model><tds:FirmwareVersion>$firmware</tds:FirmwareVersion>"
+        "<tds:SerialNumber>$serial</tds:SerialNumber><tds:HardwareId>$hardware_id</tds:HardwareId>"
+        "</tds:GetDeviceInformationResponse>",
+    ("device", "GetSystemDateAndTime"):
+        "<tds:GetSystemDateAndTimeResponse><tds:SystemDateAndTime>"
+        "<tt:DateTimeType>NTP</tt:DateTimeType><tt:DaylightSavings>false</tt:DaylightSavings>"
+        "<tt:TimeZone><tt:TZ>UTC0</tt:TZ></tt:TimeZone>"
+        "<tt:UTCDateTime><tt:Time><tt:Hour>$hour</tt:Hour><tt:Minute>$minute</tt:Minute>"
+        "<tt:Second>$second</tt:Second></tt:Time><tt:Date><tt:Year>$year</tt:Year>"
+        "<tt:Month>$month</tt:Month><tt:Day>$day</tt:Day></tt:Date></tt:UTCDateTime>"
+        "<tt:LocalDateTime><tt:Time><tt:Hour>$hour</tt:Hour><tt:Minute>$minute</tt:Minute>"
+        "<tt:Second>$second</tt:Second></tt:Time><tt:Date><tt:Year>$year</tt:Year>"
+        "<tt:Month>$month</tt:Month><tt:Day>$day</tt:Day></tt:Date></tt:LocalDateTime>"
+        "</tds:SystemDateAndTime></tds:GetSystemDateAndTimeResponse>",
+    ("device", "GetHostname"):
+        "<tds:GetHostnameResponse><tds:HostnameInformation><tt:FromDHCP>false</tt:FromDHCP>"
+        "<tt:Name>$hostname</tt:Name></tds:HostnameInformation></tds:GetHostnameResponse>",
+    ("device", "GetNetworkInterfaces"):
+        '<tds:GetNetworkInterfacesResponse><tds:NetworkInterfaces token="eth0">'
+        "<tt:Enabled>true</tt:Enabled><tt:Info><tt:Name>eth0</tt:Name>"
+        "<tt:HwAddress>$mac</tt:HwAddress><tt:MTU>1500</tt:MTU></tt:Info>"
+        "<tt:IPv4><tt:Enabled>true</tt:Enabled><tt:Config><tt:Manual>"
+        "<tt:Address>$ip</tt:Address><tt:PrefixLength>24</tt:PrefixLength></tt:Manual>"
+        "<tt:DHCP>false</tt:DHCP></tt:Config></tt:IPv4></tds:NetworkInterfaces>"
+        "</tds:GetNetworkInterfacesResponse>",
+    ("device", "GetUsers"):
+        "<tds:GetUsersResponse><tds:User><tt:Username>$username</tt:Username>"
+        "<tt:UserLevel>Administrator</tt:UserLevel></tds:User></tds:GetUsersResponse>",
+    ("device", "GetNTP"):
+        "<tds:GetNTPResponse><tds:NTPInformation><tt:FromDHCP>false</tt:FromDHCP>"
+        "<tt:NTPManual><tt:Type>DNS</tt:Type><tt:DNSname>pool.ntp.org</tt:DNSname></tt:NTPManual>"
+        "</tds:NTPInformation></tds:GetNTPResponse>",
+    ("device", "GetDNS"):
+        "<tds:GetDNSResponse><tds:DNSInformation><tt:FromDHCP>false</tt:FromDHCP>"
+        "<tt:DNSManual><tt:Type>IPv4</tt:Type><tt:IPv4Address>192.0.2.53</tt:IPv4Address>"
+        "</tt:DNSManual></tds:DNSInformation></tds:GetDNSResponse>",
+    ("device", "GetWsdlUrl"):
+        "<tds:GetWsdlUrlResponse><tds:WsdlUrl>http://www.onvif.org/</tds:WsdlUrl></tds:GetWsdlUrlResponse>",
+    ("device", "GetServiceCapabilities"):
+        "<tds:GetServiceCapabilitiesResponse><tds:Capabilities>"
+        '<tds:Network IPFilter="false" ZeroConfiguration="false" IPVersion6="false" DynDNS="false"/>'
+        '<tds:Security UsernameToken="true" HttpDigest="false" TLS1.2="false"/>'
+        '<tds:System DiscoveryResolve="false" DiscoveryBye="true" RemoteDiscovery="false"'
+        ' SystemBackup="false" SystemLogging="false" FirmwareUpgrade="false"/>'
+        "</tds:Capabilities></tds:GetServiceCapabilitiesResponse>",
+    ("device", "GetCapabilities"):
+        "<tds:GetCapabilitiesResponse><tds:Capabilities>"
+        "<tt:Device><tt:XAddr>$base/onvif/device_service</tt:XAddr>"
+        "<tt:Network><tt:IPFilter>false</tt:IPFilter><tt:ZeroConfiguration>false</tt:ZeroConfiguration>"
+        "<tt:IPVersion6>false</tt:IPVersion6><tt:DynDNS>false</tt:DynDNS></tt:Network>"
+        "<tt:System><tt:DiscoveryResolve>false</tt:DiscoveryResolve><tt:DiscoveryBye>true</tt:DiscoveryBye>"
+        "<tt:RemoteDiscovery>false</tt:RemoteDiscovery><tt:SystemBackup>false</tt:SystemBackup>"
+        "<tt:SystemLogging>false</tt:SystemLogging><tt:FirmwareUpgrade>false</tt:FirmwareUpgrade>"
+        "<tt:SupportedVersions><tt:Major>2</tt:Major><tt:Minor>60</tt:Minor></tt:SupportedVersions>"
+        "</tt:System></tt:Device>"
+        "<tt:Events><tt:XAddr>$base/onvif/event_service</tt:XAddr>"
+        "<tt:WSSubscriptionPolicySupport>false</tt:WSSubscriptionPolicySupport>"
+        "<tt:WSPullPointSupport>true</tt:WSPullPointSupport>"
+        "<tt:WSPausableSubscriptionManagerInterfaceSupport>false"
+        "</tt:WSPausableSubscriptionManagerInterfaceSupport></tt:Events>"
+        "<tt:Media><tt:XAddr>$base/onvif/media_service</tt:XAddr><tt:StreamingCapabilities>"
+        "<tt:RTPMulticast>false</tt:RTPMulticast><tt:RTP_TCP>true</tt:RTP_TCP>"
+        "<tt:RTP_RTSP_TCP>true</tt:RTP_RTSP_TCP></tt:StreamingCapabilities></tt:Media>"
+        "<tt:PTZ><tt:XAddr>$base/onvif/ptz_service</tt:XAddr></tt:PTZ>"
+        "<tt:Extension><tt:Recording><tt:XAddr>$base/onvif/recording_service</tt:XAddr>"
+        "<tt:ReceiverSource>false</tt:ReceiverSource><tt:MediaProfileSource>true</tt:MediaProfileSource>"
+        "<tt:DynamicRecordings>false</tt:DynamicRecordings><tt:DynamicTracks>false</tt:DynamicTracks>"
+        "<tt:MaxStringLength>64</tt:MaxStringLength></tt:Recording>"
+        "<tt:Search><tt:XAddr>$base/onvif/search_service</tt:XAddr>"
+        "<tt:MetadataSearch>false</tt:MetadataSearch></tt:Search></tt:Extension>"
+        "</tds:Capabilities></tds:GetCapabilitiesResponse>",
+    ("device", "SetHostname"): "<tds:SetHostnameResponse/>",
+    ("device", "SystemReboot"):
+        "<tds:SystemRebootResponse><tds:Message>Rebooting in 30 seconds</tds:Message></tds:SystemRebootResponse>",
+
+    ("media", "GetVideoSources"):
+        '<trt:GetVideoSourcesResponse><trt:VideoSources token="VideoSource_1">'
+        "<tt:Framerate>30</tt:Framerate><tt:Resolution><tt:Width>1920</tt:Width>"
+        "<tt:Height>1080</tt:Height></tt:Resolution></trt:VideoSources></trt:GetVideoSourcesResponse>",
+    ("media", "GetSnapshotUri"):
+        "<trt:GetSnapshotUriResponse><trt:MediaUri><tt:Uri>$base/snapshot.jpg</tt:Uri>"
+        "<tt:InvalidAfterConnect>false</tt:InvalidAfterConnect>"
+        "<tt:InvalidAfterReboot>false</tt:InvalidAfterReboot><tt:Timeout>PT0S</tt:Timeout>"
+        "</trt:MediaUri></trt:GetSnapshotUriResponse>",
+    ("media", "GetServiceCapabilities"):
+        '<trt:GetServiceCapabilitiesResponse><trt:Capabilities SnapshotUri="true" Rotation="false">'
+        '<trt:ProfileCapabilities MaximumNumberOfProfiles="$max_profiles"/>'
+        '<trt:StreamingCapabilities RTPMulticast="false" RTP_TCP="true" RTP_RTSP_TCP="true"/>'
+        "</trt:Capabilities></trt:GetServiceCapabilitiesResponse>",
+    ("media2", "GetServiceCapabilities"):
+        '<tr2:GetServiceCapabilitiesResponse><tr2:Capabilities SnapshotUri="true" Rotation="false">'
+        '<tr2:ProfileCapabilities MaximumNumberOfProfiles="$max_profiles"/>'
+        '<tr2:StreamingCapabilities RTSPStreaming="true" RTPMulticast="false"/>'
+        "</tr2:Capabilities></tr2:GetServiceCapabilitiesResponse>",
+    ("ptz", "GetServiceCapabilities"):
+        '<tptz:GetServiceCapabilitiesResponse><tptz:Capabilities EFlip="false" Reverse="false"'
+        ' GetCompatibleConfigurations="false" MoveStatus="true" StatusPosition="true"/>'
+        "</tptz:GetServiceCapabilitiesResponse>",
+    ("ptz", "ContinuousMove"): "<tptz:ContinuousMoveResponse/>",
+    ("ptz", "Stop"): "<tptz:StopResponse/>",
+    ("ptz", "SetHomePosition"): "<tptz:SetHomePositionResponse/>",
+
+    ("events", "GetServiceCapabilities"):
+        '<tev:GetServiceCapabilitiesResponse><tev:Capabilities WSSubscriptionPolicySupport="false"'
+        ' WSPullPointSupport="true" WSPausableSubscriptionManagerInterfaceSupport="false"'
+        ' MaxNotificationProducers="0" MaxPullPoints="64"/></tev:GetServiceCapabilitiesResponse>',
+    ("events", "GetEventProperties"):
+        "<tev:GetEventPropertiesResponse>"
+        "<tev:TopicNamespaceLocation>http://www.onvif.org/onvif/ver10/topics/topicns.xml"
+        "</tev:TopicNamespaceLocation><wsnt:FixedTopicSet>true</wsnt:FixedTopicSet>"
+        "<wstop:TopicSet><tns1:VideoSource><MotionAlarm wstop:topic=\"true\">"
+        '<tt:MessageDescription IsProperty="true"><tt:Source>'
+        '<tt:SimpleItemDescription Name="Source" Type="tt:ReferenceToken"/></tt:Source>'
+        '<tt:Data><tt:SimpleItemDescription Name="State" Type="xs:boolean"/></tt:Data>'
+        "</tt:MessageDescription></MotionAlarm></tns1:VideoSource></wstop:TopicSet>"
+        "<wsnt:TopicExpressionDialect>http://www.onvif.org/ver10/tev/topicExpression/ConcreteSet"
+        "</wsnt:TopicExpressionDialect>"
+        "<wsnt:TopicExpressionDialect>http://docs.oasis-open.org/wsn/t-1/TopicExpression/Concrete"
+        "</wsnt:TopicExpressionDialect>"
+        "<tev:MessageContentFilterDialect>http://www.onvif.org/ver10/tev/messageContentFilter/ItemFilter"
+        "</tev:MessageContentFilterDialect>"
+        "<tev:MessageContentSchemaLocation>http://www.onvif.org/onvif/ver10/schema/onvif.xsd"
+        "</tev:MessageContentSchemaLocation></tev:GetEventPropertiesResponse>",
+    ("events", "SetSynchronizationPoint"): "<tev:SetSynchronizationPointResponse/>",
+
+    ("recording", "GetServiceCapabilities"):
+        '<trc:GetServiceCapabilitiesResponse><trc:Capabilities DynamicRecordings="false"'
+        ' DynamicTracks="false" MaxStringLength="64"/></trc:GetServiceCapabilitiesResponse>',
+    ("search", "GetServiceCapabilities"):
+        '<tse:GetServiceCapabilitiesResponse><tse:Capabilities MetadataSearch="false"/>'
+        "</tse:GetServiceCapabilitiesResponse>",
+    ("search", "GetRecordingSummary"):
+        "<tse:GetRecordingSummaryResponse><tse:Summary><tt:DataFrom>$recording_from</tt:DataFrom>"
+        "<tt:DataUntil>$utc_now</tt:DataUntil><tt:NumberRecordings>$recordings</tt:NumberRecordings>"
+        "</tse:Summary></tse:GetRecordingSummaryResponse>",
+    ("search", "EndSearch"):
+        "<tse:EndSearchResponse><tse:Endpoint>$utc_now</tse:Endpoint></tse:EndSearchResponse>",
+}
+
+HANDLERS = {}
+
+
+def handler(service: str, *operations):
+    """Register a function building the response element of ``operations``."""
+    def register(func):
+        for operation in operations:
+            HANDLERS[(service, operation)] = func
+        return func
+    return register
+
+
+def _video_source_configuration(ctx) -> str:
+    return ('<tt:Name>VideoSourceConfig</tt:Name>'
+            f'<tt:UseCount>{ctx["profiles"]}</tt:UseCount><tt:SourceToken>VideoSource_1</tt:SourceToken>'
+            '<tt:Bounds x="0" y="0" width="1920" height="1080"/>')
+
+
+def _stream(index: int) -> tuple:
+    """(width, height, bitrate) of profile ``index``: main streams, then sub streams."""
+    return (1920, 1080, 4096) if index % 2 == 0 else (640, 360, 512)
+
+
+def _media_profile(ctx, index: int) -> str:
+    width, height, bitrate = _stream(index)
+    return (
+        f'<trt:Profiles token="Profile_{index + 1}" fixed="true">'
+        f"<tt:Name>Profile_{index + 1}</tt:Name>"
+        f'<tt:VideoSourceConfiguration token="VideoSourceConfig_1">{_video_source_configuration(ctx)}'
+        "</tt:VideoSourceConfiguration>"
+        f'<tt:VideoEncoderConfiguration token="VideoEncoder_{index + 1}">'
+        f"{_video_encoder_fields(index, width, height, bitrate)}</tt:VideoEncoderConfiguration>"
+        '<tt:PTZConfiguration token="PTZConfig_1"><tt:Name>PTZConfig</tt:Name>'
+        f'<tt:UseCount>{ctx["profiles"]}</tt:UseCount><tt:NodeToken>PTZNode_1</tt:NodeToken>'
+        f"<tt:DefaultAbsolutePantTiltPositionSpace>{PAN_TILT_SPACE}</tt:DefaultAbsolutePantTiltPositionSpace>"
+        f"<tt:DefaultAbsoluteZoomPositionSpace>{ZOOM_SPACE}</tt:DefaultAbsoluteZoomPositionSpace>"
+        "<tt:DefaultPTZTimeout>PT10S</tt:DefaultPTZTimeout></tt:PTZConfiguration>"
+        "</trt:Profiles>"
+    )
+
+
+def _video_encoder_fields(index: int, width: int, height: int, bitrate: int) -> str:
+    return (
+        f"<tt:Name>VideoEncoder_{index + 1}</tt:Name><tt:UseCount>1</tt:UseCount>"
+        f"<tt:Encoding>H264</tt:Encoding><tt:Resolution><tt:Width>{width}</tt:Width>"
+        f"<tt:Height>{height}</tt:Height></tt:Resolution><tt:Quality>5</tt:Quality>"
+        "<tt:RateControl><tt:FrameRateLimit>30</tt:FrameRateLimit>"
+        f"<tt:EncodingInterval>1</tt:EncodingInterval><tt:BitrateLimit>{bitrate}</tt:BitrateLimit>"
+        "</tt:RateControl><tt:H264><tt:GovLength>30</tt:GovLength><tt:H264Profile>Main</tt:H264Profile>"
+        "</tt:H264><tt:Multicast><tt:Address><tt:Type>IPv4</tt:Type>"
+        "<tt:IPv4Address>0.0.0.0</tt:IPv4Address></tt:Address><tt:Port>0</tt:Port><tt:TTL>1</tt:TTL>"
+        "<tt:AutoStart>false</tt:AutoStart></tt:Multicast><tt:SessionTimeout>PT60S</tt:SessionTimeout>"
+    )
+
+
+def _profile_index(device, request) -> int:
+    """Index of the request's ProfileToken, or a NoProfile fault."""
+    token = _text(request, "{*}ProfileToken")
+    for index in range(device.config.profiles):
+        if token == f"Profile_{index + 1}":
+            return index
+    raise SoapFault("Sender", ("InvalidArgVal", "NoProfile"), f"Profile {token!r} does not exist")
+
+
+@handler("device", "GetServices")
+def _get_services(device, request, ctx):
+    items = "".join(
+        f"<tds:Service><tds:Namespace>{ns}</tds:Namespace><tds:XAddr>{ctx['base']}{path}</tds:XAddr>"
+        f"<tds:Version><tt:Major>{major}</tt:Major><tt:Minor>{minor}</tt:Minor></tds:Version></tds:Service>"
+        for ns, path, (major, minor) in SERVICES.values()
+    )
+    return f"<tds:GetServicesResponse>{items}</tds:GetServicesResponse>"
+
+
+@handler("device", "GetScopes")
+def _get_scopes(device, request, ctx):
+    items = "".join(f"<tds:Scopes><tt:ScopeDef>Fixed</tt:ScopeDef><tt:ScopeItem>{scope}</tt:ScopeItem>"
+                    "</tds:Scopes>" for scope in device.scopes())
+    return f"<tds:GetScopesResponse>{items}</tds:GetScopesResponse>"
+
+
+@handler("device", "SetHostname")
+def _set_hostname(device, request, ctx):
+    name = _text(request, "{*}Name")
+    if not name:
+        raise SoapFault("Sender", ("InvalidArgVal", "InvalidHostname"), "Hostname is empty")
+    device.hostname = name
+    return "<tds:SetHostnameResponse/>"
+
+
+@handler("media", "GetProfiles")
+def _get_profiles(device, request, ctx):
+    profiles = "".join(_media_profile(ctx, i) for i in range(device.config.profiles))
+    return f"<trt:GetProfilesResponse>{profiles}</trt:GetProfilesResponse>"
+
+
+@handler("media", "GetProfile")
+def _get_profile(device, request, ctx):
+    profile = _media_profile(ctx, _profile_index(device, request)).replace("trt:Profiles", "trt:Profile")
+    return f"<trt:GetProfileResponse>{profile}</trt:GetProfileResponse>"
+
+
+@handler("media", "GetVideoSourceConfigurations")
+def _get_video_source_configurations(device, request, ctx):
+    return ('<trt:GetVideoSourceConfigurationsResponse><trt:Configurations token="VideoSourceConfig_1">'
+            f"{_video_source_configuration(ctx)}</trt:Configurations>"
+            "</trt:GetVideoSourceConfigurationsResponse>")
+
+
+@handler("media", "GetVideoEncoderConfigurations")
+def _get_video_encoder_configurations(device, request, ctx):
+    items = "".join(
+        f'<trt:Configurations token="VideoEncoder_{i + 1}">{_video_encoder_fields(i, *_stream(i))}'
+        "</trt:Configurations>" for i in range(device.config.profiles)
+    )
+    return f"<trt:GetVideoEncoderConfigurationsResponse>{items}</trt:GetVideoEncoderConfigurationsResponse>"
+
+
+@handler("media", "GetStreamUri")
+def _get_stream_uri(device, request, ctx):
+    index = _profile_index(device, request)
+    return ("<trt:GetStreamUriResponse><trt:MediaUri>"
+            f"<tt:Uri>rtsp://{ctx['ip']}:554/stream{index + 1}</tt:Uri>"
+            "<tt:InvalidAfterConnect>false</tt:InvalidAfterConnect>"
+            "<tt:InvalidAfterReboot>false</tt:InvalidAfterReboot><tt:Timeout>PT0S</tt:Timeout>"
+            "</trt:MediaUri></trt:GetStreamUriResponse>")
+
+
+@handler("media2", "GetProfiles")
+def _get_profiles2(device, request, ctx):
+    items = []
+    for i in range(device.config.profiles):
+        width, height, bitrate = _stream(i)
+        items.append(
+            f'<tr2:Profiles token="Profile_{i + 1}" fixed="true"><tr2:Name>Profile_{i + 1}</tr2:Name>'
+            '<tr2:Configurations><tr2:VideoSource token="VideoSourceConfig_1">'
+            f"{_video_source_configuration(ctx)}</tr2:VideoSource>"
+            f'<tr2:VideoEncoder token="VideoEncoder_{i + 1}" GovLength="30" Profile="Main">'
+            f"<tt:Name>VideoEncoder_{i + 1}</tt:Name><tt:UseCount>1</tt:UseCount>"
+            f"<tt:Encoding>H264</tt:Encoding><tt:Resolution><tt:Width>{width}</tt:Width>"
+            f"<tt:Height>{height}</tt:Height></tt:Resolution>"
+            '<tt:RateControl ConstantBitRate="false"><tt:FrameRateLimit>30</tt:FrameRateLimit>'
+            f"<tt:BitrateLimit>{bitrate}</tt:BitrateLimit></tt:RateControl>"
+            "<tt:Quality>5</tt:Quality></tr2:VideoEncoder></tr2:Configurations></tr2:Profiles>"
+        )
+    return f"<tr2:GetProfilesResponse>{''.join(items)}</tr2:GetProfilesResponse>"
+
+
+@handler("media2", "GetStreamUri")
+def _get_stream_uri2(device, request, ctx):
+    index = _profile_index(device, request)
+    return (f"<tr2:GetStreamUriResponse><tr2:Uri>rtsp://{ctx['ip']}:554/stream{index + 1}</tr2:Uri>"
+            "</tr2:GetStreamUriResponse>")
+
+
+def _ptz_node(tag: str) -> str:
+    return (
+        f'<{tag} token="PTZNode_1" FixedHomePosition="false"><tt:Name>PTZNode</tt:Name>'
+        "<tt:SupportedPTZSpaces>"
+        f"<tt:AbsolutePanTiltPositionSpace><tt:URI>{PAN_TILT_SPACE}</tt:URI>"
+        "<tt:XRange><tt:Min>-1</tt:Min><tt:Max>1</tt:Max></tt:XRange>"
+        "<tt:YRange><tt:Min>-1</tt:Min><tt:Max>1</tt:Max></tt:YRange></tt:AbsolutePanTiltPositionSpace>"
+        f"<tt:AbsoluteZoomPositionSpace><tt:URI>{ZOOM_SPACE}</tt:URI>"
+        "<tt:XRange><tt:Min>0</tt:Min><tt:Max>1</tt:Max></tt:XRange></tt:AbsoluteZoomPositionSpace>"
+        f"<tt:ContinuousPanTiltVelocitySpace><tt:URI>{PAN_TILT_VELOCITY}</tt:URI>"
+        "<tt:XRange><tt:Min>-1</tt:Min><tt:Max>1</tt:Max></tt:XRange>"
+        "<tt:YRange><tt:Min>-1</tt:Min><tt:Max>1</tt:Max></tt:YRange></tt:ContinuousPanTiltVelocitySpace>"
+        f"<tt:ContinuousZoomVelocitySpace><tt:URI>{ZOOM_VELOCITY}</tt:URI>"
+        "<tt:XRange><tt:Min>-1</tt:Min><tt:Max>1</tt:Max></tt:XRange></tt:ContinuousZoomVelocitySpace>"
+        "</tt:SupportedPTZSpaces><tt:MaximumNumberOfPresets>64</tt:MaximumNumberOfPresets>"
+        f"<tt:HomeSupported>true</tt:HomeSupported></{tag}>"
+    )
+
+
+def _ptz_vector(position: dict) -> str:
+    return (f'<tt:PanTilt x="{position["x"]:.4f}" y="{position["y"]:.4f}" space="{PAN_TILT_SPACE}"/>'
+            f'<tt:Zoom x="{position["zoom"]:.4f}" space="{ZOOM_SPACE}"/>')
+
+
+def _read_vector(element) -> dict:
+    """``{"x", "y", "zoom"}`` of a PTZVector element (missing parts are None)."""
+    pan_tilt = element.find("{*}PanTilt") if element is not None else None
+    zoom = element.find("{*}Zoom") if element is not None else None
+    try:
+        return {
+            "x": float(pan_tilt.get("x")) if pan_tilt is not None else None,
+            "y": float(pan_tilt.get("y")) if pan_tilt is not None else None,
+            "zoom": float(zoom.get("x")) if zoom is not None else None,
+        }
+    except (TypeError, ValueError):
+        raise SoapFault("Sender", ("InvalidArgVal", "InvalidPosition"), "Invalid PTZ vector")
+
+
+@handler("ptz", "GetNodes")
+def _get_nodes(device, request, ctx):
+    return f"<tptz:GetNodesResponse>{_ptz_node('tptz:PTZNode')}</tptz:GetNodesResponse>"
+
+
+@handler("ptz", "GetNode")
+def _get_node(device, request, ctx):
+    return f"<tptz:GetNodeResponse>{_ptz_node('tptz:PTZNode')}</tptz:GetNodeResponse>"
+
+
+@handler("ptz", "GetConfigurations")
+def _get_ptz_configurations(device, request, ctx):
+    return (
+        '<tptz:GetConfigurationsResponse><tptz:PTZConfiguration token="PTZConfig_1">'
+        f"<tt:Name>PTZConfig</tt:Name><tt:UseCount>{ctx['profiles']}</tt:UseCount>"
+        "<tt:NodeToken>PTZNode_1</tt:NodeToken>"
+        f"<tt:DefaultAbsolutePantTiltPositionSpace>{PAN_TILT_SPACE}</tt:DefaultAbsolutePantTiltPositionSpace>"
+        f"<tt:DefaultAbsoluteZoomPositionSpace>{ZOOM_SPACE}</tt:DefaultAbsoluteZoomPositionSpace>"
+        f"<tt:DefaultContinuousPanTiltVelocitySpace>{PAN_TILT_VELOCITY}</tt:DefaultContinuousPanTiltVelocitySpace>"
+        f"<tt:DefaultContinuousZoomVelocitySpace>{ZOOM_VELOCITY}</tt:DefaultContinuousZoomVelocitySpace>"
+        '<tt:DefaultPTZSpeed><tt:PanTilt x="0.5" y="0.5"/><tt:Zoom x="0.5"/></tt:DefaultPTZSpeed>'
+        "<tt:DefaultPTZTimeout>PT10S</tt:DefaultPTZTimeout></tptz:PTZConfiguration>"
+        "</tptz:GetConfigurationsResponse>"
+    )
+
+
+@handler("ptz", "GetStatus")
+def _get_status(device, request, ctx):
+    with device.lock:
+        position = dict(device.ptz)
+    return ("<tptz:GetStatusResponse><tptz:PTZStatus>"
+            f"<tt:Position>{_ptz_vector(position)}</tt:Position>"
+            "<tt:MoveStatus><tt:PanTilt>IDLE</tt:PanTilt><tt:Zoom>IDLE</tt:Zoom></tt:MoveStatus>"
+            f"<tt:UtcTime>{ctx['utc_now']}</tt:UtcTime></tptz:PTZStatus></tptz:GetStatusResponse>")
+
+
+@handler("ptz", "AbsoluteMove", "RelativeMove", "GotoHomePosition")
+def _move(device, request, ctx):
+    operation = etree.QName(request).localname
+    if operation == "AbsoluteMove":
+        target = _read_vector(request.find("{*}Position"))
+    elif operation == "RelativeMove":
+        target = _read_vector(request.find("{*}Translation"))
+    else:
+        target = {"x": 0.0, "y": 0.0, "zoom": 0.0}
+    with device.lock:
+        for axis, value in target.items():
+            if value is None:
+                continue
+            if operation == "RelativeMove":
+                value += device.ptz[axis]
+            low = 0.0 if axis == "zoom" else -1.0
+            device.ptz[axis] = min(max(value, low), 1.0)
+    return f"<tptz:{operation}Response/>"
+
+
+@handler("ptz", "GetPresets")
+def _get_presets(device, request, ctx):
+    with device.lock:
+        presets = sorted(device.presets.items())
+    items = "".join(
+        f'<tptz:Preset token="{token}"><tt:Name>{_escape(name)}</tt:Name>'
+        f"<tt:PTZPosition>{_ptz_vector(position)}</tt:PTZPosition></tptz:Preset>"
+        for token, (name, position) in presets
+    )
+    return f"<tptz:GetPresetsResponse>{items}</tptz:GetPresetsResponse>"
+
+
+@handler("ptz", "SetPreset")
+def _set_preset(device, request, ctx):
+    with device.lock:
+        token = _text(request, "{*}PresetToken") or str(len(device.presets) + 1)
+        while not _text(request, "{*}PresetToken") and token in device.presets:
+            token = str(int(token) + 1)
+        name = _text(request, "{*}PresetName", f"Preset {token}")
+        device.presets[token] = (name, dict(device.ptz))
+    return f"<tptz:SetPresetResponse><tptz:PresetToken>{token}</tptz:PresetToken></tptz:SetPresetResponse>"
+
+
+@handler("ptz", "GotoPreset", "RemovePreset")
+def _use_preset(device, request, ctx):
+    operation = etree.QName(request).localname
+    token = _text(request, "{*}PresetToken")
+    with device.lock:
+        if token not in device.presets:
+            raise SoapFault("Sender", ("InvalidArgVal", "NoToken"), f"Preset {token!r} does not exist")
+        if operation == "GotoPreset":
+            device.ptz = dict(device.presets[token][1])
+        else:
+            del device.presets[token]
+    return f"<tptz:{operation}Response/>"
+
+
+@handler("events", "CreatePullPointSubscription")
+def _create_pull_point(device, request, ctx):
+    lifetime = _duration(_text(request, "{*}InitialTerminationTime"), 60)
+    subscription_id = device.subscribe(lifetime)
+    now, expires = device.subscription_times(subscription_id)
+    return ("<tev:CreatePullPointSubscriptionResponse><tev:SubscriptionReference>"
+            f"<wsa:Address>{ctx['base']}/onvif/events/subscription/{subscription_id}</wsa:Address>"
+            f"</tev:SubscriptionReference><wsnt:CurrentTime>{now}</wsnt:CurrentTime>"
+            f"<wsnt:TerminationTime>{expires}</wsnt:TerminationTime>"
+            "</tev:CreatePullPointSubscriptionResponse>")
+
+
+@handler("events", "PullMessages")
+def _pull_messages(device, request, ctx):
+    subscription_id = ctx["path"].rstrip("/").rpartition("/")[2]
+    timeout = min(_duration(_text(request, "{*}Timeout"), 10), 60)
+    limit = int(_text(request, "{*}MessageLimit", "100") or 100)
+    messages = device.pull(subscription_id, timeout, limit)
+    now, expires = device.subscription_times(subscription_id)
+    items = "".join(
+        "<wsnt:NotificationMessage>"
+        '<wsnt:Topic Dialect="http://www.onvif.org/ver10/tev/topicExpression/ConcreteSet">'
+        "tns1:VideoSource/MotionAlarm</wsnt:Topic><wsnt:Message>"
+        f'<tt:Message UtcTime="{utc_time}" PropertyOperation="Changed"><tt:Source>'
+        '<tt:SimpleItem Name="Source" Value="VideoSource_1"/></tt:Source><tt:Data>'
+        f'<tt:SimpleItem Name="State" Value="{"true" if state else "false"}"/></tt:Data>'
+        "</tt:Message></wsnt:Message></wsnt:NotificationMessage>"
+        for utc_time, state in messages
+    )
+    return (f"<tev:PullMessagesResponse><tev:CurrentTime>{now}</tev:CurrentTime>"
+            f"<tev:TerminationTime>{expires}</tev:TerminationTime>{items}</tev:PullMessagesResponse>")
+
+
+@handler("events", "Renew")
+def _renew(device, request, ctx):
+    subscription_id = ctx["path"].rstrip("/").rpartition("/")[2]
+    device.renew(subscription_id, _duration(_text(request, "{*}TerminationTime"), 60))
+    now, expires = device.subscription_times(subscription_id)
+    return (f"<wsnt:RenewResponse><wsnt:TerminationTime>{expires}</wsnt:TerminationTime>"
+            f"<wsnt:CurrentTime>{now}</wsnt:CurrentTime></wsnt:RenewResponse>")
+
+
+@handler("events", "Unsubscribe")
+def _unsubscribe(device, request, ctx):
+    device.unsubscribe(ctx["path"].rstrip("/").rpartition("/")[2])
+    return "<wsnt:UnsubscribeResponse/>"
+
+
+def _recording_source(ctx, index: int) -> str:
+    return (f"<tt:SourceId>{ctx['base']}/onvif/device_service</tt:SourceId>"
+            f"<tt:Name>{_escape(ctx['hostname'])}</tt:Name><tt:Location>Mock site</tt:Location>"
+            f"<tt:Description>Camera {index + 1}</tt:Description>"
+            f"<tt:Address>{ctx['base']}/onvif/device_service</tt:Address>")
+
+
+@handler("recording", "GetRecordings")
+def _get_recordings(device, request, ctx):
+    items = "".join(
+        f"<trc:RecordingItem><tt:RecordingToken>Recording_{i + 1}</tt:RecordingToken>"
+        f"<tt:Configuration><tt:Source>{_recording_source(ctx, i)}</tt:Source>"
+        f"<tt:Content>Recording {i + 1}</tt:Content>"
+        "<tt:MaximumRetentionTime>PT0S</tt:MaximumRetentionTime></tt:Configuration>"
+        "<tt:Tracks><tt:Track><tt:TrackToken>VIDEO001</tt:TrackToken><tt:Configuration>"
+        "<tt:TrackType>Video</tt:TrackType><tt:Description>Video track</tt:Description>"
+        "</tt:Configuration></tt:Track></tt:Tracks></trc:RecordingItem>"
+        for i in range(device.config.recordings)
+    )
+    return f"<trc:GetRecordingsResponse>{items}</trc:GetRecordingsResponse>"
+
+
+@handler("search", "FindRecordings")
+def _find_recordings(device, request, ctx):
+    return (f"<tse:FindRecordingsResponse><tse:SearchToken>search-{uuid.uuid4().hex[:8]}"
+            "</tse:SearchToken></tse:FindRecordingsResponse>")
+
+
+@handler("search", "GetRecordingSearchResults")
+def _get_recording_search_results(device, request, ctx):
+    items = "".join(
+        f"<tt:RecordingInformation><tt:RecordingToken>Recording_{i + 1}</tt:RecordingToken>"
+        f"<tt:Source>{_recording_source(ctx, i)}</tt:Source>"
+        f"<tt:EarliestRecording>{ctx['recording_from']}</tt:EarliestRecording>"
+        f"<tt:LatestRecording>{ctx['utc_now']}</tt:LatestRecording>"
+        f"<tt:Content>Recording {i + 1}</tt:Content>"
+        "<tt:Track><tt:TrackToken>VIDEO001</tt:TrackToken><tt:TrackType>Video</tt:TrackType>"
+        f"<tt:Description>Video track</tt:Description><tt:DataFrom>{ctx['recording_from']}</tt:DataFrom>"
+        f"<tt:DataTo>{ctx['utc_now']}</tt:DataTo></tt:Track>"
+        "<tt:RecordingStatus>Recording</tt:RecordingStatus></tt:RecordingInformation>"
+        for i in range(device.config.recordings)
+    )
+    return ("<tse:GetRecordingSearchResultsResponse><tse:ResultList>"
+            f"<tt:SearchState>Completed</tt:SearchState>{items}</tse:ResultList>"
+            "</tse:GetRecordingSearchResultsResponse>")
+
+
+# ── Device ─────────────────────────────────────────────────
+
+class MockConfig:
+    """Settings shared by every mock device of one process."""
+
+    def __init__(self, args):
+        self.username = args.username
+        self.password = args.password
+        self.auth = not args.no_auth
+        self.max_skew = args.max_skew
+        self.clock_offset = args.clock_offset
+        self.latency = args.latency / 1000
+        self.jitter = args.jitter / 1000
+        self.hang = args.hang
+        self.faults = parse_faults(args.faults)
+        self.profiles = args.profiles
+        self.recordings = args.recordings
+        self.event_rate = args.event_rate
+        self.responses = load_responses(args.responses) if args.responses else {}
+
+    def pick_fault(self):
+        roll = random.random()
+        for kind in FAULT_KINDS:
+            rate = self.faults.get(kind, 0)
+            if roll < rate:
+                return kind
+            roll -= rate
+        return None
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+
+class MockDevice:
+    """State of one mock camera: identity, clock, PTZ position, subscriptions."""
+
+    def __init__(self, index: int, config: MockConfig):
+        self.index = index
+        self.config = config
+        self.serial = f"MOCK{index:05d}"
+        self.hostname = f"mock-camera-{index}"
+        self.endpoint_reference = f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, self.serial)}"
+        self.ptz = {"x": 0.0, "y": 0.0, "zoom": 0.0}
+        self.presets = {}
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self._subscriptions = {}  # id -> {"expires", "next_event", "state"}
+        self._nonces = deque()
+        self._nonce_set = set()
+        self._started = datetime.now(timezone.utc)
+
+    def now(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.config.clock_offset)
+
+    def scopes(self) -> list:
+        return [
+            "onvif://www.onvif.org/type/video_encoder",
+            "onvif://www.onvif.org/type/ptz",
+            "onvif://www.onvif.org/Profile/Streaming",
+            "onvif://www.onvif.org/Profile/T",
+            "onvif://www.onvif.org/Profile/G",
+            f"onvif://www.onvif.org/name/{self.hostname}",
+            "onvif://www.onvif.org/hardware/MockCam-1000",
+            "onvif://www.onvif.org/location/mock",
+        ]
+
+    def context(self, host: str, path: str) -> dict:
+        now = self.now()
+        return {
+            "base": f"http://{host}", "ip": host.rpartition(":")[0] or host, "path": path,
+            "manufacturer": "Mock Vision", "model": "MockCam-1000", "firmware": "1.0.0",
+            "serial": self.serial, "hardware_id": f"HW-{self.index:04d}",
+            "hostname": _escape(self.hostname), "username": _escape(self.config.username),
+            "mac": f"02:00:00:00:{self.index >> 8 & 0xff:02x}:{self.index & 0xff:02x}",
+            "utc_now": _iso(now), "recording_from": _iso(self._started - timedelta(days=1)),
+            "year": now.year, "month": now.month, "day": now.day,
+            "hour": now.hour, "minute": now.minute, "second": now.second,
+            "profiles": self.config.profiles, "max_profiles": max(8, self.config.profiles),
+            "recordings": self.config.recordings,
+        }
+
+    def handle(self, raw: bytes, host: str, path: str) -> tuple:
+        """Return ``(http_status, envelope_bytes)`` for one SOAP request."""
+        operation = "?"
+        try:
+            try:
+                root = etree.fromstring(raw, etree.XMLParser(resolve_entities=False, no_network=True))
+            except etree.XMLSyntaxError as e:
+                raise SoapFault("Sender", ("WellFormed",), f"Malformed request: {e}")
+            body = root.find("{*}Body")
+            request = next((child for child in (body if body is not None else [])
+                            if isinstance(child.tag, str)), None)
+            if request is None:
+                raise SoapFault("Sender", ("InvalidArgs",), "Empty SOAP body")
+            qname = etree.QName(request)
+            operation = qname.localname
+            service = NAMESPACE_SERVICES.get(qname.namespace)
+            if service is None:
+                raise SoapFault("Receiver", ("ActionNotSupported",),
+                                f"Unsupported service namespace {qname.namespace}")
+            if self.config.auth and not (service == "device" and operation in PRE_AUTH):
+                self._check_auth(root.find("{*}Header"))
+
+            ctx = self.context(host, path)
+            template = (self.config.responses.get((service, operation))
+                        or self.config.responses.get(operation))
+            if template is None and (service, operation) in HANDLERS:
+                template = HANDLERS[(service, operation)](self, request, ctx)
+            template = template or TEMPLATES.get((service, operation))
+            if template is None:
+                raise SoapFault("Receiver", ("ActionNotSupported",),
+                                f"{operation} is not implemented by the mock device")
+            self.stats[operation] += 1
+            body_xml = Template(template).safe_substitute(ctx)
+            return 200, ENVELOPE.format(body=body_xml).encode("utf-8")
+        except SoapFault as fault:
+            self.stats[f"fault:{fault.subcodes[-1]}"] += 1
+            return fault.status, ENVELOPE.format(body=fault.body()).encode("utf-8")
+
+    def _check_auth(self, header):
+        token = header.find(".//{*}Security/{*}UsernameToken") if header is not None else None
+        if token is None:
+            raise SoapFault("Sender", ("NotAuthorized",), "WS-Security UsernameToken required")
+        password = token.find("{*}Password")
+        if _text(token, "{*}Username") != self.config.username or password is None:
+            raise SoapFault("Sender", ("NotAuthorized",), "Sender not authorized")
+        supplied = (password.text or "").strip()
+        if password.get("Type", "").endswith("#PasswordText"):
+            if not hmac.compare_digest(supplied, self.config.password):
+                raise SoapFault("Sender", ("NotAuthorized",), "Sender not authorized")
+            return
+
+        nonce_b64 = _text(token, "{*}Nonce")
+        created = _text(token, "{*}Created")
+        try:
+            nonce = base64.b64decode(nonce_b64)
+            created_at = isodate.parse_datetime(created)
+        except (ValueError, isodate.ISO8601Error):
+            raise SoapFault("Sender", ("NotAuthorized",), "Invalid Nonce or Created")
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        expected = base64.b64encode(hashlib.sha1(
+            nonce + created.encode("utf-8") + self.config.password.encode("utf-8")).digest()).decode()
+        if not hmac.compare_digest(expected, supplied):
+            raise SoapFault("Sender", ("NotAuthorized",), "Sender not authorized")
+        if abs((created_at - self.now()).total_seconds()) > self.config.max_skew:
+            raise SoapFault("Sender", ("NotAuthorized",),
+                            "Created time is outside the device's allowed clock skew")
+        with self.lock:
+            if nonce_b64 in self._nonce_set:
+                raise SoapFault("Sender", ("NotAuthorized",), "Nonce already used")
+            self._nonces.append(nonce_b64)
+            self._nonce_set.add(nonce_b64)
+            if len(self._nonces) > _NONCES_KEPT:
+                self._nonce_set.discard(self._nonces.popleft())
+
+    # PullPoint subscriptions: events are generated at --event-rate per second
+
+    def subscribe(self, lifetime: float) -> str:
+        subscription_id = uuid.uuid4().hex[:12]
+        with self.lock:
+            self._subscriptions[subscription_id] = {
+                "expires": time.time() + lifetime, "next_event": time.time(), "state": False,
+            }
+        return subscription_id
+
+    def renew(self, subscription_id: str, lifetime: float):
+        self._subscription(subscription_id)["expires"] = time.time() + lifetime
+
+    def unsubscribe(self, subscription_id: str):
+        self._subscription(subscription_id)
+        with self.lock:
+            self._subscriptions.pop(subscription_id, None)
+
+    def subscription_times(self, subscription_id: str) -> tuple:
+        subscription = self._subscription(subscription_id)
+        offset = timedelta(seconds=self.config.clock_offset)
+        return (_iso(self.now()),
+                _iso(datetime.fromtimestamp(subscription["expires"], timezone.utc) + offset))
+
+    def pull(self, subscription_id: str, timeout: float, limit: int) -> list:
+        """Wait up to ``timeout`` for due events; return ``[(utc_time, state), ...]``."""
+        subscription = self._subscription(subscription_id)
+        rate = self.config.event_rate
+        deadline = time.time() + timeout
+        while True:
+            now = time.time()
+            if rate > 0 and subscription["next_event"] <= now:
+                break
+            wake = min(deadline, subscription["next_event"]) if rate > 0 else deadline
+            if now >= deadline:
+                return []
+            time.sleep(max(0.0, min(wake - now, 0.5)))
+        messages = []
+        offset = timedelta(seconds=self.config.clock_offset)
+        with self.lock:
+            while subscription["next_event"] <= now and len(messages) < limit:
+                subscription["state"] = not subscription["state"]
+                at = datetime.fromtimestamp(subscription["next_event"], timezone.utc) + offset
+                messages.append((_iso(at), subscription["state"]))
+                subscription["next_event"] += 1 / rate
+        return messages
+
+    def _subscription(self, subscription_id: str) -> dict:
+        with self.lock:
+            for key in [k for k, s in self._subscriptions.items() if s["expires"] < time.time()]:
+                del self._subscriptions[key]
+            subscription = self._subscriptions.get(subscription_id)
+        if subscription is None:
+            raise SoapFault("Receiver", ("InvalidArgVal", "ResourceUnknown"),
+                            f"Subscription {subscription_id!r} does not exist")
+        return subscription
+
+
+class ONVIFRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockONVIF/1.0"
+    # Headers and body are separate writes; without this Nagle + delayed ACK add ~40 ms
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        device = self.server.device
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        fault = device.config.pick_fault()
+        if fault:
+            device.stats[f"injected:{fault}"] += 1
+        if fault == "drop":
+            self.close_connection = True
+            return
+        device.config.delay()
+        if fault == "hang":
+            time.sleep(device.config.hang)
+        if fault == "http503":
+            self._send(503, b"Service Unavailable", "text/plain")
+            return
+        if fault == "soap":
+            injected = SoapFault("Receiver", ("Action",), "Injected fault")
+            status, envelope = 500, ENVELOPE.format(body=injected.body()).encode("utf-8")
+        else:
+            host = self.headers.get("Host") or f"{self.server.server_address[0]}:{self.server.server_port}"
+            status, envelope = device.handle(raw, host, self.path)
+        self._send(status, envelope, "application/soap+xml; charset=utf-8")
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/mock/stats":
+            self._send(404, b"Not Found", "text/plain")
+            return
+        device = self.server.device
+        body = json.dumps({"serial": device.serial, "requests": dict(device.stats)}).encode()
+        self._send(200, body, "application/json")
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256
+
+    def __init__(self, address, device: MockDevice):
+        super().__init__(address, ONVIFRequestHandler)
+        self.device = device
+
+
+# ── WS-Discovery responder ─────────────────────────────────
+
+PROBE_MATCH = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope"'
+    ' xmlns:a="http://schemas.xmlsoap.org/ws/2004/08/addressing"'
+    ' xmlns:d="http://schemas.xmlsoap.org/ws/2005/04/discovery"'
+    ' xmlns:dn="http://www.onvif.org/ver10/network/wsdl"'
+    ' xmlns:tds="http://www.onvif.org/ver10/device/wsdl">'
+    "<s:Header><a:MessageID>urn:uuid:{message_id}</a:MessageID>"
+    "<a:RelatesTo>{relates_to}</a:RelatesTo>"
+    "<a:To>http://schemas.xmlsoap.org/ws/2004/08/addressing/role/anonymous</a:To>"
+    "<a:Action>http://schemas.xmlsoap.org/ws/2005/04/discovery/ProbeMatches</a:Action></s:Header>"
+    "<s:Body><d:ProbeMatches><d:ProbeMatch>"
+    "<a:EndpointReference><a:Address>{epr}</a:Address></a:EndpointReference>"
+    "<d:Types>dn:NetworkVideoTransmitter tds:Device</d:Types>"
+    "<d:Scopes>{scopes}</d:Scopes><d:XAddrs>{xaddrs}</d:XAddrs>"
+    "<d:MetadataVersion>1</d:MetadataVersion>"
+    "</d:ProbeMatch></d:ProbeMatches></s:Body></s:Envelope>"
+)
+
+
+def serve_discovery(servers: list, port: int, advertise_host: str = None):
+    """Answer WS-Discovery Probes (multicast and unicast) for every mock device."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("", port))
+    try:
+        membership = struct.pack("4s4s", socket.inet_aton("239.255.255.250"),
+                                 socket.inet_aton("0.0.0.0"))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    except OSError as e:
+        print(f"WS-Discovery: multicast unavailable ({e}); answering unicast probes only")
+
+    while True:
+        data, sender = sock.recvfrom(65535)
+        try:
+            root = etree.fromstring(data, etree.XMLParser(resolve_entities=False, no_network=True))
+        except etree.XMLSyntaxError:
+            continue
+        if root.find("{*}Body/{*}Probe") is None:
+            continue
+        relates_to = _text(root, "{*}Header/{*}MessageID")
+        host = advertise_host or _local_address_for(sender[0])
+        for server in servers:
+            device = server.device
+            reply = PROBE_MATCH.format(
+                message_id=uuid.uuid4(), relates_to=_escape(relates_to),
+                epr=device.endpoint_reference, scopes=" ".join(device.scopes()),
+                xaddrs=f"http://{host}:{server.server_port}/onvif/device_service",
+            )
+            sock.sendto(reply.encode("utf-8"), sender)
+
+
+def _local_address_for(remote_ip: str) -> str:
+    """The local address the OS would use to reach ``remote_ip``."""
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        probe.connect((remote_ip, 9))
+        return probe.getsockname()[0]
+    except OSError:
+        return "127.0.0.1"
+    finally:
+        probe.close()
+
+
+# ── Command line ───────────────────────────────────────────
+
+def parse_faults(spec: str) -> dict:
+    """``"soap=0.01,drop=0.001"`` -> ``{"soap": 0.01, "drop": 0.001}``."""
+    faults = {}
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        kind, _, rate = part.partition("=")
+        if kind not in FAULT_KINDS:
+            raise ValueError(f"Unknown fault kind {kind!r} (use {', '.join(FAULT_KINDS)})")
+        faults[kind] = float(rate)
+    if sum(faults.values()) > 1:
+        raise ValueError("Fault rates add up to more than 1")
+    return faults
+
+
+def load_responses(directory: str) -> dict:
+    """Canned responses: ``<Operation>.xml`` or ``<service>.<Operation>.xml`` files."""
+    responses = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".xml"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as fh:
+            content = fh.read().strip()
+        parts = name[:-4].split(".")
+        key = (parts[0], parts[1]) if len(parts) == 2 and parts[0] in SERVICES else parts[-1]
+        responses[key] = content
+    return responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port of the first device")
+    parser.add_argument("--devices", type=int, default=1, help="number of devices (consecutive ports)")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--no-auth", action="store_true", help="accept requests without WS-Security")
+    parser.add_argument("--max-skew", type=float, default=300,
+                        help="seconds a UsernameToken Created time may differ from the device clock")
+    parser.add_argument("--clock-offset", type=float, default=0, help="seconds the device clock is ahead")
+    parser.add_argument("--latency", type=float, default=0, help="response delay in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="+/- random delay in ms")
+    parser.add_argument("--faults", default="", help="e.g. soap=0.01,http503=0.005,drop=0.001,hang=0.001")
+    parser.add_argument("--hang", type=float, default=60, help="seconds a 'hang' fault delays the response")
+    parser.add_argument("--profiles", type=int, default=2, help="media profiles per device")
+    parser.add_argument("--recordings", type=int, default=1, help="recordings per device")
+    parser.add_argument("--event-rate", type=float, default=1, help="PullPoint events per second")
+    parser.add_argument("--responses", help="directory of canned <Operation>.xml responses")
+    parser.add_argument("--discovery", action="store_true", help="answer WS-Discovery probes")
+    parser.add_argument("--discovery-port", type=int, default=3702)
+    args = parser.parse_args()
+
+    try:
+        config = MockConfig(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    servers = []
+    for i in range(args.devices):
+        port = args.port + i if args.port else 0
+        server = MockServer((args.host, port), MockDevice(i + 1, config))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        print(f"Listening: http://{args.host}:{server.server_port}/onvif/device_service", flush=True)
+    if args.discovery:
+        advertise = None if args.host in ("", "0.0.0.0") else args.host
+        threading.Thread(target=serve_discovery, args=(servers, args.discovery_port, advertise),
+                         daemon=True).start()
+    print(f"Ready: {len(servers)} device(s), user {args.username!r}", flush=True)
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()